@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+End-to-End Throughput Benchmark
+Drives VideoDownloader against the local synthetic media server and reports
+MB/s, p50/p99 job latency, CPU time and RSS as JSON
+
+Scenarios:
+    progressive  direct MP4 links through the yt-dlp generic extractor
+    hls          m3u8 streams through the full VideoDownloader path (needs ffmpeg)
+    hls-engine   the native HLS segment engine alone (no ffmpeg needed)
+
+Usage: python benchmarks/e2e_throughput.py --scenario all --jobs 8 --workers 4
+"""
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+sys.path.insert(0, BENCHMARK_DIR)
+
+from media_server import video_url, hls_url
+
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+SCENARIOS = ('progressive', 'hls', 'hls-engine')
+SERVER_START_TIMEOUT = 10
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _round(value: Optional[float], digits: int = 4) -> Optional[float]:
+    return None if value is None else round(value, digits)
+
+
+def _cpu_times() -> Dict[str, float]:
+    if resource is None:
+        times = os.times()
+        return {'self': times.user + times.system, 'children': times.children_user + times.children_system}
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {'self': own.ru_utime + own.ru_stime, 'children': children.ru_utime + children.ru_stime}
+
+
+def _rss_mb() -> Dict[str, Optional[float]]:
+    """Current and peak resident set size of this process"""
+    current = None
+    try:
+        with open('/proc/self/statm') as f:
+            current = round(int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024, 1)
+    except (OSError, ValueError, AttributeError):
+        pass
+    peak = None
+    if resource is not None:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS bytes
+        peak = round(maxrss / 1024 / 1024 if sys.platform == 'darwin' else maxrss / 1024, 1)
+    return {'rss_mb': current, 'peak_rss_mb': peak}
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _dir_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            if not name.startswith('.'):
+                total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+class ServerProcess:
+    """Media server in a child process so it does not skew our CPU and RSS numbers"""
+
+    def __init__(self, latency_ms: float, bandwidth_mbps: Optional[float], error_rate: float, seed: int):
+        command = [sys.executable, os.path.join(BENCHMARK_DIR, 'media_server.py'),
+                   '--latency-ms', str(latency_ms), '--error-rate', str(error_rate), '--seed', str(seed)]
+        if bandwidth_mbps:
+            command += ['--bandwidth-mbps', str(bandwidth_mbps)]
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        line = ''
+        while time.monotonic() < deadline and not line.startswith('READY'):
+            line = self.process.stdout.readline()
+            if not line and self.process.poll() is not None:
+                break
+        if not line.startswith('READY'):
+            self.stop()
+            raise RuntimeError('Media server did not start')
+        self.base_url = line.split()[1]
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def _run_queue_jobs(urls: List[str], workers: int, output_dir: str, format_choice: str) -> Dict:
+    from core.downloader import VideoDownloader
+
+    downloader = VideoDownloader(output_dir)
+    # Every job hits the one local server, spacing their starts would only measure the interval
+    downloader.host_scheduler.configure(min_interval=0)
+    queue = downloader.get_queue(workers)
+    jobs = [queue.submit(url, 'best', format_choice) for url in urls]
+    queue.wait_all()
+    downloader.close()
+
+    latencies = [job.finished_at - job.created_at for job in jobs if job.state == 'done']
+    errors = sorted({job.error for job in jobs if job.state != 'done' and job.error})
+    return {
+        'succeeded': len(latencies),
+        'failed': len(jobs) - len(latencies),
+        'errors': errors[:5],
+        'latencies': latencies,
+        'bytes': _dir_bytes(output_dir),
+    }
+
+
+def _run_engine_jobs(urls: List[str], workers: int, output_dir: str, segment_workers: int) -> Dict:
+    from core.hls import HLSDownloader
+
+    def fetch(index_url):
+        index, url = index_url
+        started = time.time()
+        engine = HLSDownloader(max_workers=segment_workers)
+        try:
+            result = engine.download(url, os.path.join(output_dir, f'{index:03d}-stream.ts'))
+            return time.time() - started, result['bytes'], None
+        except Exception as e:
+            return None, 0, str(e)
+        finally:
+            engine.close()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(fetch, enumerate(urls, 1)))
+
+    latencies = [latency for latency, _, error in outcomes if error is None]
+    return {
+        'succeeded': len(latencies),
+        'failed': len(outcomes) - len(latencies),
+        'errors': sorted({error for _, _, error in outcomes if error})[:5],
+        'latencies': latencies,
+        'bytes': sum(size for _, size, _ in outcomes),
+    }
+
+
+def run_scenario(name: str, args, base_url: str) -> Dict:
+    """Run one scenario and summarize throughput, latency and resource use"""
+    if name == 'hls' and shutil.which('ffmpeg') is None:
+        return {'scenario': name, 'skipped': 'ffmpeg not found (needed to remux)'}
+
+    output_dir = tempfile.mkdtemp(prefix=f'bench-{name}-')
+    if name == 'progressive':
+        urls = [video_url(base_url, f'video{i}', int(args.size_mb * 1024 * 1024)) for i in range(args.jobs)]
+    else:
+        urls = [hls_url(base_url, f'stream{i}', args.segments, args.segment_kb * 1024) for i in range(args.jobs)]
+
+    cpu_before = _cpu_times()
+    started = time.perf_counter()
+    try:
+        # yt-dlp console output goes to stderr so stdout stays valid JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            if name == 'hls-engine':
+                outcome = _run_engine_jobs(urls, args.workers, output_dir, args.segment_workers)
+            else:
+                outcome = _run_queue_jobs(urls, args.workers, output_dir, 'MP4')
+    finally:
+        wall = time.perf_counter() - started
+        cpu_after = _cpu_times()
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    cpu_self = cpu_after['self'] - cpu_before['self']
+    latencies = outcome.pop('latencies')
+    summary = {
+        'scenario': name,
+        'jobs': args.jobs,
+        'workers': args.workers,
+        'wall_s': round(wall, 3),
+        'bytes': outcome['bytes'],
+        'mb_per_s': round(outcome['bytes'] / 1024 / 1024 / wall, 2) if wall else None,
+        # Job latency runs from submission to completion, queue wait included
+        'latency_p50_s': _round(percentile(latencies, 50)),
+        'latency_p99_s': _round(percentile(latencies, 99)),
+        'cpu_s': round(cpu_self, 3),
+        'cpu_percent': round(cpu_self / wall * 100, 1) if wall else None,
+        'child_cpu_s': round(cpu_after['children'] - cpu_before['children'], 3),
+    }
+    summary.update(outcome)
+    summary.update(_rss_mb())
+    return summary
+
+
+def compare(previous: Dict, current: Dict) -> List[str]:
+    """Human readable deltas for scenarios present in both runs"""
+    lines = []
+    old = {s['scenario']: s for s in previous.get('scenarios', []) if 'skipped' not in s}
+    for scenario in current['scenarios']:
+        before = old.get(scenario['scenario'])
+        if before is None or 'skipped' in scenario:
+            continue
+        for metric in ('mb_per_s', 'latency_p50_s', 'latency_p99_s', 'cpu_s', 'peak_rss_mb'):
+            if before.get(metric) and scenario.get(metric) is not None:
+                change = (scenario[metric] - before[metric]) / before[metric] * 100
+                lines.append(f"{scenario['scenario']:<12} {metric:<14} "
+                             f"{before[metric]:>10.3f} -> {scenario[metric]:>10.3f} ({change:+.1f}%)")
+    return lines
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='End-to-end download throughput benchmark')
+    parser.add_argument('--scenario', choices=SCENARIOS + ('all',), default='all')
+    parser.add_argument('--jobs', type=int, default=8, help='downloads per scenario')
+    parser.add_argument('--workers', type=int, default=4, help='concurrent downloads')
+    parser.add_argument('--size-mb', type=float, default=16, help='progressive file size')
+    parser.add_argument('--segments', type=int, default=40, help='HLS segments per stream')
+    parser.add_argument('--segment-kb', type=int, default=256, help='HLS segment size')
+    parser.add_argument('--segment-workers', type=int, default=8, help='hls-engine fetch threads per stream')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='server delay per request')
+    parser.add_argument('--bandwidth-mbps', type=float, default=None, help='server limit per connection')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered 503')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='result JSON path (default: benchmarks/results/e2e-<time>.json)')
+    parser.add_argument('--compare', metavar='JSON', help='previous result file to compare against')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    scenarios = SCENARIOS if args.scenario == 'all' else (args.scenario,)
+
+    # Keep the journal and caches of the benchmark away from the user's data
+    data_dir = tempfile.mkdtemp(prefix='bench-data-')
+    os.environ['YTDL_PRO_DATA_DIR'] = data_dir
+
+    server = ServerProcess(args.latency_ms, args.bandwidth_mbps, args.error_rate, args.seed)
+    try:
+        results = [run_scenario(name, args, server.base_url) for name in scenarios]
+    finally:
+        server.stop()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {
+        'benchmark': 'e2e_throughput',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'server': {'latency_ms': args.latency_ms, 'bandwidth_mbps': args.bandwidth_mbps,
+                   'error_rate': args.error_rate, 'seed': args.seed},
+        'scenarios': results,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"e2e-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(report, indent=2))
+    print(f"Saved to {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            for line in compare(json.load(f), report):
+                print(line, file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Import Time Benchmark
+Measures cold import time of the application entry modules, each in a fresh
+interpreter, and reports which heavy dependencies were pulled in eagerly
+
+Usage: python benchmarks/import_time.py [--runs 5] [--max-ms 150] [module ...]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(PROJECT_ROOT, 'src')
+
+DEFAULT_MODULES = ('core.downloader', 'cli.batch', 'gui.simple_gui')
+# Modules that should only be imported once a download actually needs them
+HEAVY_MODULES = ('yt_dlp', 'requests', 'PIL')
+TOP_IMPORTS = 8
+
+CHILD_CODE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def _parse_importtime(stderr: str) -> List[Dict]:
+    """Slowest imports by cumulative time from -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except (ValueError, IndexError):
+            continue  # header line
+        rows.append({'module': parts[2].strip(), 'self_ms': self_us / 1000,
+                     'cumulative_ms': cumulative_us / 1000})
+    rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+    return rows[:TOP_IMPORTS]
+
+
+def measure_module(module: str, runs: int) -> Dict:
+    """Import a module in fresh interpreters and summarize the timings"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([SRC_DIR, PROJECT_ROOT]))
+    samples = []
+    heavy = []
+    slowest = []
+    for run in range(runs):
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD_CODE.format(module=module, heavy=HEAVY_MODULES)],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env, cwd=PROJECT_ROOT
+        )
+        if completed.returncode != 0:
+            error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'import failed'
+            return {'module': module, 'error': error}
+        report = json.loads(completed.stdout.strip().splitlines()[-1])
+        samples.append(report['seconds'] * 1000)
+        heavy = report['heavy']
+        if run == 0:
+            slowest = _parse_importtime(completed.stderr)
+
+    return {
+        'module': module,
+        'runs': runs,
+        'median_ms': round(statistics.median(samples), 2),
+        'min_ms': round(min(samples), 2),
+        'max_ms': round(max(samples), 2),
+        'heavy_imported': heavy,
+        'slowest_imports': slowest,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Cold import time of the entry modules')
+    parser.add_argument('modules', nargs='*', default=list(DEFAULT_MODULES))
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per module')
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='fail if a module median exceeds this budget')
+    args = parser.parse_args(argv)
+
+    results = [measure_module(module, max(1, args.runs)) for module in args.modules]
+    print(json.dumps({'python': sys.version.split()[0], 'results': results}, indent=2))
+
+    over_budget = [r['module'] for r in results
+                   if args.max_ms is not None and r.get('median_ms', 0) > args.max_ms]
+    if over_budget:
+        print(f"Over budget ({args.max_ms} ms): {', '.join(over_budget)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
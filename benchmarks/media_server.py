@@ -0,0 +1,257 @@
+"""
+Local Media Server
+Threaded HTTP server serving synthetic progressive MP4 files and HLS
+playlists with configurable latency, bandwidth and error injection
+
+    /video/<name>.mp4?size=BYTES                      progressive file, supports Range
+    /hls/<segments>/<segment_size>/<name>.m3u8        VOD media playlist
+    /hls/<segments>/<segment_size>/seg<i>.ts          media segment
+"""
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
+
+
+DEFAULT_VIDEO_SIZE = 8 * 1024 * 1024
+DEFAULT_SEGMENTS = 20
+DEFAULT_SEGMENT_SIZE = 256 * 1024
+SEGMENT_DURATION = 4.0
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'bytes=(\d*)-(\d*)')
+
+# Repeating payload with a 256 byte period; content only has to be deterministic,
+# not decodable. Twice the chunk size so any offset can be sliced without copying.
+_PATTERN = memoryview(bytes(range(256)) * (2 * CHUNK_SIZE // 256))
+
+
+def video_url(base_url: str, name: str, size: int = DEFAULT_VIDEO_SIZE) -> str:
+    return f'{base_url}/video/{name}.mp4?size={size}'
+
+
+def hls_url(base_url: str, name: str, segments: int = DEFAULT_SEGMENTS,
+            segment_size: int = DEFAULT_SEGMENT_SIZE) -> str:
+    # Parameters live in the path so the URL still ends in .m3u8
+    return f'{base_url}/hls/{segments}/{segment_size}/{name}.m3u8'
+
+
+class MediaServerConfig:
+    """Fault and shaping settings, changeable while the server runs"""
+
+    def __init__(self, latency: float = 0.0, bandwidth: Optional[float] = None,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency          # seconds before the response starts
+        self.bandwidth = bandwidth      # bytes per second per connection, None = unlimited
+        self.error_rate = error_rate    # probability of answering 503
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def should_fail(self) -> bool:
+        if self.error_rate <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+
+class _MediaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def _handle(self, send_body: bool):
+        config = self.server.config
+        self.server.count_request()
+        if config.latency:
+            time.sleep(config.latency)
+        if config.should_fail():
+            self._send_empty(503)
+            return
+
+        parsed = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        parts = [part for part in parsed.path.split('/') if part]
+        try:
+            self._route(parts, query, send_body)
+        except ValueError:
+            self._send_empty(400)
+
+    def _route(self, parts, query, send_body: bool):
+        if len(parts) == 2 and parts[0] == 'video' and parts[1].endswith('.mp4'):
+            self._send_payload(int(query.get('size', DEFAULT_VIDEO_SIZE)), 'video/mp4', send_body)
+        elif len(parts) == 4 and parts[0] == 'hls' and parts[3].endswith('.m3u8'):
+            self._send_playlist(int(parts[1]), send_body)
+        elif len(parts) == 4 and parts[0] == 'hls' and parts[3].startswith('seg'):
+            self._send_payload(int(parts[2]), 'video/mp2t', send_body)
+        else:
+            self._send_empty(404)
+
+    def _send_empty(self, status: int):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _send_playlist(self, segments: int, send_body: bool):
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3', f'#EXT-X-TARGETDURATION:{int(SEGMENT_DURATION)}',
+                 '#EXT-X-MEDIA-SEQUENCE:0']
+        for index in range(segments):
+            lines.append(f'#EXTINF:{SEGMENT_DURATION:.3f},')
+            lines.append(f'seg{index}.ts')
+        lines.append('#EXT-X-ENDLIST')
+        body = ('\n'.join(lines) + '\n').encode('ascii')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/vnd.apple.mpegurl')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _send_payload(self, size: int, content_type: str, send_body: bool):
+        start, end = 0, size - 1
+        match = RANGE_RE.fullmatch(self.headers.get('Range', '').strip())
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            else:
+                start = max(size - int(match.group(2)), 0)
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            self.send_response(200)
+
+        length = end - start + 1
+        self.send_header('Content-Type', content_type)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(length))
+        self.end_headers()
+        if send_body:
+            self._write_throttled(start, length)
+
+    def _write_throttled(self, offset: int, length: int):
+        bandwidth = self.server.config.bandwidth
+        started = time.monotonic()
+        sent = 0
+        try:
+            while sent < length:
+                position = (offset + sent) % 256
+                chunk = _PATTERN[position:position + min(CHUNK_SIZE, length - sent)]
+                self.wfile.write(chunk)
+                sent += len(chunk)
+                self.server.count_bytes(len(chunk))
+                if bandwidth:
+                    # Sleep until the connection is back under its byte budget
+                    ahead = sent / bandwidth - (time.monotonic() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class MediaServer:
+    """Runs the synthetic media server on a background thread"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0,
+                 config: Optional[MediaServerConfig] = None):
+        self.config = config or MediaServerConfig()
+        self._server = ThreadingHTTPServer((host, port), _MediaHandler)
+        self._server.daemon_threads = True
+        self._server.config = self.config
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.bytes_sent = 0
+        self._server.count_request = self._count_request
+        self._server.count_bytes = self._count_bytes
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def video_url(self, name: str, size: int = DEFAULT_VIDEO_SIZE) -> str:
+        return video_url(self.base_url, name, size)
+
+    def hls_url(self, name: str, segments: int = DEFAULT_SEGMENTS,
+                segment_size: int = DEFAULT_SEGMENT_SIZE) -> str:
+        return hls_url(self.base_url, name, segments, segment_size)
+
+    def serve_forever(self):
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def start(self) -> 'MediaServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='media-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _count_request(self):
+        with self._stats_lock:
+            self.requests += 1
+
+    def _count_bytes(self, count: int):
+        with self._stats_lock:
+            self.bytes_sent += count
+
+
+def main(argv=None) -> int:
+    """Run the server in the foreground (used by the benchmark as a separate process)"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Synthetic media server for benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--bandwidth-mbps', type=float, default=None,
+                        help='per-connection limit in megabits per second')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    config = MediaServerConfig(
+        latency=args.latency_ms / 1000,
+        bandwidth=args.bandwidth_mbps * 1_000_000 / 8 if args.bandwidth_mbps else None,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    server = MediaServer(args.host, args.port, config)
+    # The parent process reads this line to learn the address
+    print(f'READY {server.base_url}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
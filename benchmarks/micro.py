@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Core Hot Path Micro-Benchmarks
+Times the per-event and per-job hot paths with realistic inputs and fails
+when a case regressed against the stored baseline
+
+Cases:
+    progress_hook           yt-dlp progress hook publishing a burst of events into the progress bus
+    extract_formats         format list extraction and sort over a 1,000-entry format list
+    extract_formats_scored  FormatIndex build and stream set selection over the same list
+    next_file_number        file numbering in a 50k-file directory, cold scan and warm index
+    gui_update_progress     SimpleYTDownloader._update_progress formatting a burst of events
+
+Usage:
+    python benchmarks/micro.py                      # compare against benchmarks/baselines/micro.json
+    python benchmarks/micro.py --update-baseline    # store the current timings as the baseline
+    python benchmarks/micro.py --threshold 0.5 --case extract_formats
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, 'baselines', 'micro.json')
+DEFAULT_THRESHOLD = 0.25   # fail when a case is more than 25% slower than its baseline
+DEFAULT_REPEAT = 5
+DEFAULT_RETRIES = 2        # re-measure a case that looks regressed before failing on it
+
+# Realistic load sizes from the request: bursts of progress events, long format lists, big folders
+PROGRESS_EVENTS = 100_000
+FORMAT_ENTRIES = 1_000
+DIRECTORY_FILES = 50_000
+CALIBRATION_LOOPS = 200_000
+CALIBRATION_REPEAT = 9     # the normalizer itself must be stable, so it always gets more runs
+
+
+def _best_of(function: Callable[[], None], repeat: int, setup: Optional[Callable[[], None]] = None) -> float:
+    """Fastest of several runs, the least noisy estimate of the code's own cost"""
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def calibrate(repeat: int = CALIBRATION_REPEAT) -> float:
+    """Seconds for a fixed pure-Python loop, used to normalize machine speed"""
+    def loop():
+        total = 0
+        values = {}
+        for index in range(CALIBRATION_LOOPS):
+            values[index & 1023] = f"{index}"
+            total += len(values)
+    return _best_of(loop, repeat)
+
+
+def make_progress_events(count: int) -> List[Dict]:
+    """yt-dlp style progress dicts of one growing download"""
+    total = 500 * 1024 * 1024
+    return [{
+        'status': 'downloading',
+        'downloaded_bytes': total * index // count,
+        'total_bytes': total,
+        'speed': 5_000_000.0 + index,
+        'eta': (count - index) // 100,
+        'filename': '/downloads/001-Some video title [abcdefghijk].f137.mp4.part',
+    } for index in range(count)]
+
+
+def make_formats(count: int) -> List[Dict]:
+    """yt-dlp style format list mixing video, audio-only and storyboard entries"""
+    heights = (144, 240, 360, 480, 720, 1080, 1440, 2160, 4320)
+    formats = []
+    for index in range(count):
+        kind = index % 5
+        if kind == 0:
+            formats.append({'format_id': f'a{index}', 'vcodec': 'none', 'acodec': 'opus',
+                            'ext': 'webm', 'abr': 48 + index % 160, 'filesize': 1_000_000 + index})
+        elif kind == 1:
+            formats.append({'format_id': f'sb{index}', 'vcodec': 'none', 'acodec': 'none',
+                            'ext': 'mhtml'})
+        else:
+            formats.append({'format_id': str(index), 'vcodec': 'avc1.640028', 'acodec': 'none',
+                            'ext': 'mp4', 'height': heights[index % len(heights)] + index // 50,
+                            'filesize': 10_000_000 + index})
+    return formats
+
+
+def make_numbered_files(directory: str, count: int):
+    """Empty numbered media files plus unrelated files, as in a long-used output folder"""
+    extensions = ('.mp4', '.mp3', '.webm')
+    for index in range(1, count + 1):
+        if index % 10 == 0:
+            name = f'notes-{index}.txt'
+        else:
+            name = f'{index:03d}-video {index}{extensions[index % len(extensions)]}'
+        open(os.path.join(directory, name), 'w').close()
+
+
+def bench_progress_hook(repeat: int, events: int = PROGRESS_EVENTS) -> Dict:
+    from core.downloader import VideoDownloader
+    from core.progress import ProgressBus
+
+    output_dir = tempfile.mkdtemp(prefix='micro-progress-')
+    try:
+        downloader = VideoDownloader(output_dir)
+        bus = ProgressBus()
+        delivered = []
+        bus.subscribe(delivered.append)
+        reporter = bus.reporter('job-1')
+        burst = make_progress_events(events)
+        hook = downloader._progress_hook
+
+        def run():
+            for event in burst:
+                hook(event, reporter)
+            bus.flush('job-1')
+
+        seconds = _best_of(run, repeat)
+        downloader.close()
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return {'seconds': seconds, 'operations': events}
+
+
+def bench_extract_formats(repeat: int, entries: int = FORMAT_ENTRIES, rounds: int = 100) -> Dict:
+    from core.downloader import VideoDownloader
+
+    output_dir = tempfile.mkdtemp(prefix='micro-formats-')
+    try:
+        downloader = VideoDownloader(output_dir)
+        formats = make_formats(entries)
+        extract = downloader._extract_formats
+
+        def run():
+            for _ in range(rounds):
+                extract(formats)
+
+        seconds = _best_of(run, repeat)
+        downloader.close()
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return {'seconds': seconds, 'operations': rounds}
+
+
+def bench_extract_formats_scored(repeat: int, entries: int = FORMAT_ENTRIES, rounds: int = 100) -> Dict:
+    from core.format_index import FormatIndex
+
+    formats = make_formats(entries)
+    qualities = ('best', '720p', 'bestaudio')
+
+    def run():
+        # What each download of an analyzed video pays: index the list, pick one set
+        for round_index in range(rounds):
+            FormatIndex(formats).select(qualities[round_index % len(qualities)], 'mp4')
+
+    return {'seconds': _best_of(run, repeat), 'operations': rounds}
+
+
+def bench_next_file_number(repeat: int, files: int = DIRECTORY_FILES, warm_calls: int = 1_000) -> Dict:
+    from core.downloader import VideoDownloader
+    from core.file_counter import COUNTER_FILE
+
+    output_dir = tempfile.mkdtemp(prefix='micro-counter-')
+    try:
+        make_numbered_files(output_dir, files)
+        downloader = VideoDownloader(output_dir)
+        index_path = os.path.join(output_dir, COUNTER_FILE)
+
+        def drop_index():
+            if os.path.exists(index_path):
+                os.remove(index_path)
+
+        # Cold: no index yet, the first number needs a directory scan
+        cold = _best_of(downloader.get_next_file_number, repeat, setup=drop_index)
+
+        def run_warm():
+            for _ in range(warm_calls):
+                downloader.get_next_file_number()
+
+        warm = _best_of(run_warm, repeat)
+        downloader.close()
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return {'seconds': cold + warm, 'operations': 1 + warm_calls,
+            'cold_seconds': cold, 'warm_seconds': warm}
+
+
+class _Widget:
+    """Stand-in for a CTk widget that accepts updates without drawing"""
+
+    def set(self, value):
+        self.value = value
+
+    def configure(self, **options):
+        self.options = options
+
+
+class _ProgressView:
+    progress_bar = progress_label = status_label = info_label = _Widget()
+
+
+def bench_gui_update_progress(repeat: int, events: int = PROGRESS_EVENTS) -> Dict:
+    # Only the handler is timed; widgets are stubs so no display is needed
+    from gui.simple_gui import SimpleYTDownloader
+    from core.progress import progress_fraction
+
+    view = _ProgressView()
+    burst = []
+    for event in make_progress_events(events):
+        event['fraction'] = progress_fraction(event['downloaded_bytes'], event['total_bytes'])
+        event['filename'] = os.path.basename(event['filename'])
+        burst.append(event)
+    update = SimpleYTDownloader._update_progress
+
+    def run():
+        for event in burst:
+            update(view, event)
+
+    return {'seconds': _best_of(run, repeat), 'operations': events}
+
+
+CASES = {
+    'progress_hook': bench_progress_hook,
+    'extract_formats': bench_extract_formats,
+    'extract_formats_scored': bench_extract_formats_scored,
+    'next_file_number': bench_next_file_number,
+    'gui_update_progress': bench_gui_update_progress,
+}
+
+
+def run_cases(names: List[str], repeat: int) -> Dict[str, Dict]:
+    results = {}
+    for name in names:
+        # Calibrated right before each case so both see the same machine load
+        calibration = calibrate(max(repeat, CALIBRATION_REPEAT))
+        result = CASES[name](repeat)
+        result['us_per_op'] = result['seconds'] / result['operations'] * 1_000_000
+        result['calibration_s'] = calibration
+        results[name] = {key: round(value, 6) if isinstance(value, float) else value
+                         for key, value in result.items()}
+    return results
+
+
+def check_regressions(baseline: Dict, current: Dict, threshold: float) -> List[Dict]:
+    """Per-case comparison, timings normalized by each run's calibration loop"""
+    rows = []
+    for name, result in current['cases'].items():
+        before = baseline.get('cases', {}).get(name)
+        if not before or not before.get('seconds'):
+            rows.append({'case': name, 'status': 'new', 'seconds': result['seconds']})
+            continue
+        scale = result['calibration_s'] / (before.get('calibration_s') or result['calibration_s'])
+        expected = before['seconds'] * scale
+        ratio = result['seconds'] / expected
+        rows.append({
+            'case': name,
+            'status': 'regressed' if ratio > 1 + threshold else 'ok',
+            'baseline_s': before['seconds'],
+            'expected_s': round(expected, 6),
+            'seconds': result['seconds'],
+            'ratio': round(ratio, 3),
+        })
+    return rows
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Micro-benchmarks of the core hot paths')
+    parser.add_argument('--case', action='append', choices=sorted(CASES), dest='cases',
+                        help='run only this case, may be repeated (default: all)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='runs per case, the fastest counts')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline JSON path')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'allowed slowdown before failing (default: {DEFAULT_THRESHOLD:g} = '
+                             f'{DEFAULT_THRESHOLD:.0%})')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help='re-runs of a case that looks regressed, the best result counts')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='write the timings as the new baseline instead of checking')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    names = args.cases or list(CASES)
+
+    # Benchmarks must not touch the user's journal and caches
+    data_dir = tempfile.mkdtemp(prefix='micro-data-')
+    os.environ['YTDL_PRO_DATA_DIR'] = data_dir
+    try:
+        report = {
+            'benchmark': 'micro',
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cases': run_cases(names, args.repeat),
+        }
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        # Partial runs only replace the cases they measured
+        report['cases'] = dict(baseline.get('cases', {}), **report['cases'])
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(json.dumps(report, indent=2))
+        print(f"Baseline saved to {args.baseline}", file=sys.stderr)
+        return 0
+
+    try:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"No usable baseline ({e}), run with --update-baseline first", file=sys.stderr)
+        return 2
+
+    rows = check_regressions(baseline, report, args.threshold)
+    for _ in range(args.retries):
+        suspects = [row['case'] for row in rows if row['status'] == 'regressed']
+        if not suspects:
+            break
+        # One slow run is usually noise from other processes; a regression reproduces
+        os.environ['YTDL_PRO_DATA_DIR'] = data_dir = tempfile.mkdtemp(prefix='micro-data-')
+        try:
+            rerun = run_cases(suspects, args.repeat)
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+        for row in check_regressions(baseline, dict(report, cases=rerun), args.threshold):
+            index = next(i for i, old in enumerate(rows) if old['case'] == row['case'])
+            if row['ratio'] < rows[index]['ratio']:
+                rows[index] = row
+                report['cases'][row['case']] = rerun[row['case']]
+    print(json.dumps(dict(report, comparison=rows), indent=2))
+    for row in rows:
+        if row['status'] == 'new':
+            print(f"{row['case']:<22} new, no baseline", file=sys.stderr)
+        else:
+            print(f"{row['case']:<22} {row['expected_s']:>10.4f}s -> {row['seconds']:>10.4f}s "
+                  f"({(row['ratio'] - 1) * 100:+.1f}%) {row['status'].upper()}", file=sys.stderr)
+
+    regressed = [row['case'] for row in rows if row['status'] == 'regressed']
+    if regressed:
+        print(f"Regression over {args.threshold:.0%}: {', '.join(regressed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -43,7 +43,7 @@ def main():
             print("\nDOPORUCENE KROKY:")
         
         # Show installation commands
-        commands = checker.get_installation_commands()
+        commands = checker.get_installation_commands(results)
         if commands:
             print("\n1. Nainstalujte chybějící Python balíčky:")
             for cmd in commands:
@@ -52,7 +52,7 @@ def main():
         # Check for system dependencies
         ffmpeg_missing = False
         for dep_name, info in results['system'].items():
-            if not info['available'] and info['required']:
+            if info['available'] is False and info['required']:
                 ffmpeg_missing = True
                 print(f"\n2. Nainstalujte {dep_name}:")
                 print(f"   {info['install_info']}")
@@ -54,23 +54,21 @@ from yt_dlp import YoutubeDL
 # Cesta ke stažení videí
 download_path = "E:/webREBEL/Skool-Amelin/"
 
-# Funkce pro zjištění dalšího čísla souboru
+# Funkce pro zjištění dalšího čísla souboru (sdílený čítač s aplikací)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from core.file_counter import FileCounter
+from core.download_archive import DownloadArchive
+
 def get_next_file_number(path):
-    existing_files = [f for f in os.listdir(path) if f.endswith(".mp4")]
-    numbers = []
-    for file in existing_files:
-        try:
-            number = int(file.split('-')[0])
-            numbers.append(number)
-        except (ValueError, IndexError):
-            continue
-    return max(numbers, default=0) + 1
+    return FileCounter(path).next_number()
 
 # Nastavení pro stažení videí v nejvyšší možné kvalitě
 ydl_opts = {
     'format': 'bestvideo+bestaudio/best',  # Nejlepší video a audio dostupné kvality
     'merge_output_format': 'mp4',
-    'outtmpl': f'{download_path}/%(title)s.%(ext)s'
+    'outtmpl': f'{download_path}/%(title)s.%(ext)s',
+    # Sdílený archiv s aplikací: už stažená videa se přeskočí bez dotazu na server
+    'download_archive': DownloadArchive().for_ytdlp('mp4')
 }
 
 # Inicializace Tkinter
@@ -24,15 +24,19 @@ def check_ffmpeg():
 
 # Funkce pro stažení obsahu přes yt-dlp
 def download_playlist_with_yt_dlp(url, output_path):
+    options = {
+        'noplaylist': False,  # Povolit stahování celého playlistu
+        'outtmpl': f"{output_path}/%(playlist_index)s-%(title)s.%(ext)s",  # Ukládání s indexem
+        # Archivuje se jako MP4, proto se video a audio slučují do MP4
+        'merge_output_format': 'mp4',
+        # Už stažené položky playlistu se přeskočí ještě před dotazem na video
+        'download_archive': archive.for_ytdlp('mp4'),
+    }
     try:
-        subprocess.run([
-            "yt-dlp",
-            "--yes-playlist",  # Povolit stahování celého playlistu
-            "-o", f"{output_path}/%(playlist_index)s-%(title)s.%(ext)s",  # Ukládání s indexem
-            url
-        ], check=True)
+        with YoutubeDL(options) as ydl:
+            ydl.download([url])
         print(f"Playlist {url} úspěšně stažen do složky: {output_path}")
-    except subprocess.CalledProcessError as e:
+    except Exception as e:
         print(f"Chyba při stahování playlistu pomocí yt-dlp: {e}")
 
 # Zkontrolujte a nainstalujte požadované knihovny
@@ -41,6 +45,11 @@ check_ffmpeg()
 
 from yt_dlp import YoutubeDL
 
+# Archiv stažených videí sdílený s aplikací
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from core.download_archive import DownloadArchive
+archive = DownloadArchive()
+
 # Vyber složku pro ukládání videí
 root = tk.Tk()
 root.withdraw()
@@ -66,7 +75,8 @@ while True:
             ydl_opts = {
                 'format': 'bestvideo+bestaudio/best',
                 'merge_output_format': 'mp4',
-                'outtmpl': f'{download_path}/%(title)s.%(ext)s'
+                'outtmpl': f'{download_path}/%(title)s.%(ext)s',
+                'download_archive': archive.for_ytdlp('mp4')
             }
             with YoutubeDL(ydl_opts) as ydl:
                 ydl.download([link.strip()])
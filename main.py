@@ -2,7 +2,9 @@
 """
 YouTube Downloader Pro v2.1.0 - Main Entry Point
 Modern YouTube video downloader with GUI and dependency checking
+Run with options or URLs (e.g. `main.py --input urls.txt`) for the headless CLI
 """
+import multiprocessing
 import sys
 import os
 
@@ -11,8 +13,33 @@ project_root = os.path.dirname(__file__)
 sys.path.insert(0, project_root)
 sys.path.insert(0, os.path.join(project_root, 'src'))
 
+def cli_arguments(argv):
+    """Arguments for the CLI, or None when the GUI should start
+
+    macOS passes a -psn_... process serial number to app bundles and "Open
+    with" passes file paths; neither is a CLI request. Options and URLs are.
+    """
+    arguments = [arg for arg in argv if not arg.startswith('-psn_')]
+    if any(arg.startswith('-') or '://' in arg for arg in arguments):
+        return arguments
+    return None
+
+def run_cli(argv):
+    """Headless mode: the CLI runs instead of the GUI"""
+    try:
+        from cli.batch import main as cli_main
+    except ImportError as e:
+        print(f"Import error: {e}", file=sys.stderr)
+        print("Please install required packages: pip install -r requirements.txt", file=sys.stderr)
+        return 1
+    return cli_main(argv)
+
 def main():
     """Main application entry point with error handling"""
+    arguments = cli_arguments(sys.argv[1:])
+    if arguments is not None:
+        sys.exit(run_cli(arguments))
+    
     try:
         from version import APP_TITLE, VERSION
         print(f"Starting {APP_TITLE}...")
@@ -32,4 +59,6 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
+    # Frozen builds need this for the process pool of the dedup scan
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -39,6 +39,7 @@ setup(
     entry_points={
         "console_scripts": [
             "yt-downloader-pro=gui.modern_gui:main",
+            "yt-downloader-cli=cli.batch:main",
         ],
     },
     include_package_data=True,
@@ -0,0 +1 @@
+# CLI package
\ No newline at end of file
@@ -0,0 +1,394 @@
+"""
+Headless Batch Downloader
+Command line and daemon entry point over VideoDownloader that reads URL
+lists from files or stdin and reports progress as JSON lines
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from typing import Optional, Iterator, List, TextIO
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.downloader import VideoDownloader
+from core.download_queue import DownloadJob, DONE, FAILED, CANCELLED
+from core.progress import DEFAULT_RATE_HZ
+from core.bandwidth import parse_rate
+from core.host_scheduler import DEFAULT_MIN_INTERVAL
+from core.dedup import Deduplicator, DEFAULT_LINK_METHODS, LINK_METHODS
+from core.transcode import TranscodeScheduler
+from core.disk_space import parse_size
+from core.range_download import MAX_CONNECTIONS
+
+
+FORMAT_CHOICES = ('MP4', 'MP3', 'WEBM', 'AVI')
+FOLLOW_INTERVAL = 1.0  # seconds between checks for lines appended to a followed file
+
+# Input lines starting with this prefix change settings instead of queueing a URL
+DIRECTIVE_PREFIX = '@'
+
+# Exit codes
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+
+def parse_url_line(line: str) -> Optional[str]:
+    """URL on a list line, None for blank lines and # comments"""
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    return line
+
+
+def parse_host_limit(value: str):
+    """HOST=RATE pair of --host-limit-rate"""
+    host, separator, rate = value.partition('=')
+    if not separator or not host.strip():
+        raise argparse.ArgumentTypeError(f"expected HOST=RATE, got {value!r}")
+    try:
+        return host.strip(), parse_rate(rate)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _rate_argument(value: str) -> Optional[float]:
+    try:
+        return parse_rate(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _size_argument(value: str) -> int:
+    try:
+        return parse_size(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def iter_urls(stream: TextIO) -> Iterator[str]:
+    """URLs from a stream, yielded as soon as each line arrives"""
+    for line in stream:
+        url = parse_url_line(line)
+        if url:
+            yield url
+
+
+def follow_urls(path: str, stop_event: threading.Event,
+                interval: float = FOLLOW_INTERVAL) -> Iterator[str]:
+    """URLs from a file, including lines appended later, until stop_event is set"""
+    with open(path, 'r', encoding='utf-8') as f:
+        partial_line = ''
+        while not stop_event.is_set():
+            chunk = f.readline()
+            if not chunk:
+                stop_event.wait(interval)
+                continue
+            partial_line += chunk
+            if not partial_line.endswith('\n'):
+                # Writer has not finished the line yet
+                continue
+            url = parse_url_line(partial_line)
+            partial_line = ''
+            if url:
+                yield url
+
+
+class JsonLinesReporter:
+    """Writes one JSON object per line, safe to call from worker threads"""
+
+    def __init__(self, stream: TextIO = None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def emit(self, event: str, **fields):
+        record = {'event': event, 'time': round(time.time(), 3)}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+
+class BatchRunner:
+    """Feeds URLs into the download queue and reports every job event"""
+
+    def __init__(self, downloader: VideoDownloader, reporter: JsonLinesReporter,
+                 quality: str = 'best', format_choice: str = 'MP4',
+                 max_workers: Optional[int] = None, show_progress: bool = True):
+        self.downloader = downloader
+        self.reporter = reporter
+        self.quality = quality
+        self.format_choice = format_choice
+        self.queue = downloader.get_queue(max_workers)
+        if show_progress:
+            self._unsubscribe = downloader.progress_bus.subscribe(self._on_progress)
+        else:
+            self._unsubscribe = None
+
+    def submit(self, url: str) -> DownloadJob:
+        job = self.queue.submit(url, self.quality, self.format_choice,
+                                done_callback=self._on_done)
+        self.reporter.emit('queued', job_id=job.job_id, url=url)
+        return job
+
+    def resume_interrupted(self) -> List[DownloadJob]:
+        """Queue jobs left unfinished by a previous run"""
+        jobs = self.downloader.resume_interrupted_jobs(done_callback=self._on_done)
+        for job in jobs:
+            self.reporter.emit('queued', job_id=job.job_id, url=job.url, resumed=True)
+        return jobs
+
+    def apply_directive(self, line: str):
+        """Change bandwidth limits from an input line, e.g. '@limit-rate 2M'
+
+        Supported: @limit-rate RATE, @job-limit-rate RATE,
+        @host-limit-rate HOST=RATE and @job-rate JOB_ID RATE.
+        """
+        governor = self.downloader.governor
+        name, _, value = line[len(DIRECTIVE_PREFIX):].strip().partition(' ')
+        value = value.strip()
+        try:
+            if name == 'limit-rate':
+                governor.set_global_limit(value)
+            elif name == 'job-limit-rate':
+                governor.set_default_job_limit(value)
+            elif name == 'host-limit-rate':
+                governor.set_host_limit(*parse_host_limit(value))
+            elif name == 'job-rate':
+                job_id, _, rate = value.partition(' ')
+                if not self.queue.set_job_rate_limit(int(job_id), parse_rate(rate.strip())):
+                    raise ValueError(f"no active job {job_id}")
+            else:
+                raise ValueError(f"unknown directive {name!r}")
+        except (ValueError, TypeError, argparse.ArgumentTypeError) as e:
+            self.reporter.emit('error', directive=line, error=str(e))
+            return
+        self.reporter.emit('limits', global_limit=governor.global_limit, job_limit=governor.job_limit,
+                           host_limits=governor.host_limits())
+
+    def cancel_all(self):
+        for job in self.queue.jobs():
+            self.queue.cancel(job.job_id)
+
+    def wait(self):
+        """Block until every queued job is finished"""
+        while not self.queue.wait_all(timeout=0.5):
+            pass
+
+    def summary(self) -> dict:
+        jobs = self.queue.jobs()
+        states = [job.state for job in jobs]
+        return {
+            'total': len(states),
+            'done': states.count(DONE),
+            'failed': states.count(FAILED),
+            'cancelled': states.count(CANCELLED),
+            'skipped': sum(1 for job in jobs if job.result and job.result.get('skipped')),
+        }
+
+    def close(self):
+        if self._unsubscribe:
+            self._unsubscribe()
+        self.queue.shutdown(wait=True)
+
+    def _on_progress(self, event: dict):
+        self.reporter.emit('progress', **event)
+
+    def _on_done(self, job: DownloadJob):
+        result = job.result or {}
+        self.reporter.emit('done', job_id=job.job_id, url=job.url, state=job.state,
+                           success=bool(result.get('success')), error=job.error,
+                           filename=result.get('filename'), skipped=bool(result.get('skipped')),
+                           duplicate_of=result.get('duplicate_of'))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='yt-downloader-cli',
+        description='Headless batch downloader, progress is printed as JSON lines'
+    )
+    parser.add_argument('urls', nargs='*', help='URLs to download')
+    parser.add_argument('-i', '--input', action='append', default=[], metavar='FILE',
+                        help="file with one URL per line ('-' for stdin), may be repeated")
+    parser.add_argument('-o', '--output', help='download directory')
+    parser.add_argument('-q', '--quality', default='best',
+                        help="best, bestaudio or a height such as 720p (default: best)")
+    parser.add_argument('-f', '--format', dest='format_choice', default='MP4',
+                        type=str.upper, choices=FORMAT_CHOICES, help='output format (default: MP4)')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='concurrent downloads (default: queue default)')
+    parser.add_argument('--progress-rate', type=float, default=DEFAULT_RATE_HZ,
+                        help=f'progress lines per second per job (default: {DEFAULT_RATE_HZ:g})')
+    parser.add_argument('--no-progress', action='store_true',
+                        help='only report queued and finished jobs')
+    parser.add_argument('--limit-rate', type=_rate_argument, metavar='RATE',
+                        help='total download rate in bytes/s, e.g. 500K or 2M (default: unlimited)')
+    parser.add_argument('--job-limit-rate', type=_rate_argument, metavar='RATE',
+                        help='download rate of each job (default: unlimited)')
+    parser.add_argument('--host-limit-rate', type=parse_host_limit, action='append', default=[],
+                        metavar='HOST=RATE', help='download rate from one domain and its subdomains, may be repeated')
+    parser.add_argument('--host-jobs', type=int, default=None, metavar='N',
+                        help='concurrent jobs per domain, 0 = as many as --jobs (default: 0)')
+    parser.add_argument('--host-interval', type=float, default=None, metavar='SECONDS',
+                        help=f'minimum time between job starts on one domain '
+                             f'(default: {DEFAULT_MIN_INTERVAL:g})')
+    parser.add_argument('--no-archive', action='store_true',
+                        help='download videos even if the download archive lists them')
+    parser.add_argument('--transcode-jobs', type=int, default=None, metavar='N',
+                        help='concurrent MP3/AVI/WEBM conversions (default: one per CPU core)')
+    parser.add_argument('--no-stream-audio', action='store_true',
+                        help='download MP3 sources completely before encoding')
+    parser.add_argument('--no-dedup', action='store_true',
+                        help='keep duplicate downloads as separate copies')
+    parser.add_argument('--dedup-scan', action='append', default=[], metavar='DIR',
+                        help='replace duplicate files in DIR by links and exit, may be repeated')
+    parser.add_argument('--dedup-dry-run', action='store_true',
+                        help='with --dedup-scan only report duplicates')
+    parser.add_argument('--dedup-hardlinks', action='store_true',
+                        help='hardlink duplicates where reflinks are not supported '
+                             '(the copies then share edits)')
+    parser.add_argument('--disk-reserve', type=_size_argument, default=None, metavar='SIZE',
+                        help='free space to keep on the output volume, e.g. 500M or 20G '
+                             '(default: 1G); jobs wait or fail instead of filling the disk')
+    parser.add_argument('--connections', type=int, default=1, metavar='N',
+                        help='HTTP connections per progressive file, split into byte ranges '
+                             f'(default: 1, at most {MAX_CONNECTIONS})')
+    parser.add_argument('--resume', action='store_true',
+                        help='also resume downloads interrupted in a previous run')
+    parser.add_argument('--daemon', action='store_true',
+                        help='keep following input files for appended URLs until SIGINT/SIGTERM')
+    return parser
+
+
+def _submit_line(runner: BatchRunner, line: str):
+    if line.startswith(DIRECTIVE_PREFIX):
+        runner.apply_directive(line)
+    else:
+        runner.submit(line)
+
+
+def _read_source(source: str, runner: BatchRunner, daemon: bool,
+                 stop_event: threading.Event, reporter: JsonLinesReporter):
+    try:
+        if source == '-':
+            for url in iter_urls(sys.stdin):
+                if stop_event.is_set():
+                    break
+                _submit_line(runner, url)
+        elif daemon:
+            for url in follow_urls(source, stop_event):
+                _submit_line(runner, url)
+        else:
+            with open(source, 'r', encoding='utf-8') as f:
+                for url in iter_urls(f):
+                    if stop_event.is_set():
+                        break
+                    _submit_line(runner, url)
+    except OSError as e:
+        reporter.emit('error', source=source, error=str(e))
+    except RuntimeError:
+        # Queue was shut down while this reader was still blocked on input
+        pass
+
+
+def run_dedup_scan(directories: List[str], reporter: JsonLinesReporter,
+                   dry_run: bool = False, workers: Optional[int] = None,
+                   hardlinks: bool = False) -> int:
+    """Deduplicate existing folders, one 'dedup' line per folder"""
+    deduplicator = Deduplicator(methods=LINK_METHODS if hardlinks else DEFAULT_LINK_METHODS)
+    status = EXIT_OK
+    try:
+        for directory in directories:
+            if not os.path.isdir(directory):
+                reporter.emit('error', source=directory, error='not a directory')
+                status = EXIT_FAILED
+                continue
+            summary = deduplicator.scan(directory, workers=workers, dry_run=dry_run)
+            reporter.emit('dedup', directory=directory, **summary)
+    finally:
+        deduplicator.close()
+    return status
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.dedup_scan:
+        return run_dedup_scan(args.dedup_scan, JsonLinesReporter(), args.dedup_dry_run, args.jobs,
+                              args.dedup_hardlinks)
+    if not args.urls and not args.input and not args.resume:
+        parser.print_usage(sys.stderr)
+        print("error: no URLs given (pass URLs, --input FILE or --input -)", file=sys.stderr)
+        return EXIT_USAGE
+
+    reporter = JsonLinesReporter()
+    deduplicator = Deduplicator(methods=LINK_METHODS if args.dedup_hardlinks else DEFAULT_LINK_METHODS)
+    downloader = VideoDownloader(args.output, transcoder=TranscodeScheduler(args.transcode_jobs),
+                                 deduplicator=deduplicator)
+    downloader.progress_bus.set_rate(args.progress_rate)
+    downloader.use_archive = not args.no_archive
+    downloader.use_dedup = not args.no_dedup
+    downloader.stream_audio = not args.no_stream_audio
+    downloader.governor.set_global_limit(args.limit_rate)
+    downloader.governor.set_default_job_limit(args.job_limit_rate)
+    for host, rate in args.host_limit_rate:
+        downloader.governor.set_host_limit(host, rate)
+    downloader.host_scheduler.configure(args.host_jobs, args.host_interval)
+    downloader.disk_space.configure(args.disk_reserve)
+    downloader.connections = args.connections
+    runner = BatchRunner(downloader, reporter, args.quality, args.format_choice,
+                         args.jobs, show_progress=not args.no_progress)
+
+    stop_event = threading.Event()
+
+    def handle_signal(signum, frame):
+        if stop_event.is_set():
+            # Second signal: abort running downloads as well
+            reporter.emit('cancelling')
+            runner.cancel_all()
+        else:
+            # First signal: stop reading input and let queued jobs finish
+            reporter.emit('stopping')
+            stop_event.set()
+
+    previous_handlers = {}
+    if threading.current_thread() is threading.main_thread():
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            previous_handlers[signum] = signal.signal(signum, handle_signal)
+
+    try:
+        if args.resume:
+            runner.resume_interrupted()
+        for url in args.urls:
+            runner.submit(url)
+
+        readers = [threading.Thread(target=_read_source, name=f'cli-input-{index}', daemon=True,
+                                    args=(source, runner, args.daemon, stop_event, reporter))
+                   for index, source in enumerate(args.input)]
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            # Timed joins keep the main thread responsive to signals; a reader
+            # blocked on stdin is abandoned once stopping
+            while reader.is_alive() and not stop_event.is_set():
+                reader.join(0.5)
+
+        runner.wait()
+        summary = runner.summary()
+        reporter.emit('summary', **summary)
+    finally:
+        runner.close()
+        downloader.close()
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
+
+    return EXIT_OK if summary['failed'] == 0 else EXIT_FAILED
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,34 @@
+"""
+Application Data Paths
+Per-user locations for caches and persistent state
+"""
+import os
+import sys
+
+
+APP_DIR_NAME = "YouTube_Downloader_Pro"
+
+# Overrides the base directory (tests, portable installs)
+DATA_DIR_ENV = "YTDL_PRO_DATA_DIR"
+
+
+def get_data_dir() -> str:
+    """Base directory for application state"""
+    override = os.environ.get(DATA_DIR_ENV)
+    if override:
+        base = override
+    elif sys.platform == 'win32':
+        base = os.path.join(os.environ.get('LOCALAPPDATA') or os.path.expanduser("~"), APP_DIR_NAME)
+    elif sys.platform == 'darwin':
+        base = os.path.join(os.path.expanduser("~"), "Library", "Application Support", APP_DIR_NAME)
+    else:
+        xdg = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser("~"), ".cache")
+        base = os.path.join(xdg, APP_DIR_NAME.lower())
+
+    os.makedirs(base, exist_ok=True)
+    return base
+
+
+def get_data_path(filename: str) -> str:
+    """Path of a state file inside the data directory"""
+    return os.path.join(get_data_dir(), filename)
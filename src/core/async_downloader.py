@@ -0,0 +1,232 @@
+"""
+Asyncio Downloader API
+Coroutine front end of VideoDownloader: blocking work runs on a bounded
+executor, jobs waiting for a slot are plain coroutines and cancelling a task
+stops its download
+"""
+import asyncio
+import functools
+import threading
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Optional, Callable, Dict, AsyncIterator
+
+from .downloader import VideoDownloader
+from .download_queue import DEFAULT_MAX_WORKERS
+
+
+class _ProgressChannel:
+    """Progress events handed from worker threads to the event loop
+
+    An unread 'downloading' event is replaced by the next one, so a slow
+    consumer holds at most one pending transfer update per job while status
+    changes ('finished', 'transcoding', ...) are all delivered.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._events = deque()
+        self._wakeup = asyncio.Event()
+        self._closed = False
+
+    def publish(self, event: Dict):
+        """Called from any thread"""
+        try:
+            self._loop.call_soon_threadsafe(self._put, dict(event))
+        except RuntimeError:
+            # The loop is closed, nobody is listening any more
+            pass
+
+    def _put(self, event: Dict):
+        if (self._events and event.get('status') == 'downloading'
+                and self._events[-1].get('status') == 'downloading'):
+            self._events[-1] = event
+        else:
+            self._events.append(event)
+        self._wakeup.set()
+
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+
+    def __aiter__(self) -> 'AsyncIterator[Dict]':
+        return self
+
+    async def __anext__(self) -> Dict:
+        while not self._events:
+            if self._closed:
+                raise StopAsyncIteration
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        return self._events.popleft()
+
+
+class AsyncDownload:
+    """A download started by AsyncVideoDownloader.start()
+
+    Awaiting it gives the result dict; progress() iterates the job's events
+    until it ends and is meant for a single consumer.
+    """
+
+    def __init__(self, task: asyncio.Task, channel: _ProgressChannel):
+        self.task = task
+        self._channel = channel
+
+    def progress(self) -> AsyncIterator[Dict]:
+        return self._channel
+
+    def cancel(self) -> bool:
+        return self.task.cancel()
+
+    def done(self) -> bool:
+        return self.task.done()
+
+    def __await__(self):
+        return self.task.__await__()
+
+
+class AsyncVideoDownloader:
+    """Async versions of get_video_info, download_video_with_format and the m3u8 download
+
+    At most max_concurrent blocking calls run at once, on the given executor
+    (by default a private thread pool of that size). Jobs beyond that wait
+    as coroutines without holding a thread, so one loop can track thousands
+    of them. Cancelling a download sets its cancel event and waits until the
+    blocking call has removed its partial files before CancelledError is
+    raised. Info extraction cannot be interrupted; a cancelled lookup
+    returns at once and its thread finishes in the background.
+    """
+
+    def __init__(self, downloader: Optional[VideoDownloader] = None,
+                 executor: Optional[Executor] = None,
+                 max_concurrent: int = DEFAULT_MAX_WORKERS,
+                 output_path: Optional[str] = None):
+        self._own_downloader = downloader is None
+        self.downloader = downloader if downloader is not None else VideoDownloader(output_path)
+        self.max_concurrent = max(1, max_concurrent)
+        self._own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=self.max_concurrent,
+                                                       thread_name_prefix='async-download')
+        # Created in the running loop, asyncio primitives are bound to one loop before 3.10
+        self._slots = None
+        self._slots_loop = None
+        # Calls handed to the executor and not finished yet
+        self._submitted = set()
+        self._submitted_lock = threading.Lock()
+
+    async def __aenter__(self) -> 'AsyncVideoDownloader':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Release the executor and the downloader when they were created here"""
+        if self._own_executor:
+            # Cancelled here rather than with shutdown(cancel_futures=True), which needs Python 3.9
+            with self._submitted_lock:
+                submitted = list(self._submitted)
+            for future in submitted:
+                future.cancel()
+            self.executor.shutdown(wait=False)
+        if self._own_downloader:
+            await asyncio.get_running_loop().run_in_executor(None, self.downloader.close)
+
+    async def get_video_info(self, url: str) -> Dict:
+        """Get video information without downloading"""
+        return await self._run_blocking(self.downloader.get_video_info, url)
+
+    async def download_video_with_format(self, url: str, quality: str = 'best',
+                                         format_choice: str = 'MP4',
+                                         progress_callback: Optional[Callable] = None,
+                                         **options) -> Dict:
+        """Download video with specified quality and format
+
+        progress_callback is called on the event loop. options are passed
+        on to VideoDownloader.download_video_with_format, e.g. connections=8.
+        """
+        return await self._download(url, quality, format_choice,
+                                    self._loop_callback(progress_callback), options)
+
+    async def download_m3u8(self, url: str, progress_callback: Optional[Callable] = None,
+                            bandwidth_key=None) -> Dict:
+        """Download an HLS stream with the native segment fetcher"""
+        cancel_event = threading.Event()
+        function = functools.partial(self._download_m3u8, url, self._loop_callback(progress_callback),
+                                     cancel_event, bandwidth_key)
+        return await self._run_blocking(function, cancel_event=cancel_event)
+
+    def start(self, url: str, quality: str = 'best', format_choice: str = 'MP4',
+              **options) -> AsyncDownload:
+        """Start a download as a task whose progress can be iterated
+
+        Must be called from a running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        channel = _ProgressChannel(loop)
+
+        task = loop.create_task(self._download(url, quality, format_choice, channel.publish, options))
+        # Also ends the iteration of a task cancelled before it started
+        task.add_done_callback(lambda done: channel.close())
+        return AsyncDownload(task, channel)
+
+    async def _download(self, url: str, quality: str, format_choice: str,
+                        progress_callback: Optional[Callable], options: Dict) -> Dict:
+        """Blocking download on the executor, progress_callback must be thread safe"""
+        cancel_event = threading.Event()
+        function = functools.partial(self.downloader.download_video_with_format, url, quality,
+                                     format_choice, progress_callback,
+                                     cancel_event=cancel_event, **options)
+        return await self._run_blocking(function, cancel_event=cancel_event)
+
+    def _download_m3u8(self, url: str, progress_callback: Optional[Callable],
+                       cancel_event: threading.Event, bandwidth_key) -> Dict:
+        try:
+            return self.downloader._download_m3u8(url, progress_callback, cancel_event=cancel_event,
+                                                  bandwidth_key=bandwidth_key)
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    @staticmethod
+    def _loop_callback(callback: Optional[Callable]) -> Optional[Callable]:
+        """Callback for worker threads that runs callback on the current loop"""
+        if callback is None:
+            return None
+        loop = asyncio.get_running_loop()
+
+        def call(event: Dict):
+            try:
+                loop.call_soon_threadsafe(callback, dict(event))
+            except RuntimeError:
+                pass
+
+        return call
+
+    def _forget(self, future):
+        with self._submitted_lock:
+            self._submitted.discard(future)
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+            self._slots_loop = loop
+        return self._slots
+
+    async def _run_blocking(self, function: Callable, *args,
+                            cancel_event: Optional[threading.Event] = None):
+        async with self._get_slots():
+            submitted = self.executor.submit(function, *args)
+            with self._submitted_lock:
+                self._submitted.add(submitted)
+            submitted.add_done_callback(self._forget)
+            future = asyncio.wrap_future(submitted)
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if cancel_event is None:
+                    raise
+                cancel_event.set()
+                # The slot is kept until the download has stopped and cleaned up
+                await asyncio.wait([future])
+                raise
@@ -0,0 +1,184 @@
+"""
+Streaming Audio Encoder
+Pipes an audio stream into ffmpeg while it downloads, so the MP3 is complete
+when the transfer ends and no full-size intermediate file is written
+"""
+import os
+import subprocess
+import threading
+import time
+from typing import Optional, Callable, Dict, List
+
+from .progress import progress_fraction
+
+
+STREAM_CHUNK_SIZE = 256 * 1024
+REQUEST_TIMEOUT = 30
+MP3_OPTIONS = ['-vn', '-c:a', 'libmp3lame', '-q:a', '2', '-f', 'mp3']
+# Containers ffmpeg demuxes from a non-seekable pipe; a progressive M4A may
+# keep its index at the end of the file and is only used without an alternative
+PIPE_FRIENDLY_EXTENSIONS = ('webm', 'opus', 'ogg', 'mp3', 'aac', 'weba')
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+
+
+class StreamEncodeError(Exception):
+    """Raised when streaming is not possible; the caller falls back to download + convert"""
+
+
+class StreamEncodeCancelled(StreamEncodeError):
+    """Raised when the download was cancelled"""
+
+
+def pick_stream_format(formats: List[Dict]) -> Optional[Dict]:
+    """Best audio-only format served as one plain HTTP resource, None if there is none"""
+    candidates = [fmt for fmt in formats
+                  if fmt.get('url') and fmt.get('protocol') in ('http', 'https')
+                  and fmt.get('vcodec') == 'none' and fmt.get('acodec') not in (None, 'none')]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda fmt: (fmt.get('ext') in PIPE_FRIENDLY_EXTENSIONS,
+                                            fmt.get('abr') or fmt.get('tbr') or 0))
+
+
+class StreamingEncoder:
+    """Downloads one audio URL straight into an ffmpeg MP3 encoder"""
+
+    def __init__(self, ffmpeg: str = 'ffmpeg', session: Optional['requests.Session'] = None,
+                 chunk_size: int = STREAM_CHUNK_SIZE):
+        self.ffmpeg = ffmpeg
+        self.chunk_size = chunk_size
+        self._own_session = session is None
+        self.session = session or self._create_session()
+
+    def _create_session(self) -> 'requests.Session':
+        # requests is imported on first use to keep application startup fast
+        import requests
+
+        session = requests.Session()
+        session.headers['User-Agent'] = USER_AGENT
+        return session
+
+    def close(self):
+        if self._own_session:
+            self.session.close()
+
+    def encode(self, url: str, output_path: str, headers: Optional[Dict] = None,
+               total: Optional[int] = None, range_size: Optional[int] = None,
+               meter: Optional['BandwidthMeter'] = None,
+               progress_callback: Optional[Callable] = None,
+               cancel_event: Optional[threading.Event] = None) -> int:
+        """Stream url through ffmpeg into output_path, returns the bytes downloaded
+
+        With range_size and a known total the stream is fetched in
+        consecutive Range requests (some hosts throttle long single requests).
+        """
+        import requests
+
+        base, extension = os.path.splitext(output_path)
+        # Written under a temporary name so an interrupted encode never looks finished
+        temp_output = f"{base}.streaming{extension}"
+        filename = os.path.basename(output_path)
+        process = self._start_ffmpeg(temp_output)
+        stderr = []
+        reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()),
+                                  name='ffmpeg-stderr', daemon=True)
+        reader.start()
+
+        downloaded = 0
+        started = time.monotonic()
+        try:
+            for chunk in self._iter_chunks(url, headers or {}, total, range_size):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise StreamEncodeCancelled("Stahování bylo zrušeno")
+                try:
+                    process.stdin.write(chunk)
+                except (BrokenPipeError, OSError):
+                    raise StreamEncodeError("FFmpeg ukončil kódování předčasně")
+                downloaded += len(chunk)
+                if meter is not None:
+                    meter.consume(len(chunk), url)
+                if progress_callback:
+                    elapsed = max(time.monotonic() - started, 1e-6)
+                    speed = downloaded / elapsed
+                    progress_callback({
+                        'status': 'downloading',
+                        'downloaded_bytes': downloaded,
+                        'total_bytes': total,
+                        'fraction': progress_fraction(downloaded, total),
+                        'speed': speed,
+                        'eta': (total - downloaded) / speed if total and speed else None,
+                        'filename': filename,
+                    })
+            process.stdin.close()
+            process.wait()
+            reader.join()
+            if process.returncode != 0:
+                message = b''.join(stderr).decode('utf-8', 'replace').strip().splitlines()
+                raise StreamEncodeError(f"FFmpeg error: {message[-1] if message else process.returncode}")
+        except (StreamEncodeError, requests.RequestException) as e:
+            self._abort(process, temp_output)
+            if isinstance(e, StreamEncodeError):
+                raise
+            raise StreamEncodeError(str(e))
+        except BaseException:
+            self._abort(process, temp_output)
+            raise
+
+        os.replace(temp_output, output_path)
+        return downloaded
+
+    def _start_ffmpeg(self, output: str) -> subprocess.Popen:
+        command = [self.ffmpeg, '-y', '-loglevel', 'error', '-i', 'pipe:0'] + MP3_OPTIONS + [output]
+        try:
+            return subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                    stderr=subprocess.PIPE)
+        except OSError as e:
+            raise StreamEncodeError(f"FFmpeg nelze spustit: {e}")
+
+    def _iter_chunks(self, url: str, headers: Dict, total: Optional[int],
+                     range_size: Optional[int]):
+        if not range_size or not total:
+            yield from self._iter_response(url, headers)
+            return
+        for start in range(0, total, range_size):
+            end = min(start + range_size, total) - 1
+            partial = yield from self._iter_response(url, dict(headers, Range=f'bytes={start}-{end}'),
+                                                     start)
+            if not partial:
+                # The whole file came back and has been passed on to its end
+                return
+
+    def _iter_response(self, url: str, headers: Dict, offset: int = 0):
+        """Chunks of one request, returns False when a Range header was ignored
+
+        A server answering 200 instead of 206 sends the file from byte 0, so
+        the offset bytes the encoder already has are dropped and the transfer
+        continues from there rather than feeding them twice.
+        """
+        with self.session.get(url, headers=headers, timeout=REQUEST_TIMEOUT, stream=True) as response:
+            response.raise_for_status()
+            partial = response.status_code == 206
+            if 'Range' not in headers or partial:
+                yield from response.iter_content(self.chunk_size)
+                return partial
+            for chunk in response.iter_content(self.chunk_size):
+                if offset >= len(chunk):
+                    offset -= len(chunk)
+                    continue
+                yield chunk[offset:]
+                offset = 0
+            return False
+
+    @staticmethod
+    def _abort(process: subprocess.Popen, temp_output: str):
+        if process.poll() is None:
+            process.kill()
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        process.wait()
+        try:
+            os.remove(temp_output)
+        except OSError:
+            pass
@@ -0,0 +1,250 @@
+"""
+Bandwidth Governor
+Token buckets shared by every transfer (yt-dlp and the native stream
+fetchers) that cap the global, per-host and per-job download rate.
+Limits can be changed while downloads are running.
+"""
+import re
+import threading
+import time
+from typing import Optional, Dict, Hashable
+from urllib.parse import urlparse
+
+from .host_scheduler import domain_key
+
+
+MAX_SLEEP = 0.25           # seconds; waits are sliced so limit changes apply quickly
+MIN_BURST = 64 * 1024      # bytes a bucket may hold even at very low rates
+
+RATE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([kmg]?)(?:i?b)?(?:/s)?\s*$', re.IGNORECASE)
+RATE_UNITS = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+
+
+def parse_rate(value) -> Optional[float]:
+    """Bytes per second from numbers or strings like '500K' or '2.5M' (None or 0 = unlimited)"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) if value > 0 else None
+    text = str(value).strip().lower()
+    if text in ('', '0', 'none', 'unlimited', 'off'):
+        return None
+    match = RATE_RE.match(text)
+    if not match:
+        raise ValueError(f"Neplatný limit rychlosti: {value}")
+    rate = float(match.group(1)) * RATE_UNITS[match.group(2)]
+    return rate if rate > 0 else None
+
+
+def url_host(url: Optional[str]) -> Optional[str]:
+    if not url:
+        return None
+    try:
+        return urlparse(url).hostname
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """Byte budget refilled at a fixed rate; consumers may go into debt and then wait it off"""
+
+    __slots__ = ('_rate', '_burst', '_tokens', '_updated', '_lock')
+
+    def __init__(self, rate: Optional[float] = None):
+        self._lock = threading.Lock()
+        self._rate = None
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self.set_rate(rate)
+        # A new bucket starts with its burst available
+        self._tokens = self._burst
+
+    @property
+    def rate(self) -> Optional[float]:
+        return self._rate
+
+    def set_rate(self, rate: Optional[float]):
+        """Change the rate in bytes per second (None = unlimited)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._rate = rate if rate and rate > 0 else None
+            # Half a second worth of data smooths chunky writers without allowing big bursts
+            self._burst = max(self._rate * 0.5, MIN_BURST) if self._rate else 0.0
+            if self._rate is None or self._tokens > self._burst:
+                self._tokens = self._burst
+
+    def consume(self, amount: int):
+        """Take bytes from the budget, possibly leaving it in debt"""
+        with self._lock:
+            if self._rate is None:
+                return
+            self._refill(time.monotonic())
+            self._tokens -= amount
+
+    def delay(self) -> float:
+        """Seconds until the budget is out of debt"""
+        with self._lock:
+            if self._rate is None:
+                return 0.0
+            self._refill(time.monotonic())
+            return -self._tokens / self._rate if self._tokens < 0 else 0.0
+
+    def _refill(self, now: float):
+        if self._rate is not None:
+            self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+
+class BandwidthGovernor:
+    """Global, per-host and per-job rate limits applied to every transferred chunk
+
+    Every chunk is charged to the global bucket, the bucket of its host and
+    the bucket of its job; the transfer then waits until all of them are out
+    of debt. Host limits apply per domain like HostScheduler's slots, so a
+    limit on googlevideo.com covers its numbered media servers. Jobs without
+    an explicit limit use job_limit.
+    """
+
+    def __init__(self, global_limit: Optional[float] = None,
+                 job_limit: Optional[float] = None,
+                 host_limits: Optional[Dict[str, float]] = None):
+        self._lock = threading.Lock()
+        self._global = TokenBucket(global_limit)
+        self._job_limit = job_limit
+        self._hosts: Dict[str, TokenBucket] = {}
+        self._jobs: Dict[Hashable, TokenBucket] = {}
+        self._explicit_jobs = set()
+        for host, rate in (host_limits or {}).items():
+            self.set_host_limit(host, rate)
+
+    @property
+    def global_limit(self) -> Optional[float]:
+        return self._global.rate
+
+    @property
+    def job_limit(self) -> Optional[float]:
+        return self._job_limit
+
+    def host_limits(self) -> Dict[str, float]:
+        with self._lock:
+            return {host: bucket.rate for host, bucket in self._hosts.items()}
+
+    def set_global_limit(self, rate):
+        self._global.set_rate(parse_rate(rate))
+
+    def set_host_limit(self, host: str, rate):
+        """Limit one host and its subdomains (None removes the limit)"""
+        rate = parse_rate(rate)
+        host = domain_key(host)
+        with self._lock:
+            bucket = self._hosts.get(host)
+            if rate is None:
+                self._hosts.pop(host, None)
+            elif bucket is None:
+                self._hosts[host] = TokenBucket(rate)
+                return
+        if bucket is not None:
+            # Also releases transfers currently waiting on this host's budget
+            bucket.set_rate(rate)
+
+    def set_job_limit(self, job_key: Hashable, rate):
+        """Limit one job, overriding the default per-job limit"""
+        with self._lock:
+            self._explicit_jobs.add(job_key)
+            bucket = self._jobs.get(job_key)
+            if bucket is None:
+                self._jobs[job_key] = TokenBucket(parse_rate(rate))
+                return
+        bucket.set_rate(parse_rate(rate))
+
+    def set_default_job_limit(self, rate):
+        """Limit every job without its own limit, running jobs included"""
+        rate = parse_rate(rate)
+        with self._lock:
+            self._job_limit = rate
+            buckets = [bucket for key, bucket in self._jobs.items() if key not in self._explicit_jobs]
+        for bucket in buckets:
+            bucket.set_rate(rate)
+
+    def release_job(self, job_key: Hashable):
+        """Forget a finished job's bucket and limit"""
+        with self._lock:
+            self._jobs.pop(job_key, None)
+            self._explicit_jobs.discard(job_key)
+
+    def is_limited(self) -> bool:
+        with self._lock:
+            return (self._global.rate is not None or self._job_limit is not None
+                    or bool(self._hosts) or bool(self._explicit_jobs))
+
+    def throttle(self, amount: int, host: Optional[str] = None, job_key: Optional[Hashable] = None,
+                 cancel_event: Optional[threading.Event] = None):
+        """Charge a transferred chunk and block until every applicable budget allows more"""
+        buckets = [self._global]
+        with self._lock:
+            if host:
+                bucket = self._hosts.get(domain_key(host))
+                if bucket is not None:
+                    buckets.append(bucket)
+            if job_key is not None:
+                bucket = self._jobs.get(job_key)
+                if bucket is None:
+                    bucket = self._jobs[job_key] = TokenBucket(self._job_limit)
+                buckets.append(bucket)
+
+        for bucket in buckets:
+            bucket.consume(amount)
+
+        while True:
+            # Re-evaluated after each slice so a raised or removed limit frees waiters
+            wait = max(bucket.delay() for bucket in buckets)
+            if wait <= 0:
+                return
+            wait = min(wait, MAX_SLEEP)
+            if cancel_event is not None:
+                if cancel_event.wait(wait):
+                    return
+            else:
+                time.sleep(wait)
+
+    def meter(self, job_key: Optional[Hashable] = None, url: Optional[str] = None,
+              cancel_event: Optional[threading.Event] = None) -> 'BandwidthMeter':
+        return BandwidthMeter(self, job_key, url_host(url), cancel_event)
+
+
+class BandwidthMeter:
+    """Charges one job's transfers to the governor
+
+    consume() is for our own fetchers, called per chunk; progress_hook() is
+    a yt-dlp progress hook that charges the growth of downloaded_bytes, so
+    sleeping in it paces yt-dlp's download loop.
+    """
+
+    def __init__(self, governor: BandwidthGovernor, job_key: Optional[Hashable] = None,
+                 host: Optional[str] = None, cancel_event: Optional[threading.Event] = None):
+        self.governor = governor
+        self.job_key = job_key
+        self.host = host
+        self.cancel_event = cancel_event
+        self._seen: Dict[str, int] = {}
+
+    def consume(self, amount: int, url: Optional[str] = None):
+        host = url_host(url) if url else self.host
+        self.governor.throttle(amount, host, self.job_key, self.cancel_event)
+
+    def progress_hook(self, d: Dict):
+        if d.get('status') != 'downloading':
+            return
+        key = d.get('tmpfilename') or d.get('filename') or ''
+        downloaded = d.get('downloaded_bytes') or 0
+        previous = self._seen.get(key, 0)
+        self._seen[key] = downloaded
+        # A smaller count means the file restarted, nothing to charge
+        if downloaded > previous:
+            info = d.get('info_dict') or {}
+            host = url_host(info.get('url')) or self.host
+            self.governor.throttle(downloaded - previous, host, self.job_key, self.cancel_event)
+
+    def close(self):
+        if self.job_key is not None:
+            self.governor.release_job(self.job_key)
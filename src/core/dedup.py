@@ -0,0 +1,333 @@
+"""
+Output Deduplication
+Content-hash index of downloaded files; a file whose bytes already exist in
+the library is replaced by a reflink or hardlink to the earlier copy
+"""
+import errno
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, List, Tuple, Iterable
+
+from .app_paths import get_data_path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+INDEX_FILE = "dedup_index.sqlite3"
+HASH_CHUNK_SIZE = 1024 * 1024
+MIN_DEDUP_SIZE = 64 * 1024     # smaller files are not worth a link
+DEDUP_EXTENSIONS = ('.mp4', '.mp3', '.webm', '.avi', '.mkv', '.m4a', '.opus', '.ts')
+# Reflinks share extents copy-on-write, so the copies stay independent files.
+# Hardlinks share one inode, editing one copy changes the other, so they are
+# only used where reflinks are not supported and the user opted in
+DEFAULT_LINK_METHODS = ('reflink',)
+LINK_METHODS = ('reflink', 'hardlink')
+FICLONE = 0x40049409           # Linux ioctl, supported by Btrfs, XFS and others
+
+
+def hash_file(path: str) -> str:
+    """BLAKE2b digest of a file's content"""
+    digest = hashlib.blake2b(digest_size=32)
+    buffer = bytearray(HASH_CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            digest.update(view[:count])
+    return digest.hexdigest()
+
+
+def _hash_entry(path: str) -> Tuple[str, Optional[str]]:
+    """(path, digest) for the process pool, digest None when unreadable"""
+    try:
+        return path, hash_file(path)
+    except OSError:
+        return path, None
+
+
+def reflink(source: str, target: str):
+    """Create target as a copy-on-write clone of source, OSError where unsupported"""
+    if fcntl is None or not sys.platform.startswith('linux'):
+        raise OSError(errno.EOPNOTSUPP, "Reflink není podporován")
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(target)
+            raise
+
+
+def link_duplicate(original: str, duplicate: str,
+                   methods: Iterable[str] = DEFAULT_LINK_METHODS) -> Optional[str]:
+    """Replace duplicate by a link to original; returns the method used or None"""
+    temp_path = f"{duplicate}.{os.getpid()}.dedup"
+    for method in methods:
+        try:
+            if method == 'reflink':
+                reflink(original, temp_path)
+            else:
+                os.link(original, temp_path)
+        except OSError:
+            continue
+        try:
+            # Swapped in atomically, the duplicate path never goes missing
+            os.replace(temp_path, duplicate)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return None
+        return method
+    return None
+
+
+class DedupIndex:
+    """path -> (size, mtime, digest) of library files in SQLite
+
+    Digests are computed lazily: a file is only hashed once another file of
+    the same size turns up, so unique sizes never cost a read.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or get_data_path(INDEX_FILE)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "digest TEXT, linked INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_size ON files (size)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_digest ON files (digest)")
+        self._db.commit()
+
+    def same_size(self, size: int) -> List[Dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT path, size, mtime_ns, digest, linked FROM files WHERE size = ?", (size,)
+            ).fetchall()
+        return [{'path': path, 'size': size, 'mtime_ns': mtime_ns, 'digest': digest,
+                 'linked': bool(linked)} for path, size, mtime_ns, digest, linked in rows]
+
+    def get(self, path: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT size, mtime_ns, digest, linked FROM files WHERE path = ?", (path,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'path': path, 'size': row[0], 'mtime_ns': row[1], 'digest': row[2],
+                'linked': bool(row[3])}
+
+    def put(self, path: str, stat: os.stat_result, digest: Optional[str] = None,
+            linked: bool = False):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, digest, linked) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, digest, int(linked))
+            )
+            self._db.commit()
+
+    def remove(self, path: str):
+        with self._lock:
+            self._db.execute("DELETE FROM files WHERE path = ?", (path,))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class Deduplicator:
+    """Collapses duplicate downloads into links, one file at a time or per folder scan
+
+    Only reflinks are made by default; pass methods=LINK_METHODS to fall
+    back to hardlinks on filesystems without them.
+    """
+
+    def __init__(self, index: Optional[DedupIndex] = None, methods: Iterable[str] = DEFAULT_LINK_METHODS,
+                 min_size: int = MIN_DEDUP_SIZE):
+        self.index = index if index is not None else DedupIndex()
+        self.methods = tuple(methods)
+        self.min_size = min_size
+
+    def close(self):
+        self.index.close()
+
+    def process_file(self, path: str) -> Dict:
+        """Index a finished download and link it to an identical earlier file
+
+        Returns {'path', 'duplicate_of', 'method', 'saved_bytes'}; duplicate_of
+        is None when the content is new.
+        """
+        path = os.path.abspath(path)
+        result = {'path': path, 'duplicate_of': None, 'method': None, 'saved_bytes': 0}
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return result
+        if stat.st_size < self.min_size:
+            return result
+
+        candidates = [row for row in self.index.same_size(stat.st_size) if row['path'] != path]
+        candidates = [row for row in candidates if self._current_digest(row) is not None]
+        if not candidates:
+            self.index.put(path, stat)
+            return result
+
+        digest = hash_file(path)
+        for row in candidates:
+            if row['digest'] != digest:
+                continue
+            method = self._link(row['path'], path, stat)
+            if method is not None:
+                result.update(duplicate_of=row['path'], method=method, saved_bytes=stat.st_size)
+                self.index.put(path, os.stat(path), digest, linked=True)
+                return result
+        self.index.put(path, stat, digest)
+        return result
+
+    def scan(self, directory: str, workers: Optional[int] = None, dry_run: bool = False,
+             extensions: Tuple[str, ...] = DEDUP_EXTENSIONS) -> Dict:
+        """Deduplicate an existing folder tree
+
+        Files are grouped by size first; only sizes shared by two or more
+        files (in the folder or the index) are hashed, on a process pool.
+        """
+        files = {}
+        for root, _, names in os.walk(directory):
+            for name in names:
+                if not name.lower().endswith(extensions):
+                    continue
+                path = os.path.abspath(os.path.join(root, name))
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if stat.st_size >= self.min_size:
+                    files[path] = stat
+
+        by_size = {}
+        for path, stat in files.items():
+            by_size.setdefault(stat.st_size, []).append(path)
+
+        digests = {}
+        to_hash = []
+        known = {}
+        for size, paths in by_size.items():
+            indexed = {row['path']: row for row in self.index.same_size(size)
+                       if row['path'] not in files and os.path.exists(row['path'])}
+            if len(paths) + len(indexed) < 2:
+                for path in paths:
+                    if not dry_run:
+                        self.index.put(path, files[path])
+                continue
+            known.update(indexed)
+            for path in paths:
+                row = self.index.get(path)
+                if row is not None and self._unchanged(row, files[path]) and row['digest']:
+                    digests[path] = row['digest']
+                else:
+                    to_hash.append(path)
+            to_hash.extend(path for path, row in indexed.items()
+                           if not row['digest'] or not self._unchanged(row, os.stat(path)))
+
+        errors = 0
+        for path, digest in self._hash_many(to_hash, workers):
+            if digest is None:
+                errors += 1
+                continue
+            digests[path] = digest
+            if path in known and not dry_run:
+                self.index.put(path, os.stat(path), digest, known[path]['linked'])
+        for path, row in known.items():
+            digests.setdefault(path, row['digest'])
+
+        groups = {}
+        for path, digest in digests.items():
+            if digest is not None:
+                groups.setdefault(digest, []).append(path)
+
+        summary = {'files': len(files), 'hashed': len(to_hash), 'duplicates': 0,
+                   'saved_bytes': 0, 'errors': errors, 'dry_run': dry_run}
+        for digest, paths in groups.items():
+            # The earliest copy stays, later downloads become links to it
+            paths.sort(key=lambda p: (p not in known, self._mtime(p, files), p))
+            original = paths[0]
+            if not dry_run and original not in known:
+                self.index.put(original, files[original], digest)
+            for path in paths[1:]:
+                stat = files.get(path) or os.stat(path)
+                if self._already_linked(original, path, stat):
+                    continue
+                summary['duplicates'] += 1
+                summary['saved_bytes'] += stat.st_size
+                if dry_run:
+                    continue
+                if self._link(original, path, stat) is None:
+                    summary['duplicates'] -= 1
+                    summary['saved_bytes'] -= stat.st_size
+                    summary['errors'] += 1
+                    self.index.put(path, stat, digest)
+                else:
+                    self.index.put(path, os.stat(path), digest, linked=True)
+        return summary
+
+    def _hash_many(self, paths: List[str], workers: Optional[int]):
+        if len(paths) < 2 or workers == 1:
+            return [_hash_entry(path) for path in paths]
+        # Hashing is CPU bound on fast disks, processes get past the GIL
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(_hash_entry, paths, chunksize=4))
+
+    def _current_digest(self, row: Dict) -> Optional[str]:
+        """Digest of an indexed file, hashing it now if needed; None once it is gone"""
+        try:
+            stat = os.stat(row['path'])
+        except OSError:
+            self.index.remove(row['path'])
+            return None
+        if row['digest'] is None or not self._unchanged(row, stat):
+            try:
+                row['digest'] = hash_file(row['path'])
+            except OSError:
+                return None
+            self.index.put(row['path'], stat, row['digest'], row['linked'])
+        return row['digest']
+
+    def _link(self, original: str, duplicate: str, stat: os.stat_result) -> Optional[str]:
+        if self._already_linked(original, duplicate, stat):
+            return None
+        return link_duplicate(original, duplicate, self.methods)
+
+    def _already_linked(self, original: str, duplicate: str, stat: os.stat_result) -> bool:
+        try:
+            if os.path.samefile(original, duplicate):
+                return True
+        except OSError:
+            return True
+        # Reflinked copies have their own inode, the index remembers them
+        row = self.index.get(duplicate)
+        return row is not None and row['linked'] and self._unchanged(row, stat)
+
+    @staticmethod
+    def _unchanged(row: Dict, stat: os.stat_result) -> bool:
+        return row['size'] == stat.st_size and row['mtime_ns'] == stat.st_mtime_ns
+
+    @staticmethod
+    def _mtime(path: str, files: Dict) -> int:
+        stat = files.get(path)
+        return stat.st_mtime_ns if stat is not None else 0
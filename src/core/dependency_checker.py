@@ -5,15 +5,30 @@ Checks if required components are installed and available
 import subprocess
 import sys
 import os
-import shutil
-from typing import Dict, List, Optional, Tuple
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Callable, Iterator
 import importlib.util
 
+from .probe_cache import ProbeCache, binary_fingerprint, module_fingerprint
+
+
+# Overall time budget for a full check; probes still running after it are reported as unknown
+DEFAULT_PROBE_DEADLINE = 3.0
+
+# Probe statuses
+STATUS_OK = 'ok'
+STATUS_MISSING = 'missing'
+STATUS_UNKNOWN = 'unknown'
+
 
 class DependencyChecker:
     """Checks system and Python dependencies"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[ProbeCache] = None):
+        # Results are reused until PATH, the binary or the installed module changes
+        self.cache = cache if cache is not None else ProbeCache()
         self.system_deps = {
             'ffmpeg': {
                 'command': ['ffmpeg', '-version'],
@@ -52,29 +67,36 @@ class DependencyChecker:
         if not dep_info:
             return False, f"Neznámá závislost: {dep_name}"
         
+        fingerprint = binary_fingerprint(dep_info['command'][0])
+        cached = self.cache.get(f"system:{dep_name}", fingerprint)
+        if cached is not None:
+            return cached['available'], cached['message']
+        
+        is_ok, message, cacheable = self._probe_system_dependency(dep_name, dep_info)
+        if cacheable:
+            self.cache.put(f"system:{dep_name}", fingerprint, {'available': is_ok, 'message': message})
+        return is_ok, message
+    
+    def _probe_system_dependency(self, dep_name: str, dep_info: Dict) -> Tuple[bool, str, bool]:
+        """Run the dependency's command; the flag says whether the outcome may be cached"""
         try:
-            # First try to find the executable in PATH
-            if shutil.which(dep_name):
-                # Then verify it works by running the command
-                result = subprocess.run(
-                    dep_info['command'],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    timeout=10
-                )
-                if result.returncode == 0:
-                    return True, f"✅ {dep_name} je dostupný"
-                else:
-                    return False, f"❌ {dep_name} nenastartoval správně"
-            else:
-                return False, f"❌ {dep_name} nebyl nalezen v PATH"
-                
-        except subprocess.TimeoutExpired:
-            return False, f"❌ {dep_name} neodpověděl včas"
+            subprocess.run(
+                dep_info['command'],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=10,
+                check=True
+            )
+            return True, f"✅ {dep_name} je dostupný", True
+        except subprocess.CalledProcessError:
+            return False, f"❌ {dep_name} nenastartoval správně", True
         except FileNotFoundError:
-            return False, f"❌ {dep_name} nebyl nalezen"
+            return False, f"❌ {dep_name} nebyl nalezen v PATH", True
+        except subprocess.TimeoutExpired:
+            # Possibly a busy machine, probe again next time
+            return False, f"❌ {dep_name} neodpověděl včas", False
         except Exception as e:
-            return False, f"❌ Chyba při testování {dep_name}: {str(e)}"
+            return False, f"❌ Chyba při testování {dep_name}: {str(e)}", False
     
     def check_python_dependency(self, module_name: str) -> Tuple[bool, str]:
         """Check if Python module is available"""
@@ -82,6 +104,16 @@ class DependencyChecker:
         if not dep_info:
             return False, f"Neznámá Python závislost: {module_name}"
         
+        fingerprint = module_fingerprint(module_name)
+        cached = self.cache.get(f"python:{module_name}", fingerprint)
+        if cached is not None:
+            return cached['available'], cached['message']
+        
+        is_ok, message = self._probe_python_dependency(module_name, dep_info)
+        self.cache.put(f"python:{module_name}", fingerprint, {'available': is_ok, 'message': message})
+        return is_ok, message
+    
+    def _probe_python_dependency(self, module_name: str, dep_info: Dict) -> Tuple[bool, str]:
         try:
             spec = importlib.util.find_spec(module_name)
             if spec is None:
@@ -107,51 +139,113 @@ class DependencyChecker:
         except Exception as e:
             return False, f"❌ Chyba při testování {dep_info['package']}: {str(e)}"
     
-    def check_all_dependencies(self) -> Dict[str, Dict]:
-        """Check all dependencies and return detailed results"""
-        results = {
-            'system': {},
-            'python': {},
-            'all_ok': True,
-            'critical_missing': [],
-            'warnings': []
-        }
+    def iter_dependency_results(self, deadline: float = DEFAULT_PROBE_DEADLINE) -> Iterator[Tuple[str, str, Dict]]:
+        """Run all probes concurrently and yield (kind, name, entry) as each finishes
+        
+        Probes still running when the deadline passes are yielded with status
+        'unknown' and available None; they keep running in the background and
+        their results land in the probe cache for the next check.
+        """
+        probes = [('system', name) for name in self.system_deps] + \
+                 [('python', name) for name in self.python_deps]
+        finished = queue.Queue()
+        for kind, name in probes:
+            # Daemon threads so a hung probe never delays interpreter exit
+            threading.Thread(target=self._run_probe, args=(kind, name, finished),
+                             name=f"probe-{name}", daemon=True).start()
+        
+        end = time.monotonic() + deadline
+        pending = set(probes)
+        while pending:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                kind, name, is_ok, message = finished.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending.discard((kind, name))
+            yield kind, name, self._result_entry(kind, name, is_ok, message)
+        
+        for kind, name in probes:
+            if (kind, name) in pending:
+                yield kind, name, self._result_entry(kind, name, None, f"⏳ {name}: kontrola nebyla dokončena včas")
+    
+    def _run_probe(self, kind: str, name: str, finished: queue.Queue):
+        try:
+            if kind == 'system':
+                is_ok, message = self.check_system_dependency(name)
+            else:
+                is_ok, message = self.check_python_dependency(name)
+        except Exception as e:
+            is_ok, message = False, f"❌ Chyba při testování {name}: {str(e)}"
+        finished.put((kind, name, is_ok, message))
+    
+    def _result_entry(self, kind: str, name: str, is_ok: Optional[bool], message: str) -> Dict:
+        """Result row for one dependency; available is None while unknown"""
+        if is_ok is None:
+            status = STATUS_UNKNOWN
+        else:
+            status = STATUS_OK if is_ok else STATUS_MISSING
         
-        # Check system dependencies
-        for dep_name, dep_info in self.system_deps.items():
-            is_ok, message = self.check_system_dependency(dep_name)
-            results['system'][dep_name] = {
+        if kind == 'system':
+            dep_info = self.system_deps[name]
+            return {
                 'available': is_ok,
+                'status': status,
                 'message': message,
                 'description': dep_info['description'],
                 'install_info': dep_info['install_info'],
                 'required': dep_info['required']
             }
-            
-            if not is_ok and dep_info['required']:
-                results['all_ok'] = False
-                results['critical_missing'].append(dep_name)
+        dep_info = self.python_deps[name]
+        return {
+            'available': is_ok,
+            'status': status,
+            'message': message,
+            'description': dep_info['description'],
+            'package': dep_info['package'],
+            'required': dep_info['required']
+        }
+    
+    def check_all_dependencies(self, deadline: float = DEFAULT_PROBE_DEADLINE,
+                               on_result: Optional[Callable] = None) -> Dict[str, Dict]:
+        """Check all dependencies concurrently and return detailed results
         
-        # Check Python dependencies
-        for module_name, dep_info in self.python_deps.items():
-            is_ok, message = self.check_python_dependency(module_name)
-            results['python'][module_name] = {
-                'available': is_ok,
-                'message': message,
-                'description': dep_info['description'],
-                'package': dep_info['package'],
-                'required': dep_info['required']
-            }
-            
-            if not is_ok and dep_info['required']:
-                results['all_ok'] = False
-                results['critical_missing'].append(dep_info['package'])
+        on_result(kind, name, entry) is called as each probe finishes.
+        """
+        collected = {'system': {}, 'python': {}}
+        for kind, name, entry in self.iter_dependency_results(deadline):
+            collected[kind][name] = entry
+            if on_result:
+                on_result(kind, name, entry)
+        
+        results = {
+            # Keep declaration order regardless of completion order
+            'system': {name: collected['system'][name] for name in self.system_deps},
+            'python': {name: collected['python'][name] for name in self.python_deps},
+            'all_ok': True,
+            'critical_missing': [],
+            'unknown': [],
+            'warnings': []
+        }
+        
+        for kind in ('system', 'python'):
+            for name, info in results[kind].items():
+                label = name if kind == 'system' else info['package']
+                if info['status'] == STATUS_UNKNOWN:
+                    results['all_ok'] = False
+                    results['unknown'].append(label)
+                elif info['status'] == STATUS_MISSING and info['required']:
+                    results['all_ok'] = False
+                    results['critical_missing'].append(label)
         
         return results
     
-    def get_missing_dependencies_report(self) -> str:
+    def get_missing_dependencies_report(self, results: Optional[Dict] = None) -> str:
         """Generate a detailed report of missing dependencies"""
-        results = self.check_all_dependencies()
+        if results is None:
+            results = self.check_all_dependencies()
         
         if results['all_ok']:
             return "✅ Všechny požadované komponenty jsou dostupné!"
@@ -160,7 +254,7 @@ class DependencyChecker:
         
         # System dependencies
         for dep_name, info in results['system'].items():
-            if not info['available'] and info['required']:
+            if info['available'] is False and info['required']:
                 report.append(f"🔧 {info['description']}")
                 report.append(f"   Problém: {info['message']}")
                 report.append(f"   Řešení: {info['install_info']}")
@@ -169,13 +263,18 @@ class DependencyChecker:
         # Python dependencies  
         python_missing = []
         for module_name, info in results['python'].items():
-            if not info['available'] and info['required']:
+            if info['available'] is False and info['required']:
                 python_missing.append(info['package'])
                 report.append(f"🐍 {info['description']}")
                 report.append(f"   Problém: {info['message']}")
                 report.append(f"   Řešení: pip install {info['package']}")
                 report.append("")
         
+        # Probes that did not finish before the deadline
+        if results.get('unknown'):
+            report.append(f"⏳ NEOVĚŘENO (kontrola nestihla doběhnout): {', '.join(results['unknown'])}")
+            report.append("")
+        
         # Summary installation command
         if python_missing:
             report.append("💡 RYCHLÁ INSTALACE PYTHON BALÍČKŮ:")
@@ -184,14 +283,15 @@ class DependencyChecker:
         
         return "\n".join(report)
     
-    def get_installation_commands(self) -> List[str]:
+    def get_installation_commands(self, results: Optional[Dict] = None) -> List[str]:
         """Get list of installation commands for missing dependencies"""
-        results = self.check_all_dependencies()
+        if results is None:
+            results = self.check_all_dependencies()
         commands = []
         
         python_missing = []
         for module_name, info in results['python'].items():
-            if not info['available'] and info['required']:
+            if info['available'] is False and info['required']:
                 python_missing.append(info['package'])
         
         if python_missing:
@@ -230,7 +330,7 @@ def print_dependency_status():
         
         if not results['all_ok']:
             print("❌ ŘEŠENÍ PROBLÉMŮ:")
-            print(checker.get_missing_dependencies_report())
+            print(checker.get_missing_dependencies_report(results))
         else:
             print("✅ Všechny komponenty jsou v pořádku!")
     except UnicodeEncodeError:
@@ -254,7 +354,7 @@ def print_dependency_status():
         
         if not results['all_ok']:
             print("RESENI PROBLEMU:")
-            report = checker.get_missing_dependencies_report()
+            report = checker.get_missing_dependencies_report(results)
             clean_report = report.encode('ascii', errors='ignore').decode('ascii')
             print(clean_report)
         else:
@@ -0,0 +1,173 @@
+"""
+Disk Space Admission
+Admits downloads only while the projected free space of the target volume
+stays above a reserve, and preallocates files whose size is known
+"""
+import os
+import shutil
+import sys
+import threading
+from typing import Optional, Callable, Dict
+
+from .bandwidth import RATE_RE, RATE_UNITS
+
+
+DEFAULT_RESERVE = 1024 ** 3          # bytes kept free on every volume
+ESTIMATE_HEADROOM = 10 * 1024 ** 3   # below reserve + headroom, unknown sizes are worth fetching
+SIZE_MARGIN = 1.05                   # containers add a little over the sum of their streams
+WAIT_INTERVAL = 0.5                  # seconds between free space checks while a job waits
+
+
+class DiskSpaceError(Exception):
+    """Raised when a download cannot fit on the target volume"""
+
+
+def parse_size(value) -> int:
+    """Bytes from numbers or strings like '500M' or '2G'"""
+    if isinstance(value, (int, float)):
+        return max(0, int(value))
+    match = RATE_RE.match(str(value))
+    if not match:
+        raise ValueError(f"Neplatná velikost: {value}")
+    return int(float(match.group(1)) * RATE_UNITS[match.group(2).lower()])
+
+
+def _format_size(size: float) -> str:
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+
+def _existing_path(path: str) -> str:
+    """Nearest existing ancestor, the output folder may not exist yet"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def preallocate(file, size: int, offset: int = 0) -> bool:
+    """Allocate size bytes from offset of an open file where the filesystem supports it
+
+    Uses fallocate(2) on Linux. Filesystems without it (and other platforms)
+    are left alone rather than emulated, as posix_fallocate would write
+    every block, which costs a full pass over network shares.
+    """
+    if size <= 0 or not sys.platform.startswith('linux'):
+        return False
+    import ctypes
+
+    libc = ctypes.CDLL(None, use_errno=True)
+    result = libc.fallocate(file.fileno(), 0, ctypes.c_longlong(offset), ctypes.c_longlong(size))
+    return result == 0
+
+
+class _Claim:
+    __slots__ = ('volume', 'size', 'released')
+
+    def __init__(self, volume: int, size: int):
+        self.volume = volume
+        self.size = size
+        self.released = False
+
+
+class DiskSpaceGuard:
+    """Space claims of running downloads per volume
+
+    A job is admitted while free space minus the claims of jobs already
+    running on the volume stays above the reserve, so jobs started together
+    cannot all count the same free bytes. A job that does not fit waits for
+    running ones to finish, and fails at once when nothing else is running.
+    Jobs of unknown size only need the reserve to be free.
+    """
+
+    def __init__(self, reserve: int = DEFAULT_RESERVE,
+                 disk_usage: Callable = shutil.disk_usage):
+        self._condition = threading.Condition()
+        self._claims: Dict[int, int] = {}
+        self._disk_usage = disk_usage
+        self.configure(reserve)
+
+    def configure(self, reserve: Optional[int] = None):
+        with self._condition:
+            if reserve is not None:
+                self.reserve = max(0, int(reserve))
+            self._condition.notify_all()
+
+    def projected_free(self, path: str) -> int:
+        """Free bytes of the path's volume minus the claims of running jobs"""
+        path = _existing_path(path)
+        free = self._disk_usage(path).free
+        with self._condition:
+            return free - self._claims.get(os.stat(path).st_dev, 0)
+
+    def is_low(self, path: str) -> bool:
+        """Whether the volume is close enough to the reserve that job sizes matter"""
+        return self.projected_free(path) < self.reserve + ESTIMATE_HEADROOM
+
+    def try_acquire(self, path: str, size: Optional[int] = None) -> Optional[_Claim]:
+        """Claim space for a job if it fits now"""
+        path = _existing_path(path)
+        with self._condition:
+            return self._try_acquire(path, self._claim_size(size))
+
+    def acquire(self, path: str, size: Optional[int] = None,
+                cancel_event: Optional[threading.Event] = None) -> Optional[_Claim]:
+        """Wait until the job fits; None when cancelled first
+
+        Raises DiskSpaceError when the job does not fit although no other
+        job holds space on the volume.
+        """
+        path = _existing_path(path)
+        size = self._claim_size(size)
+        with self._condition:
+            while True:
+                claim = self._try_acquire(path, size)
+                if claim is not None:
+                    return claim
+                volume = os.stat(path).st_dev
+                if not self._claims.get(volume):
+                    free = self._disk_usage(path).free
+                    raise DiskSpaceError(
+                        f"Nedostatek místa na disku: potřeba {_format_size(size)}, "
+                        f"volno {_format_size(free)} (rezerva {_format_size(self.reserve)})")
+                if cancel_event is not None and cancel_event.is_set():
+                    return None
+                # Polled as well, other programs free space without notifying us
+                self._condition.wait(WAIT_INTERVAL)
+
+    def release(self, claim: Optional[_Claim]):
+        if claim is None:
+            return
+        with self._condition:
+            if claim.released:
+                return
+            claim.released = True
+            remaining = self._claims.get(claim.volume, 0) - claim.size
+            if remaining > 0:
+                self._claims[claim.volume] = remaining
+            else:
+                self._claims.pop(claim.volume, None)
+            self._condition.notify_all()
+
+    def claimed(self) -> int:
+        """Bytes claimed by running jobs on all volumes"""
+        with self._condition:
+            return sum(self._claims.values())
+
+    @staticmethod
+    def _claim_size(size: Optional[int]) -> int:
+        return int(size * SIZE_MARGIN) if size else 0
+
+    def _try_acquire(self, path: str, size: int) -> Optional[_Claim]:
+        volume = os.stat(path).st_dev
+        claimed = self._claims.get(volume, 0)
+        if self._disk_usage(path).free - claimed - size < self.reserve:
+            return None
+        self._claims[volume] = claimed + size
+        return _Claim(volume, size)
@@ -0,0 +1,208 @@
+"""
+Download Archive
+Persistent SQLite record of downloaded videos keyed by extractor, video ID
+and output format, with an in-memory set in front so already fetched items
+are skipped before any network request
+"""
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Optional, Tuple, Iterable
+
+from .app_paths import get_data_path
+
+
+ARCHIVE_FILE = "download_archive.sqlite3"
+
+
+def make_archive_key(extractor: str, video_id: str, fmt: Optional[str] = None) -> str:
+    """Same 'extractor id' form as yt-dlp's --download-archive lines, plus the format if any"""
+    key = f"{extractor.lower()} {video_id}"
+    return f"{key} {fmt.lower()}" if fmt else key
+
+
+@lru_cache(maxsize=4096)
+def url_archive_id(url: str) -> Optional[Tuple[str, str]]:
+    """(extractor, video id) of a URL from URL patterns alone, no network
+
+    None for URLs only the generic extractor handles, whose ID is not known
+    until the page is fetched.
+    """
+    from yt_dlp.extractor import gen_extractor_classes
+
+    for extractor in gen_extractor_classes():
+        if extractor.ie_key() == 'Generic':
+            continue
+        if extractor.suitable(url):
+            try:
+                video_id = extractor.get_temp_id(url)
+            except Exception:
+                video_id = None
+            return (extractor.ie_key(), video_id) if video_id else None
+    return None
+
+
+class DownloadArchive:
+    """Downloaded (extractor, id, format) entries; lookups hit in-memory sets, writes go to SQLite
+
+    The format is the output the user asked for ('mp4', 'mp3', ...), so a
+    video kept as MP4 is still downloaded when MP3 is wanted. Entries without
+    a format (imported yt-dlp archives) cover every format.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or get_data_path(ARCHIVE_FILE)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._migrate()
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS archive ("
+            "extractor TEXT NOT NULL, video_id TEXT NOT NULL, format TEXT NOT NULL DEFAULT '', "
+            "url TEXT, title TEXT, downloaded_at REAL NOT NULL, "
+            "PRIMARY KEY (extractor, video_id, format)) WITHOUT ROWID"
+        )
+        self._db.commit()
+        self._keys = set()
+        self._videos = set()
+        self.reload()
+
+    def _migrate(self):
+        """Archives from before the format column keep their rows as format-less entries"""
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(archive)")]
+        if not columns or 'format' in columns:
+            return
+        self._db.execute("ALTER TABLE archive RENAME TO archive_old")
+        self._db.execute(
+            "CREATE TABLE archive ("
+            "extractor TEXT NOT NULL, video_id TEXT NOT NULL, format TEXT NOT NULL DEFAULT '', "
+            "url TEXT, title TEXT, downloaded_at REAL NOT NULL, "
+            "PRIMARY KEY (extractor, video_id, format)) WITHOUT ROWID"
+        )
+        self._db.execute("INSERT INTO archive (extractor, video_id, url, title, downloaded_at) "
+                         "SELECT extractor, video_id, url, title, downloaded_at FROM archive_old")
+        self._db.execute("DROP TABLE archive_old")
+        self._db.commit()
+
+    def reload(self):
+        """Re-read the key sets, picking up items archived by other processes"""
+        with self._lock:
+            rows = self._db.execute("SELECT extractor, video_id, format FROM archive").fetchall()
+            self._keys = {make_archive_key(extractor, video_id, fmt) for extractor, video_id, fmt in rows}
+            self._videos = {make_archive_key(extractor, video_id) for extractor, video_id, _ in rows}
+
+    def contains(self, extractor: Optional[str], video_id: Optional[str],
+                 fmt: Optional[str] = None) -> bool:
+        """Whether the video is archived in fmt; without fmt, in any format"""
+        if not extractor or not video_id:
+            return False
+        key = make_archive_key(extractor, str(video_id))
+        if not fmt:
+            return key in self._videos
+        return key in self._keys or make_archive_key(extractor, str(video_id), fmt) in self._keys
+
+    def contains_url(self, url: str, fmt: Optional[str] = None) -> bool:
+        """Whether the video behind a URL is archived, decided without network access"""
+        archive_id = url_archive_id(url)
+        return archive_id is not None and self.contains(*archive_id, fmt)
+
+    def add(self, extractor: str, video_id: str, url: Optional[str] = None,
+            title: Optional[str] = None, fmt: Optional[str] = None):
+        extractor = extractor.lower()
+        video_id = str(video_id)
+        fmt = (fmt or '').lower()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO archive (extractor, video_id, format, url, title, downloaded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (extractor, video_id, fmt, url, title, time.time())
+            )
+            self._db.commit()
+            self._keys.add(make_archive_key(extractor, video_id, fmt))
+            self._videos.add(make_archive_key(extractor, video_id))
+
+    def remove(self, extractor: str, video_id: str, fmt: Optional[str] = None) -> bool:
+        """Forget a video in one format, or in all formats without fmt"""
+        extractor = extractor.lower()
+        video_id = str(video_id)
+        with self._lock:
+            if fmt:
+                cursor = self._db.execute(
+                    "DELETE FROM archive WHERE extractor = ? AND video_id = ? AND format = ?",
+                    (extractor, video_id, fmt.lower()))
+            else:
+                cursor = self._db.execute("DELETE FROM archive WHERE extractor = ? AND video_id = ?",
+                                          (extractor, video_id))
+            self._db.commit()
+            removed = cursor.rowcount > 0
+        self.reload()
+        return removed
+
+    def import_lines(self, lines: Iterable[str]) -> int:
+        """Add entries from a yt-dlp --download-archive file, returns number of new entries"""
+        rows = []
+        for line in lines:
+            extractor, _, video_id = line.strip().partition(' ')
+            if extractor and video_id:
+                rows.append((extractor.lower(), video_id.strip()))
+        now = time.time()
+        with self._lock:
+            before = len(self._keys)
+            self._db.executemany(
+                "INSERT OR IGNORE INTO archive (extractor, video_id, downloaded_at) VALUES (?, ?, ?)",
+                [(extractor, video_id, now) for extractor, video_id in rows]
+            )
+            self._db.commit()
+            self._keys.update(make_archive_key(extractor, video_id) for extractor, video_id in rows)
+            self._videos.update(make_archive_key(extractor, video_id) for extractor, video_id in rows)
+            return len(self._keys) - before
+
+    def for_ytdlp(self, fmt: Optional[str] = None, record: bool = True) -> '_YtdlpArchiveView':
+        """Object to pass as yt-dlp's download_archive option instead of a text file
+
+        With record=False yt-dlp only skips archived videos and the caller
+        adds the ones it has finished itself.
+        """
+        return _YtdlpArchiveView(self, fmt, record)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __contains__(self, archive_id: Tuple[str, ...]) -> bool:
+        """(extractor, id) or (extractor, id, format)"""
+        return self.contains(*archive_id)
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class _YtdlpArchiveView:
+    """yt-dlp's archive protocol ('extractor id' strings) over a DownloadArchive
+
+    yt-dlp tests membership before extracting a URL or playlist entry and
+    adds the key after each finished download, both in the view's format.
+    """
+
+    def __init__(self, archive: DownloadArchive, fmt: Optional[str] = None, record: bool = True):
+        self._archive = archive
+        self._fmt = fmt
+        self._record = record
+
+    def __repr__(self):
+        # Stable across calls, the instance pool keys option profiles by it
+        return f"_YtdlpArchiveView({self._archive.path!r}, {self._fmt!r}, record={self._record})"
+
+    def __contains__(self, key: str) -> bool:
+        extractor, _, video_id = key.partition(' ')
+        return self._archive.contains(extractor, video_id, self._fmt)
+
+    def add(self, key: str):
+        if not self._record:
+            return
+        extractor, _, video_id = key.partition(' ')
+        self._archive.add(extractor, video_id, fmt=self._fmt)
+
+    def __len__(self):
+        return len(self._archive)
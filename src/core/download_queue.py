@@ -0,0 +1,355 @@
+"""
+Download Queue Engine
+Bounded worker pool with job priorities, per-job state and cancellation
+"""
+import heapq
+import itertools
+import threading
+import time
+from typing import Optional, Callable, Dict, List
+
+from .progress import ProgressBus
+from .host_scheduler import host_key
+
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+TRANSCODING = 'transcoding'  # transfer finished, waiting for or running its format conversion
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINAL_STATES = (DONE, FAILED, CANCELLED)
+
+# Job priorities (higher value runs first)
+PRIORITY_LOW = 0
+PRIORITY_NORMAL = 5
+PRIORITY_HIGH = 10
+
+# Also the per-domain limit unless the host scheduler is given a cap of its own
+# (HostScheduler max_per_host, --host-jobs), so one domain can use every worker
+DEFAULT_MAX_WORKERS = 8
+IDLE_TIMEOUT = 5.0  # seconds before an idle worker thread exits
+HOST_POLL_INTERVAL = 0.5  # recheck domains whose slots may be freed by another queue
+
+
+class DownloadJob:
+    """Single download request tracked by the queue"""
+
+    def __init__(self, job_id: int, url: str, quality: str = 'best',
+                 format_choice: str = 'MP4', priority: int = PRIORITY_NORMAL,
+                 progress_callback: Optional[Callable] = None,
+                 done_callback: Optional[Callable] = None,
+                 options: Optional[Dict] = None):
+        self.job_id = job_id
+        self.url = url
+        self.quality = quality
+        self.format_choice = format_choice
+        self.priority = priority
+        self.progress_callback = progress_callback
+        self.done_callback = done_callback
+        self.options = options or {}
+
+        self.state = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+        self.cancel_event = threading.Event()
+        self._finished = threading.Event()
+        self._host_key = None
+
+    @property
+    def is_finished(self) -> bool:
+        """Whether the job reached a final state"""
+        return self.state in FINAL_STATES
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job reaches a final state"""
+        return self._finished.wait(timeout)
+
+    def to_dict(self) -> Dict:
+        """Serializable snapshot of the job"""
+        return {
+            'job_id': self.job_id,
+            'url': self.url,
+            'quality': self.quality,
+            'format': self.format_choice,
+            'priority': self.priority,
+            'state': self.state,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class DownloadQueue:
+    """Priority queue of download jobs executed by a bounded worker pool"""
+
+    def __init__(self, downloader, max_workers: int = DEFAULT_MAX_WORKERS,
+                 progress_bus: Optional[ProgressBus] = None):
+        self.downloader = downloader
+        self.progress_bus = progress_bus or ProgressBus()
+        # Per-domain politeness limits shared with every other queue of the downloader
+        self.host_scheduler = getattr(downloader, 'host_scheduler', None)
+        self._max_workers = max(1, int(max_workers))
+        self._heap = []
+        self._jobs = {}
+        self._counter = itertools.count(1)
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._workers = []
+        self._worker_count = 0
+        self._running = 0
+        self._shutdown = False
+
+    @property
+    def max_workers(self) -> int:
+        return self._max_workers
+
+    def set_max_workers(self, max_workers: int):
+        """Change the concurrency limit; applies to the next scheduled jobs"""
+        with self._condition:
+            self._max_workers = max(1, int(max_workers))
+            self._spawn_workers()
+            self._condition.notify_all()
+
+    def submit(self, url: str, quality: str = 'best', format_choice: str = 'MP4',
+               priority: int = PRIORITY_NORMAL,
+               progress_callback: Optional[Callable] = None,
+               done_callback: Optional[Callable] = None,
+               **options) -> DownloadJob:
+        """Queue a download and return its job handle"""
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("Download queue is shut down")
+
+            job = DownloadJob(next(self._counter), url, quality, format_choice, priority,
+                              progress_callback, done_callback, options)
+            self._jobs[job.job_id] = job
+            heapq.heappush(self._heap, (-priority, next(self._sequence), job))
+            self._spawn_workers()
+            self._condition.notify()
+        return job
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a queued or running job"""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.is_finished:
+                return False
+
+            job.cancel_event.set()
+            if job.state != QUEUED:
+                # Running jobs stop at the next progress tick
+                return True
+
+        # Queued jobs never reach a worker, finish them right away
+        self._finish(job, CANCELLED, {'success': False, 'error': 'Cancelled', 'cancelled': True})
+        return True
+
+    def set_job_rate_limit(self, job_id: int, rate) -> bool:
+        """Cap one job's download rate while it is queued or running (None = unlimited)"""
+        job = self._jobs.get(job_id)
+        governor = getattr(self.downloader, 'governor', None)
+        if job is None or job.is_finished or governor is None:
+            return False
+        governor.set_job_limit(job, rate)
+        return True
+
+    def get_job(self, job_id: int) -> Optional[DownloadJob]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> List[DownloadJob]:
+        """All jobs known to the queue in submission order"""
+        with self._condition:
+            return sorted(self._jobs.values(), key=lambda j: j.job_id)
+
+    def active_count(self) -> int:
+        """Number of jobs currently holding a download slot"""
+        with self._condition:
+            return self._running
+
+    def pending_count(self) -> int:
+        """Number of jobs waiting for a worker"""
+        with self._condition:
+            return sum(1 for job in self._jobs.values() if job.state == QUEUED)
+
+    def wait_all(self, timeout: Optional[float] = None) -> bool:
+        """Block until every submitted job is finished"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for job in self.jobs():
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not job.wait(remaining):
+                return False
+        return True
+
+    def shutdown(self, wait: bool = True, cancel_pending: bool = False):
+        """Stop accepting jobs and stop the workers once the queue drains"""
+        with self._condition:
+            self._shutdown = True
+            pending = [job for job in self._jobs.values() if job.state == QUEUED] if cancel_pending else []
+            self._condition.notify_all()
+
+        for job in pending:
+            self.cancel(job.job_id)
+
+        if wait:
+            for worker in list(self._workers):
+                worker.join()
+
+    def _spawn_workers(self):
+        """Start worker threads up to the concurrency limit (caller holds the lock)"""
+        self._workers = [w for w in self._workers if w.is_alive()]
+        wanted = min(self._max_workers, len(self._heap) + self._running)
+        while self._worker_count < wanted:
+            self._worker_count += 1
+            worker = threading.Thread(target=self._worker_loop, daemon=True,
+                                      name=f"download-worker-{self._worker_count}")
+            self._workers.append(worker)
+            worker.start()
+
+    def _next_job(self) -> Optional[DownloadJob]:
+        """Pop the next runnable job, or None when the worker should exit"""
+        with self._condition:
+            while True:
+                wait = None
+                if self._heap and self._running < self._max_workers:
+                    job, wait = self._pop_runnable()
+                    if job is not None:
+                        job.state = RUNNING
+                        job.started_at = time.time()
+                        self._running += 1
+                        return job
+
+                if self._heap:
+                    # Concurrency limit reached or every queued domain is busy / backing off
+                    self._condition.wait(wait)
+                elif self._shutdown or not self._condition.wait(IDLE_TIMEOUT):
+                    if not self._heap:
+                        # Idle workers exit; submit() spawns new ones on demand
+                        self._worker_count -= 1
+                        return None
+
+    def _pop_runnable(self):
+        """Highest priority job whose domain may start now, plus the wait when there is none
+
+        Caller holds the lock. Jobs skipped because their domain is busy
+        stay queued in their original order.
+        """
+        skipped = []
+        blocked = {}
+        job = None
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            candidate = entry[2]
+            if candidate.state != QUEUED:
+                # Cancelled while waiting in the heap
+                continue
+            if self.host_scheduler is None:
+                job = candidate
+                break
+            key = host_key(candidate.url)
+            if key not in blocked:
+                if self.host_scheduler.try_acquire(key):
+                    candidate._host_key = key
+                    job = candidate
+                    break
+                blocked[key] = self.host_scheduler.ready_in(key)
+            skipped.append(entry)
+
+        for entry in skipped:
+            heapq.heappush(self._heap, entry)
+        if job is not None or not blocked:
+            return job, None
+        waits = [wait if wait is not None else HOST_POLL_INTERVAL for wait in blocked.values()]
+        return None, max(0.01, min(waits + [HOST_POLL_INTERVAL]))
+
+    def _worker_loop(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            self._run_job(job)
+
+    def _run_job(self, job: DownloadJob):
+        # Route the job's progress through the bus so its callback is rate limited
+        unsubscribe = None
+        if job.progress_callback:
+            unsubscribe = self.progress_bus.subscribe(job.progress_callback, job.job_id)
+        options = job.options
+        if getattr(self.downloader, 'governor', None) is not None:
+            # Per-job rate limits are keyed by the job so set_job_rate_limit() reaches it
+            options = dict(options, bandwidth_key=job)
+        if getattr(self.downloader, 'transcoder', None) is not None:
+            # Conversions come back as a future so the slot is free for the next transfer
+            options = dict(options, defer_transcode=True)
+        try:
+            result = self.downloader.download_video_with_format(
+                job.url,
+                job.quality,
+                job.format_choice,
+                progress_callback=self.progress_bus.reporter(job.job_id),
+                cancel_event=job.cancel_event,
+                **options
+            )
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        finally:
+            if job._host_key is not None:
+                self.host_scheduler.release(job._host_key)
+
+        transcode = result.get('transcode')
+        with self._condition:
+            self._running -= 1
+            if transcode is not None:
+                job.state = TRANSCODING
+            self._condition.notify_all()
+
+        if transcode is not None:
+            # Progress stays subscribed, the conversion reports through the same reporter
+            transcode.add_done_callback(lambda future: self._finish_transcoded(job, future, unsubscribe))
+            return
+        self._end_progress(job, unsubscribe)
+        self._finish(job, self._result_state(job, result), result)
+
+    def _finish_transcoded(self, job: DownloadJob, future, unsubscribe: Optional[Callable]):
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        self._end_progress(job, unsubscribe)
+        self._finish(job, self._result_state(job, result), result)
+
+    def _end_progress(self, job: DownloadJob, unsubscribe: Optional[Callable]):
+        self.progress_bus.flush(job.job_id)
+        if unsubscribe:
+            unsubscribe()
+
+    @staticmethod
+    def _result_state(job: DownloadJob, result: Dict) -> str:
+        if job.cancel_event.is_set() and not result.get('success'):
+            return CANCELLED
+        if result.get('success'):
+            return DONE
+        return FAILED
+
+    def _finish(self, job: DownloadJob, state: str, result: Dict):
+        with self._condition:
+            if job.is_finished:
+                return
+            job.state = state
+            job.result = result
+            job.error = None if result.get('success') else result.get('error')
+            job.finished_at = time.time()
+
+        job._finished.set()
+        if job.done_callback:
+            try:
+                job.done_callback(job)
+            except Exception as e:
+                print(f"Error in download job callback: {e}")
@@ -2,65 +2,184 @@
 Modern YouTube Downloader Core Module
 Handles video downloading with quality selection and progress tracking
 """
+import copy
 import os
 import subprocess
 import sys
+import threading
+from concurrent.futures import Future
+from functools import partial
 from typing import Optional, Callable, Dict, List
-from yt_dlp import YoutubeDL
+
+from .download_queue import DownloadQueue, DownloadJob, PRIORITY_NORMAL, DEFAULT_MAX_WORKERS
+from .ytdl_pool import YoutubeDLPool
+from .metadata_cache import MetadataCache
+from .file_counter import FileCounter
+from .hls import HLSDownloader, HLSError, HLSUnsupported, HLSCancelled
+from .job_journal import JobJournal, DONE, FAILED, CANCELLED
+from .progress import ProgressBus, progress_fraction
+from .dependency_checker import DependencyChecker
+from .bandwidth import BandwidthGovernor
+from .host_scheduler import HostScheduler, host_key, is_blocked_error, BLOCKED_RETRIES
+from .download_archive import DownloadArchive, url_archive_id
+from .dedup import Deduplicator
+from .transcode import TranscodeScheduler, TranscodeCancelled, needs_transcode, target_path
+from .audio_stream import StreamingEncoder, StreamEncodeError, StreamEncodeCancelled, pick_stream_format
+from .format_index import FormatIndex
+from .disk_space import DiskSpaceGuard, DiskSpaceError
+from .range_download import RangeDownloader, RangeDownloadError, RangeDownloadCancelled
+
+
+# yt-dlp and requests dominate import time, they are imported on first use
+# (see _load_yt_dlp) so the GUI and CLI can start without them
+YoutubeDL = None
+DownloadCancelled = None
+DownloadError = None
+
+
+def _load_yt_dlp():
+    """Import yt-dlp on first use and return the YoutubeDL class"""
+    global YoutubeDL, DownloadCancelled, DownloadError
+    if DownloadError is None:
+        from yt_dlp.utils import DownloadCancelled, DownloadError
+    if YoutubeDL is None:
+        from yt_dlp import YoutubeDL
+    return YoutubeDL
+
+
+# Option profile used for metadata extraction
+INFO_OPTIONS = {
+    'quiet': True,
+    'no_warnings': True,
+}
+
+# Flat extraction lists playlist/channel entries without resolving each video
+PLAYLIST_OPTIONS = {
+    'quiet': True,
+    'no_warnings': True,
+    'extract_flat': 'in_playlist',
+}
+
+DEFAULT_PLAYLIST_WORKERS = 4
 
 
 class VideoDownloader:
-    def __init__(self, output_path: str = None):
+    def __init__(self, output_path: str = None, metadata_cache: Optional[MetadataCache] = None,
+                 journal: Optional[JobJournal] = None,
+                 progress_bus: Optional[ProgressBus] = None,
+                 dependency_checker: Optional[DependencyChecker] = None,
+                 governor: Optional[BandwidthGovernor] = None,
+                 host_scheduler: Optional[HostScheduler] = None,
+                 archive: Optional[DownloadArchive] = None,
+                 deduplicator: Optional[Deduplicator] = None,
+                 transcoder: Optional[TranscodeScheduler] = None,
+                 disk_space: Optional[DiskSpaceGuard] = None):
         self.output_path = output_path or os.path.join(os.path.expanduser("~"), "Downloads", "YT_Downloads")
         self.ensure_output_dir()
+        self._queue = None
+        self._queue_lock = threading.Lock()
+        # Resolve YoutubeDL at call time so the import is deferred and the class can be swapped out
+        self._ytdl_pool = YoutubeDLPool(lambda opts: _load_yt_dlp()(opts))
+        self.metadata_cache = metadata_cache if metadata_cache is not None else MetadataCache()
+        self.journal = journal if journal is not None else JobJournal()
+        self.dependency_checker = dependency_checker if dependency_checker is not None else DependencyChecker()
+        # Queued jobs report through this bus; subscribe to it to follow every job
+        self.progress_bus = progress_bus or ProgressBus()
+        # Shared rate limits for every transfer, adjustable while downloads run
+        self.governor = governor or BandwidthGovernor()
+        # Per-domain job limits and 403/429 backoff, also used by the download queue
+        self.host_scheduler = host_scheduler or HostScheduler()
+        # Videos downloaded before are skipped without network requests while use_archive is set
+        self.archive = archive if archive is not None else DownloadArchive()
+        self.use_archive = True
+        # Finished files identical to an earlier download become links to it while use_dedup is set
+        self.deduplicator = deduplicator if deduplicator is not None else Deduplicator()
+        self.use_dedup = True
+        # MP3/AVI/WEBM conversions run here, on CPU-sized workers outside the download slots
+        self.transcoder = transcoder or TranscodeScheduler()
+        # MP3 jobs pipe the audio stream into the encoder while it downloads when possible
+        self.stream_audio = True
+        # Jobs start only while the projected free space stays above the reserve
+        self.disk_space = disk_space or DiskSpaceGuard()
+        # HTTP connections per progressive file, 1 leaves the transfer to yt-dlp; jobs may override it
+        self.connections = 1
         
     def ensure_output_dir(self):
         """Create output directory if it doesn't exist"""
         os.makedirs(self.output_path, exist_ok=True)
     
     def check_ffmpeg(self) -> bool:
-        """Check if ffmpeg is available"""
-        try:
-            subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            return True
-        except (FileNotFoundError, subprocess.CalledProcessError):
-            return False
+        """Check if ffmpeg is available (probe result cached until PATH or the binary changes)"""
+        return self.dependency_checker.check_system_dependency('ffmpeg')[0]
+    
+    def close(self):
+        """Stop the download queue and release pooled resources"""
+        if self._queue is not None:
+            self._queue.shutdown(wait=False)
+        self._ytdl_pool.close()
+        self.metadata_cache.close()
+        self.journal.close()
+        self.archive.close()
+        self.deduplicator.close()
+        self.transcoder.shutdown(wait=False)
     
     def get_video_info(self, url: str) -> Dict:
         """Get video information without downloading"""
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
+        try:
+            entry = self._fetch_metadata(url)
+        except Exception as e:
+            return {'error': str(e)}
+        return self._build_video_info(entry['info'], entry['formats'])
+    
+    def _fetch_metadata(self, url: str, progress_callback: Optional[Callable] = None,
+                        cancel_event: Optional[threading.Event] = None) -> Optional[Dict]:
+        """Metadata cache entry of a URL ({'info', 'formats'}), extracted and cached on a miss
+
+        Extraction runs in a slot of the URL's domain (the one of the calling
+        queue job, if any) with the 403/429 backoff. Extraction errors are
+        raised; None when cancelled while waiting for the slot.
+        """
+        cached = self.metadata_cache.get(url)
+        if cached is not None:
+            return cached
+        with self.host_scheduler.slot(url, cancel_event) as acquired:
+            if not acquired:
+                return None
+            with self._ytdl_pool.lease(INFO_OPTIONS) as ydl:
+                info = self._retry_blocked(url, lambda: ydl.extract_info(url, download=False),
+                                           progress_callback, cancel_event)
+                # Keep a JSON-safe copy that yt-dlp can process again for download
+                info = ydl.sanitize_info(info, remove_private_keys=True)
+        formats = self._extract_formats(info.get('formats', []))
+        self.metadata_cache.put(url, info, formats)
+        return {'info': info, 'formats': formats}
+    
+    def _build_video_info(self, info: Dict, formats: List[Dict]) -> Dict:
+        return {
+            'title': info.get('title', 'Unknown'),
+            'duration': info.get('duration', 0),
+            'thumbnail': info.get('thumbnail', ''),
+            'formats': formats
         }
-        
-        with YoutubeDL(ydl_opts) as ydl:
-            try:
-                info = ydl.extract_info(url, download=False)
-                return {
-                    'title': info.get('title', 'Unknown'),
-                    'duration': info.get('duration', 0),
-                    'thumbnail': info.get('thumbnail', ''),
-                    'formats': self._extract_formats(info.get('formats', []))
-                }
-            except Exception as e:
-                return {'error': str(e)}
     
     def _extract_formats(self, formats: List) -> List[Dict]:
-        """Extract available video qualities"""
-        quality_formats = []
-        seen_heights = set()
-        
+        """Extract available video qualities
+
+        One pass over the list; the stream set of the chosen quality is
+        scored by FormatIndex when it is downloaded.
+        """
+        by_height = {}
         for fmt in formats:
-            if fmt.get('vcodec') != 'none' and fmt.get('height'):
+            if fmt.get('vcodec') != 'none':
                 height = fmt.get('height')
-                if height not in seen_heights:
-                    quality_formats.append({
+                if height and height not in by_height:
+                    by_height[height] = {
                         'format_id': fmt.get('format_id'),
                         'quality': f"{height}p",
                         'ext': fmt.get('ext', 'mp4'),
                         'filesize': fmt.get('filesize')
-                    })
-                    seen_heights.add(height)
+                    }
+        quality_formats = [by_height[height] for height in sorted(by_height, reverse=True)]
         
         # Add audio-only option
         quality_formats.append({
@@ -70,22 +189,148 @@ class VideoDownloader:
             'filesize': None
         })
         
-        return sorted(quality_formats, key=lambda x: int(x['quality'].replace('p', '').replace('Audio Only (MP3)', '0')), reverse=True)
+        return quality_formats
     
     def get_next_file_number(self) -> int:
-        """Get next sequential file number"""
-        existing_files = [f for f in os.listdir(self.output_path) 
-                         if f.endswith(('.mp4', '.mp3', '.webm'))]
-        numbers = []
-        
-        for file in existing_files:
+        """Reserve the next sequential file number"""
+        return FileCounter(self.output_path).next_number()
+    
+    def get_queue(self, max_workers: Optional[int] = None) -> DownloadQueue:
+        """Get the shared download queue, creating it on first use"""
+        with self._queue_lock:
+            if self._queue is None:
+                self._queue = DownloadQueue(self, max_workers or DEFAULT_MAX_WORKERS,
+                                            progress_bus=self.progress_bus)
+            elif max_workers is not None:
+                self._queue.set_max_workers(max_workers)
+            return self._queue
+    
+    def submit(self, url: str, quality: str = 'best', format_choice: str = 'MP4',
+               priority: int = PRIORITY_NORMAL,
+               progress_callback: Optional[Callable] = None,
+               done_callback: Optional[Callable] = None, **options) -> DownloadJob:
+        """Queue a download on the shared worker pool
+
+        options are passed on to download_video_with_format, e.g. connections=8.
+        """
+        return self.get_queue().submit(url, quality, format_choice, priority,
+                                       progress_callback, done_callback, **options)
+    
+    def get_playlist_entries(self, url: str) -> Dict:
+        """List playlist or channel entries using flat extraction"""
+        with self.host_scheduler.slot(url), self._ytdl_pool.lease(PLAYLIST_OPTIONS) as ydl:
             try:
-                number = int(file.split('-')[0])
-                numbers.append(number)
-            except (ValueError, IndexError):
+                info = self._retry_blocked(url, lambda: ydl.extract_info(url, download=False))
+            except Exception as e:
+                return {'error': str(e)}
+        
+        entries = []
+        for position, entry in enumerate(self._iter_flat_entries(info.get('entries') or []), start=1):
+            entry_url = entry.get('url') or entry.get('webpage_url')
+            if not entry_url:
                 continue
+            entries.append({
+                'index': entry.get('playlist_index') or position,
+                'id': entry.get('id'),
+                'ie_key': entry.get('ie_key'),
+                'title': entry.get('title', 'Unknown'),
+                'url': entry_url,
+            })
         
-        return max(numbers, default=0) + 1
+        return {
+            'title': info.get('title', 'Unknown'),
+            'entries': entries
+        }
+    
+    def _iter_flat_entries(self, entries):
+        """Flatten nested playlists (e.g. channel tabs) into video entries"""
+        for entry in entries:
+            if not entry:
+                continue
+            if entry.get('_type') == 'playlist' and entry.get('entries'):
+                yield from self._iter_flat_entries(entry['entries'])
+            else:
+                yield entry
+    
+    def download_playlist(self, url: str, quality: str = 'best', format_choice: str = 'MP4',
+                          max_workers: int = DEFAULT_PLAYLIST_WORKERS,
+                          progress_callback: Optional[Callable] = None,
+                          cancel_event: Optional[threading.Event] = None) -> Dict:
+        """Download every playlist/channel entry on a bounded worker pool"""
+        playlist = self.get_playlist_entries(url)
+        if 'error' in playlist:
+            return {'success': False, 'error': playlist['error']}
+        
+        entries = playlist['entries']
+        total = len(entries)
+        if not total:
+            return {'success': False, 'error': 'Playlist neobsahuje žádná videa'}
+        
+        # Flat entries carry extractor and ID, so archived ones are skipped without a request each
+        archive_format = self._archive_format(quality, format_choice)
+        archived = {entry['index'] for entry in entries
+                    if self.use_archive and self.archive.contains(entry['ie_key'], entry['id'],
+                                                                  archive_format)}
+        
+        # Keep the %(playlist_index)s ordering in file names
+        width = max(3, len(str(max(entry['index'] for entry in entries))))
+        tracker = _PlaylistProgress(total, progress_callback)
+        tracker.completed = len(archived)
+        queue = DownloadQueue(self, max_workers)
+        jobs = {}
+        
+        for entry in entries:
+            if entry['index'] in archived:
+                continue
+            jobs[entry['index']] = queue.submit(
+                entry['url'],
+                quality,
+                format_choice,
+                progress_callback=partial(tracker.entry_progress, entry['index']),
+                done_callback=partial(tracker.entry_done, entry['index']),
+                file_prefix=f"{entry['index']:0{width}d}"
+            )
+        
+        while not queue.wait_all(timeout=0.5):
+            if cancel_event is not None and cancel_event.is_set():
+                for job in jobs.values():
+                    queue.cancel(job.job_id)
+        queue.shutdown(wait=False)
+        
+        results = []
+        for entry in entries:
+            job = jobs.get(entry['index'])
+            result = (job.result or {}) if job is not None else self._archived_result()
+            results.append(dict(result, index=entry['index'], url=entry['url']))
+        failed = [r for r in results if not r.get('success')]
+        
+        summary = {
+            'success': not failed,
+            'title': playlist['title'],
+            'total': total,
+            'completed': total - len(failed),
+            'failed': len(failed),
+            'skipped': len(archived),
+            'results': results
+        }
+        if failed:
+            summary['error'] = f'{len(failed)} z {total} videí se nepodařilo stáhnout'
+        return summary
+    
+    def resume_interrupted_jobs(self, progress_callback: Optional[Callable] = None,
+                                done_callback: Optional[Callable] = None) -> List[DownloadJob]:
+        """Queue jobs that a previous run left unfinished"""
+        jobs = []
+        for row in self.journal.interrupted():
+            jobs.append(self.get_queue().submit(
+                row['url'],
+                row['quality'] or 'best',
+                row['format_choice'] or 'MP4',
+                progress_callback=progress_callback,
+                done_callback=done_callback,
+                resume=row
+            ))
+        return jobs
     
     def download_video(self, url: str, quality: str = 'best', 
                       progress_callback: Optional[Callable] = None) -> Dict:
@@ -94,27 +339,142 @@ class VideoDownloader:
     
     def download_video_with_format(self, url: str, quality: str = 'best', 
                                  format_choice: str = 'MP4',
-                                 progress_callback: Optional[Callable] = None) -> Dict:
-        """Download video with specified quality and format"""
+                                 progress_callback: Optional[Callable] = None,
+                                 cancel_event: Optional[threading.Event] = None,
+                                 file_prefix: Optional[str] = None,
+                                 resume: Optional[Dict] = None,
+                                 bandwidth_key=None, defer_transcode: bool = False,
+                                 connections: Optional[int] = None) -> Dict:
+        """Download video with specified quality and format
+
+        bandwidth_key identifies the job for per-job rate limits of the
+        governor; without one the job gets a private bucket. With
+        defer_transcode a pending format conversion is returned as
+        {'success': True, 'transcode': Future} instead of waited for.
+        connections > 1 fetches progressive files over that many HTTP
+        connections (default: the connections attribute).
+        """
         try:
-            # Handle m3u8 streams with ffmpeg
-            if url.endswith('.m3u8'):
-                return self._download_m3u8(url, progress_callback)
+            if cancel_event is not None and cancel_event.is_set():
+                return self._cancelled_result()
+            
+            # Handle m3u8 streams with the native HLS engine
+            if (resume is not None and resume['kind'] == 'hls') or url.endswith('.m3u8'):
+                return self._download_m3u8(url, progress_callback, cancel_event=cancel_event,
+                                           resume=resume, bandwidth_key=bandwidth_key)
             
             # Regular YouTube/video download
-            return self._download_with_ytdlp(url, quality, format_choice, progress_callback)
+            return self._download_with_ytdlp(url, quality, format_choice, progress_callback,
+                                             cancel_event=cancel_event, file_prefix=file_prefix,
+                                             resume=resume, bandwidth_key=bandwidth_key,
+                                             defer_transcode=defer_transcode, connections=connections)
             
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
-    def _download_m3u8(self, url: str, progress_callback: Optional[Callable] = None) -> Dict:
-        """Download m3u8 stream using ffmpeg"""
+    def _download_m3u8(self, url: str, progress_callback: Optional[Callable] = None,
+                       cancel_event: Optional[threading.Event] = None,
+                       resume: Optional[Dict] = None, bandwidth_key=None) -> Dict:
+        """Download m3u8 stream with the native segment fetcher, remux with ffmpeg"""
         if not self.check_ffmpeg():
             return {'success': False, 'error': 'FFmpeg not found'}
         
-        next_number = self.get_next_file_number()
-        output_file = os.path.join(self.output_path, f"{next_number:03d}-stream.mp4")
+        if resume is not None:
+            output_file = resume['output_file']
+            journal_key = self.journal.start('hls', url, resume['output_dir'], job_key=resume['job_key'])
+        else:
+            next_number = self.get_next_file_number()
+            output_file = os.path.join(self.output_path, f"{next_number:03d}-stream.mp4")
+            journal_key = self.journal.start('hls', url, self.output_path,
+                                             file_prefix=f"{next_number:03d}", output_file=output_file)
+        segments_file = output_file + '.ts.part'
         
+        # Segment playlists rarely state sizes, the job only needs the reserve to be free
+        try:
+            space = self.disk_space.acquire(os.path.dirname(output_file), None, cancel_event)
+        except DiskSpaceError as e:
+            return self._finish_journal(journal_key, {'success': False, 'error': str(e)})
+        if space is None:
+            return self._finish_journal(journal_key, self._cancelled_result())
+        try:
+            return self._download_m3u8_segments(url, output_file, segments_file, journal_key,
+                                                progress_callback, cancel_event, resume, bandwidth_key)
+        finally:
+            self.disk_space.release(space)
+    
+    def _download_m3u8_segments(self, url: str, output_file: str, segments_file: str, journal_key: str,
+                                progress_callback: Optional[Callable] = None,
+                                cancel_event: Optional[threading.Event] = None,
+                                resume: Optional[Dict] = None, bandwidth_key=None) -> Dict:
+        """Fetch the segments and remux them into output_file"""
+        import requests
+        
+        def record_segment(segments_done, bytes_done, total):
+            self.journal.update_progress(journal_key, bytes_done=bytes_done,
+                                         segments_done=segments_done, total=total)
+        
+        meter = self.governor.meter(bandwidth_key or journal_key, url, cancel_event)
+        hls = HLSDownloader(meter=meter, host_scheduler=self.host_scheduler)
+        try:
+            hls.download(url, segments_file, progress_callback, cancel_event,
+                         start_segment=resume['segments_done'] if resume else 0,
+                         resume_bytes=resume['bytes_done'] if resume else 0,
+                         segment_callback=record_segment)
+        except HLSCancelled:
+            self._discard_file(segments_file)
+            return self._finish_journal(journal_key, self._cancelled_result())
+        except (HLSUnsupported, requests.RequestException) as e:
+            self._discard_file(segments_file)
+            print(f"Native HLS download not possible ({e}), falling back to ffmpeg")
+            return self._finish_journal(journal_key,
+                                        self._download_m3u8_ffmpeg(url, output_file, progress_callback))
+        except HLSError as e:
+            self._discard_file(segments_file)
+            return self._finish_journal(journal_key, {'success': False, 'error': f'HLS error: {e}'})
+        finally:
+            hls.close()
+            meter.close()
+        self.host_scheduler.report_success(host_key(url))
+        
+        try:
+            # Segments are already local, ffmpeg only rewrites the container
+            subprocess.run([
+                "ffmpeg", "-y",
+                "-i", segments_file,
+                "-c", "copy",
+                output_file
+            ], check=True, capture_output=True)
+        except subprocess.CalledProcessError as e:
+            return self._finish_journal(journal_key, {'success': False, 'error': f'FFmpeg error: {e}'})
+        
+        os.remove(segments_file)
+        if progress_callback:
+            progress_callback({'status': 'finished', 'filename': os.path.basename(output_file)})
+        
+        result = {'success': True, 'filename': output_file}
+        self._dedup_files([output_file], result)
+        return self._finish_journal(journal_key, result)
+    
+    def _finish_journal(self, journal_key: str, result: Dict) -> Dict:
+        """Record the final job status and pass the result through"""
+        if result.get('success'):
+            status = DONE
+        elif result.get('cancelled'):
+            status = CANCELLED
+        else:
+            status = FAILED
+        self.journal.finish(journal_key, status)
+        return result
+    
+    def _discard_file(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    
+    def _download_m3u8_ffmpeg(self, url: str, output_file: str,
+                              progress_callback: Optional[Callable] = None) -> Dict:
+        """Download m3u8 stream directly with ffmpeg"""
         try:
             if progress_callback:
                 progress_callback({'status': 'downloading', 'filename': os.path.basename(output_file)})
@@ -136,10 +496,92 @@ class VideoDownloader:
         except subprocess.CalledProcessError as e:
             return {'success': False, 'error': f'FFmpeg error: {e}'}
     
+    def _cancelled_result(self) -> Dict:
+        return {'success': False, 'error': 'Stahování bylo zrušeno', 'cancelled': True}
+    
+    def _archived_result(self) -> Dict:
+        return {'success': True, 'skipped': True, 'filename': 'Již staženo dříve (přeskočeno)'}
+    
+    def _url_archive_id(self, url: str):
+        try:
+            return url_archive_id(url)
+        except Exception:
+            # Unknown URL shapes are simply not pre-checked
+            return None
+    
+    def _archive_hook(self, captured: List[Dict], d: Dict):
+        """Remember which videos yt-dlp actually fetched, for the archive
+
+        A playlist or channel URL finishes one video after another, and a
+        merged download finishes each of its streams, so every id is kept once.
+        """
+        if d.get('status') == 'finished':
+            info = d.get('info_dict') or {}
+            if info.get('extractor_key') and info.get('id'):
+                self._capture_archive(captured, info)
+    
+    @staticmethod
+    def _capture_archive(captured: List[Dict], info: Dict):
+        video = {'extractor': info['extractor_key'], 'id': info['id'], 'title': info.get('title')}
+        if not any(seen['extractor'] == video['extractor'] and seen['id'] == video['id']
+                   for seen in captured):
+            captured.append(video)
+    
+    @staticmethod
+    def _archive_format(quality: str, format_choice: str) -> str:
+        """Output format a download is archived under, MP4 and MP3 of one video are separate"""
+        if format_choice.lower() == 'mp3' or quality == 'bestaudio':
+            return 'mp3'
+        return format_choice.lower()
+    
+    def _record_archive(self, url: str, captured: List[Dict], fmt: str):
+        if captured:
+            for video in captured:
+                self.archive.add(video['extractor'], video['id'], url, video.get('title'), fmt)
+            return
+        archive_id = self._url_archive_id(url)
+        if archive_id is not None:
+            self.archive.add(archive_id[0], archive_id[1], url, fmt=fmt)
+    
+    def _dedup_files(self, paths: List[str], result: Dict):
+        """Link finished files to identical earlier downloads, noting it in the result"""
+        if not self.use_dedup:
+            return
+        for path in paths:
+            try:
+                dedup = self.deduplicator.process_file(path)
+            except OSError as e:
+                print(f"Deduplication of {path} failed: {e}")
+                continue
+            if dedup['duplicate_of']:
+                result['duplicate_of'] = dedup['duplicate_of']
+                result['saved_bytes'] = result.get('saved_bytes', 0) + dedup['saved_bytes']
+    
     def _download_with_ytdlp(self, url: str, quality: str, format_choice: str = 'MP4', 
-                           progress_callback: Optional[Callable] = None) -> Dict:
+                           progress_callback: Optional[Callable] = None,
+                           cancel_event: Optional[threading.Event] = None,
+                           file_prefix: Optional[str] = None,
+                           resume: Optional[Dict] = None, bandwidth_key=None,
+                           defer_transcode: bool = False, connections: Optional[int] = None) -> Dict:
         """Download using yt-dlp with format selection"""
-        next_number = self.get_next_file_number()
+        if resume is None and self.use_archive:
+            # Decided from the URL alone, so archived videos cost no request at all
+            archive_id = self._url_archive_id(url)
+            if archive_id is not None and self.archive.contains(*archive_id,
+                                                                self._archive_format(quality, format_choice)):
+                return self._archived_result()
+        
+        output_dir = self.output_path
+        if resume is not None:
+            # Same directory and prefix give the same file name, so yt-dlp continues its .part file
+            output_dir = resume['output_dir']
+            file_prefix = resume['file_prefix']
+            journal_key = self.journal.start('ytdlp', url, output_dir, job_key=resume['job_key'])
+        else:
+            if file_prefix is None:
+                file_prefix = f"{self.get_next_file_number():03d}"
+            journal_key = self.journal.start('ytdlp', url, output_dir, file_prefix=file_prefix,
+                                             quality=quality, format_choice=format_choice)
         
         # Configure format based on quality selection
         if quality == 'bestaudio':
@@ -151,25 +593,68 @@ class VideoDownloader:
                 height = quality.replace("p", "")
                 format_selector = f'bestvideo[height<={height}]+bestaudio/best[height<={height}]'
         
-        # Configure output format based on user choice
+        # Configure output format based on user choice; MP3, AVI and WEBM are
+        # converted afterwards by the transcode scheduler
         format_lower = format_choice.lower()
         if format_lower == 'mp3' or quality == 'bestaudio':
-            merge_format = 'mp3'
+            target_format = 'mp3'
+            merge_format = None
             format_selector = 'bestaudio/best'
+            index_quality, container = 'bestaudio', None
         elif format_lower == 'webm':
-            merge_format = 'webm'
+            target_format = 'webm'
+            # VP9/Opus streams are merged straight into WEBM and need no conversion
+            preferred = format_selector.split('/')[0]
+            preferred = preferred.replace('bestvideo', 'bestvideo[ext=webm]', 1).replace('+bestaudio', '+bestaudio[ext=webm]', 1)
+            format_selector = f'{preferred}/{format_selector}'
+            merge_format = 'webm/mkv'
+            index_quality, container = quality, 'webm'
         elif format_lower == 'avi':
-            merge_format = 'avi'
+            target_format = 'avi'
+            merge_format = 'mkv'
+            index_quality, container = quality, None
         else:  # MP4 default
+            target_format = None
             merge_format = 'mp4'
+            index_quality, container = quality, 'mp4'
+        
+        connections = self.connections if connections is None else connections
+        stream_mp3 = target_format == 'mp3' and self.stream_audio and resume is None
+        ranged = connections > 1 and target_format != 'mp3' and resume is None
+        
+        # Videos with metadata get explicit format ids picked by expected size;
+        # the generic selector stays in the profile as the fallback
+        choice = self._format_choice(url, index_quality, container, output_dir,
+                                     progress_callback, cancel_event, fetch=stream_mp3 or ranged)
+        format_spec = f"{choice.spec}/{format_selector}" if choice is not None else None
+        estimate = choice.size if choice is not None else None
+        if estimate and needs_transcode(target_format):
+            # The download and its conversion exist side by side until the conversion ends
+            estimate *= 2
+        try:
+            space = self.disk_space.acquire(output_dir, estimate, cancel_event)
+        except DiskSpaceError as e:
+            return self._finish_journal(journal_key, {'success': False, 'error': str(e)})
+        if space is None:
+            return self._finish_journal(journal_key, self._cancelled_result())
         
-        output_template = f'{self.output_path}/{next_number:03d}-%(title)s.%(ext)s'
+        output_template = f'{output_dir}/{file_prefix}-%(title)s.%(ext)s'
         
+        # Sleeping in the meter's hook paces yt-dlp's transfer loop to the governor's limits
+        meter = self.governor.meter(bandwidth_key or journal_key, url, cancel_event)
+        archived_info = []
+        final_files = []
+        progress_hooks = [partial(self._journal_hook, journal_key), meter.progress_hook,
+                          partial(self._archive_hook, archived_info)]
+        if progress_callback or cancel_event:
+            progress_hooks.append(partial(self._progress_hook, progress_callback=progress_callback,
+                                          cancel_event=cancel_event))
+        
+        # Per-job output template and hooks are applied on lease, the rest
+        # of the options form the pooled instance's profile
         ydl_opts = {
             'format': format_selector,
             'merge_output_format': merge_format,
-            'outtmpl': output_template,
-            'progress_hooks': [self._progress_hook] if progress_callback else [],
             # Anti-403 measures
             'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'referer': 'https://www.youtube.com/',
@@ -187,114 +672,414 @@ class VideoDownloader:
             'ignoreerrors': False,
             # Additional options
             'no_warnings': False,
-            'extractaudio': format_lower == 'mp3',
-            'audioformat': 'mp3' if format_lower == 'mp3' else None
         }
+        if self.use_archive:
+            # Playlist and channel entries already archived in this format are
+            # skipped by yt-dlp; finished ones are recorded by _record_archive,
+            # after a conversion has succeeded
+            ydl_opts['download_archive'] = self.archive.for_ytdlp(
+                self._archive_format(quality, format_choice), record=False)
         
-        # Store callback for progress hook
-        if progress_callback:
-            self._progress_callback = progress_callback
-        
+        # Loaded before the try block, whose handlers name yt-dlp's exception classes
+        _load_yt_dlp()
+        transcode = None
+        result = None
         try:
-            with YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
+            if stream_mp3:
+                # Encoded while it downloads, so there is no second pass over a full-size file
+                result = self._stream_mp3(url, output_template, meter, progress_callback, cancel_event)
             
-            return {'success': True, 'filename': f'Downloaded successfully as {format_choice}'}
+            if result is None:
+                if ranged:
+                    # Hosts that throttle each connection are fetched over several at once
+                    ranged = self._download_ranged(url, index_quality, container, merge_format,
+                                                   output_template, connections, meter, journal_key,
+                                                   final_files, archived_info,
+                                                   progress_callback, cancel_event)
+                if not ranged:
+                    with self._ytdl_pool.lease(ydl_opts, outtmpl=output_template,
+                                               format_spec=format_spec,
+                                               progress_hooks=progress_hooks,
+                                               post_hooks=[final_files.append]) as ydl:
+                        self._retry_blocked(url, lambda: self._run_ytdlp_download(ydl, url),
+                                            progress_callback, cancel_event)
+                
+                if needs_transcode(target_format) and final_files:
+                    if self.check_ffmpeg():
+                        # Only the last file is converted, so only its video is archived
+                        transcode = self._schedule_transcode(final_files[-1], target_format, url,
+                                                             archived_info[-1:], journal_key,
+                                                             progress_callback, cancel_event)
+                    else:
+                        # Not archived, so the job can be retried once ffmpeg is installed
+                        result = {'success': False,
+                                  'error': f'ffmpeg není k dispozici, převod do {format_choice.upper()} nelze provést'}
+                else:
+                    result = {'success': True, 'filename': f'Downloaded successfully as {format_choice}'}
+                    self._record_archive(url, archived_info, self._archive_format(quality, format_choice))
+                    self._dedup_files(final_files, result)
             
+        except RangeDownloadCancelled:
+            result = self._cancelled_result()
+        except DownloadCancelled:
+            result = self._cancelled_result()
         except Exception as e:
-            error_msg = str(e).lower()
-            
-            # Provide specific error messages for common issues
-            if '403' in error_msg or 'forbidden' in error_msg:
-                return {
-                    'success': False, 
-                    'error': 'HTTP 403: Video je blokováno. Zkuste: 1) Jiné video 2) Nižší kvalitu 3) MP3 formát 4) Restartovat aplikaci'
-                }
-            elif '404' in error_msg or 'not found' in error_msg:
-                return {
-                    'success': False,
-                    'error': 'Video nebylo nalezeno. Zkontrolujte URL nebo zkuste později.'
-                }
-            elif 'private' in error_msg or 'unavailable' in error_msg:
-                return {
-                    'success': False,
-                    'error': 'Video je privátní nebo nedostupné. Zkuste veřejné video.'
-                }
-            elif 'age' in error_msg or 'restricted' in error_msg:
-                return {
-                    'success': False,
-                    'error': 'Video má věkové omezení. Zkuste jiné video.'
-                }
+            if cancel_event is not None and cancel_event.is_set():
+                result = self._cancelled_result()
             else:
-                return {'success': False, 'error': f'Chyba stahování: {str(e)}'}
+                result = self._ytdlp_error_result(e)
+        finally:
+            meter.close()
+            if transcode is None:
+                self.disk_space.release(space)
+        
+        if transcode is not None:
+            transcode.add_done_callback(lambda future: self.disk_space.release(space))
+            if defer_transcode:
+                # The caller's download slot is freed while the conversion waits for a CPU worker
+                return {'success': True, 'transcode': transcode}
+            return transcode.result()
+        return self._finish_journal(journal_key, result)
     
-    def _progress_hook(self, d):
-        """Progress hook for yt-dlp with extensive debugging"""
+    def _format_choice(self, url: str, quality: str, container: Optional[str], output_dir: str,
+                       progress_callback: Optional[Callable] = None,
+                       cancel_event: Optional[threading.Event] = None, fetch: bool = False):
+        """Cheapest stream set of a video with its reported size, None if not known
+
+        Metadata of videos that were not analyzed is fetched ahead when the
+        job needs it anyway (fetch, for the streamed MP3 and multi-connection
+        paths) or the volume is short of space; it is cached, so the download
+        reuses it. Other jobs keep the generic selector.
+        """
+        if self.metadata_cache.get(url) is None and not fetch and not self.disk_space.is_low(output_dir):
+            return None
         try:
-            status = d.get('status', 'unknown')
-            print(f"Progress hook called with status: {status}")
-            
-            if hasattr(self, '_progress_callback') and self._progress_callback:
-                if d['status'] == 'downloading':
-                    # Extract percentage from different possible fields
-                    percentage = '0%'
-                    if '_percent_str' in d and d['_percent_str']:
-                        percentage = d['_percent_str'].strip()
-                        print(f"Found _percent_str: {percentage}")
-                    elif 'downloaded_bytes' in d and 'total_bytes' in d and d['total_bytes']:
-                        pct = (d['downloaded_bytes'] / d['total_bytes']) * 100
-                        percentage = f"{pct:.1f}%"
-                        print(f"Calculated from bytes: {percentage}")
-                    elif 'downloaded_bytes' in d and 'total_bytes_estimate' in d and d['total_bytes_estimate']:
-                        pct = (d['downloaded_bytes'] / d['total_bytes_estimate']) * 100
-                        percentage = f"{pct:.1f}%"
-                        print(f"Calculated from estimate: {percentage}")
-                    
-                    # Extract speed
-                    speed = ''
-                    if '_speed_str' in d and d['_speed_str']:
-                        speed = d['_speed_str']
-                    elif 'speed' in d and d['speed']:
-                        speed = f"{d['speed']:.2f}B/s"
-                    
-                    # Safe filename handling with encoding
-                    filename = 'downloading...'
-                    try:
-                        if 'filename' in d:
-                            filename = os.path.basename(d['filename'])
-                            # Remove problematic characters
-                            filename = filename.encode('ascii', errors='ignore').decode('ascii')
-                    except (UnicodeEncodeError, UnicodeDecodeError):
-                        filename = 'video_file'
-                    
-                    progress_data = {
-                        'status': 'downloading',
-                        'percentage': percentage,
-                        'speed': speed if speed else 'Unknown',
-                        'filename': filename
-                    }
-                    
-                    print(f"Sending progress update: {percentage}")
-                    self._progress_callback(progress_data)
-                    
-                elif d['status'] == 'finished':
-                    print("Download finished, sending completion callback")
-                    
-                    # Safe filename handling
-                    filename = 'completed'
-                    try:
-                        if 'filename' in d:
-                            filename = os.path.basename(d['filename'])
-                            filename = filename.encode('ascii', errors='ignore').decode('ascii')
-                    except (UnicodeEncodeError, UnicodeDecodeError):
-                        filename = 'video_file'
-                    
-                    self._progress_callback({
-                        'status': 'finished',
-                        'filename': filename
-                    })
-            else:
-                print("No progress callback available")
-                
+            entry = self._fetch_metadata(url, progress_callback, cancel_event)
         except Exception as e:
-            print(f"Error in progress hook: {e}")
\ No newline at end of file
+            # Extraction errors are reported by the download itself
+            print(f"Size estimate not available ({e})")
+            return None
+        if entry is None or entry['info'].get('_type', 'video') != 'video':
+            return None
+        return FormatIndex.from_info(entry['info']).select(quality, container)
+    
+    def _download_ranged(self, url: str, quality: str, container: Optional[str],
+                         merge_format: Optional[str], output_template: str, connections: int,
+                         meter, journal_key: str, final_files: List[str], archived_info: List[Dict],
+                         progress_callback: Optional[Callable] = None,
+                         cancel_event: Optional[threading.Event] = None) -> bool:
+        """Fetch the selected streams over several connections each and merge them
+
+        Adds the final file to final_files. Returns False when the streams
+        are not plain HTTP files with range support (DASH/HLS fragments, no
+        ffmpeg for a merge, failed transfer); the caller then downloads them
+        with yt-dlp.
+        """
+        try:
+            entry = self._fetch_metadata(url, progress_callback, cancel_event)
+            if entry is None:
+                return False
+            info = entry['info']
+            with self._ytdl_pool.lease(INFO_OPTIONS, outtmpl=output_template) as ydl:
+                choice = FormatIndex.from_info(info).select(quality, container)
+                if choice is None:
+                    return False
+                formats = {str(fmt.get('format_id')): fmt for fmt in info.get('formats') or []}
+                streams = [formats[str(record.format_id)] for record in choice.streams]
+                if any(fmt.get('protocol') not in ('http', 'https') or not fmt.get('url') for fmt in streams):
+                    return False
+                if len(streams) > 1:
+                    if not self.check_ffmpeg():
+                        return False
+                    extension = (merge_format or 'mkv').split('/')[0]
+                    if not all(record.compatible(extension) for record in choice.streams):
+                        extension = 'mkv'
+                else:
+                    extension = streams[0].get('ext') or 'mp4'
+                output_file = ydl.prepare_filename(dict(info, ext=extension))
+        except Exception as e:
+            # Extraction errors are reported by the regular download path
+            print(f"Multi-connection download not possible ({e}), using one connection")
+            return False
+        
+        def report(event):
+            self._journal_hook(journal_key, event)
+            if progress_callback:
+                progress_callback(event)
+        
+        base = os.path.splitext(output_file)[0]
+        parts = [output_file] if len(streams) == 1 else \
+            [f"{base}.f{fmt['format_id']}.{fmt.get('ext')}" for fmt in streams]
+        downloader = RangeDownloader(connections, meter=meter)
+        try:
+            for fmt, part in zip(streams, parts):
+                downloader.download(fmt['url'], part, fmt.get('http_headers'), report, cancel_event)
+            if len(parts) > 1:
+                self._merge_streams(parts, output_file)
+        except RangeDownloadCancelled:
+            for part in parts:
+                self._discard_file(part)
+            raise
+        except RangeDownloadError as e:
+            for part in parts:
+                self._discard_file(part)
+            print(f"Multi-connection download failed ({e}), using one connection")
+            return False
+        finally:
+            downloader.close()
+        
+        if info.get('extractor_key') and info.get('id'):
+            self._capture_archive(archived_info, info)
+        final_files.append(output_file)
+        if progress_callback:
+            progress_callback({'status': 'finished', 'filename': os.path.basename(output_file),
+                               'fraction': 1.0})
+        return True
+    
+    def _merge_streams(self, parts: List[str], output_file: str):
+        """Copy the video of the first and the audio of the second file into output_file"""
+        base, extension = os.path.splitext(output_file)
+        temp_output = f"{base}.merging{extension}"
+        try:
+            subprocess.run(['ffmpeg', '-y', '-nostdin', '-loglevel', 'error',
+                            '-i', parts[0], '-i', parts[1],
+                            '-map', '0:v:0', '-map', '1:a:0', '-c', 'copy', temp_output],
+                           check=True, capture_output=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            self._discard_file(temp_output)
+            raise RangeDownloadError(f"FFmpeg error: {e}")
+        os.replace(temp_output, output_file)
+        for part in parts:
+            self._discard_file(part)
+    
+    def _stream_mp3(self, url: str, output_template: str, meter,
+                    progress_callback: Optional[Callable] = None,
+                    cancel_event: Optional[threading.Event] = None) -> Optional[Dict]:
+        """Download the best audio stream straight into the MP3 encoder
+
+        Returns None when the stream cannot be piped (fragmented or HLS
+        formats, no ffmpeg, failed transfer); the caller then downloads
+        the file and converts it afterwards.
+        """
+        if not self.check_ffmpeg():
+            return None
+        try:
+            entry = self._fetch_metadata(url, progress_callback, cancel_event)
+            if entry is None:
+                return None
+            info = entry['info']
+            with self._ytdl_pool.lease(INFO_OPTIONS, outtmpl=output_template) as ydl:
+                audio = pick_stream_format(info.get('formats') or [])
+                if audio is None:
+                    return None
+                output_file = target_path(ydl.prepare_filename(dict(info, ext=audio.get('ext'))), 'mp3')
+        except Exception as e:
+            # Extraction errors are reported by the regular download path
+            print(f"Streaming MP3 encode not possible ({e}), downloading first")
+            return None
+        
+        encoder = StreamingEncoder()
+        try:
+            encoder.encode(audio['url'], output_file, headers=audio.get('http_headers'),
+                           total=audio.get('filesize'),
+                           range_size=(audio.get('downloader_options') or {}).get('http_chunk_size'),
+                           meter=meter, progress_callback=progress_callback, cancel_event=cancel_event)
+        except StreamEncodeCancelled:
+            return self._cancelled_result()
+        except StreamEncodeError as e:
+            print(f"Streaming MP3 encode failed ({e}), downloading first")
+            return None
+        finally:
+            encoder.close()
+        
+        result = {'success': True, 'filename': output_file}
+        captured = []
+        if info.get('extractor_key') and info.get('id'):
+            self._capture_archive(captured, info)
+        self._record_archive(url, captured, 'mp3')
+        self._dedup_files([output_file], result)
+        if progress_callback:
+            progress_callback({'status': 'finished', 'filename': os.path.basename(output_file),
+                               'fraction': 1.0})
+        return result
+    
+    def _schedule_transcode(self, source: str, target_format: str, url: str, archived_info: List[Dict],
+                            journal_key: str, progress_callback: Optional[Callable] = None,
+                            cancel_event: Optional[threading.Event] = None) -> Future:
+        """Queue the conversion of a downloaded file; the future yields the job's final result"""
+        done = Future()
+        
+        def finish(future):
+            try:
+                path = future.result()
+                result = {'success': True, 'filename': path}
+                self._record_archive(url, archived_info, target_format)
+                self._dedup_files([path], result)
+                if progress_callback:
+                    progress_callback({'status': 'finished', 'filename': os.path.basename(path),
+                                       'fraction': 1.0})
+            except TranscodeCancelled:
+                result = self._cancelled_result()
+            except Exception as e:
+                if cancel_event is not None and cancel_event.is_set():
+                    result = self._cancelled_result()
+                else:
+                    result = {'success': False, 'error': f'Chyba převodu: {e}'}
+            done.set_result(self._finish_journal(journal_key, result))
+        
+        self.transcoder.submit(source, target_format, cancel_event, progress_callback).add_done_callback(finish)
+        return done
+    
+    def _retry_blocked(self, url: str, operation: Callable,
+                       progress_callback: Optional[Callable] = None,
+                       cancel_event: Optional[threading.Event] = None):
+        """Run operation, backing off and retrying while the domain answers 403/429"""
+        key = host_key(url)
+        for attempt in range(BLOCKED_RETRIES + 1):
+            try:
+                result = operation()
+            except Exception as e:
+                if attempt == BLOCKED_RETRIES or not is_blocked_error(e):
+                    raise
+                pause = self.host_scheduler.report_blocked(key)
+                if progress_callback:
+                    progress_callback({'status': 'backoff', 'host': key, 'retry_in': pause,
+                                       'attempt': attempt + 1})
+                if not self.host_scheduler.wait_ready(key, cancel_event):
+                    raise
+                continue
+            self.host_scheduler.report_success(key)
+            return result
+    
+    def _ytdlp_error_result(self, e: Exception) -> Dict:
+        """Map yt-dlp exceptions to user-facing error results"""
+        error_msg = str(e).lower()
+        
+        # Provide specific error messages for common issues
+        if '403' in error_msg or 'forbidden' in error_msg:
+            return {
+                'success': False, 
+                'error': 'HTTP 403: Video je blokováno. Zkuste: 1) Jiné video 2) Nižší kvalitu 3) MP3 formát 4) Restartovat aplikaci'
+            }
+        elif '404' in error_msg or 'not found' in error_msg:
+            return {
+                'success': False,
+                'error': 'Video nebylo nalezeno. Zkontrolujte URL nebo zkuste později.'
+            }
+        elif 'private' in error_msg or 'unavailable' in error_msg:
+            return {
+                'success': False,
+                'error': 'Video je privátní nebo nedostupné. Zkuste veřejné video.'
+            }
+        elif 'age' in error_msg or 'restricted' in error_msg:
+            return {
+                'success': False,
+                'error': 'Video má věkové omezení. Zkuste jiné video.'
+            }
+        else:
+            return {'success': False, 'error': f'Chyba stahování: {str(e)}'}
+    
+    def _run_ytdlp_download(self, ydl, url: str):
+        """Download from cached metadata when fresh, otherwise resolve the URL"""
+        cached = self.metadata_cache.get(url)
+        if cached is None or cached['info'].get('_type', 'video') != 'video':
+            # Sanitized playlist infos have lost their entries, they are resolved again
+            ydl.download([url])
+            return
+        
+        try:
+            ydl.process_ie_result(copy.deepcopy(cached['info']), download=True)
+        except DownloadError:
+            # Stream URLs in the cached info may have expired
+            self.metadata_cache.invalidate(url)
+            ydl.download([url])
+    
+    def _journal_hook(self, journal_key: str, d: Dict):
+        """Record yt-dlp transfer progress in the job journal"""
+        if d.get('status') == 'downloading':
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            self.journal.update_progress(journal_key, bytes_done=d.get('downloaded_bytes'),
+                                         total=int(total) if total else None,
+                                         output_file=d.get('filename'))
+    
+    def _progress_hook(self, d, progress_callback: Optional[Callable] = None,
+                       cancel_event: Optional[threading.Event] = None):
+        """Progress hook for yt-dlp, forwards numeric progress events"""
+        if cancel_event is not None and cancel_event.is_set():
+            # Raised outside the guarded block so yt-dlp aborts the transfer
+            _load_yt_dlp()
+            raise DownloadCancelled()
+        
+        if progress_callback is None:
+            progress_callback = getattr(self, '_progress_callback', None)
+        if not progress_callback:
+            return
+        
+        # Runs for every chunk, so only copy numbers here; formatting happens in subscribers
+        status = d.get('status')
+        filename = os.path.basename(d.get('filename') or '')
+        if status == 'downloading':
+            downloaded = d.get('downloaded_bytes') or 0
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            progress_callback({
+                'status': 'downloading',
+                'downloaded_bytes': downloaded,
+                'total_bytes': total,
+                'fraction': progress_fraction(downloaded, total),
+                'speed': d.get('speed'),
+                'eta': d.get('eta'),
+                'filename': filename,
+            })
+        elif status == 'finished':
+            progress_callback({
+                'status': 'finished',
+                'downloaded_bytes': d.get('downloaded_bytes') or d.get('total_bytes'),
+                'total_bytes': d.get('total_bytes'),
+                'fraction': 1.0,
+                'filename': filename,
+            })
+
+
+class _PlaylistProgress:
+    """Aggregates per-entry progress of a playlist download"""
+    
+    def __init__(self, total: int, callback: Optional[Callable] = None):
+        self.total = total
+        self.callback = callback
+        self.completed = 0
+        self.failed = 0
+        self._fractions = {}
+        self._lock = threading.Lock()
+    
+    def entry_progress(self, index: int, progress_info: Dict):
+        if progress_info.get('status') == 'downloading':
+            with self._lock:
+                self._fractions[index] = progress_info.get('fraction') or 0.0
+        self._emit(dict(progress_info, playlist_index=index))
+    
+    def entry_done(self, index: int, job):
+        with self._lock:
+            self._fractions.pop(index, None)
+            if job.result and job.result.get('success'):
+                self.completed += 1
+            else:
+                self.failed += 1
+        self._emit({'status': 'playlist_entry_done', 'state': job.state, 'url': job.url,
+                    'playlist_index': index})
+    
+    def _emit(self, event: Dict):
+        if not self.callback:
+            return
+        with self._lock:
+            finished = self.completed + self.failed
+            in_flight = sum(self._fractions.values())
+            # Finished entries count fully, in-flight ones by their own progress
+            overall = min((finished + in_flight) / self.total, 1.0) if self.total else 1.0
+            event.update({
+                'playlist_total': self.total,
+                'playlist_completed': self.completed,
+                'playlist_failed': self.failed,
+                'playlist_fraction': overall,
+            })
+            # Called under the lock so aggregate updates arrive in order
+            self.callback(event)
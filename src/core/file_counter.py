@@ -0,0 +1,125 @@
+"""
+Sequential File Numbering
+Persisted counter index so the next "NNN-" prefix is handed out without
+listing the output directory on every download
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+COUNTER_FILE = ".ytdl_counter.json"
+LOCK_FILE = ".ytdl_counter.lock"
+NUMBERED_EXTENSIONS = ('.mp4', '.mp3', '.webm', '.avi', '.mkv')
+
+_thread_locks: Dict[str, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def _thread_lock(directory: str) -> threading.Lock:
+    """In-process lock shared by every counter of one directory"""
+    key = os.path.normcase(os.path.realpath(directory))
+    with _registry_lock:
+        lock = _thread_locks.get(key)
+        if lock is None:
+            lock = _thread_locks[key] = threading.Lock()
+        return lock
+
+
+def scan_highest_number(directory: str, extensions: Tuple[str, ...] = NUMBERED_EXTENSIONS) -> int:
+    """Highest "NNN-" prefix among media files in a directory (0 if none)"""
+    highest = 0
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            name = entry.name
+            if not name.endswith(extensions):
+                continue
+            try:
+                number = int(name.split('-')[0])
+            except (ValueError, IndexError):
+                continue
+            if number > highest:
+                highest = number
+    return highest
+
+
+class FileCounter:
+    """Hands out unique sequential file numbers for one output directory"""
+
+    def __init__(self, directory: str, extensions: Tuple[str, ...] = NUMBERED_EXTENSIONS):
+        self.directory = directory
+        self.extensions = extensions
+        self.index_path = os.path.join(directory, COUNTER_FILE)
+        self.lock_path = os.path.join(directory, LOCK_FILE)
+
+    def next_number(self) -> int:
+        """Reserve and return the next free number"""
+        with self._locked():
+            number = self._read_index()
+            if number is None:
+                number = scan_highest_number(self.directory, self.extensions) + 1
+            self._write_index(number + 1)
+            return number
+
+    def peek(self) -> int:
+        """Next number without reserving it"""
+        with self._locked():
+            number = self._read_index()
+            if number is None:
+                number = scan_highest_number(self.directory, self.extensions) + 1
+            return number
+
+    def rebuild(self) -> int:
+        """Rebuild the index from a directory scan, returns the next number"""
+        with self._locked():
+            number = scan_highest_number(self.directory, self.extensions) + 1
+            self._write_index(number)
+            return number
+
+    def _read_index(self):
+        """Stored next number, or None when the index is missing or corrupt"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                number = json.load(f)['next']
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if not isinstance(number, int) or number < 1:
+            return None
+        return number
+
+    def _write_index(self, number: int):
+        # Write to a temp file and swap it in so readers never see a partial index
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'next': number}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.index_path)
+
+    @contextmanager
+    def _locked(self):
+        """Hold the in-process lock and an OS file lock across processes"""
+        os.makedirs(self.directory, exist_ok=True)
+        with _thread_lock(self.directory):
+            with open(self.lock_path, 'a+b') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                    else:
+                        lock_file.seek(0)
+                        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,236 @@
+"""
+Format Index
+Compact records of a video's formats and a selector that picks the stream
+set with the fewest expected bytes meeting the requested quality
+"""
+from functools import lru_cache
+from typing import Optional, Dict, List, Iterable
+
+
+# Bytes a codec needs for comparable quality, relative to H.264 / AAC
+VIDEO_CODEC_EFFICIENCY = {
+    'av01': 0.55, 'hev1': 0.6, 'hvc1': 0.6, 'h265': 0.6, 'vp09': 0.65, 'vp9': 0.65,
+    'avc1': 1.0, 'avc3': 1.0, 'h264': 1.0, 'vp8': 1.1, 'mp4v': 1.4,
+}
+AUDIO_CODEC_EFFICIENCY = {
+    'opus': 0.6, 'vorbis': 0.8, 'mp4a': 1.0, 'aac': 1.0, 'ec-3': 1.0, 'mp3': 1.2, 'ac-3': 1.3,
+}
+# Codecs each merge container takes without re-encoding
+CONTAINER_CODECS = {
+    'mp4': {'av01', 'hev1', 'hvc1', 'h265', 'vp09', 'vp9', 'avc1', 'avc3', 'h264', 'mp4v',
+            'mp4a', 'aac', 'opus', 'mp3', 'ac-3', 'ec-3'},
+    'webm': {'av01', 'vp09', 'vp9', 'vp8', 'opus', 'vorbis'},
+}
+# Cost multiplier for streams the target container cannot hold as they are
+INCOMPATIBLE_PENALTY = 2.0
+# Typical H.264 bitrate (kbit/s) by height, for formats reported without size or bitrate
+REFERENCE_KBPS = ((2160, 18000), (1440, 9000), (1080, 4500), (720, 2500),
+                  (480, 1000), (360, 600), (240, 300), (0, 150))
+REFERENCE_AUDIO_KBPS = 128
+HIGH_FPS_FACTOR = 1.5
+DEFAULT_DURATION = 300  # seconds assumed when yt-dlp reports no duration
+# Audio within this share of the best available quality counts as meeting it
+AUDIO_QUALITY_TOLERANCE = 0.9
+
+
+@lru_cache(maxsize=512)
+def codec_family(codec: Optional[str]) -> Optional[str]:
+    """'avc1.640028' -> 'avc1'; None stays None (unknown), 'none' means no stream"""
+    if not codec:
+        return None
+    return codec.split('.', 1)[0].lower()
+
+
+def _reference_kbps(height: int) -> int:
+    for min_height, kbps in REFERENCE_KBPS:
+        if height >= min_height:
+            return kbps
+    return REFERENCE_KBPS[-1][1]
+
+
+def _video_bytes(fmt: Dict, height: int, family: Optional[str], high_fps: bool, duration: float) -> float:
+    """Reported size, else bitrate x duration, else the codec-scaled reference for the height"""
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if size:
+        return size
+    bitrate = fmt.get('tbr') or fmt.get('vbr')
+    if not bitrate:
+        bitrate = _reference_kbps(height) * VIDEO_CODEC_EFFICIENCY.get(family, 1.0)
+        if high_fps:
+            bitrate *= HIGH_FPS_FACTOR
+    return bitrate * 125 * duration
+
+
+def _audio_figures(fmt: Dict, family: Optional[str], duration: float) -> tuple:
+    """Quality as the AAC bitrate it matches and expected bytes of an audio stream"""
+    efficiency = AUDIO_CODEC_EFFICIENCY.get(family, 1.0)
+    bitrate = fmt.get('abr') or fmt.get('tbr')
+    # Bitrate as AAC would need it, so Opus at 128k outranks AAC at 128k
+    quality = (bitrate or REFERENCE_AUDIO_KBPS * efficiency) / efficiency
+    size = (fmt.get('filesize') or fmt.get('filesize_approx')
+            or (bitrate or REFERENCE_AUDIO_KBPS * efficiency) * 125 * duration)
+    return quality, size
+
+
+class FormatRecord:
+    """One yt-dlp format, reduced to what selection needs"""
+
+    __slots__ = ('format_id', 'ext', 'height', 'high_fps', 'vcodec', 'acodec', 'is_muxed',
+                 'quality', 'size', 'exact_size')
+
+    def __init__(self, fmt: Dict, duration: float):
+        get = fmt.get
+        self.format_id = get('format_id')
+        self.ext = get('ext')
+        self.height = get('height') or 0
+        self.high_fps = (get('fps') or 0) > 30
+        self.vcodec = codec_family(get('vcodec'))
+        self.acodec = codec_family(get('acodec'))
+        # Carries audio as well; an unknown audio codec counts as video only
+        self.is_muxed = self.acodec is not None and self.acodec != 'none' and self.vcodec != 'none'
+        self.exact_size = bool(get('filesize') or get('filesize_approx'))
+        if self.vcodec == 'none':
+            self.quality, self.size = _audio_figures(fmt, self.acodec, duration)
+        else:
+            self.quality = self.height
+            self.size = _video_bytes(fmt, self.height, self.vcodec, self.high_fps, duration)
+
+    def compatible(self, container: Optional[str]) -> bool:
+        if container is None:
+            return True
+        codecs = CONTAINER_CODECS.get(container)
+        if codecs is None:
+            return True
+        return all(codec is None or codec == 'none' or codec in codecs
+                   for codec in (self.vcodec, self.acodec))
+
+    def cost(self, container: Optional[str] = None) -> float:
+        if container is None or self.compatible(container):
+            return self.size
+        return self.size * INCOMPATIBLE_PENALTY
+
+
+class FormatChoice:
+    """Streams picked for one quality"""
+
+    __slots__ = ('video', 'audio', 'cost', 'streams', 'spec', 'size')
+
+    def __init__(self, video: Optional[FormatRecord], audio: Optional[FormatRecord], cost: float):
+        self.video = video
+        self.audio = audio
+        self.cost = cost
+        self.streams = streams = [record for record in (video, audio) if record is not None]
+        # yt-dlp format spec, e.g. '399+251'
+        self.spec = '+'.join(str(record.format_id) for record in streams)
+        # Expected bytes, None unless every stream reports its size
+        self.size = (int(sum(record.size for record in streams))
+                     if all(record.exact_size for record in streams) else None)
+
+
+class FormatIndex:
+    """Video and audio formats of one video, scored by expected bytes
+
+    Formats at the same height count as the same quality (60 fps is kept
+    where available), so a VP9 or AV1 stream wins over a larger AVC one.
+    Codec efficiency estimates sizes yt-dlp does not report. Video and
+    audio are scored as pairs: a pair the target container cannot hold
+    needs a re-encode of both streams and pays the penalty as a whole.
+
+    Only the cheapest format of each height, codec and frame rate bucket
+    and the cheapest audio per codec above the quality floor can win, so
+    only those become records and are paired.
+    """
+
+    def __init__(self, formats: Iterable[Dict], duration: Optional[float] = None):
+        duration = duration or DEFAULT_DURATION
+        buckets = {}
+        audio_formats = []
+        for fmt in formats:
+            get = fmt.get
+            vcodec = get('vcodec')
+            if vcodec != 'none':
+                height = get('height')
+                if not height:
+                    continue
+                high_fps = (get('fps') or 0) > 30
+                key = (height, vcodec, high_fps, get('acodec'))
+                size = (get('filesize') or get('filesize_approx')
+                        or (get('tbr') or get('vbr') or 0) * 125 * duration
+                        or _video_bytes(fmt, height, codec_family(vcodec), high_fps, duration))
+                current = buckets.get(key)
+                if current is None or size < current[0]:
+                    buckets[key] = (size, fmt)
+            elif get('acodec') != 'none':
+                audio_formats.append(fmt)
+        self.videos = [FormatRecord(fmt, duration) for _, fmt in buckets.values()]
+        self.audios = self._audio_candidates(audio_formats, duration)
+
+    @staticmethod
+    def _audio_candidates(audio_formats: List[Dict], duration: float) -> List[FormatRecord]:
+        """Cheapest audio stream per codec among those close to the best available quality"""
+        figures = []
+        for fmt in audio_formats:
+            family = codec_family(fmt.get('acodec'))
+            figures.append((_audio_figures(fmt, family, duration), family, fmt))
+        if not figures:
+            return []
+        target = max(quality for (quality, _), _, _ in figures) * AUDIO_QUALITY_TOLERANCE
+        cheapest = {}
+        for (quality, size), family, fmt in figures:
+            if quality >= target and (family not in cheapest or size < cheapest[family][0]):
+                cheapest[family] = (size, fmt)
+        return [FormatRecord(fmt, duration) for _, fmt in cheapest.values()]
+
+    @classmethod
+    def from_info(cls, info: Dict) -> 'FormatIndex':
+        return cls(info.get('formats') or [], info.get('duration'))
+
+    def heights(self) -> List[int]:
+        return sorted({record.height for record in self.videos}, reverse=True)
+
+    def best_audio(self, container: Optional[str] = None) -> Optional[FormatRecord]:
+        """Smallest audio stream close to the best available quality"""
+        if not self.audios:
+            return None
+        return min(self.audios, key=lambda record: record.cost(container))
+
+    def select(self, quality: str = 'best', container: Optional[str] = None) -> Optional[FormatChoice]:
+        """Cheapest stream set for a quality ('720p', 'best' or 'bestaudio')"""
+        if quality == 'bestaudio' or not self.videos:
+            audio = self.best_audio(container)
+            if audio is None:
+                return None
+            return FormatChoice(None, audio, audio.cost(container))
+
+        heights = self.heights()
+        height = heights[0]
+        if quality != 'best':
+            try:
+                requested = int(quality.rstrip('p'))
+            except ValueError:
+                return None
+            # The best height not above the request, or the smallest there is
+            height = next((h for h in heights if h <= requested), heights[-1])
+        return self._best_set([video for video in self.videos if video.height == height], container)
+
+    def _best_set(self, videos: List[FormatRecord], container: Optional[str]) -> FormatChoice:
+        """Cheapest video, or video and audio pair, among formats of one height"""
+        best = None
+        for video in videos:
+            partners = (None,) if video.is_muxed or not self.audios else self.audios
+            for audio in partners:
+                key = self._rank(video, audio, container)
+                if best is None or key < best[0]:
+                    best = (key, video, audio)
+        key, video, audio = best
+        return FormatChoice(video, audio, key[1])
+
+    @staticmethod
+    def _rank(video: FormatRecord, audio: Optional[FormatRecord], container: Optional[str]) -> tuple:
+        """Lower is better: high frame rate first, then expected cost, then fewer streams"""
+        if audio is None:
+            return (not video.high_fps, video.cost(container), 1)
+        size = video.size + audio.size
+        if not (video.compatible(container) and audio.compatible(container)):
+            size *= INCOMPATIBLE_PENALTY
+        return (not video.high_fps, size, 2)
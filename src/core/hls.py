@@ -0,0 +1,321 @@
+"""
+Native HLS Engine
+Parses m3u8 playlists and fetches media segments concurrently over pooled
+keep-alive connections, writing them to disk in playlist order
+"""
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Callable, Dict, List
+from urllib.parse import urljoin
+
+from .host_scheduler import host_key
+from .disk_space import preallocate
+
+
+DEFAULT_SEGMENT_WORKERS = 8
+SEGMENT_RETRIES = 3
+REQUEST_TIMEOUT = 30
+THROTTLED_CHUNK_SIZE = 64 * 1024
+BLOCKED_STATUSES = (403, 429)
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+
+ATTRIBUTE_RE = re.compile(r'([A-Za-z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+class HLSError(Exception):
+    """Raised when a stream cannot be fetched"""
+
+
+class HLSUnsupported(HLSError):
+    """Raised for streams the native engine does not handle (caller should fall back)"""
+
+
+class HLSCancelled(HLSError):
+    """Raised when the download was cancelled"""
+
+
+def _parse_attributes(value: str) -> Dict[str, str]:
+    """Parse an attribute list like BANDWIDTH=1280000,RESOLUTION="1280x720" """
+    return {key.upper(): val.strip('"') for key, val in ATTRIBUTE_RE.findall(value)}
+
+
+def _parse_byterange(value: str, next_offset: int) -> tuple:
+    """'length[@offset]' -> inclusive (start, end)"""
+    length, _, offset = value.partition('@')
+    start = int(offset) if offset else next_offset
+    return start, start + int(length) - 1
+
+
+def parse_playlist(text: str, base_url: str) -> Dict:
+    """Parse a master or media playlist into a plain dictionary"""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    if not lines or not lines[0].startswith('#EXTM3U'):
+        raise HLSError("Neplatný m3u8 playlist")
+
+    variants = []
+    segments = []
+    playlist = {'type': 'media', 'variants': variants, 'segments': segments,
+                'endlist': False, 'encrypted': False, 'init_segment': None,
+                'alternate_audio': False}
+
+    pending_variant = None
+    duration = None
+    byterange = None
+    next_offset = 0
+
+    for line in lines[1:]:
+        if line.startswith('#EXT-X-STREAM-INF:'):
+            attributes = _parse_attributes(line.split(':', 1)[1])
+            pending_variant = {
+                'bandwidth': int(attributes.get('BANDWIDTH', 0) or 0),
+                'resolution': attributes.get('RESOLUTION'),
+            }
+        elif line.startswith('#EXTINF:'):
+            try:
+                duration = float(line.split(':', 1)[1].split(',')[0])
+            except ValueError:
+                duration = 0.0
+        elif line.startswith('#EXT-X-BYTERANGE:'):
+            byterange = _parse_byterange(line.split(':', 1)[1], next_offset)
+            next_offset = byterange[1] + 1
+        elif line.startswith('#EXT-X-KEY:'):
+            method = _parse_attributes(line.split(':', 1)[1]).get('METHOD', 'NONE')
+            if method.upper() != 'NONE':
+                playlist['encrypted'] = True
+        elif line.startswith('#EXT-X-MEDIA:'):
+            attributes = _parse_attributes(line.split(':', 1)[1])
+            if attributes.get('TYPE', '').upper() == 'AUDIO' and attributes.get('URI'):
+                playlist['alternate_audio'] = True
+        elif line.startswith('#EXT-X-MAP:'):
+            attributes = _parse_attributes(line.split(':', 1)[1])
+            # The init section may be a sub-range of a file shared with the media segments
+            playlist['init_segment'] = {
+                'url': urljoin(base_url, attributes.get('URI', '')),
+                'byterange': (_parse_byterange(attributes['BYTERANGE'], 0)
+                              if attributes.get('BYTERANGE') else None),
+            }
+        elif line.startswith('#EXT-X-ENDLIST'):
+            playlist['endlist'] = True
+        elif line.startswith('#'):
+            continue
+        elif pending_variant is not None:
+            pending_variant['url'] = urljoin(base_url, line)
+            variants.append(pending_variant)
+            pending_variant = None
+        else:
+            segments.append({'url': urljoin(base_url, line), 'duration': duration or 0.0,
+                             'byterange': byterange})
+            duration = None
+            byterange = None
+
+    if variants:
+        playlist['type'] = 'master'
+    return playlist
+
+
+def playlist_size(playlist: Dict, start_segment: int = 0) -> Optional[int]:
+    """Bytes of the segments from start_segment on when all have byte ranges, else None"""
+    segments = playlist['segments'][start_segment:]
+    if not segments:
+        return None
+    if playlist['init_segment'] and start_segment == 0:
+        segments = [playlist['init_segment']] + segments
+    if any(segment['byterange'] is None for segment in segments):
+        return None
+    return sum(end - start + 1 for start, end in (segment['byterange'] for segment in segments))
+
+
+def _retry_after(response) -> Optional[float]:
+    """Retry-After header in seconds (HTTP dates are ignored)"""
+    try:
+        return float(response.headers.get('Retry-After', ''))
+    except ValueError:
+        return None
+
+
+class HLSDownloader:
+    """Fetches HLS media segments in parallel and writes them in order"""
+
+    def __init__(self, max_workers: int = DEFAULT_SEGMENT_WORKERS,
+                 session: Optional['requests.Session'] = None,
+                 user_agent: str = USER_AGENT,
+                 meter: Optional['BandwidthMeter'] = None,
+                 host_scheduler: Optional['HostScheduler'] = None):
+        self.max_workers = max(1, max_workers)
+        # Charged per chunk when set, so segment fetches obey the bandwidth governor
+        self.meter = meter
+        # Backs off from hosts answering 403/429 instead of hammering them with retries
+        self.host_scheduler = host_scheduler
+        self.session = session or self._create_session()
+        self.session.headers.setdefault('User-Agent', user_agent)
+
+    def _create_session(self) -> 'requests.Session':
+        # requests is imported on first use to keep application startup fast
+        import requests
+        from requests.adapters import HTTPAdapter
+        
+        session = requests.Session()
+        # One keep-alive connection per worker
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def close(self):
+        self.session.close()
+
+    def resolve_media_playlist(self, url: str) -> Dict:
+        """Fetch the playlist, following a master playlist to its best variant"""
+        playlist = parse_playlist(self._get(url).text, url)
+        if playlist['type'] == 'master':
+            if playlist['alternate_audio']:
+                # Separate audio renditions need muxing of two streams
+                raise HLSUnsupported("Stream s oddělenou zvukovou stopou")
+            best = max(playlist['variants'], key=lambda v: v['bandwidth'])
+            playlist = parse_playlist(self._get(best['url']).text, best['url'])
+
+        if playlist['encrypted']:
+            raise HLSUnsupported("Šifrovaný stream")
+        if not playlist['endlist']:
+            raise HLSUnsupported("Živý stream")
+        if not playlist['segments']:
+            raise HLSError("Playlist neobsahuje žádné segmenty")
+        return playlist
+
+    def download(self, url: str, output_path: str,
+                 progress_callback: Optional[Callable] = None,
+                 cancel_event: Optional[threading.Event] = None,
+                 start_segment: int = 0, resume_bytes: int = 0,
+                 segment_callback: Optional[Callable] = None) -> Dict:
+        """Download all segments of the stream into output_path
+
+        With start_segment > 0 the file is truncated to resume_bytes (the size
+        after the last recorded segment) and the remaining segments are appended.
+        segment_callback(segments_done, bytes_written, total) runs after each
+        segment is flushed to disk.
+        """
+        playlist = self.resolve_media_playlist(url)
+        segments = playlist['segments']
+        total = len(segments)
+        filename = os.path.basename(output_path)
+        started = time.monotonic()
+
+        if start_segment > 0 and (start_segment > total or not os.path.exists(output_path)
+                                  or os.path.getsize(output_path) < resume_bytes):
+            # Recorded progress does not match the file on disk, start over
+            start_segment = 0
+        if start_segment == 0:
+            resume_bytes = 0
+
+        with open(output_path, 'r+b' if start_segment else 'wb') as output, \
+                ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='hls-segment') as pool:
+            output.truncate(resume_bytes)
+            expected = playlist_size(playlist, start_segment)
+            if expected:
+                # Allocated in one piece instead of growing segment by segment
+                preallocate(output, expected, resume_bytes)
+            output.seek(resume_bytes)
+            written = resume_bytes
+            fetched = 0
+
+            if playlist['init_segment'] and start_segment == 0:
+                written += output.write(self._fetch_segment(playlist['init_segment'], cancel_event))
+
+            # Bounded window keeps at most a few segments buffered in memory
+            window = deque()
+            next_index = start_segment
+            for index in range(start_segment, total):
+                while next_index < total and len(window) < self.max_workers * 2:
+                    window.append(pool.submit(self._fetch_segment, segments[next_index], cancel_event))
+                    next_index += 1
+
+                future = window.popleft()
+                try:
+                    data = future.result()
+                except Exception:
+                    for pending in window:
+                        pending.cancel()
+                    raise
+
+                written += output.write(data)
+                fetched += len(data)
+                if segment_callback:
+                    output.flush()
+                    segment_callback(index + 1, written, total)
+                if progress_callback:
+                    elapsed = max(time.monotonic() - started, 1e-6)
+                    speed = fetched / elapsed
+                    remaining = total - index - 1
+                    progress_callback({
+                        'status': 'downloading',
+                        'downloaded_bytes': written,
+                        # Segments are similar in size, extrapolate from the ones so far
+                        'total_bytes': int(written / (index + 1) * total),
+                        'fraction': (index + 1) / total,
+                        'speed': speed,
+                        'eta': remaining * (fetched / (index + 1 - start_segment)) / speed if speed else None,
+                        'filename': filename,
+                        'segments_done': index + 1,
+                        'segments_total': total,
+                    })
+            # Drops whatever the preallocation reserved beyond the real size
+            output.truncate(written)
+
+        return {'segments': total, 'bytes': written, 'resumed_from': start_segment}
+
+    def _fetch_segment(self, segment: Dict, cancel_event: Optional[threading.Event] = None) -> bytes:
+        import requests
+        
+        headers = {}
+        if segment.get('byterange'):
+            headers['Range'] = 'bytes=%d-%d' % segment['byterange']
+
+        last_error = None
+        for attempt in range(SEGMENT_RETRIES):
+            if cancel_event is not None and cancel_event.is_set():
+                raise HLSCancelled("Stahování bylo zrušeno")
+            try:
+                if self.meter is None:
+                    response = self._get(segment['url'], headers)
+                    self._check_partial(response, headers)
+                    return response.content
+                return self._read_throttled(segment['url'], headers, cancel_event)
+            except requests.RequestException as e:
+                last_error = e
+                status = e.response.status_code if e.response is not None else None
+                if status in BLOCKED_STATUSES and self.host_scheduler is not None:
+                    key = host_key(segment['url'])
+                    self.host_scheduler.report_blocked(key, _retry_after(e.response))
+                    if not self.host_scheduler.wait_ready(key, cancel_event):
+                        raise HLSCancelled("Stahování bylo zrušeno")
+                    continue
+                time.sleep(0.5 * (attempt + 1))
+        raise HLSError(f"Segment se nepodařilo stáhnout: {last_error}")
+
+    def _read_throttled(self, url: str, headers: Dict,
+                        cancel_event: Optional[threading.Event] = None) -> bytes:
+        chunks = []
+        with self.session.get(url, headers=headers, timeout=REQUEST_TIMEOUT, stream=True) as response:
+            response.raise_for_status()
+            self._check_partial(response, headers)
+            for chunk in response.iter_content(THROTTLED_CHUNK_SIZE):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise HLSCancelled("Stahování bylo zrušeno")
+                chunks.append(chunk)
+                self.meter.consume(len(chunk), url)
+        return b''.join(chunks)
+
+    @staticmethod
+    def _check_partial(response: 'requests.Response', headers: Dict):
+        """A server ignoring Range sends the whole file, which must not be written as the segment"""
+        if 'Range' in headers and response.status_code == 200:
+            raise HLSUnsupported("Server nepodporuje rozsahy bajtů")
+
+    def _get(self, url: str, headers: Optional[Dict] = None) -> 'requests.Response':
+        response = self.session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response
@@ -0,0 +1,204 @@
+"""
+Per-Host Politeness Scheduler
+Limits concurrent jobs per domain, spaces out their starts and backs off
+from domains that answered 403 or 429
+"""
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict
+from urllib.parse import urlparse
+
+
+DEFAULT_HOST_CONCURRENCY = None  # no cap of its own, a domain may use every queue worker
+DEFAULT_MIN_INTERVAL = 0.5     # seconds between job starts on one domain
+BACKOFF_BASE = 5.0             # first pause after a block, doubled for each further block
+BACKOFF_MAX = 120.0
+BLOCKED_RETRIES = 2            # retries of a blocked download before the error is shown
+
+BLOCKED_RE = re.compile(r'\b(403|429)\b|forbidden|too many requests', re.IGNORECASE)
+
+
+def host_key(url: Optional[str]) -> str:
+    """Domain a URL is scheduled under, subdomains share it (www.youtube.com -> youtube.com)"""
+    try:
+        host = urlparse(url or '').hostname or ''
+    except ValueError:
+        host = ''
+    return domain_key(host)
+
+
+def domain_key(host: str) -> str:
+    """Domain of a host name (rr1---sn-abc.googlevideo.com -> googlevideo.com)"""
+    host = host.lower().rstrip('.')
+    labels = host.split('.')
+    if len(labels) <= 2 or host.replace('.', '').isdigit():
+        return host
+    # Keep one more label for second-level registries such as co.uk or com.au
+    keep = 3 if len(labels[-2]) <= 3 and len(labels[-1]) == 2 else 2
+    return '.'.join(labels[-keep:])
+
+
+def is_blocked_error(error) -> bool:
+    """Whether an error message looks like a 403/429 block"""
+    return bool(BLOCKED_RE.search(str(error)))
+
+
+class _HostState:
+    __slots__ = ('active', 'next_start', 'strikes')
+
+    def __init__(self):
+        self.active = 0
+        self.next_start = 0.0
+        self.strikes = 0
+
+
+class HostScheduler:
+    """Concurrency slots, start spacing and backoff per domain
+
+    Slots are taken without blocking with try_acquire() (the download queue
+    skips to jobs for other domains) or by waiting in slot(). Shared by
+    every queue of a downloader. With max_per_host None (or 0) the number
+    of concurrent jobs on a domain is bounded by the queue's workers only.
+    Slots are held per thread: slot() in a thread that already holds one of
+    the domain (a queue job extracting its metadata) does not take another.
+    """
+
+    def __init__(self, max_per_host: Optional[int] = DEFAULT_HOST_CONCURRENCY,
+                 min_interval: float = DEFAULT_MIN_INTERVAL):
+        self._condition = threading.Condition()
+        self._hosts: Dict[str, _HostState] = {}
+        self._held = threading.local()
+        self.max_per_host = None
+        self.configure(max_per_host, min_interval)
+
+    def configure(self, max_per_host: Optional[int] = None, min_interval: Optional[float] = None):
+        """Change the limits, None leaves a setting as it is and a cap of 0 removes it"""
+        with self._condition:
+            if max_per_host is not None:
+                self.max_per_host = int(max_per_host) if int(max_per_host) > 0 else None
+            if min_interval is not None:
+                self.min_interval = max(0.0, float(min_interval))
+            self._condition.notify_all()
+
+    def try_acquire(self, key: str) -> bool:
+        """Take a slot of the domain if one is free and it may start now"""
+        with self._condition:
+            return self._try_acquire(key, time.monotonic())
+
+    def ready_in(self, key: str) -> Optional[float]:
+        """Seconds until the domain may start again, None when only a free slot is missing"""
+        with self._condition:
+            state = self._hosts.get(key)
+            if state is None:
+                return 0.0
+            wait = max(0.0, state.next_start - time.monotonic())
+            if wait == 0.0 and self._is_full(state):
+                return None
+            return wait
+
+    def acquire(self, key: str, cancel_event: Optional[threading.Event] = None) -> bool:
+        """Wait for a slot of the domain; False when cancelled first"""
+        with self._condition:
+            while not self._try_acquire(key, time.monotonic()):
+                if cancel_event is not None and cancel_event.is_set():
+                    return False
+                state = self._hosts[key]
+                wait = state.next_start - time.monotonic()
+                # Short timeout keeps cancellation responsive while waiting for a slot
+                self._condition.wait(min(wait, 0.5) if wait > 0 else 0.5)
+        return True
+
+    def release(self, key: str):
+        held = self._held_keys()
+        if held.get(key):
+            held[key] -= 1
+        with self._condition:
+            state = self._hosts.get(key)
+            if state is not None and state.active > 0:
+                state.active -= 1
+            self._condition.notify_all()
+
+    def holds(self, key: str) -> bool:
+        """Whether the calling thread holds a slot of the domain"""
+        return self._held_keys().get(key, 0) > 0
+
+    @contextmanager
+    def slot(self, url: str, cancel_event: Optional[threading.Event] = None):
+        """Hold a slot of the URL's domain for the duration of the block"""
+        key = host_key(url)
+        if self.holds(key):
+            yield True
+            return
+        if not self.acquire(key, cancel_event):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            self.release(key)
+
+    def report_blocked(self, key: str, retry_after: Optional[float] = None) -> float:
+        """Pause new starts on a domain after a 403/429; returns the pause in seconds"""
+        with self._condition:
+            state = self._state(key)
+            state.strikes += 1
+            pause = min(BACKOFF_BASE * 2 ** (state.strikes - 1), BACKOFF_MAX)
+            if retry_after:
+                pause = min(max(pause, retry_after), BACKOFF_MAX)
+            state.next_start = max(state.next_start, time.monotonic() + pause)
+            return pause
+
+    def report_success(self, key: str):
+        with self._condition:
+            state = self._hosts.get(key)
+            if state is not None:
+                state.strikes = 0
+
+    def wait_ready(self, key: str, cancel_event: Optional[threading.Event] = None) -> bool:
+        """Sit out the domain's backoff without taking a slot; False when cancelled"""
+        while True:
+            with self._condition:
+                state = self._hosts.get(key)
+                wait = state.next_start - time.monotonic() if state is not None else 0.0
+            if wait <= 0:
+                return True
+            if cancel_event is not None:
+                if cancel_event.wait(min(wait, 0.5)):
+                    return False
+            else:
+                time.sleep(min(wait, 0.5))
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Active jobs, strikes and remaining backoff per domain"""
+        now = time.monotonic()
+        with self._condition:
+            return {key: {'active': state.active, 'strikes': state.strikes,
+                          'backoff': round(max(0.0, state.next_start - now), 3)}
+                    for key, state in self._hosts.items()}
+
+    def _state(self, key: str) -> _HostState:
+        state = self._hosts.get(key)
+        if state is None:
+            state = self._hosts[key] = _HostState()
+        return state
+
+    def _held_keys(self) -> Dict[str, int]:
+        held = getattr(self._held, 'keys', None)
+        if held is None:
+            held = self._held.keys = {}
+        return held
+
+    def _is_full(self, state: _HostState) -> bool:
+        return self.max_per_host is not None and state.active >= self.max_per_host
+
+    def _try_acquire(self, key: str, now: float) -> bool:
+        state = self._state(key)
+        if self._is_full(state) or now < state.next_start:
+            return False
+        state.active += 1
+        state.next_start = now + self.min_interval
+        held = self._held_keys()
+        held[key] = held.get(key, 0) + 1
+        return True
@@ -0,0 +1,179 @@
+"""
+Download Job Journal
+Crash-safe SQLite record of in-flight jobs so interrupted downloads can
+resume from their last completed byte or segment after a restart
+"""
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from typing import Optional, Dict, List
+
+from .app_paths import get_data_path
+
+
+JOURNAL_FILE = "jobs.sqlite3"
+PROGRESS_INTERVAL = 1.0  # seconds between progress writes per job
+PRUNE_AGE = 7 * 24 * 3600  # seconds finished rows are kept
+
+# Journal statuses
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+# Identifies jobs owned by this process; rows left running by another owner were
+# interrupted once that owner's process is gone
+PROCESS_TOKEN = f"{os.getpid()}-{uuid.uuid4().hex}"
+PROCESS_ID = os.getpid()
+
+
+def process_alive(pid: Optional[int]) -> bool:
+    """Whether a process with this id is running"""
+    if not pid or pid < 0:
+        return False
+    if pid == os.getpid():
+        return True
+    if sys.platform == 'win32':
+        import ctypes
+
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        STILL_ACTIVE = 259
+        ERROR_ACCESS_DENIED = 5
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            # Processes of other users exist but cannot be opened
+            return ctypes.get_last_error() == ERROR_ACCESS_DENIED
+        try:
+            exit_code = ctypes.c_ulong()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+                return True
+            return exit_code.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class JobJournal:
+    """Records job parameters and progress for resume after a crash"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or get_data_path(JOURNAL_FILE)
+        self._lock = threading.Lock()
+        self._last_write = {}
+        self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        self._db.row_factory = sqlite3.Row
+        # WAL keeps committed progress intact if the process dies mid-write
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_key TEXT PRIMARY KEY, owner TEXT NOT NULL, kind TEXT NOT NULL, "
+            "url TEXT NOT NULL, quality TEXT, format_choice TEXT, "
+            "output_dir TEXT NOT NULL, file_prefix TEXT, output_file TEXT, "
+            "status TEXT NOT NULL, bytes_done INTEGER DEFAULT 0, "
+            "segments_done INTEGER DEFAULT 0, total INTEGER, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL, pid INTEGER)"
+        )
+        columns = {row['name'] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        if 'pid' not in columns:
+            # Journals written before the owner's pid was recorded
+            self._db.execute("ALTER TABLE jobs ADD COLUMN pid INTEGER")
+        self._db.commit()
+        self.prune()
+
+    def start(self, kind: str, url: str, output_dir: str, file_prefix: Optional[str] = None,
+              quality: Optional[str] = None, format_choice: Optional[str] = None,
+              output_file: Optional[str] = None, job_key: Optional[str] = None) -> str:
+        """Record a job as running; an existing key is claimed by this process"""
+        now = time.time()
+        with self._lock:
+            if job_key is not None:
+                self._db.execute(
+                    "UPDATE jobs SET owner = ?, pid = ?, status = ?, updated_at = ? WHERE job_key = ?",
+                    (PROCESS_TOKEN, PROCESS_ID, RUNNING, now, job_key)
+                )
+            else:
+                job_key = uuid.uuid4().hex
+                self._db.execute(
+                    "INSERT INTO jobs (job_key, owner, kind, url, quality, format_choice, output_dir, "
+                    "file_prefix, output_file, status, created_at, updated_at, pid) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_key, PROCESS_TOKEN, kind, url, quality, format_choice, output_dir,
+                     file_prefix, output_file, RUNNING, now, now, PROCESS_ID)
+                )
+            self._db.commit()
+        return job_key
+
+    def update_progress(self, job_key: str, bytes_done: Optional[int] = None,
+                        segments_done: Optional[int] = None, total: Optional[int] = None,
+                        output_file: Optional[str] = None, force: bool = False):
+        """Record progress, rate limited per job unless forced"""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_write.get(job_key, 0.0) < PROGRESS_INTERVAL:
+                return
+            self._last_write[job_key] = now
+
+            fields = {'bytes_done': bytes_done, 'segments_done': segments_done,
+                      'total': total, 'output_file': output_file}
+            fields = {k: v for k, v in fields.items() if v is not None}
+            if not fields:
+                return
+            assignments = ", ".join(f"{name} = ?" for name in fields)
+            self._db.execute(
+                f"UPDATE jobs SET {assignments}, updated_at = ? WHERE job_key = ?",
+                (*fields.values(), time.time(), job_key)
+            )
+            self._db.commit()
+
+    def finish(self, job_key: str, status: str):
+        """Mark a job finished; finished rows are pruned after PRUNE_AGE"""
+        with self._lock:
+            self._last_write.pop(job_key, None)
+            self._db.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE job_key = ?",
+                             (status, time.time(), job_key))
+            self._db.commit()
+
+    def get(self, job_key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE job_key = ?", (job_key,)).fetchone()
+        return dict(row) if row else None
+
+    def interrupted(self) -> List[Dict]:
+        """Jobs left running by a process that no longer exists
+
+        Jobs of another live process (a GUI next to a CLI daemon) are still
+        being written by it and are left alone.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM jobs WHERE status = ? AND owner != ? ORDER BY created_at",
+                (RUNNING, PROCESS_TOKEN)
+            ).fetchall()
+        return [dict(row) for row in rows if not process_alive(row['pid'])]
+
+    def prune(self, older_than: float = PRUNE_AGE) -> int:
+        """Delete finished rows older than the given age in seconds"""
+        cutoff = time.time() - older_than
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM jobs WHERE status != ? AND updated_at < ?", (RUNNING, cutoff)
+            )
+            self._db.commit()
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._db.close()
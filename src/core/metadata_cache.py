@@ -0,0 +1,151 @@
+"""
+Metadata Cache
+Stores extract_info results and extracted format lists so a URL is
+resolved only once while the entry is fresh
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, List
+
+from .app_paths import get_data_path
+
+
+DEFAULT_TTL = 15 * 60  # seconds; stream URLs inside the info expire after a few hours
+DEFAULT_MAX_ENTRIES = 256
+DISK_CACHE_FILE = "metadata_cache.sqlite3"
+
+
+class MetadataCache:
+    """Two-tier TTL cache: in-memory LRU in front of an optional SQLite store"""
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 disk_path: Optional[str] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False, timeout=10)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS metadata ("
+                "url TEXT PRIMARY KEY, stored_at REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+            self._db.commit()
+            self.purge_expired()
+
+    @classmethod
+    def persistent(cls, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES) -> 'MetadataCache':
+        """Cache with the disk tier in the per-user data directory"""
+        return cls(ttl, max_entries, disk_path=get_data_path(DISK_CACHE_FILE))
+
+    @staticmethod
+    def make_key(url: str) -> str:
+        return url.strip()
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Cached entry with 'info' and 'formats', or None when missing or expired"""
+        key = self.make_key(url)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry['stored_at'] < self.ttl:
+                    self._memory.move_to_end(key)
+                    return entry
+                del self._memory[key]
+
+            if self._db is None:
+                return None
+
+            row = self._db.execute(
+                "SELECT stored_at, payload FROM metadata WHERE url = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[0] >= self.ttl:
+                self._db.execute("DELETE FROM metadata WHERE url = ?", (key,))
+                self._db.commit()
+                return None
+
+            try:
+                payload = json.loads(row[1])
+            except ValueError:
+                return None
+
+            # Promote disk hits into the memory tier
+            entry = {'info': payload['info'], 'formats': payload['formats'], 'stored_at': row[0]}
+            self._store_memory(key, entry)
+            return entry
+
+    def put(self, url: str, info: Dict, formats: List[Dict]):
+        """Store an extraction result"""
+        key = self.make_key(url)
+        entry = {'info': info, 'formats': formats, 'stored_at': time.time()}
+
+        with self._lock:
+            self._store_memory(key, entry)
+            if self._db is not None:
+                try:
+                    payload = json.dumps({'info': info, 'formats': formats})
+                except (TypeError, ValueError) as e:
+                    print(f"Metadata not cached on disk: {e}")
+                    return
+                self._db.execute(
+                    "INSERT OR REPLACE INTO metadata (url, stored_at, payload) VALUES (?, ?, ?)",
+                    (key, entry['stored_at'], payload)
+                )
+                self._db.commit()
+
+    def invalidate(self, url: str):
+        """Drop a single URL from both tiers"""
+        key = self.make_key(url)
+        with self._lock:
+            self._memory.pop(key, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM metadata WHERE url = ?", (key,))
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM metadata")
+                self._db.commit()
+
+    def purge_expired(self) -> int:
+        """Remove expired entries from both tiers, returns number removed"""
+        cutoff = time.time() - self.ttl
+        removed = 0
+        with self._lock:
+            for key in [k for k, e in self._memory.items() if e['stored_at'] <= cutoff]:
+                del self._memory[key]
+                removed += 1
+            if self._db is not None:
+                cursor = self._db.execute("DELETE FROM metadata WHERE stored_at <= ?", (cutoff,))
+                self._db.commit()
+                removed += cursor.rowcount
+        return removed
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._memory)
+
+    def _store_memory(self, key: str, entry: Dict):
+        """Insert into the LRU tier (caller holds the lock)"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
@@ -0,0 +1,115 @@
+"""
+Dependency Probe Cache
+Persists dependency probe results keyed by a fingerprint of the environment
+so subprocess and import probes only rerun when something actually changed
+"""
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from typing import Optional, Dict
+
+from .app_paths import get_data_path
+
+
+PROBE_CACHE_FILE = "dependency_probes.json"
+CACHE_VERSION = 1
+
+
+def _stat_fingerprint(path: Optional[str]) -> Dict:
+    """Path plus size and mtime, or just the path when it cannot be stat'ed"""
+    if not path:
+        return {'path': None}
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return {'path': path}
+    return {'path': path, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def binary_fingerprint(name: str) -> Dict:
+    """Fingerprint of an executable as resolved through PATH"""
+    path_env = os.environ.get('PATH', '')
+    resolved = shutil.which(name)
+    fingerprint = {'PATH': path_env, 'binary': _stat_fingerprint(resolved)}
+    if resolved is None:
+        # A binary dropped into an existing PATH directory changes that directory's mtime
+        fingerprint['path_dirs'] = [_stat_fingerprint(directory).get('mtime_ns')
+                                    for directory in path_env.split(os.pathsep) if directory]
+    return fingerprint
+
+
+def module_fingerprint(module_name: str) -> Dict:
+    """Fingerprint of an importable module without importing it"""
+    fingerprint = {'python': sys.executable, 'version': sys.version}
+    if getattr(sys, 'frozen', False):
+        # Bundled modules only change together with the executable
+        fingerprint['bundle'] = _stat_fingerprint(sys.executable)
+        return fingerprint
+    try:
+        spec = importlib.util.find_spec(module_name)
+    except (ImportError, ValueError):
+        spec = None
+    fingerprint['origin'] = _stat_fingerprint(spec.origin if spec is not None else None)
+    return fingerprint
+
+
+class ProbeCache:
+    """Probe results persisted as JSON, each valid while its fingerprint matches"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or get_data_path(PROBE_CACHE_FILE)
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def get(self, key: str, fingerprint: Dict) -> Optional[Dict]:
+        """Stored result for key, or None when missing or the fingerprint changed"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry.get('fingerprint') != fingerprint:
+            return None
+        return entry['result']
+
+    def put(self, key: str, fingerprint: Dict, result: Dict):
+        with self._lock:
+            # Merge with the file so entries written by other processes survive
+            entries = self._load()
+            entries[key] = {'fingerprint': fingerprint, 'result': result}
+            self._entries = entries
+            self._save(entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._save({})
+
+    def _load(self) -> Dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get('version') != CACHE_VERSION:
+            return {}
+        return data.get('entries') or {}
+
+    def _save(self, entries: Dict):
+        # Write to a temp file and swap it in so readers never see a partial file
+        temp_path = None
+        try:
+            # A unique name per write, threads of one process may save concurrently
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)),
+                                             prefix=os.path.basename(self.path) + '.', suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'version': CACHE_VERSION, 'entries': entries}, f)
+            os.replace(temp_path, self.path)
+        except OSError:
+            # The cache is an optimization, probing still works without it
+            if temp_path is not None:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
@@ -0,0 +1,140 @@
+"""
+Progress Event Bus
+Coalesces per-job progress updates to a bounded rate before they reach
+subscribers such as the GUI or the CLI
+"""
+import threading
+import time
+from typing import Optional, Callable, Dict, Hashable
+
+
+DEFAULT_RATE_HZ = 10.0
+
+# Events with this status are coalesced; any other status is a state change
+PROGRESS_STATUS = 'downloading'
+
+
+def progress_fraction(downloaded: Optional[float], total: Optional[float]) -> Optional[float]:
+    """Completed fraction clamped to 0..1, or None when the total is unknown"""
+    if not total or downloaded is None:
+        return None
+    return min(max(downloaded / total, 0.0), 1.0)
+
+
+def format_percentage(fraction: Optional[float]) -> str:
+    if fraction is None:
+        return '?%'
+    return f"{fraction * 100:.1f}%"
+
+
+def format_speed(speed: Optional[float]) -> str:
+    """Human readable transfer rate from bytes per second"""
+    if not speed:
+        return 'Unknown'
+    for unit in ('B/s', 'KiB/s', 'MiB/s'):
+        if speed < 1024:
+            return f"{speed:.2f}{unit}"
+        speed /= 1024
+    return f"{speed:.2f}GiB/s"
+
+
+def format_eta(eta: Optional[float]) -> str:
+    if eta is None:
+        return '--:--'
+    minutes, seconds = divmod(int(eta), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours:d}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+class _JobState:
+    __slots__ = ('last_delivery', 'pending')
+
+    def __init__(self):
+        self.last_delivery = 0.0
+        self.pending = None
+
+
+class ProgressBus:
+    """Delivers progress events to subscribers at most rate_hz times per job
+
+    Intermediate 'downloading' ticks are coalesced: only the newest one is
+    kept and it is delivered with the next tick after the interval, or by
+    flush(). Events with any other status (finished, error, ...) are state
+    changes and are delivered immediately, superseding a pending tick.
+    Delivery happens on the publishing thread, so events of one job arrive
+    in order.
+    """
+
+    def __init__(self, rate_hz: float = DEFAULT_RATE_HZ):
+        self._lock = threading.Lock()
+        self._jobs: Dict[Hashable, _JobState] = {}
+        self._subscribers = []
+        self.set_rate(rate_hz)
+
+    @property
+    def rate_hz(self) -> float:
+        return self._rate_hz
+
+    def set_rate(self, rate_hz: float):
+        """Change the per-job delivery rate (0 or less disables coalescing)"""
+        self._rate_hz = rate_hz
+        self._interval = 1.0 / rate_hz if rate_hz > 0 else 0.0
+
+    def subscribe(self, callback: Callable, job_id: Optional[Hashable] = None) -> Callable:
+        """Receive events of one job, or of all jobs when job_id is None
+
+        Returns a function that removes the subscription.
+        """
+        subscription = (job_id, callback)
+        with self._lock:
+            self._subscribers = self._subscribers + [subscription]
+
+        def unsubscribe():
+            with self._lock:
+                self._subscribers = [s for s in self._subscribers if s is not subscription]
+        return unsubscribe
+
+    def reporter(self, job_id: Hashable) -> Callable:
+        """Progress callback that publishes into this bus for one job"""
+        return lambda event: self.publish(job_id, event)
+
+    def publish(self, job_id: Hashable, event: Dict):
+        # Tagged on a copy, the caller may reuse or share its dict
+        event = dict(event, job_id=job_id)
+        now = time.monotonic()
+        with self._lock:
+            state = self._jobs.get(job_id)
+            if state is None:
+                state = self._jobs[job_id] = _JobState()
+
+            if event.get('status') == PROGRESS_STATUS:
+                if now - state.last_delivery < self._interval:
+                    state.pending = event
+                    return
+                state.last_delivery = now
+            else:
+                # State change: deliver now and let the next tick through at once
+                state.last_delivery = 0.0
+            state.pending = None
+            subscribers = self._subscribers
+
+        self._deliver(subscribers, job_id, event)
+
+    def flush(self, job_id: Hashable):
+        """Deliver a pending tick of the job and forget its state"""
+        with self._lock:
+            state = self._jobs.pop(job_id, None)
+            subscribers = self._subscribers
+        if state is not None and state.pending is not None:
+            self._deliver(subscribers, job_id, state.pending)
+
+    def _deliver(self, subscribers, job_id: Hashable, event: Dict):
+        for subscribed_job, callback in subscribers:
+            if subscribed_job is None or subscribed_job == job_id:
+                try:
+                    callback(event)
+                except Exception:
+                    # A failing subscriber must not abort the download
+                    pass
@@ -0,0 +1,212 @@
+"""
+Multi-Connection Range Downloader
+Splits one progressive HTTP file into byte ranges fetched concurrently over
+pooled connections, each written at its offset of a preallocated file
+"""
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_EXCEPTION, wait
+from typing import Optional, Callable, Dict, List, Tuple
+
+from .disk_space import preallocate
+from .progress import progress_fraction
+
+
+DEFAULT_CONNECTIONS = 4
+MAX_CONNECTIONS = 16
+# Ranges are at most this long, so a retry repeats little and hosts that
+# refuse long ranges (googlevideo answers 403 above ~10 MB) are served
+MAX_RANGE_SIZE = 8 * 1024 * 1024
+RANGE_RETRIES = 3
+CHUNK_SIZE = 64 * 1024
+REQUEST_TIMEOUT = 30
+PROGRESS_INTERVAL = 0.2  # seconds between progress events
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+
+CONTENT_RANGE_RE = re.compile(r'bytes\s+(\d+)-(\d+)/(\d+)', re.IGNORECASE)
+
+
+class RangeDownloadError(Exception):
+    """Raised when a file cannot be fetched by ranges; the caller falls back to one connection"""
+
+
+class RangeUnsupported(RangeDownloadError):
+    """Raised when the server does not answer range requests"""
+
+
+class RangeDownloadCancelled(RangeDownloadError):
+    """Raised when the download was cancelled"""
+
+
+def split_ranges(total: int, parts: int, max_size: int = MAX_RANGE_SIZE) -> List[Tuple[int, int]]:
+    """Inclusive (start, end) byte ranges covering total bytes"""
+    if total <= 0:
+        return []
+    count = max(1, parts, -(-total // max_size))
+    size = -(-total // count)
+    return [(start, min(start + size, total) - 1) for start in range(0, total, size)]
+
+
+class RangeDownloader:
+    """Fetches one HTTP resource over several connections, range by range
+
+    A failed range is retried from the byte it stopped at without touching
+    the others; the download fails once one range runs out of retries.
+    """
+
+    def __init__(self, connections: int = DEFAULT_CONNECTIONS,
+                 session: Optional['requests.Session'] = None,
+                 meter: Optional['BandwidthMeter'] = None,
+                 range_size: int = MAX_RANGE_SIZE):
+        self.connections = min(max(1, int(connections)), MAX_CONNECTIONS)
+        self.range_size = range_size
+        # Charged per chunk when set, so every connection obeys the bandwidth governor
+        self.meter = meter
+        self._own_session = session is None
+        self.session = session or self._create_session()
+
+    def _create_session(self) -> 'requests.Session':
+        # requests is imported on first use to keep application startup fast
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        session.headers['User-Agent'] = USER_AGENT
+        # One keep-alive connection per worker
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.connections)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def close(self):
+        if self._own_session:
+            self.session.close()
+
+    def probe(self, url: str, headers: Optional[Dict] = None) -> int:
+        """Size of the resource, RangeUnsupported if ranges are not served"""
+        import requests
+
+        try:
+            with self.session.get(url, headers=dict(headers or {}, Range='bytes=0-0'),
+                                  timeout=REQUEST_TIMEOUT, stream=True) as response:
+                response.raise_for_status()
+                match = CONTENT_RANGE_RE.match(response.headers.get('Content-Range', ''))
+                if response.status_code != 206 or not match:
+                    raise RangeUnsupported("Server nepodporuje stahování po částech")
+                total = int(match.group(3))
+                if total == 0:
+                    # Nothing to split, the single-connection path handles empty files
+                    raise RangeUnsupported("Soubor je prázdný")
+                return total
+        except requests.RequestException as e:
+            raise RangeDownloadError(str(e))
+
+    def download(self, url: str, output_path: str, headers: Optional[Dict] = None,
+                 progress_callback: Optional[Callable] = None,
+                 cancel_event: Optional[threading.Event] = None) -> int:
+        """Fetch url into output_path, returns the size in bytes"""
+        headers = headers or {}
+        total = self.probe(url, headers)
+        filename = os.path.basename(output_path)
+        # Written under a temporary name so an unfinished file never looks complete
+        temp_output = f"{output_path}.ranges.part"
+        state = {'done': 0}
+        lock = threading.Lock()
+        stop = threading.Event()
+        started = time.monotonic()
+
+        def report(final=False):
+            if not progress_callback:
+                return
+            with lock:
+                done = state['done']
+            elapsed = max(time.monotonic() - started, 1e-6)
+            speed = done / elapsed
+            progress_callback({
+                'status': 'downloading',
+                'downloaded_bytes': done,
+                'total_bytes': total,
+                'fraction': 1.0 if final else progress_fraction(done, total),
+                'speed': speed,
+                'eta': (total - done) / speed if speed else None,
+                'filename': filename,
+                'connections': self.connections,
+            })
+
+        try:
+            with open(temp_output, 'wb') as output:
+                # One allocation for the whole file instead of one per range
+                preallocate(output, total)
+                ranges = split_ranges(total, self.connections, self.range_size)
+                with ThreadPoolExecutor(max_workers=self.connections,
+                                        thread_name_prefix='range-fetch') as pool:
+                    futures = [pool.submit(self._fetch_range, url, headers, start, end, output,
+                                           lock, state, stop, cancel_event)
+                               for start, end in ranges]
+                    pending = set(futures)
+                    # Progress is reported from the calling thread, not the workers
+                    while pending:
+                        _, pending = wait(pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_EXCEPTION)
+                        if any(future.done() and future.exception() for future in futures):
+                            stop.set()
+                            break
+                        report()
+                for future in futures:
+                    if future.done() and future.exception() is not None:
+                        raise future.exception()
+            report(final=True)
+        except BaseException:
+            stop.set()
+            self._discard(temp_output)
+            raise
+
+        os.replace(temp_output, output_path)
+        return total
+
+    def _fetch_range(self, url: str, headers: Dict, start: int, end: int, output,
+                     lock: threading.Lock, state: Dict, stop: threading.Event,
+                     cancel_event: Optional[threading.Event]):
+        import requests
+
+        position = start
+        last_error = None
+        for attempt in range(RANGE_RETRIES + 1):
+            if attempt:
+                time.sleep(0.5 * attempt)
+            try:
+                request_headers = dict(headers, Range=f'bytes={position}-{end}')
+                with self.session.get(url, headers=request_headers, timeout=REQUEST_TIMEOUT,
+                                      stream=True) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        # A full body here would be written at the wrong offset
+                        raise RangeUnsupported("Server nepodporuje stahování po částech")
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        if cancel_event is not None and cancel_event.is_set():
+                            raise RangeDownloadCancelled("Stahování bylo zrušeno")
+                        if stop.is_set():
+                            return
+                        chunk = chunk[:end + 1 - position]
+                        with lock:
+                            output.seek(position)
+                            output.write(chunk)
+                            state['done'] += len(chunk)
+                        position += len(chunk)
+                        if self.meter is not None:
+                            self.meter.consume(len(chunk), url)
+                        if position > end:
+                            return
+                last_error = RangeDownloadError("Spojení ukončeno před koncem rozsahu")
+            except requests.RequestException as e:
+                # Retried from the byte it stopped at, the rest of the range is kept
+                last_error = e
+        raise RangeDownloadError(f"Rozsah {start}-{end} se nepodařilo stáhnout: {last_error}")
+
+    @staticmethod
+    def _discard(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,247 @@
+"""
+Thumbnail Service
+Fetches video thumbnails over one shared HTTP session, downsizes them off the
+UI thread and keeps the resized variants in a size-bounded on-disk LRU cache
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from .app_paths import get_data_path
+
+
+THUMBNAIL_DIR = "thumbnails"
+THUMBNAIL_EXT = ".jpg"
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_SIZE = (320, 180)
+DEFAULT_WORKERS = 4
+MEMORY_ENTRIES = 64        # decoded images kept for repeated views
+JPEG_QUALITY = 85
+REQUEST_TIMEOUT = 15
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+
+
+def thumbnail_key(url: str, size: Tuple[int, int]) -> str:
+    """Cache key of one resized variant: URL hash plus the bounding size"""
+    digest = hashlib.sha1(url.strip().encode('utf-8')).hexdigest()
+    return f"{digest}-{size[0]}x{size[1]}"
+
+
+class ThumbnailCache:
+    """Resized thumbnails as files, least recently used evicted beyond max_bytes
+
+    Recency is kept in the file modification times, so the order survives
+    restarts without an index file.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory or get_data_path(THUMBNAIL_DIR)
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> size in bytes, oldest first
+        self._total = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(THUMBNAIL_EXT):
+                stat = entry.stat()
+                files.append((stat.st_mtime_ns, entry.name[:-len(THUMBNAIL_EXT)], stat.st_size))
+            elif entry.name.endswith('.tmp'):
+                # Left over by a write that was interrupted
+                self._remove(entry.path)
+        with self._lock:
+            for _, key, size in sorted(files):
+                self._entries[key] = size
+                self._total += size
+            self._evict()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + THUMBNAIL_EXT)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Stored bytes of a variant, or None when missing"""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._total -= self._entries.pop(key, 0)
+            return None
+        return data
+
+    def put(self, key: str, data: bytes):
+        path = self.path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Náhled se nepodařilo uložit do cache: {e}")
+            self._remove(temp_path)
+            return
+        with self._lock:
+            self._total += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._evict()
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._total
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def _evict(self):
+        # The newest entry is kept even when it alone exceeds the limit
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total -= size
+            self._remove(self.path(key))
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class ThumbnailService:
+    """Loads thumbnails on a small worker pool without blocking the caller
+
+    get() returns a Future of a PIL image no larger than the requested size,
+    or of None when the thumbnail cannot be loaded. Requests for a variant
+    already in flight share its Future, recently decoded images are served
+    from memory, and the rest from the disk cache before the network.
+    """
+
+    def __init__(self, cache: Optional[ThumbnailCache] = None,
+                 session: Optional['requests.Session'] = None,
+                 workers: int = DEFAULT_WORKERS, memory_entries: int = MEMORY_ENTRIES):
+        self.cache = cache if cache is not None else ThumbnailCache()
+        self.workers = workers
+        self.memory_entries = memory_entries
+        self._session = session
+        self._own_session = session is None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnail')
+        self._pending = {}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> 'requests.Session':
+        with self._lock:
+            if self._session is None:
+                self._session = self._create_session()
+            return self._session
+
+    def _create_session(self) -> 'requests.Session':
+        # requests is imported on first use to keep application startup fast
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        session.headers['User-Agent'] = USER_AGENT
+        # One keep-alive connection per worker
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get(self, url: Optional[str], size: Tuple[int, int] = DEFAULT_SIZE) -> Future:
+        """Future of the thumbnail at url fitted into size"""
+        if not url:
+            return self._resolved(None)
+        key = thumbnail_key(url, size)
+        with self._lock:
+            image = self._memory.get(key)
+            if image is not None:
+                self._memory.move_to_end(key)
+                return self._resolved(image)
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            future = self._executor.submit(self._load, url, tuple(size), key)
+            self._pending[key] = future
+        future.add_done_callback(lambda done: self._finish(key, done))
+        return future
+
+    def close(self):
+        # Cancelled here rather than with shutdown(cancel_futures=True), which needs Python 3.9
+        with self._lock:
+            pending = list(self._pending.values())
+        for future in pending:
+            future.cancel()
+        self._executor.shutdown(wait=False)
+        if self._own_session and self._session is not None:
+            self._session.close()
+
+    @staticmethod
+    def _resolved(image) -> Future:
+        future = Future()
+        future.set_result(image)
+        return future
+
+    def _finish(self, key: str, future: Future):
+        with self._lock:
+            self._pending.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                return
+            image = future.result()
+            if image is not None:
+                self._memory[key] = image
+                while len(self._memory) > self.memory_entries:
+                    self._memory.popitem(last=False)
+
+    def _load(self, url: str, size: Tuple[int, int], key: str):
+        from PIL import Image
+
+        data = self.cache.get(key)
+        if data is None:
+            data = self._fetch(url, size)
+            if data is None:
+                return None
+            self.cache.put(key, data)
+        try:
+            image = Image.open(io.BytesIO(data))
+            image.load()
+        except OSError as e:
+            print(f"Náhled {url} se nepodařilo dekódovat: {e}")
+            return None
+        return image
+
+    def _fetch(self, url: str, size: Tuple[int, int]) -> Optional[bytes]:
+        """Download and downsize one thumbnail, JPEG bytes or None"""
+        import requests
+        from PIL import Image
+
+        try:
+            response = self.session.get(url, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            image = Image.open(io.BytesIO(response.content))
+            # JPEG sources decode straight at a reduced scale
+            image.draft('RGB', size)
+            image = image.convert('RGB')
+            image.thumbnail(size, Image.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+            return output.getvalue()
+        except (requests.RequestException, OSError) as e:
+            # PIL raises OSError subclasses for data it cannot decode
+            print(f"Náhled {url} se nepodařilo načíst: {e}")
+            return None
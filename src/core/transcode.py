@@ -0,0 +1,189 @@
+"""
+Transcode Scheduler
+Runs CPU-bound ffmpeg conversions (MP3, AVI, WEBM) on their own worker pool
+sized to the CPU cores, so download slots are free while encodes wait
+"""
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional, Callable, List
+
+
+# ffmpeg output options per target format, tried in order. WEBM tries a
+# stream copy first since VP9/Opus sources already fit the container.
+TRANSCODE_PROFILES = {
+    'mp3': [['-vn', '-c:a', 'libmp3lame', '-q:a', '2']],
+    'avi': [['-c:v', 'mpeg4', '-q:v', '3', '-c:a', 'libmp3lame', '-q:a', '4']],
+    'webm': [['-c', 'copy'],
+             ['-c:v', 'libvpx-vp9', '-crf', '32', '-b:v', '0', '-row-mt', '1',
+              '-c:a', 'libopus', '-b:a', '128k']],
+}
+CANCEL_POLL_INTERVAL = 0.2  # seconds between cancellation checks while ffmpeg runs
+
+
+class TranscodeError(Exception):
+    """Raised when ffmpeg cannot convert a file"""
+
+
+class TranscodeCancelled(TranscodeError):
+    """Raised when the conversion was cancelled"""
+
+
+def available_cores() -> int:
+    """CPU cores this process may run on"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # Windows, macOS
+        return os.cpu_count() or 1
+
+
+def needs_transcode(target_format: Optional[str]) -> bool:
+    return (target_format or '').lower() in TRANSCODE_PROFILES
+
+
+def target_path(source: str, target_format: str) -> str:
+    """Output path of a conversion: the source path with the target extension"""
+    return f"{os.path.splitext(source)[0]}.{target_format.lower()}"
+
+
+class TranscodeScheduler:
+    """FIFO of ffmpeg conversions executed by at most max_workers processes
+
+    Defaults to one worker per core, and each ffmpeg gets cores / workers
+    threads so concurrent encodes do not oversubscribe the CPU.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, ffmpeg: str = 'ffmpeg'):
+        self.max_workers = max(1, int(max_workers or available_cores()))
+        self.threads_per_job = max(1, available_cores() // self.max_workers)
+        self.ffmpeg = ffmpeg
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='transcode')
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._active = 0
+        self._futures = set()
+        self._stop = threading.Event()
+
+    def submit(self, source: str, target_format: str,
+               cancel_event: Optional[threading.Event] = None,
+               progress_callback: Optional[Callable] = None) -> Future:
+        """Queue a conversion; the future yields the output path
+
+        The source file is removed once the output is complete.
+        """
+        with self._lock:
+            self._pending += 1
+        if progress_callback:
+            progress_callback({'status': 'transcode_queued', 'filename': os.path.basename(source),
+                               'format': target_format.upper()})
+        future = self._pool.submit(self._run, source, target_format.lower(), cancel_event,
+                                   progress_callback)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._forget)
+        return future
+
+    def transcode(self, source: str, target_format: str,
+                  cancel_event: Optional[threading.Event] = None,
+                  progress_callback: Optional[Callable] = None) -> str:
+        """Convert and wait for the result"""
+        return self.submit(source, target_format, cancel_event, progress_callback).result()
+
+    def pending_count(self) -> int:
+        """Conversions waiting for a worker"""
+        with self._lock:
+            return self._pending
+
+    def active_count(self) -> int:
+        """Conversions currently running"""
+        with self._lock:
+            return self._active
+
+    def shutdown(self, wait: bool = True):
+        """Drop queued conversions and stop running ones"""
+        self._stop.set()
+        # Cancelled here rather than with shutdown(cancel_futures=True), which needs Python 3.9
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.cancel()
+        self._pool.shutdown(wait=wait)
+
+    def _forget(self, future: Future):
+        with self._lock:
+            self._futures.discard(future)
+            if future.cancelled():
+                # Dropped before a worker picked it up, so _run never counted it off
+                self._pending -= 1
+
+    def _run(self, source: str, target_format: str,
+             cancel_event: Optional[threading.Event],
+             progress_callback: Optional[Callable]) -> str:
+        with self._lock:
+            self._pending -= 1
+            self._active += 1
+        try:
+            if self._cancelled(cancel_event):
+                raise TranscodeCancelled("Převod byl zrušen")
+            output = target_path(source, target_format)
+            if output == source:
+                return source
+            if progress_callback:
+                progress_callback({'status': 'transcoding', 'filename': os.path.basename(output),
+                                   'format': target_format.upper()})
+
+            base, extension = os.path.splitext(output)
+            # Written under a temporary name so a half-encoded file never looks finished
+            temp_output = f"{base}.transcoding{extension}"
+            last_error = None
+            for options in TRANSCODE_PROFILES[target_format]:
+                try:
+                    self._ffmpeg(source, temp_output, options, cancel_event)
+                except TranscodeCancelled:
+                    self._discard(temp_output)
+                    raise
+                except TranscodeError as e:
+                    last_error = e
+                    self._discard(temp_output)
+                    continue
+                os.replace(temp_output, output)
+                self._discard(source)
+                return output
+            raise last_error
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def _ffmpeg(self, source: str, output: str, options: List[str],
+                cancel_event: Optional[threading.Event]):
+        command = [self.ffmpeg, '-y', '-nostdin', '-loglevel', 'error', '-i', source,
+                   '-threads', str(self.threads_per_job)] + options + [output]
+        try:
+            process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except OSError as e:
+            raise TranscodeError(f"FFmpeg nelze spustit: {e}")
+
+        while True:
+            try:
+                _, stderr = process.communicate(timeout=CANCEL_POLL_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                if self._cancelled(cancel_event):
+                    process.kill()
+                    process.communicate()
+                    raise TranscodeCancelled("Převod byl zrušen")
+
+        if process.returncode != 0:
+            message = stderr.decode('utf-8', 'replace').strip().splitlines()
+            raise TranscodeError(f"FFmpeg error: {message[-1] if message else process.returncode}")
+
+    def _cancelled(self, cancel_event: Optional[threading.Event]) -> bool:
+        return self._stop.is_set() or (cancel_event is not None and cancel_event.is_set())
+
+    @staticmethod
+    def _discard(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,129 @@
+"""
+YoutubeDL Instance Pool
+Keeps long-lived yt-dlp instances per option profile so extractor lookup
+and HTTP sessions are reused between calls
+"""
+import json
+import threading
+from contextlib import contextmanager
+from typing import Optional, Callable, Dict, List
+
+
+DEFAULT_MAX_IDLE = 4  # idle instances kept per option profile
+
+
+class _PooledInstance:
+    """YoutubeDL instance plus the hooks of its current lease"""
+
+    def __init__(self, ydl):
+        self.ydl = ydl
+        self.hooks = []
+        self.post_hooks = []
+        self.default_outtmpl = ydl.params['outtmpl'].get('default')
+        self.default_format = ydl.params.get('format')
+        self.default_format_selector = getattr(ydl, 'format_selector', None)
+
+    def dispatch(self, d):
+        for hook in self.hooks:
+            hook(d)
+
+    def post_dispatch(self, filepath):
+        for hook in self.post_hooks:
+            hook(filepath)
+
+
+class YoutubeDLPool:
+    """Lends out YoutubeDL instances keyed by their option profile
+
+    An instance is used by one caller at a time. Per-call settings (output
+    template, progress hooks and post hooks) are applied on each lease, everything else
+    is part of the profile and fixed for the lifetime of the instance.
+    """
+
+    def __init__(self, factory: Callable[[Dict], object], max_idle: int = DEFAULT_MAX_IDLE):
+        self._factory = factory
+        self._max_idle = max_idle
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self.created = 0
+
+    @staticmethod
+    def profile_key(options: Dict) -> str:
+        """Stable key for an option profile"""
+        return json.dumps(options, sort_keys=True, default=repr)
+
+    @contextmanager
+    def lease(self, options: Dict, outtmpl: Optional[str] = None,
+              progress_hooks: Optional[List[Callable]] = None,
+              post_hooks: Optional[List[Callable]] = None,
+              format_spec: Optional[str] = None):
+        """Borrow an instance for the given profile
+
+        post_hooks are called with the final path of each downloaded file,
+        after merging and postprocessing. format_spec replaces the profile's
+        format selection for this lease only, so per-video format ids do not
+        create a profile each.
+        """
+        key = self.profile_key(options)
+        entry = self._acquire(key, options)
+        entry.hooks = list(progress_hooks or [])
+        entry.post_hooks = list(post_hooks or [])
+        entry.ydl.params['outtmpl']['default'] = outtmpl if outtmpl is not None else entry.default_outtmpl
+        if format_spec is not None:
+            entry.ydl.params['format'] = format_spec
+            entry.ydl.format_selector = entry.ydl.build_format_selector(format_spec)
+
+        try:
+            yield entry.ydl
+        finally:
+            entry.hooks = []
+            entry.post_hooks = []
+            if format_spec is not None:
+                entry.ydl.params['format'] = entry.default_format
+                entry.ydl.format_selector = entry.default_format_selector
+            self._release(key, entry)
+
+    def idle_count(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self._idle.values())
+
+    def close(self):
+        """Close every idle instance; leased ones close when returned"""
+        with self._lock:
+            self._closed = True
+            entries = [entry for bucket in self._idle.values() for entry in bucket]
+            self._idle.clear()
+
+        for entry in entries:
+            self._close_instance(entry)
+
+    def _acquire(self, key: str, options: Dict) -> _PooledInstance:
+        with self._lock:
+            bucket = self._idle.get(key)
+            if bucket:
+                return bucket.pop()
+
+        # Instances are created outside the lock, construction is slow
+        ydl = self._factory(dict(options)).__enter__()
+        entry = _PooledInstance(ydl)
+        ydl.add_progress_hook(entry.dispatch)
+        ydl.add_post_hook(entry.post_dispatch)
+        with self._lock:
+            self.created += 1
+        return entry
+
+    def _release(self, key: str, entry: _PooledInstance):
+        with self._lock:
+            bucket = self._idle.setdefault(key, [])
+            if not self._closed and len(bucket) < self._max_idle:
+                bucket.append(entry)
+                return
+
+        self._close_instance(entry)
+
+    def _close_instance(self, entry: _PooledInstance):
+        try:
+            entry.ydl.__exit__(None, None, None)
+        except Exception as e:
+            print(f"Error closing YoutubeDL instance: {e}")
@@ -5,15 +5,14 @@ Features: Dark theme, quality selection, progress tracking
 import customtkinter as ctk
 import threading
 import tkinter.filedialog as fd
-from PIL import Image
-import requests
-from io import BytesIO
 import os
 import sys
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from core.downloader import VideoDownloader
+from core.progress import format_percentage, format_speed, format_eta
+from core.thumbnails import ThumbnailService
 
 
 class ModernYTDownloader:
@@ -31,6 +30,9 @@ class ModernYTDownloader:
         # Initialize downloader
         self.downloader = VideoDownloader()
         self.current_video_info = None
+        # Thumbnails load on their own workers and are cached on disk
+        self.thumbnails = ThumbnailService()
+        self.thumbnail_url = None
         
         self.setup_ui()
         
@@ -97,6 +99,10 @@ class ModernYTDownloader:
         info_label = ctk.CTkLabel(self.info_frame, text="Video Information:", font=ctk.CTkFont(size=14, weight="bold"))
         info_label.pack(anchor="w", padx=20, pady=(20, 10))
         
+        # Thumbnail of the analyzed video, filled in when it has loaded
+        self.thumbnail_label = ctk.CTkLabel(self.info_frame, text="")
+        self.thumbnail_label.pack(anchor="w", padx=20)
+        
         # Info display area
         self.info_text = ctk.CTkTextbox(self.info_frame, height=100)
         self.info_text.pack(fill="x", padx=20, pady=(0, 20))
@@ -282,6 +288,7 @@ class ModernYTDownloader:
             
         # Store info and update display
         self.current_video_info = info
+        self._load_thumbnail(info.get('thumbnail'))
         
         info_text = f"Title: {info.get('title', 'Unknown')}\\n"
         info_text += f"Duration: {self._format_duration(info.get('duration', 0))}\\n"
@@ -298,6 +305,22 @@ class ModernYTDownloader:
         self.info_text.delete("0.0", ctk.END)
         self.info_text.insert("0.0", info_text)
         
+    def _load_thumbnail(self, thumbnail_url):
+        """Request the thumbnail without waiting for it"""
+        self.thumbnail_url = thumbnail_url
+        self.thumbnail_label.configure(image=None)
+        future = self.thumbnails.get(thumbnail_url)
+        future.add_done_callback(lambda done: self.root.after(0, self._show_thumbnail, thumbnail_url, done))
+        
+    def _show_thumbnail(self, thumbnail_url, future):
+        """Display a loaded thumbnail unless another video was analyzed meanwhile"""
+        if thumbnail_url != self.thumbnail_url or future.cancelled() or future.exception():
+            return
+        image = future.result()
+        if image is not None:
+            self.thumbnail_image = ctk.CTkImage(light_image=image, dark_image=image, size=image.size)
+            self.thumbnail_label.configure(image=self.thumbnail_image)
+        
     def _show_analysis_error(self, error):
         """Show analysis error"""
         self.analyze_btn.configure(state="normal", text="Analyze")
@@ -305,7 +328,7 @@ class ModernYTDownloader:
         self.info_text.insert("0.0", f"Analysis failed: {error}")
         
     def start_download(self):
-        """Start download in separate thread"""
+        """Queue download on the downloader's worker pool"""
         url = self.url_entry.get().strip()
         quality = self.quality_var.get()
         
@@ -320,24 +343,17 @@ class ModernYTDownloader:
         self.speed_label.configure(text="Speed: --")
         self.file_info_label.configure(text="File: Preparing...")
         
-        # Start download thread
-        thread = threading.Thread(target=self._download_thread, args=(url, quality))
-        thread.daemon = True
-        thread.start()
+        # Queue download on the shared worker pool
+        self.downloader.submit(
+            url,
+            quality,
+            progress_callback=self._progress_callback,
+            done_callback=self._job_done
+        )
         
-    def _download_thread(self, url, quality):
-        """Thread function for downloading"""
-        try:
-            result = self.downloader.download_video(
-                url, 
-                quality, 
-                progress_callback=self._progress_callback
-            )
-            
-            self.root.after(0, self._download_finished, result)
-            
-        except Exception as e:
-            self.root.after(0, self._download_error, str(e))
+    def _job_done(self, job):
+        """Queue callback when a job reaches a final state"""
+        self.root.after(0, self._download_finished, job.result)
             
     def _progress_callback(self, progress_info):
         """Handle progress updates"""
@@ -348,22 +364,18 @@ class ModernYTDownloader:
         status = progress_info.get('status', '')
         
         if status == 'downloading':
-            percentage_str = progress_info.get('percentage', '0%')
-            percentage = percentage_str.replace('%', '')
+            fraction = progress_info.get('fraction')
+            if fraction is not None:
+                self.progress_bar.set(fraction)
+                self.progress_percentage.configure(text=format_percentage(fraction))
             
-            try:
-                progress_val = float(percentage) / 100
-                self.progress_bar.set(progress_val)
-                self.progress_percentage.configure(text=percentage_str)
-            except ValueError:
-                pass
-            
-            speed = progress_info.get('speed', '')
+            speed = format_speed(progress_info.get('speed'))
+            eta = format_eta(progress_info.get('eta'))
             filename = progress_info.get('filename', '')
             
             # Update all progress elements
             self.status_label.configure(text=f"⬇️ Downloading: {filename}")
-            self.speed_label.configure(text=f"Speed: {speed}")
+            self.speed_label.configure(text=f"Speed: {speed} | ETA: {eta}")
             self.file_info_label.configure(text=f"File: {filename}")
             
         elif status == 'finished':
@@ -376,6 +388,15 @@ class ModernYTDownloader:
             self.speed_label.configure(text="Speed: Download finished")
             self.file_info_label.configure(text=f"📁 Saved to: {self.downloader.output_path}")
             
+        elif status in ('transcode_queued', 'transcoding'):
+            # Transfer is done, the format conversion waits for or runs on a CPU worker
+            target = progress_info.get('format', '')
+            waiting = status == 'transcode_queued'
+            self.status_label.configure(text=f"⏳ Waiting to convert to {target}" if waiting
+                                        else f"🎛️ Converting to {target}...")
+            self.speed_label.configure(text="Speed: Download finished")
+            self.file_info_label.configure(text=f"File: {progress_info.get('filename', '')}")
+            
     def _download_finished(self, result):
         """Handle download completion"""
         self.download_btn.configure(state="normal", text="📥 DOWNLOAD VIDEO")
@@ -387,12 +408,6 @@ class ModernYTDownloader:
             self.show_status(f"Download failed: {result.get('error', 'Unknown error')}", "error")
             self.progress_bar.set(0)
             
-    def _download_error(self, error):
-        """Handle download error"""
-        self.download_btn.configure(state="normal", text="📥 DOWNLOAD VIDEO")
-        self.show_status(f"Download error: {error}", "error")
-        self.progress_bar.set(0)
-        
     def show_status(self, message, status_type="info"):
         """Show status message with visual feedback"""
         # Update main status label
@@ -421,6 +436,7 @@ class ModernYTDownloader:
     def run(self):
         """Start the application"""
         self.root.mainloop()
+        self.thumbnails.close()
 
 
 def main():
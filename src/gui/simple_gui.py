@@ -4,19 +4,32 @@ Simple and Clear GUI for YouTube Downloader
 Focused on visibility and functionality
 """
 import customtkinter as ctk
-import threading
 import tkinter.filedialog as fd
 import os
 import sys
+import threading
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 from core.downloader import VideoDownloader
-from core.dependency_checker import DependencyChecker
+from core.progress import format_percentage, format_speed, format_eta
 from version import APP_TITLE
 
 
+DEPENDENCY_PROBE_DELAY_MS = 100  # let the window draw before probing
+
+# Speed limit menu entries in bytes per second (None = unlimited)
+SPEED_LIMITS = {
+    "Unlimited": None,
+    "10 MB/s": 10 * 1024 * 1024,
+    "5 MB/s": 5 * 1024 * 1024,
+    "2 MB/s": 2 * 1024 * 1024,
+    "1 MB/s": 1024 * 1024,
+    "500 KB/s": 500 * 1024,
+}
+
+
 class SimpleYTDownloader:
     def __init__(self):
         # Set appearance
@@ -32,17 +45,42 @@ class SimpleYTDownloader:
         self.root.geometry("800x700")
         self.root.minsize(600, 500)
         
-        # Check dependencies before proceeding
-        self.dependency_checker = DependencyChecker()
-        dependency_results = self.dependency_checker.check_all_dependencies()
-        
         # Initialize downloader
         self.downloader = VideoDownloader()
+        self.dependency_checker = self.downloader.dependency_checker
         
         self.setup_ui()
         self.setup_menu()
         
-        # Show dependency warning if needed
+        # Pick up downloads interrupted by a crash or forced exit
+        resumed = self.downloader.resume_interrupted_jobs(
+            progress_callback=self._progress_callback,
+            done_callback=self._job_done
+        )
+        if resumed:
+            self.status_label.configure(text=f"♻️ Resuming {len(resumed)} interrupted download(s)...")
+        
+        # Probe dependencies once the window is up instead of blocking startup
+        self.root.after(DEPENDENCY_PROBE_DELAY_MS, self._start_dependency_probe)
+        
+    def _start_dependency_probe(self):
+        """Run the dependency check off the UI thread"""
+        thread = threading.Thread(target=self._dependency_probe_thread, name='dependency-probe', daemon=True)
+        thread.start()
+        
+    def _dependency_probe_thread(self):
+        dependency_results = self.dependency_checker.check_all_dependencies(
+            on_result=lambda kind, name, entry: self.root.after(0, self._dependency_probe_result, entry)
+        )
+        self.root.after(0, self._dependency_probe_done, dependency_results)
+        
+    def _dependency_probe_result(self, entry):
+        """Flag a missing component as soon as its probe finishes"""
+        if entry['available'] is False and entry['required']:
+            self.status_label.configure(text=f"⚠️ {entry['message']}")
+        
+    def _dependency_probe_done(self, dependency_results):
+        """Show dependency warning if needed"""
         if not dependency_results['all_ok']:
             self.show_dependency_warning(dependency_results)
         
@@ -195,7 +233,29 @@ class SimpleYTDownloader:
             font=ctk.CTkFont(size=13),
             height=35
         )
-        self.format_menu.pack(fill="x", padx=20, pady=(0, 20))
+        self.format_menu.pack(fill="x", padx=20, pady=(0, 10))
+        
+        # Total download speed limit, applied immediately to running downloads too
+        ctk.CTkLabel(
+            options_container,
+            text="Speed limit:",
+            font=ctk.CTkFont(size=13, weight="bold")
+        ).pack(anchor="w", padx=20, pady=(10, 5))
+        
+        self.speed_limit_var = ctk.StringVar(value="Unlimited")
+        self.speed_limit_menu = ctk.CTkOptionMenu(
+            options_container,
+            variable=self.speed_limit_var,
+            values=list(SPEED_LIMITS),
+            command=self.set_speed_limit,
+            font=ctk.CTkFont(size=13),
+            height=35
+        )
+        self.speed_limit_menu.pack(fill="x", padx=20, pady=(0, 20))
+        
+    def set_speed_limit(self, choice):
+        """Apply the selected total speed limit to the bandwidth governor"""
+        self.downloader.governor.set_global_limit(SPEED_LIMITS.get(choice))
         
     def create_download_button(self):
         """Create prominent download button"""
@@ -292,7 +352,7 @@ class SimpleYTDownloader:
             self.status_label.configure(text=f"❌ Error opening folder: {str(e)}")
             
     def start_download(self):
-        """Start video download"""
+        """Queue video download on the downloader's worker pool"""
         url = self.url_entry.get().strip()
         if not url:
             self.status_label.configure(text="❌ Please enter a video URL")
@@ -311,83 +371,68 @@ class SimpleYTDownloader:
             quality = quality.lower()  # "1080p" -> "1080p"
             
         # Update UI
-        self.download_btn.configure(state="disabled", text="⬇️ DOWNLOADING...")
         self.progress_bar.set(0)
         self.progress_label.configure(text="0%")
         self.status_label.configure(text="🚀 Starting download...")
         self.info_label.configure(text=f"Format: {format_choice} | Quality: {quality}")
         
-        # Start download in thread
-        thread = threading.Thread(
-            target=self._download_thread,
-            args=(url, quality, format_choice),
-            daemon=True
+        # Queue download on the shared worker pool
+        job = self.downloader.submit(
+            url,
+            quality,
+            format_choice,
+            progress_callback=self._progress_callback,
+            done_callback=self._job_done
         )
-        thread.start()
         
-    def _download_thread(self, url, quality, format_choice):
-        """Download thread"""
-        try:
-            result = self.downloader.download_video_with_format(
-                url,
-                quality,
-                format_choice,
-                progress_callback=self._progress_callback
-            )
-            
-            # Update UI on main thread
-            self.root.after(0, self._download_finished, result)
-            
-        except Exception as e:
-            self.root.after(0, self._download_error, str(e))
+        queue = self.downloader.get_queue()
+        if queue.active_count() >= queue.max_workers:
+            self.status_label.configure(text=f"⏳ Queued (#{job.job_id}), waiting for a free slot...")
+        
+    def _job_done(self, job):
+        """Queue callback when a job reaches a final state"""
+        # Update UI on main thread
+        self.root.after(0, self._download_finished, job.result)
             
     def _progress_callback(self, progress_info):
-        """Handle progress updates"""
-        print(f"GUI received progress callback: {progress_info}")
+        """Handle progress updates (already rate limited by the progress bus)"""
         self.root.after(0, self._update_progress, progress_info)
         
     def _update_progress(self, progress_info):
         """Update progress display"""
-        print(f"GUI updating progress with: {progress_info}")
         status = progress_info.get('status', '')
         
         if status == 'downloading':
             # Update progress bar and percentage
-            percentage_str = progress_info.get('percentage', '0%')
-            print(f"Processing percentage string: '{percentage_str}'")
-            
-            try:
-                # Remove % and any extra characters
-                percentage_clean = percentage_str.replace('%', '').strip()
-                percentage = float(percentage_clean)
-                
-                # Update progress bar (0-1 scale)
-                progress_value = min(max(percentage / 100, 0), 1)  # Clamp between 0-1
-                self.progress_bar.set(progress_value)
-                self.progress_label.configure(text=f"{percentage:.1f}%")
-                
-                print(f"Progress bar updated to: {percentage:.1f}% (value: {progress_value})")
-                
-            except (ValueError, TypeError) as e:
-                print(f"Error parsing percentage '{percentage_str}': {e}")
-                # Set some progress anyway
+            fraction = progress_info.get('fraction')
+            if fraction is not None:
+                self.progress_bar.set(fraction)
+                self.progress_label.configure(text=format_percentage(fraction))
+            else:
                 self.progress_label.configure(text="Downloading...")
                 
             # Update status and info
-            speed = progress_info.get('speed', 'Unknown')
-            filename = progress_info.get('filename', 'downloading...')
+            speed = format_speed(progress_info.get('speed'))
+            eta = format_eta(progress_info.get('eta'))
+            filename = progress_info.get('filename') or 'downloading...'
             
-            self.status_label.configure(text=f"⬇️ Downloading: {os.path.basename(filename)}")
-            self.info_label.configure(text=f"Speed: {speed} | File: {os.path.basename(filename)}")
+            self.status_label.configure(text=f"⬇️ Downloading: {filename}")
+            self.info_label.configure(text=f"Speed: {speed} | ETA: {eta} | File: {filename}")
             
         elif status == 'finished':
-            print("Setting progress to 100%")
             self.progress_bar.set(1.0)
             self.progress_label.configure(text="100%")
             filename = progress_info.get('filename', '')
             self.status_label.configure(text=f"✅ Download completed!")
-            self.info_label.configure(text=f"Saved: {os.path.basename(filename)}")
-            print("Download finished - GUI updated!")
+            self.info_label.configure(text=f"Saved: {filename}")
+            
+        elif status in ('transcode_queued', 'transcoding'):
+            # Transfer is done, the format conversion waits for or runs on a CPU worker
+            target = progress_info.get('format', '')
+            waiting = status == 'transcode_queued'
+            self.status_label.configure(text=f"⏳ Waiting to convert to {target}" if waiting
+                                        else f"🎛️ Converting to {target}...")
+            self.info_label.configure(text=f"File: {progress_info.get('filename', '')}")
             
     def _download_finished(self, result):
         """Handle download completion"""
@@ -405,14 +450,6 @@ class SimpleYTDownloader:
             self.status_label.configure(text=f"❌ Download failed: {error_msg}")
             self.info_label.configure(text="Please try again")
             
-    def _download_error(self, error):
-        """Handle download error"""
-        self.download_btn.configure(state="normal", text="⬇️ DOWNLOAD VIDEO")
-        self.progress_bar.set(0)
-        self.progress_label.configure(text="0%")
-        self.status_label.configure(text=f"❌ Error: {error}")
-        self.info_label.configure(text="Please check the URL and try again")
-    
     def show_dependency_warning(self, dependency_results):
         """Show warning dialog for missing dependencies"""
         import tkinter.messagebox as msgbox
@@ -421,13 +458,13 @@ class SimpleYTDownloader:
         
         # Collect missing system dependencies
         for dep_name, info in dependency_results['system'].items():
-            if not info['available'] and info['required']:
+            if info['available'] is False and info['required']:
                 missing_deps.append(f"• {info['description']}")
         
         # Collect missing Python dependencies
         python_missing = []
         for module_name, info in dependency_results['python'].items():
-            if not info['available'] and info['required']:
+            if info['available'] is False and info['required']:
                 missing_deps.append(f"• {info['description']}")
                 python_missing.append(info['package'])
         
@@ -459,7 +496,7 @@ class SimpleYTDownloader:
                 "✅ Všechny požadované komponenty jsou dostupné!\n\nAplikace je připravena k použití."
             )
         else:
-            report = self.dependency_checker.get_missing_dependencies_report()
+            report = self.dependency_checker.get_missing_dependencies_report(results)
             msgbox.showerror(
                 "Chybějící komponenty",
                 report
@@ -0,0 +1,10 @@
+"""
+Shared pytest fixtures
+"""
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_data_dir(tmp_path, monkeypatch):
+    """Keep caches, journals and other per-user state out of the real profile"""
+    monkeypatch.setenv("YTDL_PRO_DATA_DIR", str(tmp_path / "app_data"))
@@ -0,0 +1,212 @@
+"""
+Unit tests for the asyncio downloader API
+"""
+import pytest
+import asyncio
+import os
+import sys
+import tempfile
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add src to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from core.async_downloader import AsyncVideoDownloader
+
+
+class FakeDownloader:
+    """Blocking downloader stand-in that records threads, concurrency and cancellation"""
+
+    def __init__(self, steps=3, step_time=0.01):
+        self.steps = steps
+        self.step_time = step_time
+        self.threads = set()
+        self.running = 0
+        self.max_running = 0
+        self.cleaned_up = []
+        self.m3u8_calls = []
+        self.started = threading.Event()
+        self.info_gate = None
+        self._lock = threading.Lock()
+
+    def get_video_info(self, url):
+        self.threads.add(threading.current_thread().name)
+        if self.info_gate is not None:
+            self.info_gate.wait(5)
+        return {'title': 'Video', 'url': url}
+
+    def download_video_with_format(self, url, quality='best', format_choice='MP4',
+                                   progress_callback=None, cancel_event=None, **options):
+        self.threads.add(threading.current_thread().name)
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        self.started.set()
+        try:
+            for step in range(1, self.steps + 1):
+                if cancel_event is not None and cancel_event.is_set():
+                    self.cleaned_up.append(url)
+                    return {'success': False, 'error': 'Stahování bylo zrušeno', 'cancelled': True}
+                time.sleep(self.step_time)
+                if progress_callback:
+                    progress_callback({'status': 'downloading', 'fraction': step / self.steps})
+            if progress_callback:
+                progress_callback({'status': 'finished', 'filename': '001-Video.mp4'})
+            return {'success': True, 'options': options, 'quality': quality}
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def _download_m3u8(self, url, progress_callback=None, cancel_event=None, bandwidth_key=None):
+        self.m3u8_calls.append(url)
+        return {'success': True}
+
+    def close(self):
+        pass
+
+
+class TestAsyncVideoDownloader:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.fake = FakeDownloader()
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def run(self, coroutine_function):
+        async def main():
+            async with AsyncVideoDownloader(self.fake, max_concurrent=2) as downloader:
+                return await coroutine_function(downloader)
+        return asyncio.run(main())
+
+    def test_calls_run_off_the_event_loop(self):
+        """Test info and downloads run on the executor and options are passed on"""
+        async def scenario(downloader):
+            info = await downloader.get_video_info('https://example.com/a')
+            result = await downloader.download_video_with_format('https://example.com/a', '720p',
+                                                                 connections=4)
+            return info, result
+
+        info, result = self.run(scenario)
+
+        assert info['title'] == 'Video'
+        assert result == {'success': True, 'options': {'connections': 4}, 'quality': '720p'}
+        assert all(name.startswith('async-download') for name in self.fake.threads)
+
+    def test_progress_iterator(self):
+        """Test progress events arrive in order on the loop and end with the job"""
+        async def scenario(downloader):
+            download = downloader.start('https://example.com/a')
+            events = [event async for event in download.progress()]
+            return events, await download
+
+        events, result = self.run(scenario)
+
+        assert result['success'] is True
+        assert events[-1]['status'] == 'finished'
+        fractions = [event['fraction'] for event in events if event['status'] == 'downloading']
+        assert fractions == sorted(fractions) and fractions[-1] == 1.0
+
+    def test_slow_consumer_gets_latest_progress(self):
+        """Test unread transfer updates are coalesced, status changes are kept"""
+        self.fake.steps = 50
+        self.fake.step_time = 0
+
+        async def scenario(downloader):
+            download = downloader.start('https://example.com/a')
+            await download
+            return [event async for event in download.progress()]
+
+        events = self.run(scenario)
+
+        assert [event['status'] for event in events] == ['downloading', 'finished']
+        assert events[0]['fraction'] == 1.0
+
+    def test_progress_callback_runs_on_loop(self):
+        """Test plain callbacks are invoked on the event loop thread"""
+        threads = []
+
+        async def scenario(downloader):
+            await downloader.download_video_with_format(
+                'https://example.com/a', progress_callback=lambda event: threads.append(threading.get_ident()))
+            await asyncio.sleep(0)
+            return threading.get_ident()
+
+        loop_thread = self.run(scenario)
+
+        assert threads and set(threads) == {loop_thread}
+
+    def test_cancel_stops_download(self):
+        """Test cancelling a task sets the job's cancel event and waits for its cleanup"""
+        self.fake.steps = 1000
+
+        async def scenario(downloader):
+            download = downloader.start('https://example.com/a')
+            while not self.fake.started.is_set():
+                await asyncio.sleep(0.01)
+            download.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await download
+            # Cleanup has finished by the time the cancellation is raised
+            return list(self.fake.cleaned_up), self.fake.running
+
+        cleaned_up, running = self.run(scenario)
+
+        assert cleaned_up == ['https://example.com/a']
+        assert running == 0
+
+    def test_waiting_jobs_hold_no_thread(self):
+        """Test jobs beyond max_concurrent wait as coroutines and all complete"""
+        async def scenario(downloader):
+            downloads = [downloader.start(f'https://example.com/{index}') for index in range(20)]
+            return await asyncio.gather(*downloads)
+
+        results = self.run(scenario)
+
+        assert all(result['success'] for result in results)
+        assert self.fake.max_running == 2
+        assert len(self.fake.threads) <= 2
+
+    def test_close_drops_queued_calls(self):
+        """Test closing cancels calls still waiting for an executor thread"""
+        self.fake.info_gate = threading.Event()
+
+        async def main():
+            downloader = AsyncVideoDownloader(self.fake, max_concurrent=1)
+            # A cancelled lookup frees its slot while its thread keeps running
+            lookup = asyncio.ensure_future(downloader.get_video_info('https://example.com/a'))
+            await asyncio.sleep(0.05)
+            lookup.cancel()
+            queued = asyncio.ensure_future(downloader.get_video_info('https://example.com/b'))
+            await asyncio.sleep(0.05)
+            await downloader.close()
+            self.fake.info_gate.set()
+            with pytest.raises(asyncio.CancelledError):
+                await queued
+
+        asyncio.run(main())
+
+    def test_custom_executor_and_m3u8(self):
+        """Test a supplied executor is used and left open, and the HLS path is reachable"""
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='service-io')
+
+        async def main():
+            async with AsyncVideoDownloader(self.fake, executor=executor) as downloader:
+                return await downloader.download_m3u8('https://example.com/live.m3u8?token=1')
+
+        result = asyncio.run(main())
+        assert executor.submit(lambda: True).result()
+        executor.shutdown()
+
+        assert result['success'] is True
+        assert self.fake.m3u8_calls == ['https://example.com/live.m3u8?token=1']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
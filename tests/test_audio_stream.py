@@ -0,0 +1,215 @@
+"""
+Unit tests for the streaming MP3 encoder
+"""
+import pytest
+import os
+import sys
+import tempfile
+import shutil
+import threading
+from functools import partial
+from unittest.mock import patch
+
+# Add src and benchmarks to path for testing
+PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'benchmarks'))
+
+from core.audio_stream import StreamingEncoder, StreamEncodeError, StreamEncodeCancelled, pick_stream_format
+from core.downloader import VideoDownloader
+from media_server import MediaServer
+
+
+# Stands in for ffmpeg: copies stdin to the output file, or fails after
+# reading a little when FAKE_FFMPEG_FAIL is set
+FAKE_FFMPEG = """#!{python}
+import os, shutil, sys
+if os.environ.get('FAKE_FFMPEG_FAIL'):
+    sys.stdin.buffer.read(1024)
+    sys.stderr.write('Invalid data found when processing input\\n')
+    sys.exit(1)
+with open(sys.argv[-1], 'wb') as out:
+    shutil.copyfileobj(sys.stdin.buffer, out)
+"""
+
+AUDIO_SIZE = 1024 * 1024
+
+
+def audio_format(url, **fields):
+    fmt = {'format_id': '251', 'url': url, 'protocol': 'http', 'ext': 'webm',
+           'vcodec': 'none', 'acodec': 'opus', 'abr': 130, 'filesize': AUDIO_SIZE}
+    fmt.update(fields)
+    return fmt
+
+
+class RangeIgnoringSession:
+    """Session whose server honours the first Range request only, then answers 200"""
+
+    def __init__(self):
+        import requests
+        self.session = requests.Session()
+        self.ranges = []
+
+    def get(self, url, headers=None, **kwargs):
+        headers = dict(headers or {})
+        self.ranges.append(headers.get('Range'))
+        if len(self.ranges) > 1:
+            headers.pop('Range', None)
+        return self.session.get(url, headers=headers, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class TestStreamingEncoder:
+
+    def setup_method(self):
+        """Setup test environment"""
+        import requests
+        self.temp_dir = tempfile.mkdtemp()
+        self.ffmpeg = os.path.join(self.temp_dir, 'ffmpeg')
+        with open(self.ffmpeg, 'w', encoding='utf-8') as f:
+            f.write(FAKE_FFMPEG.format(python=sys.executable))
+        os.chmod(self.ffmpeg, 0o755)
+        self.server = MediaServer().start()
+        self.url = self.server.video_url('audio', size=AUDIO_SIZE)
+        self.payload = requests.get(self.url).content
+        self.encoder = StreamingEncoder(ffmpeg=self.ffmpeg, chunk_size=64 * 1024)
+        self.output = os.path.join(self.temp_dir, '001-Talk.mp3')
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        self.encoder.close()
+        self.server.stop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_pick_stream_format(self):
+        """Test plain HTTP audio is preferred, pipe-friendly containers first"""
+        formats = [
+            audio_format('https://a/m4a', ext='m4a', acodec='mp4a', abr=160),
+            audio_format('https://a/opus', abr=130),
+            audio_format('https://a/dash', protocol='http_dash_segments', abr=256),
+            audio_format('https://a/video', vcodec='avc1'),
+        ]
+        assert pick_stream_format(formats)['url'] == 'https://a/opus'
+        assert pick_stream_format(formats[:1])['url'] == 'https://a/m4a'
+        assert pick_stream_format([audio_format('https://a/hls', protocol='m3u8_native')]) is None
+
+    def test_stream_is_encoded_while_downloading(self):
+        """Test every byte reaches the encoder and only the final file is left"""
+        events = []
+
+        downloaded = self.encoder.encode(self.url, self.output, total=AUDIO_SIZE,
+                                         progress_callback=events.append)
+
+        assert downloaded == AUDIO_SIZE
+        with open(self.output, 'rb') as f:
+            assert f.read() == self.payload
+        assert sorted(os.listdir(self.temp_dir)) == ['001-Talk.mp3', 'ffmpeg']
+        assert events[-1]['fraction'] == 1.0
+        assert events[-1]['filename'] == '001-Talk.mp3'
+
+    def test_ranged_requests(self):
+        """Test a chunk size splits the transfer into consecutive Range requests"""
+        requests_before = self.server.requests
+
+        self.encoder.encode(self.url, self.output, total=AUDIO_SIZE, range_size=256 * 1024)
+
+        assert self.server.requests - requests_before == 4
+        with open(self.output, 'rb') as f:
+            assert f.read() == self.payload
+
+    def test_ignored_range_restarts_from_offset(self):
+        """Test a 200 answer to a later Range request is not appended to the bytes already sent"""
+        session = RangeIgnoringSession()
+        encoder = StreamingEncoder(ffmpeg=self.ffmpeg, session=session, chunk_size=64 * 1024)
+
+        encoder.encode(self.url, self.output, total=AUDIO_SIZE, range_size=300 * 1024)
+        session.close()
+
+        assert session.ranges == ['bytes=0-307199', 'bytes=307200-614399']
+        with open(self.output, 'rb') as f:
+            assert f.read() == self.payload
+
+    def test_encoder_failure_leaves_no_file(self):
+        """Test an ffmpeg error is raised for the fallback and cleans up"""
+        with patch.dict(os.environ, {'FAKE_FFMPEG_FAIL': '1'}):
+            with pytest.raises(StreamEncodeError):
+                self.encoder.encode(self.url, self.output)
+
+        assert sorted(os.listdir(self.temp_dir)) == ['ffmpeg']
+
+    def test_http_error_is_stream_error(self):
+        """Test a failed request ends as StreamEncodeError"""
+        self.server.config.error_rate = 1.0
+
+        with pytest.raises(StreamEncodeError):
+            self.encoder.encode(self.url, self.output)
+
+    def test_cancel(self):
+        """Test cancelling stops the transfer and the encoder"""
+        cancel_event = threading.Event()
+
+        def cancel_after_first_chunk(event):
+            cancel_event.set()
+
+        with pytest.raises(StreamEncodeCancelled):
+            self.encoder.encode(self.url, self.output, progress_callback=cancel_after_first_chunk,
+                                cancel_event=cancel_event)
+        assert not os.path.exists(self.output)
+
+
+class TestDownloaderStreaming:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.ffmpeg = os.path.join(self.temp_dir, 'ffmpeg')
+        with open(self.ffmpeg, 'w', encoding='utf-8') as f:
+            f.write(FAKE_FFMPEG.format(python=sys.executable))
+        os.chmod(self.ffmpeg, 0o755)
+        self.output_dir = os.path.join(self.temp_dir, 'out')
+        self.downloader = VideoDownloader(self.output_dir)
+        self.server = MediaServer().start()
+        self.url = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        self.server.stop()
+        self.downloader.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def cache_info(self, formats):
+        info = {'id': 'dQw4w9WgXcQ', 'title': 'Talk', 'ext': 'webm', 'extractor_key': 'Youtube',
+                'extractor': 'youtube', 'webpage_url': self.url, 'formats': formats}
+        self.downloader.metadata_cache.put(self.url, info, [])
+
+    @patch('core.downloader.VideoDownloader.check_ffmpeg', return_value=True)
+    def test_mp3_job_streams_into_encoder(self, mock_ffmpeg):
+        """Test an MP3 job writes the numbered MP3 directly and archives the video"""
+        self.cache_info([audio_format(self.server.video_url('talk', size=AUDIO_SIZE))])
+        self.downloader.use_archive = False
+
+        with patch('core.downloader.StreamingEncoder', partial(StreamingEncoder, ffmpeg=self.ffmpeg)), \
+             patch.object(self.downloader, '_run_ytdlp_download') as mock_download:
+            result = self.downloader._download_with_ytdlp(self.url, 'best', 'MP3')
+
+        mock_download.assert_not_called()
+        assert result['success'] is True
+        assert result['filename'] == os.path.join(self.output_dir, '001-Talk.mp3')
+        assert os.path.getsize(result['filename']) == AUDIO_SIZE
+        # No intermediate audio file next to the MP3 (dot files belong to the file counter)
+        assert [name for name in os.listdir(self.output_dir) if not name.startswith('.')] == ['001-Talk.mp3']
+        assert self.downloader.archive.contains('Youtube', 'dQw4w9WgXcQ')
+
+    @patch('core.downloader.VideoDownloader.check_ffmpeg', return_value=True)
+    def test_fragmented_audio_falls_back(self, mock_ffmpeg):
+        """Test formats that cannot be piped leave the job to download + convert"""
+        self.cache_info([audio_format('https://a/dash', protocol='http_dash_segments')])
+
+        assert self.downloader._stream_mp3(self.url, os.path.join(self.output_dir, '%(title)s.%(ext)s'),
+                                           None) is None
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,168 @@
+"""
+Unit tests for the bandwidth governor
+"""
+import pytest
+import os
+import sys
+import tempfile
+import shutil
+import threading
+import time
+
+# Add src and benchmarks to path for testing
+PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'benchmarks'))
+
+from core.bandwidth import BandwidthGovernor, TokenBucket, parse_rate
+from core.hls import HLSDownloader
+
+
+class TestBandwidthGovernor:
+
+    def test_parse_rate(self):
+        """Test rate strings with unit suffixes"""
+        assert parse_rate('500K') == 500 * 1024
+        assert parse_rate('2.5M') == 2.5 * 1024 * 1024
+        assert parse_rate('1MiB/s') == 1024 * 1024
+        assert parse_rate(2048) == 2048
+        assert parse_rate('0') is None
+        assert parse_rate('unlimited') is None
+        with pytest.raises(ValueError):
+            parse_rate('fast')
+
+    def test_bucket_starts_with_burst(self):
+        """Test a fresh bucket allows half a second of data without waiting"""
+        bucket = TokenBucket(1024 * 1024)
+        bucket.consume(512 * 1024)
+        assert bucket.delay() == 0.0
+        bucket.consume(256 * 1024)
+        assert 0.2 < bucket.delay() <= 0.25
+
+    def test_unlimited_never_waits(self):
+        """Test the default governor lets every chunk through at once"""
+        governor = BandwidthGovernor()
+        started = time.monotonic()
+        for _ in range(1000):
+            governor.throttle(1024 * 1024, 'example.com', 'job')
+        assert time.monotonic() - started < 0.5
+
+    def test_global_limit_paces_transfers(self):
+        """Test chunks beyond the burst wait for the global budget"""
+        governor = BandwidthGovernor(global_limit=1024 * 1024)
+        started = time.monotonic()
+        # Burst covers half a second, the rest has to be waited off
+        for _ in range(16):
+            governor.throttle(64 * 1024)
+        elapsed = time.monotonic() - started
+        assert 0.35 < elapsed < 1.0
+
+    def test_job_limit_is_per_job(self):
+        """Test the default job limit gives every job its own bucket"""
+        governor = BandwidthGovernor(job_limit=1024 * 1024)
+        started = time.monotonic()
+        governor.throttle(1024 * 1024, job_key='a')
+        assert time.monotonic() - started > 0.35
+
+        started = time.monotonic()
+        governor.throttle(256 * 1024, job_key='b')
+        assert time.monotonic() - started < 0.1
+
+    def test_host_limit_only_applies_to_host(self):
+        """Test per-host buckets do not slow other hosts"""
+        governor = BandwidthGovernor(host_limits={'slow.example': 64 * 1024})
+        started = time.monotonic()
+        governor.throttle(256 * 1024, 'fast.example')
+        assert time.monotonic() - started < 0.1
+
+        started = time.monotonic()
+        governor.throttle(96 * 1024, 'SLOW.example')
+        assert time.monotonic() - started > 0.3
+
+    def test_host_limit_covers_subdomains(self):
+        """Test a domain limit applies to transfers from its media servers"""
+        governor = BandwidthGovernor(host_limits={'www.googlevideo.com': 64 * 1024})
+        meter = governor.meter('job', 'https://www.youtube.com/watch?v=1')
+
+        assert governor.host_limits() == {'googlevideo.com': 64 * 1024}
+        started = time.monotonic()
+        meter.consume(96 * 1024, 'https://rr3---sn-4g5e6nzz.googlevideo.com/videoplayback?itag=22')
+        assert time.monotonic() - started > 0.3
+
+        started = time.monotonic()
+        meter.consume(256 * 1024)
+        assert time.monotonic() - started < 0.1
+
+    def test_raising_limit_releases_waiting_transfer(self):
+        """Test a limit change applies to transfers that are already waiting"""
+        governor = BandwidthGovernor(global_limit=64 * 1024)
+        waiter = threading.Thread(target=governor.throttle, args=(10 * 1024 * 1024,))
+        waiter.start()
+        time.sleep(0.1)
+        assert waiter.is_alive()
+
+        governor.set_global_limit(None)
+        waiter.join(1.0)
+        assert not waiter.is_alive()
+
+    def test_cancel_stops_waiting(self):
+        """Test a cancelled job does not sit out its debt"""
+        governor = BandwidthGovernor(job_limit=64 * 1024)
+        cancel_event = threading.Event()
+        threading.Timer(0.1, cancel_event.set).start()
+        started = time.monotonic()
+        governor.throttle(10 * 1024 * 1024, job_key='job', cancel_event=cancel_event)
+        assert time.monotonic() - started < 1.0
+
+    def test_meter_charges_ytdlp_progress_growth(self):
+        """Test the yt-dlp hook charges only newly downloaded bytes"""
+        charged = []
+
+        class RecordingGovernor(BandwidthGovernor):
+            def throttle(self, amount, host=None, job_key=None, cancel_event=None):
+                charged.append((amount, host, job_key))
+
+        meter = RecordingGovernor().meter('job', 'https://www.example.com/watch?v=1')
+        for downloaded in (100, 300, 300, 50):
+            meter.progress_hook({'status': 'downloading', 'downloaded_bytes': downloaded,
+                                 'tmpfilename': 'a.part',
+                                 'info_dict': {'url': 'https://cdn.example.net/v.mp4'}})
+        meter.progress_hook({'status': 'finished', 'downloaded_bytes': 400})
+
+        assert charged == [(100, 'cdn.example.net', 'job'), (200, 'cdn.example.net', 'job')]
+
+
+class TestThrottledHLS:
+
+    def setup_method(self):
+        """Setup test environment"""
+        from media_server import MediaServer
+        self.temp_dir = tempfile.mkdtemp()
+        self.server = MediaServer().start()
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        self.server.stop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_segments_respect_job_limit(self):
+        """Test the HLS engine is paced by the governor per chunk"""
+        governor = BandwidthGovernor()
+        governor.set_job_limit('job', 512 * 1024)
+        engine = HLSDownloader(max_workers=4, meter=governor.meter('job', self.server.base_url))
+        output = os.path.join(self.temp_dir, 'out.ts')
+        started = time.monotonic()
+        try:
+            result = engine.download(self.server.hls_url('s', segments=8, segment_size=64 * 1024), output)
+        finally:
+            engine.close()
+        elapsed = time.monotonic() - started
+
+        # 512 KiB at 512 KiB/s minus the half-second burst
+        assert result['bytes'] == 8 * 64 * 1024
+        assert elapsed > 0.4
+        assert os.path.getsize(output) == result['bytes']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
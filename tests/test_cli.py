@@ -0,0 +1,151 @@
+"""
+Unit tests for the headless batch CLI
+"""
+import pytest
+import io
+import json
+import os
+import sys
+import tempfile
+import shutil
+import threading
+from unittest.mock import patch
+
+# Add src to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from cli.batch import main, iter_urls, follow_urls, EXIT_OK, EXIT_FAILED, EXIT_USAGE
+
+
+def fake_download(self, url, quality='best', format_choice='MP4', progress_callback=None,
+                  cancel_event=None, **kwargs):
+    progress_callback({'status': 'downloading', 'downloaded_bytes': 50,
+                       'total_bytes': 100, 'fraction': 0.5})
+    if 'fail' in url:
+        return {'success': False, 'error': 'boom'}
+    return {'success': True, 'filename': url.rsplit('/', 1)[-1]}
+
+
+class TestCli:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def run_cli(self, argv, stdin=''):
+        stdout = io.StringIO()
+        with patch('core.downloader.VideoDownloader.download_video_with_format', fake_download), \
+             patch('sys.stdout', stdout), patch('sys.stdin', io.StringIO(stdin)):
+            code = main(argv + ['--output', self.temp_dir])
+        return code, [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+    def test_iter_urls_skips_blank_and_comments(self):
+        """Test URL lists ignore blank lines and comments"""
+        stream = io.StringIO("https://a\n\n  # skipped\n  https://b  \n")
+        assert list(iter_urls(stream)) == ['https://a', 'https://b']
+
+    def test_urls_from_file_and_stdin(self):
+        """Test URLs are read from files and stdin and reported as JSON lines"""
+        url_file = os.path.join(self.temp_dir, 'urls.txt')
+        with open(url_file, 'w', encoding='utf-8') as f:
+            f.write("https://example.com/one\n# comment\nhttps://example.com/two\n")
+
+        code, events = self.run_cli(['-i', url_file, '-i', '-'], stdin="https://example.com/three\n")
+
+        assert code == EXIT_OK
+        queued = sorted(e['url'] for e in events if e['event'] == 'queued')
+        assert queued == ['https://example.com/one', 'https://example.com/three',
+                          'https://example.com/two']
+        done = [e for e in events if e['event'] == 'done']
+        assert len(done) == 3
+        assert all(e['success'] for e in done)
+        progress = [e for e in events if e['event'] == 'progress']
+        assert progress and progress[0]['fraction'] == 0.5
+        assert events[-1]['event'] == 'summary'
+        assert events[-1]['done'] == 3
+
+    def test_failure_sets_exit_code(self):
+        """Test a failed job is reported and makes the exit code non-zero"""
+        code, events = self.run_cli(['https://example.com/fail', '--no-progress'])
+
+        assert code == EXIT_FAILED
+        assert not any(e['event'] == 'progress' for e in events)
+        done = [e for e in events if e['event'] == 'done'][0]
+        assert done['state'] == 'failed'
+        assert done['error'] == 'boom'
+        assert events[-1]['failed'] == 1
+
+    def test_rate_limits_from_flags_and_directives(self):
+        """Test bandwidth limits come from options and can be changed by input lines"""
+        code, events = self.run_cli(['--limit-rate', '2M', '--host-limit-rate', 'cdn.example=500K',
+                                     '-i', '-', '--no-progress'],
+                                    stdin="@job-limit-rate 1M\n@limit-rate 4M\n@bogus 1\n")
+
+        assert code == EXIT_OK
+        limits = [e for e in events if e['event'] == 'limits']
+        assert limits[0]['host_limits'] == {'cdn.example': 500 * 1024}
+        assert limits[0]['global_limit'] == 2 * 1024 * 1024
+        assert limits[0]['job_limit'] == 1024 * 1024
+        assert limits[-1]['global_limit'] == 4 * 1024 * 1024
+        errors = [e for e in events if e['event'] == 'error']
+        assert errors and errors[0]['directive'] == '@bogus 1'
+        assert not any(e['event'] == 'queued' for e in events)
+
+    def test_no_urls_is_usage_error(self):
+        """Test running without any URL source exits with a usage error"""
+        with patch('sys.stderr', io.StringIO()):
+            assert main([]) == EXIT_USAGE
+
+    def test_dedup_scan_mode(self):
+        """Test --dedup-scan reports duplicates of a folder without downloading"""
+        content = os.urandom(128 * 1024)
+        for name in ('001-A.mp4', '002-A.mp4'):
+            with open(os.path.join(self.temp_dir, name), 'wb') as f:
+                f.write(content)
+
+        code, events = self.run_cli(['--dedup-scan', self.temp_dir, '--dedup-dry-run'])
+
+        assert code == EXIT_OK
+        assert events[0]['event'] == 'dedup'
+        assert events[0]['duplicates'] == 1
+        assert events[0]['saved_bytes'] == len(content)
+
+    def test_follow_picks_up_appended_lines(self):
+        """Test daemon mode sees URLs appended after start and stops on request"""
+        url_file = os.path.join(self.temp_dir, 'spool.txt')
+        with open(url_file, 'w', encoding='utf-8') as f:
+            f.write("https://example.com/one\n")
+        stop_event = threading.Event()
+        urls = follow_urls(url_file, stop_event, interval=0.01)
+
+        assert next(urls) == 'https://example.com/one'
+        with open(url_file, 'a', encoding='utf-8') as f:
+            f.write("https://example.com/two\n")
+        assert next(urls) == 'https://example.com/two'
+
+        stop_event.set()
+        assert list(urls) == []
+
+
+
+class TestEntryPoint:
+
+    def test_cli_arguments_route_only_cli_requests(self):
+        """Test options and URLs start the CLI, macOS launch arguments start the GUI"""
+        sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+        from main import cli_arguments
+
+        assert cli_arguments([]) is None
+        assert cli_arguments(['-psn_0_12345']) is None
+        assert cli_arguments(['/Users/me/Movies/clip.mp4']) is None
+        assert cli_arguments(['-psn_0_12345', '--resume']) == ['--resume']
+        assert cli_arguments(['https://example.com/v']) == ['https://example.com/v']
+        assert cli_arguments(['-i', 'urls.txt']) == ['-i', 'urls.txt']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,163 @@
+"""
+Unit tests for output deduplication
+"""
+import pytest
+import os
+import sys
+import tempfile
+import shutil
+from unittest.mock import patch, MagicMock
+
+# Add src to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from core.dedup import Deduplicator, DedupIndex, hash_file, link_duplicate, LINK_METHODS
+from core.downloader import VideoDownloader
+
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    return path
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+class TestDeduplicator:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.library = os.path.join(self.temp_dir, 'library')
+        self.dedup = Deduplicator(DedupIndex(os.path.join(self.temp_dir, 'index.sqlite3')),
+                                  methods=LINK_METHODS, min_size=16)
+        self.video = os.urandom(256 * 1024)
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        self.dedup.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_unique_size_is_not_hashed(self):
+        """Test a file without a same-size partner is indexed without reading it"""
+        path = write_file(os.path.join(self.library, '001-A.mp4'), self.video)
+
+        with patch('core.dedup.hash_file') as mock_hash:
+            result = self.dedup.process_file(path)
+
+        mock_hash.assert_not_called()
+        assert result['duplicate_of'] is None
+        assert self.dedup.index.get(path)['digest'] is None
+
+    def test_duplicate_download_becomes_link(self):
+        """Test a second identical download is replaced by a link to the first"""
+        first = write_file(os.path.join(self.library, '007-Title.mp4'), self.video)
+        second = write_file(os.path.join(self.library, '042-Title.mp4'), self.video)
+
+        self.dedup.process_file(first)
+        result = self.dedup.process_file(second)
+
+        assert result['duplicate_of'] == first
+        assert result['method'] in LINK_METHODS
+        assert result['saved_bytes'] == len(self.video)
+        assert read_file(second) == self.video
+        assert not [name for name in os.listdir(self.library) if name.endswith('.dedup')]
+
+    def test_same_size_different_content_is_kept(self):
+        """Test files that only share their size stay separate"""
+        first = write_file(os.path.join(self.library, '001-A.mp4'), self.video)
+        other = write_file(os.path.join(self.library, '002-B.mp4'), os.urandom(len(self.video)))
+
+        self.dedup.process_file(first)
+        result = self.dedup.process_file(other)
+
+        assert result['duplicate_of'] is None
+        assert not os.path.samefile(first, other)
+        assert self.dedup.index.get(first)['digest'] == hash_file(first)
+
+    def test_default_never_hardlinks(self):
+        """Test without the hardlink opt-in a duplicate stays a file of its own"""
+        first = write_file(os.path.join(self.library, '001-A.mp4'), self.video)
+        second = write_file(os.path.join(self.library, '002-A.mp4'), self.video)
+        dedup = Deduplicator(DedupIndex(os.path.join(self.temp_dir, 'default.sqlite3')), min_size=16)
+
+        dedup.process_file(first)
+        result = dedup.process_file(second)
+        dedup.close()
+
+        assert result['method'] in (None, 'reflink')
+        assert not os.path.samefile(first, second)
+        assert read_file(second) == self.video
+
+    def test_no_working_link_method_keeps_file(self):
+        """Test the duplicate is left alone when no link can be made"""
+        first = write_file(os.path.join(self.library, '001-A.mp4'), self.video)
+        second = write_file(os.path.join(self.library, '002-A.mp4'), self.video)
+
+        assert link_duplicate(first, second, methods=()) is None
+        assert read_file(second) == self.video
+
+    def test_scan_collapses_existing_duplicates(self):
+        """Test a folder scan links copies on a process pool and is idempotent"""
+        copies = [write_file(os.path.join(self.library, sub, f'{n:03d}-Song.mp3'), self.video)
+                  for n, sub in ((1, ''), (5, 'a'), (9, 'b'))]
+        write_file(os.path.join(self.library, '002-Other.mp3'), os.urandom(len(self.video)))
+        write_file(os.path.join(self.library, 'notes.txt'), self.video)
+
+        preview = self.dedup.scan(self.library, workers=2, dry_run=True)
+        assert preview['duplicates'] == 2
+        assert preview['saved_bytes'] == 2 * len(self.video)
+        assert self.dedup.index.get(copies[1]) is None
+
+        summary = self.dedup.scan(self.library, workers=2)
+        assert summary['files'] == 4
+        assert summary['duplicates'] == 2
+        assert summary['errors'] == 0
+        assert all(read_file(path) == self.video for path in copies)
+
+        assert self.dedup.scan(self.library, workers=2)['duplicates'] == 0
+
+
+class TestDownloaderDedup:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.downloader = VideoDownloader(self.temp_dir, deduplicator=Deduplicator(methods=LINK_METHODS))
+        self.downloader.use_archive = False
+        self.downloader.deduplicator.min_size = 16
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        self.downloader.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    @patch('core.downloader.YoutubeDL')
+    def test_final_file_is_deduplicated(self, mock_ytdl_class):
+        """Test the merged output reported by yt-dlp's post hook is linked to an earlier copy"""
+        mock_ytdl = MagicMock()
+        mock_ytdl_class.return_value.__enter__.return_value = mock_ytdl
+        content = os.urandom(64 * 1024)
+        earlier = write_file(os.path.join(self.temp_dir, '001-Video.mp4'), content)
+        self.downloader.deduplicator.process_file(earlier)
+
+        def fake_download(urls):
+            path = write_file(os.path.join(self.temp_dir, '002-Video.mp4'), content)
+            # The pool registers one post hook dispatcher per instance
+            for call in mock_ytdl.add_post_hook.call_args_list:
+                call[0][0](path)
+        mock_ytdl.download.side_effect = fake_download
+
+        result = self.downloader._download_with_ytdlp('https://example.com/video', 'best')
+
+        assert result['success'] is True
+        assert result['duplicate_of'] == earlier
+        assert result['saved_bytes'] == len(content)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,105 @@
+"""
+Unit tests for concurrent dependency probing
+"""
+import pytest
+import os
+import sys
+import time
+import tempfile
+import shutil
+import threading
+from unittest.mock import patch
+
+# Add src to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from core.dependency_checker import DependencyChecker, STATUS_OK, STATUS_MISSING, STATUS_UNKNOWN
+from core.probe_cache import ProbeCache
+
+
+class TestDependencyChecker:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.checker = DependencyChecker(cache=ProbeCache(os.path.join(self.temp_dir, 'probes.json')))
+        self.release = threading.Event()
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        self.release.set()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def slow_python_probe(self, module_name):
+        time.sleep(0.2)
+        return True, f"✅ {module_name}"
+
+    def test_probes_run_concurrently(self):
+        """Test total time is bounded by the slowest probe, not their sum"""
+        with patch.object(self.checker, 'check_system_dependency', return_value=(True, 'ok')), \
+             patch.object(self.checker, 'check_python_dependency', side_effect=self.slow_python_probe):
+            started = time.monotonic()
+            results = self.checker.check_all_dependencies(deadline=5)
+            elapsed = time.monotonic() - started
+
+        assert results['all_ok'] is True
+        assert len(self.checker.python_deps) >= 4
+        assert elapsed < 0.2 * len(self.checker.python_deps)
+
+    def test_deadline_reports_unknown(self):
+        """Test probes still running at the deadline come back as unknown"""
+        def hung_probe(dep_name):
+            self.release.wait(5)
+            return True, 'late'
+
+        with patch.object(self.checker, 'check_system_dependency', side_effect=hung_probe), \
+             patch.object(self.checker, 'check_python_dependency', return_value=(True, 'ok')):
+            started = time.monotonic()
+            results = self.checker.check_all_dependencies(deadline=0.2)
+            elapsed = time.monotonic() - started
+
+        assert elapsed < 2
+        ffmpeg = results['system']['ffmpeg']
+        assert ffmpeg['status'] == STATUS_UNKNOWN
+        assert ffmpeg['available'] is None
+        assert results['unknown'] == ['ffmpeg']
+        assert results['critical_missing'] == []
+        assert results['all_ok'] is False
+        assert all(info['status'] == STATUS_OK for info in results['python'].values())
+
+    def test_results_streamed_as_completed(self):
+        """Test on_result sees the fast probes before the slow one"""
+        seen = []
+
+        def slow_system(dep_name):
+            time.sleep(0.2)
+            return False, 'missing'
+
+        with patch.object(self.checker, 'check_system_dependency', side_effect=slow_system), \
+             patch.object(self.checker, 'check_python_dependency', return_value=(True, 'ok')):
+            results = self.checker.check_all_dependencies(
+                deadline=5, on_result=lambda kind, name, entry: seen.append(name))
+
+        assert seen[-1] == 'ffmpeg'
+        assert list(results['python']) == list(self.checker.python_deps)
+        assert results['system']['ffmpeg']['status'] == STATUS_MISSING
+        assert results['critical_missing'] == ['ffmpeg']
+
+    def test_probe_exception_is_reported(self):
+        """Test a crashing probe is reported instead of stalling until the deadline"""
+        with patch.object(self.checker, 'check_system_dependency', side_effect=RuntimeError('boom')), \
+             patch.object(self.checker, 'check_python_dependency', return_value=(True, 'ok')):
+            results = self.checker.check_all_dependencies(deadline=5)
+
+        assert results['system']['ffmpeg']['status'] == STATUS_MISSING
+        assert 'boom' in results['system']['ffmpeg']['message']
+
+    def test_report_lists_unknown(self):
+        """Test the text report mentions probes that did not finish"""
+        results = {'all_ok': False, 'system': {}, 'python': {}, 'unknown': ['ffmpeg']}
+        report = self.checker.get_missing_dependencies_report(results)
+        assert 'ffmpeg' in report
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,194 @@
+"""
+Unit tests for disk space admission and preallocation
+"""
+import pytest
+import os
+import sys
+import tempfile
+import shutil
+import threading
+import time
+from collections import namedtuple
+from unittest.mock import patch, MagicMock
+
+# Add src to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from core.disk_space import DiskSpaceGuard, DiskSpaceError, parse_size, preallocate
+from core.downloader import VideoDownloader
+from core.hls import parse_playlist, playlist_size
+
+MiB = 1024 * 1024
+Usage = namedtuple('Usage', 'total used free')
+
+
+class FakeDisk:
+    """disk_usage stand-in with adjustable free space"""
+
+    def __init__(self, free):
+        self.free = free
+
+    def __call__(self, path):
+        return Usage(10 * self.free, 0, self.free)
+
+
+class TestDiskSpaceGuard:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.disk = FakeDisk(1000 * MiB)
+        self.guard = DiskSpaceGuard(reserve=100 * MiB, disk_usage=self.disk)
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_parse_size(self):
+        """Test sizes accept the units of the rate options"""
+        assert parse_size('500M') == 500 * MiB
+        assert parse_size('2g') == 2 * 1024 * MiB
+        assert parse_size(0) == 0
+        with pytest.raises(ValueError):
+            parse_size('lots')
+
+    def test_claims_count_against_free_space(self):
+        """Test running jobs' estimates are subtracted before admitting the next one"""
+        first = self.guard.try_acquire(self.temp_dir, 500 * MiB)
+        assert first is not None
+        assert self.guard.projected_free(self.temp_dir) < 500 * MiB
+
+        assert self.guard.try_acquire(self.temp_dir, 500 * MiB) is None
+        assert self.guard.try_acquire(self.temp_dir) is not None  # unknown size needs only the reserve
+
+        self.guard.release(first)
+        self.guard.release(first)  # releasing twice is harmless
+        assert self.guard.try_acquire(self.temp_dir, 500 * MiB) is not None
+
+    def test_waits_for_running_job(self):
+        """Test a job that does not fit yet starts once a running job releases its claim"""
+        running = self.guard.acquire(self.temp_dir, 600 * MiB)
+
+        threading.Timer(0.2, self.guard.release, args=(running,)).start()
+        started = time.monotonic()
+        claim = self.guard.acquire(self.temp_dir, 600 * MiB)
+
+        assert claim is not None
+        assert time.monotonic() - started >= 0.15
+
+    def test_fails_when_nothing_else_runs(self):
+        """Test a job larger than the space above the reserve fails at once"""
+        with pytest.raises(DiskSpaceError):
+            self.guard.acquire(self.temp_dir, 950 * MiB)
+
+        self.disk.free = 50 * MiB
+        with pytest.raises(DiskSpaceError):
+            self.guard.acquire(self.temp_dir)
+
+    def test_cancel_while_waiting(self):
+        """Test cancelling a waiting job returns without a claim"""
+        self.guard.acquire(self.temp_dir, 600 * MiB)
+        cancel_event = threading.Event()
+        threading.Timer(0.1, cancel_event.set).start()
+
+        assert self.guard.acquire(self.temp_dir, 600 * MiB, cancel_event) is None
+
+    def test_is_low(self):
+        """Test sizes are only worth fetching near the reserve"""
+        assert self.guard.is_low(self.temp_dir)
+        self.disk.free = 1024 ** 4
+        assert not self.guard.is_low(self.temp_dir)
+
+    def test_preallocate(self):
+        """Test preallocation sizes the file where supported and is a no-op elsewhere"""
+        path = os.path.join(self.temp_dir, 'file.bin')
+        with open(path, 'wb') as f:
+            allocated = preallocate(f, 4 * MiB)
+        assert os.path.getsize(path) == (4 * MiB if allocated else 0)
+        with open(path, 'wb') as f:
+            assert preallocate(f, 0) is False
+
+    def test_hls_playlist_size(self):
+        """Test segment byte ranges give the exact size of the remaining stream"""
+        playlist = parse_playlist("#EXTM3U\n#EXTINF:4,\n#EXT-X-BYTERANGE:1000@0\nmedia.ts\n"
+                                  "#EXTINF:4,\n#EXT-X-BYTERANGE:500\nmedia.ts\n#EXT-X-ENDLIST\n",
+                                  'https://a/index.m3u8')
+        assert playlist_size(playlist) == 1500
+        assert playlist_size(playlist, start_segment=1) == 500
+        assert playlist_size(parse_playlist("#EXTM3U\n#EXTINF:4,\nseg0.ts\n", 'https://a/')) is None
+
+
+class TestDownloaderAdmission:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.disk = FakeDisk(1000 * MiB)
+        self.downloader = VideoDownloader(self.temp_dir,
+                                          disk_space=DiskSpaceGuard(100 * MiB, disk_usage=self.disk))
+        self.downloader.use_archive = False
+        self.url = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        self.downloader.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def cache_info(self, video_size):
+        formats = [
+            {'format_id': '248', 'height': 1080, 'vcodec': 'vp9', 'acodec': 'none', 'ext': 'webm',
+             'filesize': video_size},
+            {'format_id': '251', 'vcodec': 'none', 'acodec': 'opus', 'abr': 130, 'ext': 'webm',
+             'filesize_approx': 10 * MiB},
+        ]
+        self.downloader.metadata_cache.put(self.url, {'id': 'dQw4w9WgXcQ', 'title': 'Video',
+                                                      'duration': 600, 'formats': formats}, [])
+
+    @patch('core.downloader.YoutubeDL')
+    def test_job_over_free_space_is_rejected_before_writing(self, mock_ytdl_class):
+        """Test a video that would cut into the reserve fails without starting yt-dlp"""
+        self.cache_info(2000 * MiB)
+
+        result = self.downloader._download_with_ytdlp(self.url, '1080p', 'MP4')
+
+        assert result['success'] is False
+        assert 'místa' in result['error']
+        mock_ytdl_class.assert_not_called()
+        assert self.downloader.disk_space.claimed() == 0
+
+    @patch('core.downloader.YoutubeDL')
+    def test_claim_is_held_during_download(self, mock_ytdl_class):
+        """Test the estimate is claimed while yt-dlp runs and released afterwards"""
+        mock_ytdl = MagicMock()
+        mock_ytdl_class.return_value.__enter__.return_value = mock_ytdl
+        claimed = []
+        mock_ytdl.process_ie_result.side_effect = \
+            lambda *args, **kwargs: claimed.append(self.downloader.disk_space.claimed())
+        self.cache_info(400 * MiB)
+
+        result = self.downloader._download_with_ytdlp(self.url, '1080p', 'MP4')
+
+        assert result['success'] is True
+        assert claimed[0] >= 410 * MiB
+        assert self.downloader.disk_space.claimed() == 0
+
+    @patch('core.downloader.YoutubeDL')
+    def test_uncached_video_is_measured_when_space_is_low(self, mock_ytdl_class):
+        """Test metadata is fetched ahead only near the reserve and then reused"""
+        mock_ytdl = MagicMock()
+        mock_ytdl_class.return_value.__enter__.return_value = mock_ytdl
+        info = {'id': 'dQw4w9WgXcQ', 'title': 'Video', 'duration': 600, 'formats': [
+            {'format_id': '22', 'height': 720, 'vcodec': 'avc1', 'acodec': 'mp4a', 'ext': 'mp4',
+             'filesize': 5000 * MiB}]}
+        mock_ytdl.extract_info.return_value = info
+        mock_ytdl.sanitize_info.side_effect = lambda info, **kwargs: info
+
+        result = self.downloader._download_with_ytdlp(self.url, '720p', 'MP4')
+
+        assert result['success'] is False
+        mock_ytdl.extract_info.assert_called_once()
+        assert self.downloader.metadata_cache.get(self.url) is not None
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
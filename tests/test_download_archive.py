@@ -0,0 +1,238 @@
+"""
+Unit tests for the download archive
+"""
+import pytest
+import os
+import sys
+import tempfile
+import shutil
+from unittest.mock import patch, MagicMock
+
+# Add src to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from core.download_archive import DownloadArchive, url_archive_id
+from core.downloader import VideoDownloader
+
+
+VIDEO_URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+
+
+class TestDownloadArchive:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'archive.sqlite3')
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_entries_persist_between_instances(self):
+        """Test archived IDs survive a restart and lookups ignore extractor case"""
+        archive = DownloadArchive(self.path)
+        archive.add('Youtube', 'dQw4w9WgXcQ', VIDEO_URL, 'Title')
+        archive.close()
+
+        archive = DownloadArchive(self.path)
+        assert archive.contains('youtube', 'dQw4w9WgXcQ')
+        assert ('Youtube', 'dQw4w9WgXcQ') in archive
+        assert not archive.contains('Youtube', 'other')
+        assert not archive.contains(None, 'dQw4w9WgXcQ')
+        assert len(archive) == 1
+
+        assert archive.remove('Youtube', 'dQw4w9WgXcQ')
+        assert not archive.contains('Youtube', 'dQw4w9WgXcQ')
+        archive.close()
+
+    def test_entries_are_per_format(self):
+        """Test a video archived in one format is not archived in another"""
+        archive = DownloadArchive(self.path)
+        archive.add('Youtube', 'dQw4w9WgXcQ', fmt='MP4')
+
+        assert archive.contains('Youtube', 'dQw4w9WgXcQ', 'mp4')
+        assert not archive.contains('Youtube', 'dQw4w9WgXcQ', 'mp3')
+        assert archive.contains('Youtube', 'dQw4w9WgXcQ')  # in any format
+
+        archive.add('Youtube', 'any')  # no format, e.g. imported from yt-dlp
+        assert archive.contains('Youtube', 'any', 'mp3')
+        archive.close()
+
+    def test_archive_without_formats_is_migrated(self):
+        """Test entries of an older archive are kept and cover every format"""
+        import sqlite3
+        db = sqlite3.connect(self.path)
+        db.execute("CREATE TABLE archive (extractor TEXT NOT NULL, video_id TEXT NOT NULL, url TEXT, "
+                   "title TEXT, downloaded_at REAL NOT NULL, PRIMARY KEY (extractor, video_id)) WITHOUT ROWID")
+        db.execute("INSERT INTO archive VALUES ('youtube', 'old', NULL, NULL, 0)")
+        db.commit()
+        db.close()
+
+        archive = DownloadArchive(self.path)
+        assert archive.contains('Youtube', 'old', 'mp3')
+        archive.add('Youtube', 'old', fmt='mp4')
+        assert len(archive) == 2
+        archive.close()
+
+    def test_import_ytdlp_archive_lines(self):
+        """Test a yt-dlp --download-archive file can be imported"""
+        archive = DownloadArchive(self.path)
+        added = archive.import_lines(['youtube abc\n', 'vimeo 123\n', '\n', 'youtube abc\n'])
+
+        assert added == 2
+        assert archive.contains('Vimeo', '123')
+        archive.close()
+
+    def test_url_archive_id_without_network(self):
+        """Test extractor and ID come from the URL pattern"""
+        assert url_archive_id(VIDEO_URL) == ('Youtube', 'dQw4w9WgXcQ')
+        assert url_archive_id('https://youtu.be/dQw4w9WgXcQ') == ('Youtube', 'dQw4w9WgXcQ')
+        assert url_archive_id('https://example.com/clip.mp4') is None
+
+    def test_ytdlp_uses_archive_view(self):
+        """Test yt-dlp reads and records through the archive view"""
+        from yt_dlp import YoutubeDL
+
+        archive = DownloadArchive(self.path)
+        archive.add('Youtube', 'known')
+        with YoutubeDL({'download_archive': archive.for_ytdlp(), 'quiet': True}) as ydl:
+            assert ydl.in_download_archive({'id': 'known', 'extractor_key': 'Youtube'})
+            assert not ydl.in_download_archive({'id': 'new', 'extractor_key': 'Youtube'})
+            ydl.record_download_archive({'id': 'new', 'extractor_key': 'Youtube'})
+
+        assert archive.contains('Youtube', 'new')
+        archive.close()
+
+
+class TestDownloaderArchive:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.downloader = VideoDownloader(self.temp_dir)
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        self.downloader.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    @patch('core.downloader.YoutubeDL')
+    def test_archived_url_skips_without_request(self, mock_ytdl_class):
+        """Test an archived video returns at once without yt-dlp or a file number"""
+        self.downloader.archive.add('Youtube', 'dQw4w9WgXcQ')
+
+        result = self.downloader.download_video_with_format(VIDEO_URL)
+
+        assert result['success'] is True
+        assert result['skipped'] is True
+        mock_ytdl_class.assert_not_called()
+        assert self.downloader.get_next_file_number() == 1
+
+    @patch('core.downloader.YoutubeDL')
+    def test_other_format_is_downloaded(self, mock_ytdl_class):
+        """Test a video archived as MP4 is still downloaded when MP3 is asked for"""
+        mock_ytdl_class.return_value.__enter__.return_value = MagicMock()
+        self.downloader.archive.add('Youtube', 'dQw4w9WgXcQ', fmt='mp4')
+        self.downloader.stream_audio = False
+
+        result = self.downloader.download_video_with_format(VIDEO_URL, 'best', 'MP3')
+
+        assert 'skipped' not in result
+        mock_ytdl_class.assert_called()
+
+    @patch('core.downloader.YoutubeDL')
+    def test_archive_disabled_downloads_again(self, mock_ytdl_class):
+        """Test use_archive=False forces the download"""
+        mock_ytdl_class.return_value.__enter__.return_value = MagicMock()
+        self.downloader.archive.add('Youtube', 'dQw4w9WgXcQ')
+        self.downloader.use_archive = False
+
+        result = self.downloader.download_video_with_format(VIDEO_URL)
+
+        assert result['success'] is True
+        assert 'skipped' not in result
+        mock_ytdl_class.assert_called()
+
+    @patch('core.downloader.YoutubeDL')
+    def test_successful_download_is_archived(self, mock_ytdl_class):
+        """Test the video reported by yt-dlp is recorded after download"""
+        mock_ytdl = MagicMock()
+        mock_ytdl_class.return_value.__enter__.return_value = mock_ytdl
+
+        def fake_download(urls):
+            # The pool registers one dispatcher hook per instance
+            for call in mock_ytdl.add_progress_hook.call_args_list:
+                call[0][0]({'status': 'finished', 'filename': 'x.mp4',
+                            'info_dict': {'extractor_key': 'Vimeo', 'id': '76979871', 'title': 'Clip'}})
+        mock_ytdl.download.side_effect = fake_download
+
+        result = self.downloader._download_with_ytdlp('https://vimeo.com/76979871', 'best')
+
+        assert result['success'] is True
+        assert self.downloader.archive.contains('Vimeo', '76979871', 'mp4')
+        assert not self.downloader.archive.contains('Vimeo', '76979871', 'mp3')
+
+    @patch('core.downloader.YoutubeDL')
+    def test_playlist_url_archives_every_video(self, mock_ytdl_class):
+        """Test each video finished for a playlist URL is recorded once, not just the last"""
+        mock_ytdl = MagicMock()
+        mock_ytdl_class.return_value.__enter__.return_value = mock_ytdl
+
+        def fake_download(urls):
+            # The first video is merged from two streams, each reporting 'finished'
+            for video_id in ('a', 'a', 'b'):
+                for call in mock_ytdl.add_progress_hook.call_args_list:
+                    call[0][0]({'status': 'finished', 'filename': f'{video_id}.mp4',
+                                'info_dict': {'extractor_key': 'Youtube', 'id': video_id}})
+        mock_ytdl.download.side_effect = fake_download
+
+        result = self.downloader._download_with_ytdlp('https://www.youtube.com/playlist?list=x', 'best')
+
+        assert result['success'] is True
+        assert self.downloader.archive.contains('Youtube', 'a', 'mp4')
+        assert self.downloader.archive.contains('Youtube', 'b', 'mp4')
+        assert len(self.downloader.archive) == 2
+
+    @patch('core.downloader.YoutubeDL')
+    def test_ytdlp_skips_archived_entries(self, mock_ytdl_class):
+        """Test yt-dlp gets a read-only archive view in the requested format"""
+        mock_ytdl_class.return_value.__enter__.return_value = MagicMock()
+        self.downloader.archive.add('Youtube', 'old', fmt='mp4')
+        self.downloader.stream_audio = False
+
+        self.downloader._download_with_ytdlp('https://www.youtube.com/playlist?list=x', 'best')
+        self.downloader._download_with_ytdlp('https://www.youtube.com/playlist?list=x', 'best', 'MP3')
+
+        views = [call[0][0]['download_archive'] for call in mock_ytdl_class.call_args_list]
+        assert 'youtube old' in views[0]
+        assert 'youtube old' not in views[1]
+        views[0].add('youtube new')
+        assert not self.downloader.archive.contains('Youtube', 'new')
+
+    def test_playlist_skips_archived_entries(self):
+        """Test archived playlist entries are not queued at all"""
+        self.downloader.archive.add('Youtube', 'old')
+        entries = [
+            {'index': 1, 'id': 'old', 'ie_key': 'Youtube', 'title': 'Old', 'url': 'https://y/old'},
+            {'index': 2, 'id': 'new', 'ie_key': 'Youtube', 'title': 'New', 'url': 'https://y/new'},
+        ]
+        downloaded = []
+
+        def fake_download(url, *args, **kwargs):
+            downloaded.append(url)
+            return {'success': True, 'filename': url}
+
+        with patch.object(self.downloader, 'get_playlist_entries',
+                          return_value={'title': 'List', 'entries': entries}), \
+             patch.object(self.downloader, 'download_video_with_format', side_effect=fake_download):
+            summary = self.downloader.download_playlist('https://y/list')
+
+        assert downloaded == ['https://y/new']
+        assert summary['success'] is True
+        assert summary['skipped'] == 1
+        assert summary['results'][0]['skipped'] is True
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
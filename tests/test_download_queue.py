@@ -0,0 +1,147 @@
+"""
+Unit tests for the download queue engine
+"""
+import pytest
+import os
+import sys
+import threading
+import time
+
+# Add src to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from core.download_queue import (DownloadQueue, QUEUED, DONE, FAILED, CANCELLED,
+                                 PRIORITY_LOW, PRIORITY_HIGH)
+
+
+class FakeDownloader:
+    """Records calls and blocks until released"""
+
+    def __init__(self, block: bool = False):
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        self.release = threading.Event()
+        if not block:
+            self.release.set()
+
+    def download_video_with_format(self, url, quality='best', format_choice='MP4',
+                                   progress_callback=None, cancel_event=None):
+        with self.lock:
+            self.calls.append(url)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            while not self.release.wait(0.01):
+                if cancel_event is not None and cancel_event.is_set():
+                    return {'success': False, 'error': 'Cancelled', 'cancelled': True}
+            if 'fail' in url:
+                return {'success': False, 'error': 'boom'}
+            return {'success': True, 'filename': url}
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class TickingDownloader(FakeDownloader):
+    """Emits a burst of progress ticks before finishing"""
+
+    def download_video_with_format(self, url, quality='best', format_choice='MP4',
+                                   progress_callback=None, cancel_event=None):
+        for downloaded in range(1, 201):
+            progress_callback({'status': 'downloading', 'downloaded_bytes': downloaded})
+        return {'success': True, 'filename': url}
+
+
+class TestDownloadQueue:
+
+    def test_progress_is_rate_limited(self):
+        """Test a tick burst reaches the job callback coalesced, ending on the last tick"""
+        events = []
+        queue = DownloadQueue(TickingDownloader(), max_workers=1)
+        job = queue.submit('https://example.com/ok', progress_callback=events.append)
+
+        assert job.wait(timeout=5)
+        assert 0 < len(events) < 200
+        assert events[-1]['downloaded_bytes'] == 200
+        assert events[-1]['job_id'] == job.job_id
+        queue.shutdown()
+
+    def test_jobs_complete_with_states(self):
+        """Test successful and failed jobs reach final states"""
+        queue = DownloadQueue(FakeDownloader(), max_workers=2)
+        ok = queue.submit('https://example.com/ok')
+        bad = queue.submit('https://example.com/fail')
+
+        assert queue.wait_all(timeout=5)
+        assert ok.state == DONE
+        assert ok.result['success'] is True
+        assert bad.state == FAILED
+        assert bad.error == 'boom'
+        queue.shutdown()
+
+    def test_concurrency_limit(self):
+        """Test no more than max_workers jobs run at once"""
+        downloader = FakeDownloader(block=True)
+        queue = DownloadQueue(downloader, max_workers=3)
+        for i in range(8):
+            queue.submit(f'https://example.com/{i}')
+
+        time.sleep(0.2)
+        assert downloader.active == 3
+        downloader.release.set()
+
+        assert queue.wait_all(timeout=5)
+        assert downloader.peak == 3
+        assert len(downloader.calls) == 8
+        queue.shutdown()
+
+    def test_priority_order(self):
+        """Test higher priority jobs start first"""
+        downloader = FakeDownloader(block=True)
+        queue = DownloadQueue(downloader, max_workers=1)
+        queue.submit('https://example.com/first')
+        time.sleep(0.1)
+
+        queue.submit('https://example.com/low', priority=PRIORITY_LOW)
+        queue.submit('https://example.com/high', priority=PRIORITY_HIGH)
+        downloader.release.set()
+
+        assert queue.wait_all(timeout=5)
+        assert downloader.calls == ['https://example.com/first',
+                                    'https://example.com/high',
+                                    'https://example.com/low']
+        queue.shutdown()
+
+    def test_cancel_queued_and_running(self):
+        """Test cancellation of waiting and in-flight jobs"""
+        downloader = FakeDownloader(block=True)
+        done = []
+        queue = DownloadQueue(downloader, max_workers=1)
+        running = queue.submit('https://example.com/running', done_callback=done.append)
+        time.sleep(0.1)
+        waiting = queue.submit('https://example.com/waiting')
+        assert waiting.state == QUEUED
+
+        assert queue.cancel(waiting.job_id) is True
+        assert waiting.state == CANCELLED
+        assert queue.cancel(running.job_id) is True
+
+        assert running.wait(timeout=5)
+        assert running.state == CANCELLED
+        assert done == [running]
+        assert 'https://example.com/waiting' not in downloader.calls
+        assert queue.cancel(running.job_id) is False
+        queue.shutdown()
+
+    def test_submit_after_shutdown(self):
+        """Test queue rejects jobs once shut down"""
+        queue = DownloadQueue(FakeDownloader())
+        queue.shutdown()
+        with pytest.raises(RuntimeError):
+            queue.submit('https://example.com/late')
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
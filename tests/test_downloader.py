@@ -5,6 +5,8 @@ import pytest
 import os
 import tempfile
 import shutil
+import threading
+import subprocess
 from unittest.mock import patch, MagicMock, call
 import sys
 
@@ -129,6 +131,7 @@ class TestVideoDownloader:
             ]
         }
         mock_ytdl.extract_info.return_value = mock_info
+        mock_ytdl.sanitize_info.side_effect = lambda i, remove_private_keys=False: dict(i)
         
         result = self.downloader.get_video_info('https://youtube.com/watch?v=test')
         
@@ -149,6 +152,89 @@ class TestVideoDownloader:
         assert 'error' in result
         assert 'Network error' in result['error']
     
+    @patch('core.downloader.YoutubeDL')
+    def test_get_video_info_cached(self, mock_ytdl_class):
+        """Test repeated analysis of one URL is served from the metadata cache"""
+        mock_ytdl = MagicMock()
+        mock_ytdl_class.return_value.__enter__.return_value = mock_ytdl
+        info = {'title': 'Cached', 'duration': 10, 'formats': []}
+        mock_ytdl.extract_info.return_value = info
+        mock_ytdl.sanitize_info.side_effect = lambda i, remove_private_keys=False: dict(i)
+        
+        first = self.downloader.get_video_info('https://youtube.com/watch?v=test')
+        second = self.downloader.get_video_info('https://youtube.com/watch?v=test')
+        
+        assert first == second
+        mock_ytdl.extract_info.assert_called_once()
+    
+    @patch('core.downloader.YoutubeDL')
+    def test_download_extraction_waits_for_host_slot(self, mock_ytdl_class):
+        """Test metadata fetched for a download takes a slot of the domain like analysis"""
+        mock_ytdl = MagicMock()
+        mock_ytdl_class.return_value.__enter__.return_value = mock_ytdl
+        mock_ytdl.extract_info.return_value = {'title': 'Video', 'formats': []}
+        mock_ytdl.sanitize_info.side_effect = lambda i, remove_private_keys=False: dict(i)
+        self.downloader.host_scheduler.configure(max_per_host=1, min_interval=0)
+        url = 'https://youtube.com/watch?v=test'
+        busy = threading.Thread(target=self.downloader.host_scheduler.try_acquire, args=('youtube.com',))
+        busy.start()
+        busy.join()
+        cancel_event = threading.Event()
+        cancel_event.set()
+        
+        assert self.downloader._fetch_metadata(url, cancel_event=cancel_event) is None
+        mock_ytdl.extract_info.assert_not_called()
+        
+        self.downloader.host_scheduler.release('youtube.com')
+        entry = self.downloader._fetch_metadata(url)
+        assert entry['info']['title'] == 'Video'
+        assert self.downloader.metadata_cache.get(url)['info']['title'] == 'Video'
+    
+    @patch('core.downloader.YoutubeDL')
+    def test_download_uses_cached_info(self, mock_ytdl_class):
+        """Test download after analysis skips the second URL resolution"""
+        mock_ytdl = MagicMock()
+        mock_ytdl_class.return_value.__enter__.return_value = mock_ytdl
+        info = {'title': 'Cached', 'duration': 10, 'formats': []}
+        self.downloader.metadata_cache.put('https://youtube.com/watch?v=test', info, [])
+        
+        result = self.downloader._download_with_ytdlp('https://youtube.com/watch?v=test', '720p')
+        
+        assert result['success'] is True
+        mock_ytdl.process_ie_result.assert_called_once_with(info, download=True)
+        mock_ytdl.download.assert_not_called()
+    
+    @patch('core.downloader.YoutubeDL')
+    def test_playlist_download_after_analysis(self, mock_ytdl_class):
+        """Test an analyzed playlist is resolved again instead of replaying its info without entries"""
+        mock_ytdl = MagicMock()
+        mock_ytdl_class.return_value.__enter__.return_value = mock_ytdl
+        mock_ytdl.extract_info.return_value = {'_type': 'playlist', 'title': 'List',
+                                               'entries': [{'id': 'a', 'title': 'A'}]}
+        # Private keys such as the entries generator are stripped from the cached copy
+        mock_ytdl.sanitize_info.side_effect = lambda i, remove_private_keys=False: \
+            {k: v for k, v in i.items() if k != 'entries'}
+        url = 'https://youtube.com/playlist?list=x'
+        
+        assert self.downloader.get_video_info(url)['title'] == 'List'
+        result = self.downloader._download_with_ytdlp(url, '720p')
+        
+        assert result['success'] is True
+        mock_ytdl.process_ie_result.assert_not_called()
+        mock_ytdl.download.assert_called_once_with([url])
+    
+    def test_error_before_ytdlp_import_is_reported(self):
+        """Test an error raised before yt-dlp was first used reaches the result, not a TypeError"""
+        self.downloader.stream_audio = True
+        with patch('core.downloader.DownloadCancelled', None), \
+             patch('core.downloader.DownloadError', None), \
+             patch.object(self.downloader, 'check_ffmpeg', return_value=True), \
+             patch.object(self.downloader, '_stream_mp3', side_effect=ValueError('broken stream')):
+            result = self.downloader._download_with_ytdlp('https://example.com/v', 'best', 'MP3')
+        
+        assert result['success'] is False
+        assert 'broken stream' in result['error']
+    
     def test_download_m3u8_url(self):
         """Test m3u8 URL detection"""
         url = "https://example.com/stream.m3u8"
@@ -170,16 +256,34 @@ class TestVideoDownloader:
             assert result['success'] is True
     
     @patch('subprocess.run')
-    def test_download_m3u8_success(self, mock_subprocess):
+    @patch('core.downloader.HLSDownloader')
+    def test_download_m3u8_success(self, mock_hls_class, mock_subprocess):
         """Test successful m3u8 download"""
         mock_subprocess.return_value = None
+        mock_hls_class.return_value.download.side_effect = \
+            lambda url, path, *args, **kwargs: open(path, 'wb').close()
         
         result = self.downloader._download_m3u8('https://example.com/stream.m3u8')
         
         assert result['success'] is True
         assert 'filename' in result
-        # Should be called twice: once for ffmpeg check, once for download
+        # Should be called twice: once for ffmpeg check, once for the remux
+        assert mock_subprocess.call_count == 2
+        assert not os.path.exists(result['filename'] + '.ts.part')
+    
+    @patch('subprocess.run')
+    @patch('core.downloader.HLSDownloader')
+    def test_download_m3u8_fallback_to_ffmpeg(self, mock_hls_class, mock_subprocess):
+        """Test unsupported streams are handed to ffmpeg directly"""
+        from core.hls import HLSUnsupported
+        mock_subprocess.return_value = None
+        mock_hls_class.return_value.download.side_effect = HLSUnsupported("encrypted")
+        
+        result = self.downloader._download_m3u8('https://example.com/stream.m3u8')
+        
+        assert result['success'] is True
         assert mock_subprocess.call_count == 2
+        assert 'https://example.com/stream.m3u8' in mock_subprocess.call_args[0][0]
     
     @patch('subprocess.run')
     @patch.object(VideoDownloader, 'check_ffmpeg')
@@ -229,6 +333,10 @@ class TestVideoDownloader:
         # Simulate yt-dlp progress data
         hook_data = {
             'status': 'downloading',
+            'downloaded_bytes': 512,
+            'total_bytes': 1024,
+            'speed': 1258291.2,
+            'eta': 4,
             '_percent_str': '50.0%',
             '_speed_str': '1.2MiB/s',
             'filename': '/path/to/video.mp4'
@@ -238,8 +346,12 @@ class TestVideoDownloader:
         
         assert len(progress_data) == 1
         assert progress_data[0]['status'] == 'downloading'
-        assert progress_data[0]['percentage'] == '50.0%'
-        assert progress_data[0]['speed'] == '1.2MiB/s'
+        assert progress_data[0]['fraction'] == 0.5
+        assert progress_data[0]['downloaded_bytes'] == 512
+        assert progress_data[0]['total_bytes'] == 1024
+        assert progress_data[0]['speed'] == 1258291.2
+        assert progress_data[0]['eta'] == 4
+        assert progress_data[0]['filename'] == 'video.mp4'
     
     def test_progress_hook_finished(self):
         """Test progress hook when download finishes"""
@@ -261,6 +373,115 @@ class TestVideoDownloader:
         assert progress_data[0]['status'] == 'finished'
         assert 'video.mp4' in progress_data[0]['filename']
 
+    
+    def test_progress_hook_cancelled(self):
+        """Test progress hook aborts the transfer once the job is cancelled"""
+        from yt_dlp.utils import DownloadCancelled
+        cancel_event = threading.Event()
+        cancel_event.set()
+        
+        with pytest.raises(DownloadCancelled):
+            self.downloader._progress_hook({'status': 'downloading'}, cancel_event=cancel_event)
+    
+    def test_download_cancelled_before_start(self):
+        """Test cancelled jobs never reach yt-dlp"""
+        cancel_event = threading.Event()
+        cancel_event.set()
+        
+        with patch.object(self.downloader, '_download_with_ytdlp') as mock_ytdlp:
+            result = self.downloader.download_video_with_format(
+                'https://youtube.com/watch?v=test', cancel_event=cancel_event)
+            mock_ytdlp.assert_not_called()
+            assert result['success'] is False
+            assert result['cancelled'] is True
+
+    
+    @patch('core.downloader.YoutubeDL')
+    def test_get_playlist_entries(self, mock_ytdl_class):
+        """Test flat playlist extraction keeps entry order and indexes"""
+        mock_ytdl = MagicMock()
+        mock_ytdl_class.return_value.__enter__.return_value = mock_ytdl
+        mock_ytdl.extract_info.return_value = {
+            'title': 'Channel',
+            'entries': [
+                {'id': 'a', 'url': 'https://youtube.com/watch?v=a', 'title': 'A'},
+                {'_type': 'playlist', 'entries': [
+                    {'id': 'b', 'url': 'https://youtube.com/watch?v=b', 'title': 'B'},
+                ]},
+                None,
+            ]
+        }
+        
+        result = self.downloader.get_playlist_entries('https://youtube.com/@channel')
+        
+        assert result['title'] == 'Channel'
+        assert [e['id'] for e in result['entries']] == ['a', 'b']
+        assert [e['index'] for e in result['entries']] == [1, 2]
+    
+    def test_download_playlist_fan_out(self):
+        """Test playlist entries are downloaded in parallel with index prefixes"""
+        entries = [{'index': i, 'id': str(i), 'ie_key': None, 'title': str(i),
+                    'url': f'https://youtube.com/watch?v={i}'} for i in range(1, 6)]
+        events = []
+        
+        def fake_ytdlp(url, quality, format_choice='MP4', progress_callback=None,
+                       file_prefix=None, **kwargs):
+            progress_callback({'status': 'downloading', 'fraction': 0.5})
+            if url.endswith('=3'):
+                return {'success': False, 'error': 'boom'}
+            return {'success': True, 'filename': file_prefix}
+        
+        with patch.object(self.downloader, 'get_playlist_entries',
+                          return_value={'title': 'List', 'entries': entries}), \
+             patch.object(self.downloader, '_download_with_ytdlp', side_effect=fake_ytdlp):
+            result = self.downloader.download_playlist('https://youtube.com/playlist?list=x',
+                                                       max_workers=3, progress_callback=events.append)
+        
+        assert result['total'] == 5
+        assert result['completed'] == 4
+        assert result['failed'] == 1
+        assert result['success'] is False
+        assert [r['index'] for r in result['results']] == [1, 2, 3, 4, 5]
+        assert result['results'][0]['filename'] == '001'
+        assert events[-1]['playlist_fraction'] == 1.0
+
+    
+    @patch('core.downloader.YoutubeDL')
+    def test_download_journaled(self, mock_ytdl_class):
+        """Test yt-dlp jobs are recorded in the job journal"""
+        mock_ytdl = MagicMock()
+        mock_ytdl_class.return_value.__enter__.return_value = mock_ytdl
+        
+        self.downloader._download_with_ytdlp('https://youtube.com/watch?v=test', '720p')
+        
+        rows = self.downloader.journal._db.execute("SELECT status, file_prefix FROM jobs").fetchall()
+        assert [tuple(row) for row in rows] == [('done', '001')]
+    
+    @patch('core.downloader.YoutubeDL')
+    def test_resume_reuses_file_prefix(self, mock_ytdl_class):
+        """Test an interrupted yt-dlp job resumes into the same file name"""
+        from core.job_journal import JobJournal
+        mock_ytdl = MagicMock()
+        mock_ytdl_class.return_value.__enter__.return_value = mock_ytdl
+        
+        # Simulate a job left running by a crashed process
+        journal_path = self.downloader.journal.path
+        crashed = subprocess.Popen([sys.executable, '-c', 'pass'])
+        crashed.wait()
+        with patch('core.job_journal.PROCESS_ID', crashed.pid):
+            self.downloader.journal.start('ytdlp', 'https://youtube.com/watch?v=test', self.temp_dir,
+                                          file_prefix='007', quality='720p', format_choice='MP4')
+        self.downloader.journal.close()
+        with patch('core.job_journal.PROCESS_TOKEN', 'restarted'):
+            self.downloader.journal = JobJournal(journal_path)
+            jobs = self.downloader.resume_interrupted_jobs()
+            assert len(jobs) == 1
+            assert jobs[0].wait(timeout=5)
+        
+        assert jobs[0].result['success'] is True
+        outtmpl = mock_ytdl.params['outtmpl'].__setitem__.call_args[0][1]
+        assert outtmpl == f'{self.temp_dir}/007-%(title)s.%(ext)s'
+
 
 if __name__ == '__main__':
     pytest.main([__file__])
\ No newline at end of file
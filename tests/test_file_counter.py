@@ -0,0 +1,80 @@
+"""
+Unit tests for sequential file numbering
+"""
+import pytest
+import os
+import sys
+import tempfile
+import shutil
+import threading
+
+# Add src to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from core.file_counter import FileCounter, COUNTER_FILE
+
+
+class TestFileCounter:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.counter = FileCounter(self.temp_dir)
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_numbers_increment(self):
+        """Test each call reserves a new number"""
+        assert self.counter.next_number() == 1
+        assert self.counter.next_number() == 2
+        assert self.counter.peek() == 3
+
+    def test_index_skips_directory_scan(self):
+        """Test existing index is used instead of the directory contents"""
+        open(os.path.join(self.temp_dir, "004-old.mp4"), 'w').close()
+        assert self.counter.next_number() == 5
+
+        # Files added later are not rescanned while the index is valid
+        open(os.path.join(self.temp_dir, "099-new.mp4"), 'w').close()
+        assert self.counter.next_number() == 6
+
+    def test_corrupt_index_rebuilds(self):
+        """Test a corrupt index falls back to scanning"""
+        open(os.path.join(self.temp_dir, "010-video.webm"), 'w').close()
+        with open(os.path.join(self.temp_dir, COUNTER_FILE), 'w') as f:
+            f.write("{not json")
+
+        assert self.counter.next_number() == 11
+
+    def test_rebuild(self):
+        """Test explicit rebuild picks up manually added files"""
+        self.counter.next_number()
+        open(os.path.join(self.temp_dir, "042-manual.mp3"), 'w').close()
+
+        assert self.counter.rebuild() == 43
+        assert self.counter.next_number() == 43
+
+    def test_unique_under_parallel_workers(self):
+        """Test concurrent workers never receive the same number"""
+        numbers = []
+        lock = threading.Lock()
+
+        def worker():
+            for _ in range(20):
+                number = FileCounter(self.temp_dir).next_number()
+                with lock:
+                    numbers.append(number)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(numbers) == list(range(1, 161))
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
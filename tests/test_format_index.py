@@ -0,0 +1,211 @@
+"""
+Unit tests for the cost-scored format index
+"""
+import pytest
+import os
+import sys
+import tempfile
+import shutil
+from unittest.mock import patch, MagicMock
+
+# Add src to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from core.format_index import FormatIndex, FormatRecord, codec_family
+from core.downloader import VideoDownloader
+
+
+def video(format_id, height, vcodec, size=None, **fields):
+    fmt = {'format_id': format_id, 'height': height, 'vcodec': vcodec, 'acodec': 'none',
+           'ext': 'webm' if vcodec.startswith(('vp', 'av01')) else 'mp4', 'filesize': size}
+    fmt.update(fields)
+    return fmt
+
+
+def audio(format_id, acodec, abr, size=None, **fields):
+    fmt = {'format_id': format_id, 'vcodec': 'none', 'acodec': acodec, 'abr': abr,
+           'ext': 'webm' if acodec == 'opus' else 'm4a', 'filesize': size}
+    fmt.update(fields)
+    return fmt
+
+
+# Shaped like a YouTube format list
+YOUTUBE_FORMATS = [
+    {'format_id': 'sb0', 'vcodec': 'none', 'acodec': 'none', 'ext': 'mhtml'},
+    audio('140', 'mp4a.40.2', 129, 3_400_000),
+    audio('251', 'opus', 130, 3_200_000),
+    audio('249', 'opus', 50, 1_300_000),
+    {'format_id': '18', 'height': 360, 'vcodec': 'avc1.42001E', 'acodec': 'mp4a.40.2',
+     'ext': 'mp4', 'filesize': 9_000_000},
+    video('134', 360, 'avc1.4d401e', 8_000_000),
+    video('243', 360, 'vp09.00.21.08', 5_000_000),
+    video('136', 720, 'avc1.4d401f', 30_000_000),
+    video('247', 720, 'vp09.00.31.08', 21_000_000),
+    video('398', 720, 'av01.0.05M.08', 18_000_000),
+    video('298', 720, 'avc1.4d4020', 45_000_000, fps=60),
+    video('302', 720, 'vp09.00.40.08', 33_000_000, fps=60),
+    video('137', 1080, 'avc1.640028', 60_000_000),
+    video('248', 1080, 'vp09.00.40.08', 40_000_000),
+]
+
+
+class TestFormatIndex:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.index = FormatIndex(YOUTUBE_FORMATS, duration=212)
+
+    def test_codec_family(self):
+        """Test codec strings are reduced to their family"""
+        assert codec_family('avc1.640028') == 'avc1'
+        assert codec_family('none') == 'none'
+        assert codec_family(None) is None
+
+    def test_records_are_slotted(self):
+        """Test records carry no per-instance dict"""
+        assert not hasattr(self.index.videos[0], '__dict__')
+        assert len(self.index.videos) == 10
+        # Only Opus 130k is close enough to the best audio quality to compete
+        assert [record.format_id for record in self.index.audios] == ['251']
+
+    def test_bucket_keeps_cheapest_candidate(self):
+        """Test formats of one height, codec and frame rate are reduced to the smallest"""
+        formats = [video('136', 720, 'avc1.4d401f', 30_000_000), video('136b', 720, 'avc1.4d401f', 25_000_000),
+                   video('136c', 720, 'avc1.4d401f', tbr=3000), audio('140', 'mp4a', 128, 3_000_000),
+                   audio('140b', 'mp4a', 128, 2_800_000)]
+        index = FormatIndex(formats, duration=60)
+
+        assert [record.format_id for record in index.videos] == ['136c']
+        assert [record.format_id for record in index.audios] == ['140b']
+
+    def test_efficient_codec_wins_at_same_height(self):
+        """Test VP9 is picked over the larger AVC stream, with Opus audio"""
+        choice = self.index.select('1080p', 'mp4')
+
+        assert choice.spec == '248+251'
+        assert choice.size == 43_200_000
+
+    def test_high_frame_rate_is_kept(self):
+        """Test a 60 fps height is not downgraded to a smaller 30 fps stream"""
+        assert self.index.select('720p', 'mp4').spec == '302+251'
+
+    def test_requested_height_is_a_ceiling(self):
+        """Test the best height not above the request is used, or the smallest one"""
+        assert self.index.select('480p').video.height == 360
+        assert self.index.select('144p').video.height == 360
+        assert self.index.select('best').video.height == 1080
+
+    def test_container_penalizes_incompatible_streams(self):
+        """Test WEBM avoids AVC/AAC unless they are much smaller"""
+        formats = [video('136', 720, 'avc1', 10_000_000), video('247', 720, 'vp9', 15_000_000),
+                   audio('140', 'mp4a', 128, 3_000_000), audio('251', 'opus', 128, 3_100_000)]
+        index = FormatIndex(formats)
+
+        assert index.select('720p', 'mp4').spec == '136+251'
+        assert index.select('720p', 'webm').spec == '247+251'
+
+    def test_pairs_pay_the_container_penalty_together(self):
+        """Test a pair that needs a re-encode loses to a slightly larger one that fits"""
+        formats = [video('247', 720, 'vp9', 15_000_000), audio('140', 'mp4a', 200, 2_000_000),
+                   audio('251', 'opus', 128, 3_500_000)]
+        index = FormatIndex(formats)
+
+        # AAC alone is the cheaper audio, but VP9 + AAC cannot go into WEBM as is
+        assert index.best_audio('mp4').format_id == '140'
+        assert index.select('720p', 'webm').spec == '247+251'
+        assert index.select('720p', 'mp4').spec == '247+140'
+
+    def test_single_muxed_stream(self):
+        """Test a muxed format is used alone when it is the cheapest set"""
+        formats = [dict(YOUTUBE_FORMATS[4], filesize=6_000_000)] + YOUTUBE_FORMATS[1:4]
+
+        assert FormatIndex(formats).select('360p').spec == '18'
+
+    def test_sizes_estimated_from_codec_efficiency(self):
+        """Test formats without sizes are ranked by bitrate or codec estimate"""
+        formats = [video('136', 720, 'avc1'), video('398', 720, 'av01'), audio('251', 'opus', 130)]
+        choice = FormatIndex(formats, duration=60).select('720p')
+
+        assert choice.spec == '398+251'
+        assert choice.size is None
+        assert FormatIndex([video('136', 720, 'avc1', tbr=800), video('398', 720, 'av01', tbr=1500)]) \
+            .select('720p').spec == '136'
+
+    def test_audio_quality_floor(self):
+        """Test low-bitrate audio is not picked just because it is small"""
+        assert self.index.best_audio().format_id == '251'
+        assert self.index.select('bestaudio').spec == '251'
+
+    def test_empty_list(self):
+        """Test nothing is selected without formats"""
+        assert FormatIndex([]).select('720p') is None
+        assert FormatIndex([]).select('bestaudio') is None
+
+
+class TestDownloaderFormatSelection:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.downloader = VideoDownloader(self.temp_dir)
+        self.downloader.use_archive = False
+        self.url = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        self.downloader.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_extract_formats_lists_each_height_once(self):
+        """Test the quality list offers each height once, sorted by the numeric height"""
+        formats = YOUTUBE_FORMATS + [video('330', 96, 'vp09.00.10.08', 1_000_000)]
+        result = self.downloader._extract_formats(formats)
+
+        assert [fmt['quality'] for fmt in result] == ['1080p', '720p', '360p', '96p', 'Audio Only (MP3)']
+
+    @patch('core.downloader.YoutubeDL')
+    def test_analyzed_video_downloads_selected_ids(self, mock_ytdl_class):
+        """Test a cached video is downloaded by explicit ids with the generic selector as fallback"""
+        mock_ytdl = MagicMock()
+        mock_ytdl_class.return_value.__enter__.return_value = mock_ytdl
+        info = {'id': 'dQw4w9WgXcQ', 'title': 'Video', 'duration': 212, 'formats': YOUTUBE_FORMATS}
+        self.downloader.metadata_cache.put(self.url, info, [])
+
+        result = self.downloader._download_with_ytdlp(self.url, '1080p', 'WEBM')
+
+        assert result['success'] is True
+        spec = mock_ytdl.build_format_selector.call_args[0][0]
+        assert spec.startswith('248+251/bestvideo[ext=webm][height<=1080]')
+        # The pooled profile keeps the generic selector
+        assert mock_ytdl_class.call_args[0][0]['format'] == spec.split('/', 1)[1]
+
+
+    @patch('core.downloader.YoutubeDL')
+    def test_jobs_fetching_metadata_are_scored(self, mock_ytdl_class):
+        """Test a multi-connection job without analysis still downloads the cheapest ids"""
+        mock_ytdl = MagicMock()
+        mock_ytdl_class.return_value.__enter__.return_value = mock_ytdl
+        mock_ytdl.extract_info.return_value = {'id': 'dQw4w9WgXcQ', 'title': 'Video', 'duration': 212,
+                                               'formats': YOUTUBE_FORMATS}
+        mock_ytdl.sanitize_info.side_effect = lambda info, **kwargs: info
+
+        result = self.downloader._download_with_ytdlp(self.url, '1080p', 'WEBM', connections=4)
+
+        assert result['success'] is True
+        mock_ytdl.extract_info.assert_called_once()
+        assert mock_ytdl.build_format_selector.call_args[0][0].startswith('248+251/')
+
+    @patch('core.downloader.YoutubeDL')
+    def test_plain_jobs_keep_generic_selector(self, mock_ytdl_class):
+        """Test a single-connection job is not delayed by a metadata lookup"""
+        mock_ytdl = MagicMock()
+        mock_ytdl_class.return_value.__enter__.return_value = mock_ytdl
+
+        result = self.downloader._download_with_ytdlp(self.url, '1080p', 'WEBM')
+
+        assert result['success'] is True
+        mock_ytdl.extract_info.assert_not_called()
+        mock_ytdl.build_format_selector.assert_not_called()
+
+if __name__ == '__main__':
+    pytest.main([__file__])
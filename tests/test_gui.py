@@ -176,29 +176,30 @@ class TestModernYTDownloader:
         insert_call = self.app.info_text.insert.call_args[0]
         assert "Error: Video not found" in insert_call[1]
     
-    @patch('threading.Thread')
-    def test_start_download_with_url(self, mock_thread):
-        """Test start download with valid URL"""
+    def test_start_download_with_url(self):
+        """Test start download queues the job on the downloader's worker pool"""
         # Setup mock UI components
         self.app.url_entry = MagicMock()
         self.app.url_entry.get.return_value = "https://youtube.com/watch?v=test"
         self.app.quality_var = MagicMock()
         self.app.quality_var.get.return_value = "720p"
-        self.app.folder_entry = MagicMock()
-        self.app.folder_entry.get.return_value = "/test/path"
         self.app.download_btn = MagicMock()
         self.app.progress_bar = MagicMock()
+        self.app.downloader = MagicMock()
         
         self.app.start_download()
         
         # Verify UI state changes
-        self.app.download_btn.configure.assert_called_with(state="disabled", text="Downloading...")
+        self.app.download_btn.configure.assert_called_with(state="disabled", text="DOWNLOADING...")
         self.app.progress_bar.set.assert_called_with(0)
         
-        # Verify thread creation
-        mock_thread.assert_called_once()
-        thread_args = mock_thread.call_args[1]
-        assert thread_args['target'] == self.app._download_thread
+        # Verify the job was queued with the GUI callbacks
+        self.app.downloader.submit.assert_called_once_with(
+            "https://youtube.com/watch?v=test",
+            "720p",
+            progress_callback=self.app._progress_callback,
+            done_callback=self.app._job_done
+        )
     
     @patch('gui.modern_gui.ModernYTDownloader.show_status')
     def test_start_download_no_url(self, mock_show_status):
@@ -210,44 +211,35 @@ class TestModernYTDownloader:
         
         mock_show_status.assert_called_once_with("Please enter a URL", "error")
     
-    def test_download_thread_success(self):
-        """Test download thread with successful result"""
-        mock_result = {'success': True, 'filename': 'test.mp4'}
-        self.mock_downloader.download_video.return_value = mock_result
+    def test_job_done_success(self):
+        """Test a finished job hands its result to the UI thread"""
+        job = MagicMock()
+        job.result = {'success': True, 'filename': 'test.mp4'}
         self.app.root = MagicMock()
         
-        self.app._download_thread("https://youtube.com/watch?v=test", "720p")
-        
-        # Verify downloader was called with progress callback
-        self.mock_downloader.download_video.assert_called_once_with(
-            "https://youtube.com/watch?v=test", 
-            "720p", 
-            progress_callback=self.app._progress_callback
-        )
+        self.app._job_done(job)
         
         # Verify success callback was scheduled
-        self.app.root.after.assert_called_once()
-        call_args = self.app.root.after.call_args[0]
-        assert call_args[1] == self.app._download_finished
-        assert call_args[2] == mock_result
+        self.app.root.after.assert_called_once_with(0, self.app._download_finished, job.result)
     
-    def test_download_thread_error(self):
-        """Test download thread with error"""
-        self.mock_downloader.download_video.side_effect = Exception("Download failed")
+    def test_job_done_error(self):
+        """Test a failed job is reported through the same completion handler"""
+        job = MagicMock()
+        job.result = {'success': False, 'error': 'Download failed'}
         self.app.root = MagicMock()
         
-        self.app._download_thread("https://youtube.com/watch?v=test", "720p")
+        self.app._job_done(job)
         
-        # Verify error callback was scheduled
+        # Verify the failure is scheduled with its error
         self.app.root.after.assert_called_once()
         call_args = self.app.root.after.call_args[0]
-        assert call_args[1] == self.app._download_error
-        assert call_args[2] == "Download failed"
+        assert call_args[1] == self.app._download_finished
+        assert call_args[2]['error'] == "Download failed"
     
     def test_progress_callback(self):
         """Test progress callback scheduling"""
         self.app.root = MagicMock()
-        progress_info = {'status': 'downloading', 'percentage': '50%'}
+        progress_info = {'status': 'downloading', 'fraction': 0.5}
         
         self.app._progress_callback(progress_info)
         
@@ -261,8 +253,8 @@ class TestModernYTDownloader:
         
         progress_info = {
             'status': 'downloading',
-            'percentage': '75%',
-            'speed': '2.5MiB/s',
+            'fraction': 0.75,
+            'speed': 2.5 * 1024 * 1024,
             'filename': 'test.mp4'
         }
         
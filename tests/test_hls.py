@@ -0,0 +1,202 @@
+"""
+Unit tests for the native HLS engine
+"""
+import pytest
+import os
+import sys
+import tempfile
+import shutil
+import random
+import threading
+import time
+from unittest.mock import MagicMock
+
+# Add src to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from core.hls import parse_playlist, HLSDownloader, HLSUnsupported, HLSCancelled, HLSError
+
+
+MASTER = """#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360
+low/index.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2500000,RESOLUTION=1280x720,CODECS="avc1.4d401f,mp4a.40.2"
+high/index.m3u8
+"""
+
+
+def media_playlist(count, extra=""):
+    lines = ["#EXTM3U", "#EXT-X-TARGETDURATION:4", extra]
+    for i in range(count):
+        lines += ["#EXTINF:4.0,", f"seg{i}.ts"]
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines)
+
+
+class FakeSession:
+    """Serves playlists and segments from a dict with random latency"""
+
+    def __init__(self, resources, honor_range=True):
+        self.resources = resources
+        self.honor_range = honor_range
+        self.headers = {}
+        self.requested = []
+        self.lock = threading.Lock()
+
+    def get(self, url, headers=None, timeout=None):
+        with self.lock:
+            self.requested.append(url)
+        if url.endswith('.ts'):
+            time.sleep(random.uniform(0, 0.01))
+        response = MagicMock()
+        body = self.resources[url]
+        response.status_code = 200
+        response.text = body if isinstance(body, str) else ''
+        response.content = body if isinstance(body, bytes) else body.encode()
+        if headers and 'Range' in headers and self.honor_range:
+            start, end = map(int, headers['Range'].split('=')[1].split('-'))
+            response.status_code = 206
+            response.content = response.content[start:end + 1]
+        return response
+
+    def close(self):
+        pass
+
+
+class TestParsePlaylist:
+
+    def test_master_playlist(self):
+        """Test variants are parsed with absolute URLs"""
+        playlist = parse_playlist(MASTER, 'https://cdn.example.com/live/master.m3u8')
+
+        assert playlist['type'] == 'master'
+        assert [v['bandwidth'] for v in playlist['variants']] == [800000, 2500000]
+        assert playlist['variants'][1]['url'] == 'https://cdn.example.com/live/high/index.m3u8'
+        assert playlist['variants'][1]['resolution'] == '1280x720'
+
+    def test_media_playlist_with_byterange(self):
+        """Test segments, byte ranges and end marker"""
+        text = "\n".join(["#EXTM3U", "#EXTINF:2.0,", "#EXT-X-BYTERANGE:100@0", "all.ts",
+                          "#EXTINF:2.0,", "#EXT-X-BYTERANGE:50", "all.ts", "#EXT-X-ENDLIST"])
+        playlist = parse_playlist(text, 'https://cdn.example.com/a/')
+
+        assert playlist['endlist'] is True
+        assert [s['byterange'] for s in playlist['segments']] == [(0, 99), (100, 149)]
+
+    def test_init_section_byterange(self):
+        """Test EXT-X-MAP keeps the byte range of an init section inside a shared file"""
+        text = "\n".join(["#EXTM3U", '#EXT-X-MAP:URI="all.mp4",BYTERANGE="720@0"',
+                          "#EXTINF:2.0,", "#EXT-X-BYTERANGE:100@720", "all.mp4", "#EXT-X-ENDLIST"])
+        playlist = parse_playlist(text, 'https://cdn.example.com/a/')
+
+        assert playlist['init_segment'] == {'url': 'https://cdn.example.com/a/all.mp4',
+                                            'byterange': (0, 719)}
+        assert playlist['segments'][0]['byterange'] == (720, 819)
+
+    def test_invalid_playlist(self):
+        """Test non-m3u8 content is rejected"""
+        with pytest.raises(HLSError):
+            parse_playlist("<html></html>", 'https://example.com/')
+
+
+class TestHLSDownloader:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.output = os.path.join(self.temp_dir, 'out.ts')
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def make_session(self, count=20, extra=""):
+        base = 'https://cdn.example.com/'
+        resources = {base + 'master.m3u8': MASTER,
+                     base + 'high/index.m3u8': media_playlist(count, extra)}
+        for i in range(count):
+            resources[f'{base}high/seg{i}.ts'] = f'[{i}]'.encode()
+        return FakeSession(resources)
+
+    def test_segments_written_in_order(self):
+        """Test parallel fetches are written in playlist order"""
+        session = self.make_session()
+        events = []
+        downloader = HLSDownloader(max_workers=4, session=session)
+
+        result = downloader.download('https://cdn.example.com/master.m3u8', self.output,
+                                     progress_callback=events.append)
+
+        with open(self.output, 'rb') as f:
+            assert f.read() == b''.join(f'[{i}]'.encode() for i in range(20))
+        assert result['segments'] == 20
+        assert events[-1]['fraction'] == 1.0
+        assert events[-1]['eta'] == 0
+        assert 'https://cdn.example.com/low/index.m3u8' not in session.requested
+
+    def test_resume_from_recorded_segment(self):
+        """Test a resumed download truncates to the recorded size and appends"""
+        session = self.make_session()
+        with open(self.output, 'wb') as f:
+            # Five complete segments plus a torn write of the sixth
+            f.write(b''.join(f'[{i}]'.encode() for i in range(5)) + b'[5')
+        recorded = []
+
+        downloader = HLSDownloader(max_workers=4, session=session)
+        result = downloader.download('https://cdn.example.com/master.m3u8', self.output,
+                                     start_segment=5, resume_bytes=15,
+                                     segment_callback=lambda *args: recorded.append(args))
+
+        with open(self.output, 'rb') as f:
+            assert f.read() == b''.join(f'[{i}]'.encode() for i in range(20))
+        assert result['resumed_from'] == 5
+        assert 'https://cdn.example.com/high/seg0.ts' not in session.requested
+        assert recorded[0][0] == 6
+        assert recorded[-1][:2] == (20, os.path.getsize(self.output))
+
+    def byterange_session(self, honor_range=True):
+        base = 'https://cdn.example.com/'
+        text = "\n".join(["#EXTM3U", '#EXT-X-MAP:URI="all.mp4",BYTERANGE="4@0"',
+                          "#EXTINF:2.0,", "#EXT-X-BYTERANGE:3@4", "all.mp4",
+                          "#EXTINF:2.0,", "#EXT-X-BYTERANGE:3", "all.mp4", "#EXT-X-ENDLIST"])
+        return FakeSession({base + 'index.m3u8': text, base + 'all.mp4': b'INIT[0][1]'},
+                           honor_range)
+
+    def test_byterange_stream_with_init_section(self):
+        """Test the init section and segments are fetched as their byte ranges"""
+        downloader = HLSDownloader(session=self.byterange_session())
+
+        result = downloader.download('https://cdn.example.com/index.m3u8', self.output)
+
+        with open(self.output, 'rb') as f:
+            assert f.read() == b'INIT[0][1]'
+        assert result['bytes'] == 10
+
+    def test_ignored_range_is_unsupported(self):
+        """Test a server answering a range request with the whole file is not written as a segment"""
+        downloader = HLSDownloader(session=self.byterange_session(honor_range=False))
+
+        with pytest.raises(HLSUnsupported):
+            downloader.download('https://cdn.example.com/index.m3u8', self.output)
+
+    def test_encrypted_stream_unsupported(self):
+        """Test encrypted streams are left to ffmpeg"""
+        session = self.make_session(extra='#EXT-X-KEY:METHOD=AES-128,URI="key.bin"')
+        downloader = HLSDownloader(session=session)
+
+        with pytest.raises(HLSUnsupported):
+            downloader.download('https://cdn.example.com/master.m3u8', self.output)
+
+    def test_cancel(self):
+        """Test cancellation stops the segment fetch"""
+        cancel_event = threading.Event()
+        cancel_event.set()
+        downloader = HLSDownloader(session=self.make_session())
+
+        with pytest.raises(HLSCancelled):
+            downloader.download('https://cdn.example.com/master.m3u8', self.output,
+                                cancel_event=cancel_event)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,207 @@
+"""
+Unit tests for the per-host politeness scheduler
+"""
+import pytest
+import os
+import sys
+import tempfile
+import shutil
+import threading
+import time
+from unittest.mock import patch, MagicMock
+
+# Add src to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from core.host_scheduler import HostScheduler, host_key, is_blocked_error
+from core.download_queue import DownloadQueue, DONE
+from core.downloader import VideoDownloader
+
+
+class DomainDownloader:
+    """Tracks concurrent downloads per domain"""
+
+    def __init__(self, scheduler, duration=0.05):
+        self.host_scheduler = scheduler
+        self.duration = duration
+        self.lock = threading.Lock()
+        self.active = {}
+        self.peak = {}
+        self.starts = []
+
+    def download_video_with_format(self, url, quality='best', format_choice='MP4',
+                                   progress_callback=None, cancel_event=None):
+        key = host_key(url)
+        with self.lock:
+            self.starts.append((key, time.monotonic()))
+            self.active[key] = self.active.get(key, 0) + 1
+            self.peak[key] = max(self.peak.get(key, 0), self.active[key])
+        time.sleep(self.duration)
+        with self.lock:
+            self.active[key] -= 1
+        return {'success': True, 'filename': url}
+
+
+class TestHostScheduler:
+
+    def test_host_key_groups_subdomains(self):
+        """Test subdomains share a domain key"""
+        assert host_key('https://www.youtube.com/watch?v=1') == 'youtube.com'
+        assert host_key('https://m.youtube.com/watch?v=1') == 'youtube.com'
+        assert host_key('https://video.bbc.co.uk/clip') == 'bbc.co.uk'
+        assert host_key('http://127.0.0.1:8080/a.m3u8') == '127.0.0.1'
+        assert host_key('not a url') == ''
+
+    def test_blocked_errors(self):
+        """Test 403 and 429 messages are recognized"""
+        assert is_blocked_error('ERROR: unable to download video data: HTTP Error 403: Forbidden')
+        assert is_blocked_error('HTTP Error 429: Too Many Requests')
+        assert not is_blocked_error('HTTP Error 404: Not Found')
+
+    def test_concurrency_and_interval(self):
+        """Test slots per domain and the spacing between starts"""
+        scheduler = HostScheduler(max_per_host=2, min_interval=0.1)
+
+        assert scheduler.try_acquire('a.com')
+        assert not scheduler.try_acquire('a.com')
+        assert scheduler.try_acquire('b.com')
+        time.sleep(0.12)
+        assert scheduler.try_acquire('a.com')
+        time.sleep(0.12)
+        assert not scheduler.try_acquire('a.com')
+        assert scheduler.ready_in('a.com') is None
+
+        scheduler.release('a.com')
+        assert scheduler.try_acquire('a.com')
+
+    def test_slot_is_reentrant_per_thread(self):
+        """Test a thread holding a domain's slot enters slot() again without a second one"""
+        scheduler = HostScheduler(max_per_host=1, min_interval=0)
+        assert scheduler.try_acquire('a.com')
+
+        with scheduler.slot('https://www.a.com/v') as acquired:
+            assert acquired
+            assert scheduler.snapshot()['a.com']['active'] == 1
+
+        other = []
+        cancel_event = threading.Event()
+        cancel_event.set()
+        thread = threading.Thread(target=lambda: other.append(
+            scheduler.acquire('a.com', cancel_event)))
+        thread.start()
+        thread.join(5)
+        scheduler.release('a.com')
+
+        assert other == [False]
+        assert not scheduler.holds('a.com')
+
+    def test_backoff_grows_and_resets(self):
+        """Test repeated blocks double the pause and success resets it"""
+        scheduler = HostScheduler(min_interval=0)
+        first = scheduler.report_blocked('a.com')
+        second = scheduler.report_blocked('a.com')
+
+        assert second == first * 2
+        assert not scheduler.try_acquire('a.com')
+        assert scheduler.ready_in('a.com') > first
+        assert scheduler.report_blocked('b.com', retry_after=30) == 30
+
+        scheduler.report_success('a.com')
+        assert scheduler.snapshot()['a.com']['strikes'] == 0
+
+
+class TestQueueScheduling:
+
+    def test_busy_domain_does_not_block_other_domains(self):
+        """Test the queue runs jobs of free domains while one domain is at its limit"""
+        scheduler = HostScheduler(max_per_host=1, min_interval=0)
+        downloader = DomainDownloader(scheduler)
+        queue = DownloadQueue(downloader, max_workers=4)
+        jobs = [queue.submit(f'https://www.busy.com/{i}') for i in range(4)]
+        jobs.append(queue.submit('https://other.org/1'))
+
+        assert queue.wait_all(timeout=5)
+        queue.shutdown()
+
+        assert all(job.state == DONE for job in jobs)
+        assert downloader.peak['busy.com'] == 1
+        # other.org started right away instead of queueing behind busy.com
+        other_start = [t for key, t in downloader.starts if key == 'other.org'][0]
+        busy_starts = sorted(t for key, t in downloader.starts if key == 'busy.com')
+        assert other_start < busy_starts[1]
+
+    def test_default_limit_follows_workers(self):
+        """Test without a cap of its own one domain may use every queue worker"""
+        scheduler = HostScheduler(min_interval=0)
+        downloader = DomainDownloader(scheduler)
+        queue = DownloadQueue(downloader, max_workers=6)
+        for i in range(12):
+            queue.submit(f'https://a.com/{i}')
+
+        assert queue.wait_all(timeout=5)
+        queue.shutdown()
+
+        assert downloader.peak['a.com'] == 6
+
+    def test_start_interval_is_enforced(self):
+        """Test jobs on one domain start at least min_interval apart"""
+        scheduler = HostScheduler(max_per_host=4, min_interval=0.1)
+        downloader = DomainDownloader(scheduler, duration=0)
+        queue = DownloadQueue(downloader, max_workers=4)
+        for i in range(3):
+            queue.submit(f'https://a.com/{i}')
+
+        assert queue.wait_all(timeout=5)
+        queue.shutdown()
+
+        starts = sorted(t for _, t in downloader.starts)
+        gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+        assert min(gaps) >= 0.09
+
+
+class TestBlockedRetry:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.downloader = VideoDownloader(self.temp_dir)
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        self.downloader.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    @patch('core.host_scheduler.BACKOFF_BASE', 0.05)
+    @patch('core.downloader.YoutubeDL')
+    def test_download_retries_after_429(self, mock_ytdl_class):
+        """Test a 429 backs off and retries before the user sees an error"""
+        mock_ytdl = MagicMock()
+        mock_ytdl_class.return_value.__enter__.return_value = mock_ytdl
+        mock_ytdl.download.side_effect = [Exception('HTTP Error 429: Too Many Requests'), None]
+        events = []
+
+        result = self.downloader._download_with_ytdlp('https://www.youtube.com/watch?v=x', '720p',
+                                                      progress_callback=events.append)
+
+        assert result['success'] is True
+        assert mock_ytdl.download.call_count == 2
+        backoff = [e for e in events if e['status'] == 'backoff']
+        assert backoff and backoff[0]['host'] == 'youtube.com'
+
+    @patch('core.host_scheduler.BACKOFF_BASE', 0.01)
+    @patch('core.downloader.YoutubeDL')
+    def test_persistent_403_reaches_user(self, mock_ytdl_class):
+        """Test the 403 message is shown once the retries are used up"""
+        mock_ytdl = MagicMock()
+        mock_ytdl_class.return_value.__enter__.return_value = mock_ytdl
+        mock_ytdl.download.side_effect = Exception('HTTP Error 403: Forbidden')
+
+        result = self.downloader._download_with_ytdlp('https://www.youtube.com/watch?v=x', '720p')
+
+        assert result['success'] is False
+        assert 'HTTP 403' in result['error']
+        assert mock_ytdl.download.call_count == 3
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,116 @@
+"""
+Unit tests for the download job journal
+"""
+import pytest
+import os
+import sys
+import tempfile
+import shutil
+import sqlite3
+import subprocess
+import time
+from unittest.mock import patch
+
+# Add src to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from core.job_journal import JobJournal, DONE, PRUNE_AGE, process_alive
+
+
+def exited_pid() -> int:
+    """Id of a process that has already ended"""
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+class TestJobJournal:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'jobs.sqlite3')
+        self.journal = JobJournal(self.path)
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        self.journal.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_running_jobs_of_this_process_are_not_interrupted(self):
+        """Test only jobs from a previous process are reported for resume"""
+        self.journal.start('ytdlp', 'https://example.com/a', self.temp_dir, file_prefix='001')
+        assert self.journal.interrupted() == []
+
+    def test_interrupted_after_restart(self):
+        """Test progress survives a restart and is offered for resume"""
+        with patch('core.job_journal.PROCESS_ID', exited_pid()):
+            key = self.journal.start('hls', 'https://example.com/a.m3u8', self.temp_dir,
+                                     output_file='/out/001-stream.mp4')
+        self.journal.update_progress(key, bytes_done=4096, segments_done=12, total=40, force=True)
+        self.journal.close()
+
+        with patch('core.job_journal.PROCESS_TOKEN', 'next-run'):
+            self.journal = JobJournal(self.path)
+            rows = self.journal.interrupted()
+
+        assert len(rows) == 1
+        assert rows[0]['job_key'] == key
+        assert rows[0]['segments_done'] == 12
+        assert rows[0]['bytes_done'] == 4096
+
+    def test_jobs_of_live_process_are_not_interrupted(self):
+        """Test jobs another running process owns are left to it"""
+        other = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+        try:
+            with patch('core.job_journal.PROCESS_ID', other.pid):
+                self.journal.start('ytdlp', 'https://example.com/a', self.temp_dir)
+
+            with patch('core.job_journal.PROCESS_TOKEN', 'next-run'):
+                assert process_alive(other.pid)
+                assert self.journal.interrupted() == []
+        finally:
+            other.kill()
+            other.wait()
+
+    def test_old_journal_is_migrated_and_pruned(self):
+        """Test journals without owner pids resume their jobs and old finished rows are dropped"""
+        self.journal.close()
+        os.remove(self.path)
+        db = sqlite3.connect(self.path)
+        db.execute("CREATE TABLE jobs (job_key TEXT PRIMARY KEY, owner TEXT NOT NULL, kind TEXT NOT NULL, "
+                   "url TEXT NOT NULL, quality TEXT, format_choice TEXT, output_dir TEXT NOT NULL, "
+                   "file_prefix TEXT, output_file TEXT, status TEXT NOT NULL, bytes_done INTEGER DEFAULT 0, "
+                   "segments_done INTEGER DEFAULT 0, total INTEGER, created_at REAL NOT NULL, "
+                   "updated_at REAL NOT NULL)")
+        old = time.time() - PRUNE_AGE - 60
+        db.executemany("INSERT INTO jobs (job_key, owner, kind, url, output_dir, status, created_at, updated_at) "
+                       "VALUES (?, 'old-run', 'ytdlp', 'https://example.com/a', '/out', ?, ?, ?)",
+                       [('running', 'running', old, old), ('done', 'done', old, old)])
+        db.commit()
+        db.close()
+
+        self.journal = JobJournal(self.path)
+
+        assert [row['job_key'] for row in self.journal.interrupted()] == ['running']
+        assert self.journal.get('done') is None
+
+    def test_finished_jobs_not_resumed(self):
+        """Test finished jobs are not offered for resume"""
+        key = self.journal.start('ytdlp', 'https://example.com/a', self.temp_dir)
+        self.journal.finish(key, DONE)
+
+        with patch('core.job_journal.PROCESS_TOKEN', 'next-run'):
+            assert self.journal.interrupted() == []
+
+    def test_progress_writes_are_rate_limited(self):
+        """Test rapid progress updates only write once per interval"""
+        key = self.journal.start('ytdlp', 'https://example.com/a', self.temp_dir)
+        self.journal.update_progress(key, bytes_done=10)
+        self.journal.update_progress(key, bytes_done=20)
+
+        assert self.journal.get(key)['bytes_done'] == 10
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
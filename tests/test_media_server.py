@@ -0,0 +1,69 @@
+"""
+Tests for the benchmark media server stand-in
+"""
+import pytest
+import os
+import sys
+import tempfile
+import shutil
+import requests
+
+# Add src and benchmarks to path for testing
+PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'benchmarks'))
+
+from media_server import MediaServer, MediaServerConfig
+from e2e_throughput import percentile
+from core.hls import HLSDownloader
+
+
+class TestMediaServer:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.server = MediaServer().start()
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        self.server.stop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_progressive_range_request(self):
+        """Test ranged reads return the matching slice of the synthetic file"""
+        url = self.server.video_url('clip', size=1000)
+        full = requests.get(url).content
+        partial = requests.get(url, headers={'Range': 'bytes=300-599'})
+
+        assert len(full) == 1000
+        assert partial.status_code == 206
+        assert partial.headers['Content-Range'] == 'bytes 300-599/1000'
+        assert partial.content == full[300:600]
+
+    def test_hls_engine_end_to_end(self):
+        """Test the native HLS engine downloads a stream served over real HTTP"""
+        url = self.server.hls_url('stream', segments=12, segment_size=4096)
+        output = os.path.join(self.temp_dir, 'stream.ts')
+
+        result = HLSDownloader(max_workers=4).download(url, output)
+
+        assert result['segments'] == 12
+        assert os.path.getsize(output) == 12 * 4096
+
+    def test_error_injection(self):
+        """Test every request fails when the error rate is 1"""
+        self.server.config.error_rate = 1.0
+        response = requests.get(self.server.video_url('clip', size=10))
+        assert response.status_code == 503
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles used in the report"""
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 99) == 99
+        assert percentile([], 50) is None
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,96 @@
+"""
+Unit tests for the metadata cache
+"""
+import pytest
+import os
+import sys
+import tempfile
+import shutil
+from unittest.mock import patch
+
+# Add src to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from core.metadata_cache import MetadataCache
+
+
+class TestMetadataCache:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, 'cache.sqlite3')
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_memory_hit_and_miss(self):
+        """Test basic put/get in the memory tier"""
+        cache = MetadataCache()
+        assert cache.get('https://example.com/a') is None
+
+        cache.put('https://example.com/a', {'title': 'A'}, [{'quality': '720p'}])
+        entry = cache.get(' https://example.com/a ')
+
+        assert entry['info'] == {'title': 'A'}
+        assert entry['formats'] == [{'quality': '720p'}]
+
+    def test_lru_eviction(self):
+        """Test least recently used entries are evicted first"""
+        cache = MetadataCache(max_entries=2)
+        cache.put('a', {}, [])
+        cache.put('b', {}, [])
+        cache.get('a')
+        cache.put('c', {}, [])
+
+        assert cache.get('a') is not None
+        assert cache.get('b') is None
+        assert len(cache) == 2
+
+    def test_ttl_expiry(self):
+        """Test entries expire after the TTL"""
+        cache = MetadataCache(ttl=60)
+        with patch('core.metadata_cache.time.time', return_value=1000.0):
+            cache.put('a', {'title': 'A'}, [])
+        with patch('core.metadata_cache.time.time', return_value=1059.0):
+            assert cache.get('a') is not None
+        with patch('core.metadata_cache.time.time', return_value=1061.0):
+            assert cache.get('a') is None
+
+    def test_disk_tier_survives_restart(self):
+        """Test entries persist in the SQLite tier"""
+        cache = MetadataCache(disk_path=self.db_path)
+        cache.put('a', {'title': 'A'}, [{'quality': '1080p'}])
+        cache.close()
+
+        reopened = MetadataCache(disk_path=self.db_path)
+        entry = reopened.get('a')
+        assert entry['info'] == {'title': 'A'}
+        assert entry['formats'] == [{'quality': '1080p'}]
+        reopened.close()
+
+    def test_disk_tier_purges_expired(self):
+        """Test expired disk entries are removed on open"""
+        with patch('core.metadata_cache.time.time', return_value=1000.0):
+            cache = MetadataCache(ttl=60, disk_path=self.db_path)
+            cache.put('a', {}, [])
+            cache.close()
+
+        with patch('core.metadata_cache.time.time', return_value=2000.0):
+            reopened = MetadataCache(ttl=60, disk_path=self.db_path)
+            assert reopened.get('a') is None
+            reopened.close()
+
+    def test_invalidate(self):
+        """Test invalidation removes the entry from both tiers"""
+        cache = MetadataCache(disk_path=self.db_path)
+        cache.put('a', {}, [])
+        cache.invalidate('a')
+
+        assert cache.get('a') is None
+        cache.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,93 @@
+"""
+Tests for the hot path micro-benchmark suite
+"""
+import pytest
+import os
+import sys
+import json
+import tempfile
+import shutil
+
+# Add src and benchmarks to path for testing
+PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'benchmarks'))
+
+import micro
+
+
+class TestRegressionCheck:
+
+    def _report(self, seconds, calibration=0.05):
+        return {'cases': {'extract_formats': {'seconds': seconds, 'calibration_s': calibration}}}
+
+    def test_slowdown_over_threshold_is_flagged(self):
+        """Test a case slower than the threshold allows is reported as regressed"""
+        rows = micro.check_regressions(self._report(1.0), self._report(1.5), 0.25)
+
+        assert rows[0]['status'] == 'regressed'
+        assert rows[0]['ratio'] == 1.5
+
+    def test_slower_machine_is_not_a_regression(self):
+        """Test timings are normalized by the calibration loop"""
+        rows = micro.check_regressions(self._report(1.0, calibration=0.05),
+                                       self._report(1.8, calibration=0.10), 0.25)
+
+        assert rows[0]['status'] == 'ok'
+        assert rows[0]['ratio'] == 0.9
+
+    def test_case_missing_from_baseline_is_new(self):
+        """Test cases without a baseline are reported, not failed"""
+        rows = micro.check_regressions({'cases': {}}, self._report(1.0), 0.25)
+
+        assert rows[0]['status'] == 'new'
+
+
+class TestCases:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_cases_run_with_small_inputs(self):
+        """Test every case runs and reports its timing"""
+        results = [
+            micro.bench_progress_hook(1, events=200),
+            micro.bench_extract_formats(1, entries=50, rounds=2),
+            micro.bench_extract_formats_scored(1, entries=50, rounds=3),
+            micro.bench_next_file_number(1, files=100, warm_calls=5),
+            micro.bench_gui_update_progress(1, events=200),
+        ]
+
+        for result in results:
+            assert result['seconds'] > 0
+            assert result['operations'] > 0
+
+    def test_generated_formats_yield_one_entry_per_height(self):
+        """Test the synthetic format list exercises deduplication and sorting"""
+        from core.downloader import VideoDownloader
+
+        downloader = VideoDownloader(self.temp_dir)
+        formats = downloader._extract_formats(micro.make_formats(1000))
+        downloader.close()
+
+        qualities = [fmt['quality'] for fmt in formats]
+        assert len(qualities) == len(set(qualities))
+        assert qualities[-1] == 'Audio Only (MP3)'
+
+    def test_stored_baseline_covers_every_case(self):
+        """Test the committed baseline has an entry for each case"""
+        with open(micro.BASELINE_PATH, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+        assert set(baseline['cases']) == set(micro.CASES)
+        for case in baseline['cases'].values():
+            assert case['seconds'] > 0 and case['calibration_s'] > 0
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
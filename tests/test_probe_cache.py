@@ -0,0 +1,150 @@
+"""
+Unit tests for the fingerprinted dependency probe cache
+"""
+import pytest
+import json
+import os
+import sys
+import stat
+import subprocess
+import tempfile
+import shutil
+import threading
+from unittest.mock import patch
+
+# Add src to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from core.probe_cache import ProbeCache, binary_fingerprint
+from core.dependency_checker import DependencyChecker
+
+
+class TestProbeCache:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.bin_dir = os.path.join(self.temp_dir, 'bin')
+        os.makedirs(self.bin_dir)
+        self.cache_path = os.path.join(self.temp_dir, 'probes.json')
+        self.path_patch = patch.dict(os.environ, {'PATH': self.bin_dir})
+        self.path_patch.start()
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        self.path_patch.stop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def install_ffmpeg(self, content=b'#!/bin/sh\n'):
+        binary = os.path.join(self.bin_dir, 'ffmpeg')
+        with open(binary, 'wb') as f:
+            f.write(content)
+        os.chmod(binary, os.stat(binary).st_mode | stat.S_IEXEC)
+        return binary
+
+    def checker(self):
+        return DependencyChecker(cache=ProbeCache(self.cache_path))
+
+    @patch('subprocess.run')
+    def test_probe_result_reused_across_instances(self, mock_subprocess):
+        """Test the ffmpeg subprocess runs once and the result is persisted"""
+        self.install_ffmpeg()
+
+        assert self.checker().check_system_dependency('ffmpeg')[0] is True
+        assert self.checker().check_system_dependency('ffmpeg')[0] is True
+        assert mock_subprocess.call_count == 1
+
+    @patch('subprocess.run')
+    def test_changed_binary_invalidates(self, mock_subprocess):
+        """Test replacing the binary triggers a new probe"""
+        binary = self.install_ffmpeg()
+        checker = self.checker()
+        checker.check_system_dependency('ffmpeg')
+
+        self.install_ffmpeg(b'#!/bin/sh\n# upgraded build\n')
+        os.utime(binary, ns=(0, 10 ** 9))
+        checker.check_system_dependency('ffmpeg')
+
+        assert mock_subprocess.call_count == 2
+
+    @patch('subprocess.run')
+    def test_missing_binary_rechecked_after_install(self, mock_subprocess):
+        """Test a cached 'missing' result expires once ffmpeg appears on PATH"""
+        mock_subprocess.side_effect = FileNotFoundError()
+        checker = self.checker()
+        assert checker.check_system_dependency('ffmpeg')[0] is False
+        assert checker.check_system_dependency('ffmpeg')[0] is False
+        assert mock_subprocess.call_count == 1
+
+        mock_subprocess.side_effect = None
+        self.install_ffmpeg()
+        assert checker.check_system_dependency('ffmpeg')[0] is True
+        assert mock_subprocess.call_count == 2
+
+    @patch('subprocess.run')
+    def test_timeout_not_cached(self, mock_subprocess):
+        """Test transient probe failures are retried on the next check"""
+        self.install_ffmpeg()
+        mock_subprocess.side_effect = subprocess.TimeoutExpired(['ffmpeg'], 10)
+        checker = self.checker()
+        checker.check_system_dependency('ffmpeg')
+        checker.check_system_dependency('ffmpeg')
+
+        assert mock_subprocess.call_count == 2
+
+    def test_python_dependency_cached_without_import(self):
+        """Test a cached Python probe does not import the module again"""
+        self.checker().check_python_dependency('requests')
+
+        with patch('importlib.import_module') as mock_import:
+            available, _ = self.checker().check_python_dependency('requests')
+
+        assert available is True
+        mock_import.assert_not_called()
+
+    def test_fingerprint_tracks_path(self):
+        """Test PATH contents are part of the fingerprint"""
+        before = binary_fingerprint('ffmpeg')
+        with patch.dict(os.environ, {'PATH': self.temp_dir}):
+            assert binary_fingerprint('ffmpeg') != before
+
+    def test_corrupt_cache_file_ignored(self):
+        """Test a damaged cache file is treated as empty"""
+        with open(self.cache_path, 'w') as f:
+            f.write('{not json')
+        cache = ProbeCache(self.cache_path)
+
+        assert cache.get('system:ffmpeg', binary_fingerprint('ffmpeg')) is None
+
+    def test_concurrent_writers_leave_valid_file(self):
+        """Test caches sharing a file write through their own temp files"""
+        caches = [ProbeCache(self.cache_path) for _ in range(4)]
+
+        def write(index, cache):
+            for round_ in range(25):
+                cache.put(f'probe:{index}', {'round': round_}, {'available': True})
+
+        threads = [threading.Thread(target=write, args=item) for item in enumerate(caches)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with open(self.cache_path, encoding='utf-8') as f:
+            assert json.load(f)['entries']
+        assert sorted(os.listdir(self.temp_dir)) == ['bin', 'probes.json']
+
+    def test_failed_write_leaves_no_temp_file(self):
+        """Test an interrupted save removes its temp file and keeps the old cache"""
+        cache = ProbeCache(self.cache_path)
+        cache.put('probe:a', {}, {'available': True})
+
+        with patch('core.probe_cache.os.replace', side_effect=OSError('disk full')):
+            cache.put('probe:b', {}, {'available': True})
+
+        assert sorted(os.listdir(self.temp_dir)) == ['bin', 'probes.json']
+        assert ProbeCache(self.cache_path).get('probe:b', {}) is None
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
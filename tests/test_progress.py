@@ -0,0 +1,132 @@
+"""
+Unit tests for the progress event bus
+"""
+import pytest
+import os
+import sys
+from unittest.mock import patch
+
+# Add src to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from core.progress import ProgressBus, format_speed, format_eta, format_percentage
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestProgressBus:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.clock = FakeClock()
+        self.patcher = patch('core.progress.time.monotonic', self.clock)
+        self.patcher.start()
+        self.bus = ProgressBus(rate_hz=10)
+        self.events = []
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        self.patcher.stop()
+
+    def tick(self, job_id, downloaded):
+        self.bus.publish(job_id, {'status': 'downloading', 'downloaded_bytes': downloaded})
+
+    def test_ticks_are_coalesced_to_rate(self):
+        """Test a burst of ticks is delivered once per interval with the newest values"""
+        self.bus.subscribe(self.events.append)
+        for downloaded in range(100):
+            self.tick(1, downloaded)
+            self.clock.now += 0.001
+        self.clock.now += 0.1
+        self.tick(1, 500)
+
+        assert [e['downloaded_bytes'] for e in self.events] == [0, 500]
+
+    def test_flush_delivers_pending_tick(self):
+        """Test the last coalesced tick is not lost when the job ends"""
+        self.bus.subscribe(self.events.append)
+        self.tick(1, 10)
+        self.tick(1, 20)
+        self.bus.flush(1)
+
+        assert [e['downloaded_bytes'] for e in self.events] == [10, 20]
+
+    def test_state_change_supersedes_pending_tick(self):
+        """Test non-progress events are delivered immediately and in order"""
+        self.bus.subscribe(self.events.append)
+        self.tick(1, 10)
+        self.tick(1, 20)
+        self.bus.publish(1, {'status': 'finished'})
+        self.bus.flush(1)
+
+        assert [e['status'] for e in self.events] == ['downloading', 'finished']
+
+    def test_jobs_are_throttled_independently(self):
+        """Test one busy job does not starve another"""
+        self.bus.subscribe(self.events.append)
+        self.tick(1, 10)
+        self.tick(2, 10)
+
+        assert [e['job_id'] for e in self.events] == [1, 2]
+
+    def test_caller_event_is_not_modified(self):
+        """Test an event dict shared by two jobs keeps no job_id and each delivery has its own"""
+        self.bus.subscribe(self.events.append)
+        event = {'status': 'finished'}
+        self.bus.publish(1, event)
+        self.bus.publish(2, event)
+
+        assert event == {'status': 'finished'}
+        assert [e['job_id'] for e in self.events] == [1, 2]
+
+    def test_job_subscription_and_unsubscribe(self):
+        """Test per-job subscribers only see their job until unsubscribed"""
+        unsubscribe = self.bus.subscribe(self.events.append, job_id=2)
+        self.tick(1, 10)
+        self.tick(2, 10)
+        unsubscribe()
+        self.bus.publish(2, {'status': 'finished'})
+
+        assert len(self.events) == 1
+        assert self.events[0]['job_id'] == 2
+
+    def test_failing_subscriber_does_not_break_delivery(self):
+        """Test an exception in one subscriber does not reach the publisher"""
+        def broken(event):
+            raise RuntimeError("boom")
+        self.bus.subscribe(broken)
+        self.bus.subscribe(self.events.append)
+        self.tick(1, 10)
+
+        assert len(self.events) == 1
+
+    def test_rate_change_at_runtime(self):
+        """Test disabling the rate limit delivers every tick"""
+        self.bus.subscribe(self.events.append)
+        self.bus.set_rate(0)
+        for downloaded in range(5):
+            self.tick(1, downloaded)
+
+        assert len(self.events) == 5
+
+
+class TestFormatting:
+
+    def test_format_helpers(self):
+        """Test display formatting of numeric progress fields"""
+        assert format_percentage(0.5) == '50.0%'
+        assert format_percentage(None) == '?%'
+        assert format_speed(2.5 * 1024 * 1024) == '2.50MiB/s'
+        assert format_speed(None) == 'Unknown'
+        assert format_eta(75) == '01:15'
+        assert format_eta(3725) == '1:02:05'
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,199 @@
+"""
+Unit tests for the multi-connection range downloader
+"""
+import pytest
+import os
+import sys
+import tempfile
+import shutil
+import threading
+from unittest.mock import patch, MagicMock
+
+# Add src and benchmarks to path for testing
+PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'benchmarks'))
+
+from core.range_download import (RangeDownloader, RangeUnsupported, RangeDownloadCancelled,
+                                 split_ranges)
+from core.downloader import VideoDownloader
+from media_server import MediaServer
+
+FILE_SIZE = 3 * 1024 * 1024 + 123
+RANGE_SIZE = 512 * 1024
+
+
+def recording_session(fail_once_at=None, on_range=None):
+    """requests session that records range starts and can drop one range once"""
+    import requests
+
+    requested = []
+
+    class RecordingSession(requests.Session):
+        def get(self, url, headers=None, **kwargs):
+            start = int((headers or {}).get('Range', 'bytes=0-').split('=')[1].split('-')[0])
+            requested.append(start)
+            if start == fail_once_at and requested.count(start) == 1:
+                raise requests.ConnectionError("connection reset")
+            if on_range is not None and (headers or {}).get('Range') != 'bytes=0-0':
+                on_range()
+            return super().get(url, headers=headers, **kwargs)
+
+    return RecordingSession(), requested
+
+
+class TestRangeDownloader:
+
+    def setup_method(self):
+        """Setup test environment"""
+        import requests
+        self.temp_dir = tempfile.mkdtemp()
+        self.server = MediaServer().start()
+        self.url = self.server.video_url('big', size=FILE_SIZE)
+        self.payload = requests.get(self.url).content
+        self.output = os.path.join(self.temp_dir, '001-Big.mp4')
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        self.server.stop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_split_ranges(self):
+        """Test ranges cover the file exactly and respect the size limit"""
+        ranges = split_ranges(FILE_SIZE, 4, max_size=RANGE_SIZE)
+
+        assert ranges[0][0] == 0 and ranges[-1][1] == FILE_SIZE - 1
+        assert all(end + 1 == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+        assert max(end - start + 1 for start, end in ranges) <= RANGE_SIZE
+        assert split_ranges(10, 4) == [(0, 2), (3, 5), (6, 8), (9, 9)]
+        assert split_ranges(0, 4) == []
+
+    def test_empty_resource_is_unsupported(self):
+        """Test a zero length from the probe leaves the file to the single-connection path"""
+        response = MagicMock(status_code=206, headers={'Content-Range': 'bytes 0-0/0'})
+        session = MagicMock()
+        session.get.return_value.__enter__.return_value = response
+        downloader = RangeDownloader(4, session=session)
+
+        with pytest.raises(RangeUnsupported):
+            downloader.download('https://example.com/empty', os.path.join(self.temp_dir, 'empty'))
+        assert os.listdir(self.temp_dir) == []
+
+    def test_download_over_several_connections(self):
+        """Test the ranges are reassembled into the exact file, with no temporary left"""
+        downloader = RangeDownloader(connections=4, range_size=RANGE_SIZE)
+        events = []
+        requests_before = self.server.requests
+
+        size = downloader.download(self.url, self.output, progress_callback=events.append)
+        downloader.close()
+
+        assert size == FILE_SIZE
+        with open(self.output, 'rb') as f:
+            assert f.read() == self.payload
+        assert os.listdir(self.temp_dir) == ['001-Big.mp4']
+        # One probe plus one request per range
+        assert self.server.requests - requests_before == 1 + len(split_ranges(FILE_SIZE, 4, RANGE_SIZE))
+        assert events[-1]['fraction'] == 1.0
+        assert events[-1]['connections'] == 4
+
+    def test_failed_range_is_retried_alone(self):
+        """Test a dropped connection repeats only its own range"""
+        second, third = [start for start, _ in split_ranges(FILE_SIZE, 3, RANGE_SIZE)[1:3]]
+        session, requested = recording_session(fail_once_at=second)
+        downloader = RangeDownloader(connections=3, session=session, range_size=RANGE_SIZE)
+
+        downloader.download(self.url, self.output)
+        session.close()
+
+        with open(self.output, 'rb') as f:
+            assert f.read() == self.payload
+        assert requested.count(second) == 2
+        assert requested.count(third) == 1
+
+    def test_server_without_ranges(self):
+        """Test a server that ignores Range is reported for the fallback"""
+        downloader = RangeDownloader(connections=2)
+
+        with pytest.raises(RangeUnsupported):
+            downloader.download(self.server.hls_url('live', segments=2), self.output)
+        downloader.close()
+
+        assert os.listdir(self.temp_dir) == []
+
+    def test_cancel(self):
+        """Test cancelling stops every connection and removes the partial file"""
+        cancel_event = threading.Event()
+        session, _ = recording_session(on_range=cancel_event.set)
+        downloader = RangeDownloader(connections=2, session=session, range_size=RANGE_SIZE)
+
+        with pytest.raises(RangeDownloadCancelled):
+            downloader.download(self.url, self.output, cancel_event=cancel_event)
+        session.close()
+
+        assert os.listdir(self.temp_dir) == []
+
+
+class TestDownloaderRanges:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.downloader = VideoDownloader(self.temp_dir)
+        self.downloader.use_archive = False
+        self.server = MediaServer().start()
+        self.url = 'https://example.com/talk'
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        self.server.stop()
+        self.downloader.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def cache_info(self, **fields):
+        fmt = {'format_id': 'http-720p', 'url': self.server.video_url('talk', size=FILE_SIZE),
+               'protocol': 'https', 'ext': 'mp4', 'height': 720, 'vcodec': 'avc1', 'acodec': 'mp4a',
+               'filesize': FILE_SIZE}
+        fmt.update(fields)
+        info = {'id': 'talk', 'title': 'Talk', 'ext': 'mp4', 'extractor_key': 'Generic',
+                'extractor': 'generic', 'webpage_url': self.url, 'formats': [fmt]}
+        self.downloader.metadata_cache.put(self.url, info, [])
+
+    def test_job_selects_connections(self):
+        """Test a job with connections > 1 fetches a progressive file without yt-dlp's transfer"""
+        self.cache_info()
+        events = []
+
+        with patch.object(self.downloader, '_run_ytdlp_download') as mock_download:
+            result = self.downloader.download_video_with_format(self.url, '720p', 'MP4',
+                                                                progress_callback=events.append,
+                                                                connections=4)
+
+        mock_download.assert_not_called()
+        assert result['success'] is True
+        output = os.path.join(self.temp_dir, '001-Talk.mp4')
+        assert os.path.getsize(output) == FILE_SIZE
+        assert events[-1]['status'] == 'finished'
+
+    def test_fragmented_format_falls_back(self):
+        """Test streams that are not plain HTTP files are left to yt-dlp"""
+        self.cache_info(protocol='m3u8_native')
+
+        with patch.object(self.downloader, '_run_ytdlp_download') as mock_download:
+            result = self.downloader.download_video_with_format(self.url, '720p', 'MP4', connections=4)
+
+        mock_download.assert_called_once()
+        assert result['success'] is True
+
+    def test_single_connection_by_default(self):
+        """Test jobs without connections keep the yt-dlp transfer"""
+        self.cache_info()
+
+        with patch.object(self.downloader, '_run_ytdlp_download') as mock_download:
+            self.downloader.download_video_with_format(self.url, '720p', 'MP4')
+
+        mock_download.assert_called_once()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,49 @@
+"""
+Startup regression tests: heavy dependencies must stay lazily imported
+"""
+import pytest
+import json
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(PROJECT_ROOT, 'src')
+
+# Add src to path for testing
+sys.path.insert(0, SRC_DIR)
+
+
+def imported_modules(module: str, probes) -> dict:
+    """Import a module in a fresh interpreter and report which probes got loaded"""
+    code = (f"import json, sys; import {module}; "
+            f"print(json.dumps({{m: m in sys.modules for m in {list(probes)!r}}}))")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([SRC_DIR, PROJECT_ROOT]))
+    completed = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True, env=env, check=True)
+    return json.loads(completed.stdout)
+
+
+class TestStartup:
+
+    def test_core_import_is_lazy(self):
+        """Test importing the downloader core does not load yt-dlp or requests"""
+        loaded = imported_modules('core.downloader', ['yt_dlp', 'requests'])
+        assert loaded == {'yt_dlp': False, 'requests': False}
+
+    def test_cli_import_skips_gui_toolkits(self):
+        """Test the headless CLI never loads Tk or customtkinter"""
+        loaded = imported_modules('cli.batch', ['tkinter', 'customtkinter', 'yt_dlp'])
+        assert loaded == {'tkinter': False, 'customtkinter': False, 'yt_dlp': False}
+
+    def test_yt_dlp_loaded_on_first_use(self):
+        """Test the YoutubeDL factory imports yt-dlp when first needed"""
+        import core.downloader as downloader_module
+        from yt_dlp import YoutubeDL
+
+        assert downloader_module._load_yt_dlp() is YoutubeDL
+        assert downloader_module.DownloadError is not None
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,188 @@
+"""
+Unit tests for the thumbnail service and its disk cache
+"""
+import pytest
+import io
+import os
+import sys
+import tempfile
+import shutil
+import threading
+import time
+
+# Add src to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from core.thumbnails import ThumbnailCache, ThumbnailService, thumbnail_key
+
+THUMBNAIL_URL = 'https://i.ytimg.com/vi/dQw4w9WgXcQ/maxresdefault.jpg'
+
+
+def image_bytes(width=1280, height=720, fmt='JPEG') -> bytes:
+    from PIL import Image
+
+    output = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 40, 40)).save(output, fmt)
+    return output.getvalue()
+
+
+class FakeResponse:
+
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        import requests
+
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error")
+
+
+class FakeSession:
+    """Session stand-in counting requests, optionally held until released"""
+
+    def __init__(self, content=None, status_code=200, gate=None):
+        self.content = content if content is not None else image_bytes()
+        self.status_code = status_code
+        self.gate = gate
+        self.calls = []
+
+    def get(self, url, timeout=None):
+        self.calls.append(url)
+        if self.gate is not None:
+            self.gate.wait(5)
+        return FakeResponse(self.content, self.status_code)
+
+
+class TestThumbnailCache:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_put_and_get(self):
+        """Test variants are stored under the URL hash and size"""
+        cache = ThumbnailCache(self.temp_dir)
+        key = thumbnail_key(THUMBNAIL_URL, (320, 180))
+
+        assert cache.get(key) is None
+        cache.put(key, b'jpeg')
+
+        assert cache.get(key) == b'jpeg'
+        assert key != thumbnail_key(THUMBNAIL_URL, (160, 90))
+        assert os.listdir(self.temp_dir) == [key + '.jpg']
+
+    def test_least_recently_used_is_evicted(self):
+        """Test the cache stays under its byte limit, dropping what was not used lately"""
+        cache = ThumbnailCache(self.temp_dir, max_bytes=250)
+        cache.put('a', b'x' * 100)
+        cache.put('b', b'x' * 100)
+        cache.get('a')
+        cache.put('c', b'x' * 100)
+
+        assert 'a' in cache and 'c' in cache
+        assert 'b' not in cache
+        assert cache.total_bytes() == 200
+        assert not os.path.exists(cache.path('b'))
+
+    def test_order_survives_restart(self):
+        """Test recency is restored from the files of an earlier run"""
+        cache = ThumbnailCache(self.temp_dir)
+        for index, key in enumerate(('old', 'new')):
+            cache.put(key, b'x' * 100)
+            os.utime(cache.path(key), ns=(index * 10 ** 9, index * 10 ** 9))
+
+        reopened = ThumbnailCache(self.temp_dir, max_bytes=150)
+
+        assert 'new' in reopened and 'old' not in reopened
+        assert reopened.total_bytes() == 100
+
+
+class TestThumbnailService:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = ThumbnailCache(self.temp_dir)
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_thumbnail_is_downsized(self):
+        """Test the image is fitted into the requested size and stored"""
+        service = ThumbnailService(self.cache, session=FakeSession())
+
+        image = service.get(THUMBNAIL_URL, (320, 180)).result(5)
+        service.close()
+
+        assert image.size == (320, 180)
+        assert thumbnail_key(THUMBNAIL_URL, (320, 180)) in self.cache
+
+    def test_repeated_views_cost_no_requests(self):
+        """Test memory and the disk cache answer later requests, also after a restart"""
+        session = FakeSession()
+        service = ThumbnailService(self.cache, session=session)
+        service.get(THUMBNAIL_URL).result(5)
+        service.get(THUMBNAIL_URL).result(5)
+        service.close()
+
+        restarted = ThumbnailService(ThumbnailCache(self.temp_dir), session=session)
+        image = restarted.get(THUMBNAIL_URL).result(5)
+        restarted.close()
+
+        assert image is not None
+        assert session.calls == [THUMBNAIL_URL]
+
+    def test_concurrent_requests_share_one_fetch(self):
+        """Test requests for a thumbnail in flight wait for the same fetch"""
+        gate = threading.Event()
+        session = FakeSession(gate=gate)
+        service = ThumbnailService(self.cache, session=session)
+
+        futures = [service.get(THUMBNAIL_URL) for _ in range(5)]
+        gate.set()
+        images = [future.result(5) for future in futures]
+        service.close()
+
+        assert len({id(image) for image in images}) == 1
+        assert session.calls == [THUMBNAIL_URL]
+
+    def test_close_drops_queued_requests(self):
+        """Test closing cancels thumbnails still waiting for a worker"""
+        gate = threading.Event()
+        session = FakeSession(gate=gate)
+        service = ThumbnailService(self.cache, session=session, workers=1)
+
+        running = service.get(THUMBNAIL_URL)
+        queued = service.get(THUMBNAIL_URL + '?v=2')
+        while not session.calls:
+            time.sleep(0.01)
+        service.close()
+        gate.set()
+
+        assert queued.cancelled()
+        assert running.result(5) is not None
+        assert session.calls == [THUMBNAIL_URL]
+
+    def test_failures_resolve_to_none(self):
+        """Test missing, unreachable and undecodable thumbnails give None and are not cached"""
+        service = ThumbnailService(self.cache, session=FakeSession(status_code=404))
+        assert service.get(THUMBNAIL_URL).result(5) is None
+        assert service.get('').result(5) is None
+        service.close()
+
+        service = ThumbnailService(self.cache, session=FakeSession(content=b'<html>'))
+        assert service.get(THUMBNAIL_URL).result(5) is None
+        service.close()
+
+        assert self.cache.total_bytes() == 0
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,257 @@
+"""
+Unit tests for the transcode scheduler
+"""
+import pytest
+import os
+import sys
+import tempfile
+import shutil
+import threading
+import time
+from concurrent.futures import Future
+from unittest.mock import patch, MagicMock
+
+# Add src to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from core.transcode import TranscodeScheduler, TranscodeError, TranscodeCancelled, target_path
+from core.download_queue import DownloadQueue, DONE, TRANSCODING
+from core.downloader import VideoDownloader
+
+
+# Stands in for ffmpeg: copies the input to the output after FAKE_FFMPEG_DELAY
+# seconds and rejects stream copies when FAKE_FFMPEG_NO_COPY is set
+FAKE_FFMPEG = """#!{python}
+import os, shutil, sys, time
+args = sys.argv[1:]
+if os.environ.get('FAKE_FFMPEG_NO_COPY') and 'copy' in args:
+    sys.stderr.write('Only VP8 or VP9 video is supported for WebM\\n')
+    sys.exit(1)
+time.sleep(float(os.environ.get('FAKE_FFMPEG_DELAY', '0')))
+shutil.copyfile(args[args.index('-i') + 1], args[-1])
+"""
+
+
+def write_file(path, content=b'media'):
+    with open(path, 'wb') as f:
+        f.write(content)
+    return path
+
+
+class TestTranscodeScheduler:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.ffmpeg = os.path.join(self.temp_dir, 'ffmpeg')
+        with open(self.ffmpeg, 'w', encoding='utf-8') as f:
+            f.write(FAKE_FFMPEG.format(python=sys.executable))
+        os.chmod(self.ffmpeg, 0o755)
+        self.scheduler = TranscodeScheduler(max_workers=2, ffmpeg=self.ffmpeg)
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        self.scheduler.shutdown()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_target_path(self):
+        """Test the output keeps the name and swaps the extension"""
+        assert target_path('/out/001-Song.webm', 'MP3') == '/out/001-Song.mp3'
+
+    def test_converts_and_removes_source(self):
+        """Test a conversion reports its steps and replaces the source file"""
+        source = write_file(os.path.join(self.temp_dir, '001-Song.m4a'))
+        events = []
+
+        output = self.scheduler.transcode(source, 'MP3', progress_callback=events.append)
+
+        assert output == os.path.join(self.temp_dir, '001-Song.mp3')
+        assert os.path.exists(output)
+        assert not os.path.exists(source)
+        assert [e['status'] for e in events] == ['transcode_queued', 'transcoding']
+        assert events[0]['format'] == 'MP3'
+
+    def test_webm_falls_back_to_encode(self):
+        """Test a failed stream copy is retried as a real encode"""
+        source = write_file(os.path.join(self.temp_dir, '001-Video.mkv'))
+
+        with patch.dict(os.environ, {'FAKE_FFMPEG_NO_COPY': '1'}):
+            output = self.scheduler.transcode(source, 'webm')
+
+        assert output.endswith('001-Video.webm')
+        assert os.path.exists(output)
+
+    def test_failure_keeps_source(self):
+        """Test the downloaded file survives a failed conversion"""
+        source = write_file(os.path.join(self.temp_dir, '001-Video.mkv'))
+        broken = TranscodeScheduler(max_workers=1, ffmpeg=os.path.join(self.temp_dir, 'missing'))
+
+        with pytest.raises(TranscodeError):
+            broken.transcode(source, 'avi')
+        broken.shutdown()
+
+        assert os.path.exists(source)
+
+    def test_workers_bound_concurrent_encodes(self):
+        """Test queued conversions wait for one of the workers"""
+        sources = [write_file(os.path.join(self.temp_dir, f'{n:03d}.m4a')) for n in range(5)]
+        peak = 0
+
+        with patch.dict(os.environ, {'FAKE_FFMPEG_DELAY': '0.3'}):
+            futures = [self.scheduler.submit(source, 'mp3') for source in sources]
+            while not all(future.done() for future in futures):
+                peak = max(peak, self.scheduler.active_count())
+                time.sleep(0.02)
+
+        assert peak == 2
+        assert all(os.path.exists(future.result()) for future in futures)
+        assert self.scheduler.pending_count() == 0
+
+    def test_cancel_stops_running_encode(self):
+        """Test cancelling kills ffmpeg and leaves no partial output"""
+        source = write_file(os.path.join(self.temp_dir, '001-Song.m4a'))
+        cancel_event = threading.Event()
+
+        with patch.dict(os.environ, {'FAKE_FFMPEG_DELAY': '10'}):
+            future = self.scheduler.submit(source, 'mp3', cancel_event)
+            time.sleep(0.2)
+            started = time.monotonic()
+            cancel_event.set()
+            with pytest.raises(TranscodeCancelled):
+                future.result(timeout=5)
+
+        assert time.monotonic() - started < 2
+        assert sorted(os.listdir(self.temp_dir)) == ['001-Song.m4a', 'ffmpeg']
+
+    def test_shutdown_drops_queued_conversions(self):
+        """Test shutdown cancels conversions still waiting and counts them off"""
+        sources = [write_file(os.path.join(self.temp_dir, f'{n:03d}.m4a')) for n in range(4)]
+
+        with patch.dict(os.environ, {'FAKE_FFMPEG_DELAY': '0.5'}):
+            futures = [self.scheduler.submit(source, 'mp3') for source in sources]
+            time.sleep(0.2)
+            self.scheduler.shutdown(wait=True)
+
+        assert [future.cancelled() for future in futures] == [False, False, True, True]
+        assert self.scheduler.pending_count() == 0
+        assert self.scheduler.active_count() == 0
+
+
+class DeferringDownloader:
+    """Returns MP3 jobs with a pending conversion like VideoDownloader does"""
+
+    def __init__(self):
+        self.transcoder = object()
+        self.conversions = {}
+
+    def download_video_with_format(self, url, quality='best', format_choice='MP4',
+                                   progress_callback=None, cancel_event=None, defer_transcode=False):
+        if format_choice == 'MP3' and defer_transcode:
+            self.conversions[url] = Future()
+            return {'success': True, 'transcode': self.conversions[url]}
+        return {'success': True, 'filename': url}
+
+
+class TestQueueHandoff:
+
+    def test_transfer_slot_is_freed_during_conversion(self):
+        """Test the next download starts while an earlier job is still converting"""
+        downloader = DeferringDownloader()
+        queue = DownloadQueue(downloader, max_workers=1)
+        converting = queue.submit('https://a/song', format_choice='MP3')
+        following = queue.submit('https://a/video')
+
+        assert following.wait(timeout=5)
+        assert following.state == DONE
+        assert converting.state == TRANSCODING
+        assert queue.active_count() == 0
+
+        downloader.conversions['https://a/song'].set_result({'success': True, 'filename': 'song.mp3'})
+        assert converting.wait(timeout=5)
+        assert converting.state == DONE
+        assert converting.result['filename'] == 'song.mp3'
+        queue.shutdown()
+
+
+class TestDownloaderTranscode:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.transcoder = MagicMock()
+        self.downloader = VideoDownloader(self.temp_dir, transcoder=self.transcoder)
+        self.downloader.use_archive = False
+
+    def teardown_method(self):
+        """Cleanup test environment"""
+        self.downloader.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    @patch('core.downloader.VideoDownloader.check_ffmpeg', return_value=True)
+    @patch('core.downloader.YoutubeDL')
+    def test_mp3_download_is_converted_after_transfer(self, mock_ytdl_class, mock_ffmpeg):
+        """Test MP3 downloads fetch the audio stream and hand it to the transcoder"""
+        mock_ytdl = MagicMock()
+        mock_ytdl_class.return_value.__enter__.return_value = mock_ytdl
+        source = os.path.join(self.temp_dir, '001-Song.webm')
+        mp3 = os.path.join(self.temp_dir, '001-Song.mp3')
+
+        def fake_download(urls):
+            for call in mock_ytdl.add_post_hook.call_args_list:
+                call[0][0](source)
+        mock_ytdl.download.side_effect = fake_download
+        conversion = Future()
+        self.transcoder.submit.return_value = conversion
+        # Download-then-convert path; streaming is covered in test_audio_stream
+        self.downloader.stream_audio = False
+
+        result = self.downloader._download_with_ytdlp('https://example.com/v', 'best', 'MP3',
+                                                      defer_transcode=True)
+
+        options = mock_ytdl_class.call_args[0][0]
+        assert options['format'] == 'bestaudio/best'
+        assert 'extractaudio' not in options
+        assert self.transcoder.submit.call_args[0][:2] == (source, 'mp3')
+        assert result['success'] is True
+
+        write_file(mp3)
+        conversion.set_result(mp3)
+        assert result['transcode'].result(timeout=5) == {'success': True, 'filename': mp3}
+
+    @patch('core.downloader.VideoDownloader.check_ffmpeg', return_value=False)
+    @patch('core.downloader.YoutubeDL')
+    def test_conversion_without_ffmpeg_fails(self, mock_ytdl_class, mock_ffmpeg):
+        """Test a download that cannot be converted is reported as failed and not archived"""
+        mock_ytdl = MagicMock()
+        mock_ytdl_class.return_value.__enter__.return_value = mock_ytdl
+        source = os.path.join(self.temp_dir, '001-Video.mkv')
+
+        def fake_download(urls):
+            for call in mock_ytdl.add_post_hook.call_args_list:
+                call[0][0](source)
+        mock_ytdl.download.side_effect = fake_download
+        self.downloader.use_archive = True
+
+        with patch.object(self.downloader, '_record_archive') as mock_record:
+            result = self.downloader._download_with_ytdlp('https://example.com/v', '720p', 'AVI')
+
+        assert result['success'] is False
+        assert 'ffmpeg' in result['error']
+        mock_record.assert_not_called()
+        self.transcoder.submit.assert_not_called()
+
+    @patch('core.downloader.YoutubeDL')
+    def test_mp4_is_not_converted(self, mock_ytdl_class):
+        """Test MP4 downloads finish without the transcoder"""
+        mock_ytdl_class.return_value.__enter__.return_value = MagicMock()
+
+        result = self.downloader._download_with_ytdlp('https://example.com/v', '720p', 'MP4',
+                                                      defer_transcode=True)
+
+        assert result['success'] is True
+        assert 'transcode' not in result
+        self.transcoder.submit.assert_not_called()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
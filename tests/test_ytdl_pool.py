@@ -0,0 +1,108 @@
+"""
+Unit tests for the YoutubeDL instance pool
+"""
+import pytest
+import os
+import sys
+from unittest.mock import MagicMock
+
+# Add src to path for testing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'src'))
+
+from core.ytdl_pool import YoutubeDLPool
+
+
+def make_factory(created):
+    def factory(options):
+        ydl = MagicMock()
+        ydl.__enter__.return_value = ydl
+        ydl.params = {'outtmpl': {'default': '%(title)s.%(ext)s'}}
+        ydl.options = options
+        created.append(ydl)
+        return ydl
+    return factory
+
+
+class TestYoutubeDLPool:
+
+    def setup_method(self):
+        """Setup test environment"""
+        self.created = []
+        self.pool = YoutubeDLPool(make_factory(self.created))
+
+    def test_instance_reused_for_same_profile(self):
+        """Test sequential leases of one profile share an instance"""
+        with self.pool.lease({'quiet': True}) as first:
+            pass
+        with self.pool.lease({'quiet': True}) as second:
+            pass
+
+        assert first is second
+        assert len(self.created) == 1
+
+    def test_profiles_are_isolated(self):
+        """Test different option profiles get different instances"""
+        with self.pool.lease({'format': 'best'}) as first:
+            pass
+        with self.pool.lease({'format': 'bestaudio'}) as second:
+            pass
+
+        assert first is not second
+        assert second.options == {'format': 'bestaudio'}
+
+    def test_concurrent_leases_get_separate_instances(self):
+        """Test an instance is never lent to two callers at once"""
+        with self.pool.lease({'quiet': True}) as first:
+            with self.pool.lease({'quiet': True}) as second:
+                assert first is not second
+        assert self.pool.idle_count() == 2
+
+    def test_per_lease_outtmpl_and_hooks(self):
+        """Test output template and hooks only apply to their lease"""
+        events = []
+        with self.pool.lease({}, outtmpl='001-%(title)s.%(ext)s', progress_hooks=[events.append]) as ydl:
+            assert ydl.params['outtmpl']['default'] == '001-%(title)s.%(ext)s'
+            dispatch = ydl.add_progress_hook.call_args[0][0]
+            dispatch({'status': 'downloading'})
+
+        dispatch({'status': 'finished'})
+        assert events == [{'status': 'downloading'}]
+
+        with self.pool.lease({}) as ydl:
+            assert ydl.params['outtmpl']['default'] == '%(title)s.%(ext)s'
+
+    def test_post_hooks_per_lease(self):
+        """Test final file paths reach only the post hooks of the current lease"""
+        paths = []
+        with self.pool.lease({}, post_hooks=[paths.append]) as ydl:
+            post_dispatch = ydl.add_post_hook.call_args[0][0]
+            post_dispatch('/out/001-Video.mp4')
+
+        post_dispatch('/out/002-Video.mp4')
+        assert paths == ['/out/001-Video.mp4']
+
+    def test_format_spec_per_lease(self):
+        """Test a per-video format spec is restored after the lease and shares the profile"""
+        with self.pool.lease({'format': 'best'}) as ydl:
+            default_selector = ydl.format_selector
+        with self.pool.lease({'format': 'best'}, format_spec='399+251/best') as leased:
+            assert leased is ydl
+            assert ydl.params['format'] == '399+251/best'
+            ydl.build_format_selector.assert_called_once_with('399+251/best')
+            assert ydl.format_selector is ydl.build_format_selector.return_value
+
+        assert ydl.format_selector is default_selector
+        assert len(self.created) == 1
+
+    def test_close(self):
+        """Test closing the pool exits idle instances"""
+        with self.pool.lease({}) as ydl:
+            pass
+        self.pool.close()
+
+        ydl.__exit__.assert_called_once()
+        assert self.pool.idle_count() == 0
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])